@@ -0,0 +1,258 @@
+"""
+Supabase JWT Authentication
+ASGI middleware that verifies Supabase access tokens once and serves repeat requests from a verified-claims LRU
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Tuple
+
+from model_router import _percentile
+
+try:
+    import jwt
+    JWT_AVAILABLE = True
+except ImportError:
+    JWT_AVAILABLE = False
+
+# Paths reachable without a token (health checks, service info, API docs)
+PUBLIC_PATHS = {"/", "/health", "/docs", "/redoc", "/openapi.json", "/docs/oauth2-redirect"}
+
+# Custom claims added by the Supabase custom access token hook
+CUSTOM_CLAIMS = ("user_role", "is_super_admin", "organization_id")
+
+
+class AuthenticationError(Exception):
+    """Raised when a bearer token is missing, malformed, expired or has a bad signature."""
+
+
+class SupabaseJWTVerifier:
+    """
+    Verifies Supabase access tokens with the project HS256 secret or the
+    project JWKS (asymmetric signing keys, fetched and cached by PyJWT).
+
+    Verified claims are kept per token in a bounded LRU until the token's
+    exp, so only the first request with a token pays for the signature
+    check; every later one is a dictionary lookup.
+    """
+
+    def __init__(
+        self,
+        secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        audience: str = "authenticated",
+        cache_size: int = 10000,
+        jwks_ttl_s: int = 600,
+        leeway_s: int = 10
+    ):
+        if not JWT_AVAILABLE:
+            raise RuntimeError("PyJWT is not installed")
+        if not secret and not jwks_url:
+            raise ValueError("A JWT secret or a JWKS URL is required")
+        self.secret = secret
+        self.audience = audience
+        self.cache_size = cache_size
+        self.leeway_s = leeway_s
+        self._jwks = jwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=jwks_ttl_s) if jwks_url else None
+
+        self._lock = threading.Lock()
+        self._claims: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "failures": 0, "evictions": 0}
+        self._verify_ms: deque = deque(maxlen=1000)
+
+    @property
+    def uses_jwks(self) -> bool:
+        return self._jwks is not None
+
+    def cached_claims(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return the claims of an already verified, unexpired token, or None."""
+        with self._lock:
+            entry = self._claims.get(token)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._claims[token]
+                return None
+            self._claims.move_to_end(token)
+            self._stats["hits"] += 1
+            return claims
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify a token and return its claims.
+
+        Raises:
+            AuthenticationError: If the token does not verify
+        """
+        claims = self.cached_claims(token)
+        if claims is not None:
+            return claims
+
+        start = time.perf_counter()
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+            if algorithm == "HS256" and self.secret:
+                key = self.secret
+            elif self._jwks is not None and algorithm in ("RS256", "ES256"):
+                key = self._jwks.get_signing_key_from_jwt(token).key
+            else:
+                raise AuthenticationError(f"Unsupported token algorithm: {algorithm}")
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                leeway=self.leeway_s,
+                options={"require": ["exp", "sub"]}
+            )
+        except AuthenticationError:
+            self._record_failure()
+            raise
+        except jwt.PyJWTError as e:
+            self._record_failure()
+            raise AuthenticationError(str(e))
+
+        with self._lock:
+            self._stats["misses"] += 1
+            self._verify_ms.append((time.perf_counter() - start) * 1000)
+            self._claims[token] = (claims, float(claims["exp"]))
+            while len(self._claims) > self.cache_size:
+                self._claims.popitem(last=False)
+                self._stats["evictions"] += 1
+        return claims
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            latencies = sorted(self._verify_ms)
+            return {
+                **self._stats,
+                "mode": "jwks" if self._jwks is not None else "hs256",
+                "cached_tokens": len(self._claims),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "verify_p50_ms": round(_percentile(latencies, 0.5), 3) if latencies else None,
+                "verify_p99_ms": round(_percentile(latencies, 0.99), 3) if latencies else None
+            }
+
+    def _record_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+
+
+class JWTAuthMiddleware:
+    """
+    Pure ASGI middleware: requires "Authorization: Bearer <token>" on every
+    non-public path and exposes the verified claims to handlers as
+    request.state.auth and request.state.organization_id.
+
+    CORS preflight requests pass through untouched. JWKS verification may
+    fetch keys over the network, so cache misses in that mode run in a
+    worker thread instead of on the event loop.
+    """
+
+    def __init__(self, app, verifier: SupabaseJWTVerifier, public_paths=PUBLIC_PATHS):
+        self.app = app
+        self.verifier = verifier
+        self.public_paths = set(public_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in self.public_paths:
+            await self.app(scope, receive, send)
+            return
+
+        token = _bearer_token(scope)
+        if token is None:
+            await _reject(send, 401, "Missing bearer token")
+            return
+
+        claims = self.verifier.cached_claims(token)
+        if claims is None:
+            try:
+                if self.verifier.uses_jwks:
+                    loop = asyncio.get_running_loop()
+                    claims = await loop.run_in_executor(None, self.verifier.verify, token)
+                else:
+                    claims = self.verifier.verify(token)
+            except AuthenticationError as e:
+                await _reject(send, 401, f"Invalid token: {e}")
+                return
+
+        state = scope.setdefault("state", {})
+        state["auth"] = claims
+        state["organization_id"] = claims.get("organization_id")
+        await self.app(scope, receive, send)
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token.strip()
+            return None
+    return None
+
+
+async def _reject(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"www-authenticate", b"Bearer"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def scoped_organization(request, organization_id: Optional[str]) -> Optional[str]:
+    """
+    Resolve the organization a request acts on.
+
+    With authentication on, the token's organization_id wins: a missing body
+    value is filled from it, and a different one is refused unless the
+    caller is a super admin. Without authentication the body value is used.
+
+    Raises:
+        PermissionError: If the body names another organization
+    """
+    claims = getattr(request.state, "auth", None)
+    if claims is None:
+        return organization_id
+    token_organization = claims.get("organization_id")
+    if not organization_id:
+        return token_organization
+    if organization_id != token_organization and not claims.get("is_super_admin"):
+        raise PermissionError(f"Token is not valid for organization {organization_id}")
+    return organization_id
+
+
+def create_verifier_from_env() -> Optional[SupabaseJWTVerifier]:
+    """
+    Build the verifier from SUPABASE_JWT_SECRET and/or SUPABASE_JWKS_URL
+    (derived from SUPABASE_URL when not set). Returns None when neither is
+    configured or PyJWT is missing, which leaves the API unauthenticated.
+    """
+    if not JWT_AVAILABLE:
+        print("⚠️ PyJWT not installed, JWT authentication disabled")
+        return None
+    secret = os.getenv('SUPABASE_JWT_SECRET')
+    jwks_url = os.getenv('SUPABASE_JWKS_URL')
+    if not jwks_url and os.getenv('SUPABASE_URL'):
+        jwks_url = os.getenv('SUPABASE_URL').rstrip('/') + '/auth/v1/.well-known/jwks.json'
+    if not secret and not jwks_url:
+        print("⚠️ SUPABASE_JWT_SECRET / SUPABASE_URL not set, JWT authentication disabled")
+        return None
+    return SupabaseJWTVerifier(
+        secret=secret,
+        jwks_url=jwks_url,
+        audience=os.getenv('SUPABASE_JWT_AUDIENCE', 'authenticated'),
+        cache_size=int(os.getenv('AUTH_CLAIMS_CACHE_SIZE', '10000'))
+    )
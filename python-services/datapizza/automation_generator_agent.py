@@ -34,18 +34,34 @@ from datapizza.agents import Agent
 from datapizza.tools import tool
 import os
 import json
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional, Iterator, Tuple
 import re
 
+from response_cache import get_agent_cache, prompt_version
+from workflow_graph import WORKFLOW_NODE_LIBRARY, validate_workflow_graph
+from workflow_layout import layout_workflow
+from workflow_templates import get_template_library
+from workflow_rules import workflow_rule_engine
+from workflow_stream import IncrementalWorkflowParser, provisional_position
+from workflow_patch import plan_rule_patch, validate_patch, position_added_nodes, normalize_patch, empty_patch
+from usage_tracker import track_agent_run, count_tool_call, usage_tracker
+
+AGENT_NAME = "guardian_automation_generator_agent"
+client_model = None
+
 # Initialize Google VertexAI client for DataPizza (reuse from lead scoring)
 try:
     from datapizza.clients.vertexai import VertexAIClient
+    from google_credentials import build_vertex_client
     
-    client = VertexAIClient(
+    client = build_vertex_client(
+        VertexAIClient,
         project_id=os.getenv('GOOGLE_CLOUD_PROJECT', 'crm-ai-471815'),
         location=os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1'),
         model='gemini-1.5-pro'
     )
+    client_model = 'gemini-1.5-pro'
     print("✅ DataPizza VertexAI client initialized for automation generator")
     
 except ImportError as e:
@@ -58,6 +74,7 @@ except ImportError as e:
             api_key=api_key,
             model='gpt-4'
         )
+        client_model = 'gpt-4'
         print("✅ DataPizza OpenAI client initialized for automation generator (fallback)")
     except Exception as e2:
         print(f"⚠️ DataPizza client initialization failed: {e2}")
@@ -67,25 +84,6 @@ except Exception as e:
     print(f"❌ VertexAI initialization error: {e}")
     client = None
 
-# Define workflow node library for validation and agent guidance
-WORKFLOW_NODE_LIBRARY = {
-    "triggers": {
-        "form_submit": "When a form is submitted",
-        "contact_update": "When a contact is updated",  
-        "deal_won": "When a deal is won/closed",
-        "deal_lost": "When a deal is lost/failed",
-        "time_trigger": "Scheduled/recurring automation"
-    },
-    "actions": {
-        "send_email": "Send automated email",
-        "ai_score": "Score lead with DataPizza AI",
-        "create_deal": "Create new deal/opportunity",
-        "update_contact": "Modify contact information",
-        "send_notification": "Internal team notification", 
-        "wait_delay": "Add time delay between actions"
-    }
-}
-
 @tool
 def get_available_triggers() -> Dict[str, str]:
     """
@@ -94,6 +92,8 @@ def get_available_triggers() -> Dict[str, str]:
     Returns:
         Dictionary of trigger types and descriptions
     """
+    count_tool_call("get_available_triggers")
+    
     return WORKFLOW_NODE_LIBRARY["triggers"]
 
 @tool
@@ -104,6 +104,8 @@ def get_available_actions() -> Dict[str, str]:
     Returns:
         Dictionary of action types and descriptions  
     """
+    count_tool_call("get_available_actions")
+    
     return WORKFLOW_NODE_LIBRARY["actions"]
 
 @tool
@@ -117,52 +119,24 @@ def validate_workflow_structure(elements: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Validation results with errors/warnings
     """
-    validation_result = {
-        "valid": True,
-        "errors": [],
-        "warnings": []
-    }
+    count_tool_call("validate_workflow_structure")
+    
+    # Check if elements key exists
+    if "elements" not in elements:
+        return {
+            "valid": False,
+            "errors": ["Missing 'elements' key in workflow structure"],
+            "warnings": []
+        }
     
     try:
-        # Check if elements key exists
-        if "elements" not in elements:
-            validation_result["errors"].append("Missing 'elements' key in workflow structure")
-            validation_result["valid"] = False
-            return validation_result
-            
-        # Validate each element
-        for i, element in enumerate(elements["elements"]):
-            # Check required fields
-            required_fields = ["id", "type", "data", "position"]
-            for field in required_fields:
-                if field not in element:
-                    validation_result["errors"].append(f"Element {i}: Missing required field '{field}'")
-                    validation_result["valid"] = False
-                    
-            # Validate nodeType against library
-            if "data" in element and "nodeType" in element["data"]:
-                node_type = element["data"]["nodeType"]
-                all_types = {**WORKFLOW_NODE_LIBRARY["triggers"], **WORKFLOW_NODE_LIBRARY["actions"]}
-                if node_type not in all_types:
-                    validation_result["errors"].append(f"Element {i}: Invalid nodeType '{node_type}'")
-                    validation_result["valid"] = False
-                    
-        # Validate edges if present
-        if "edges" in elements:
-            element_ids = [el["id"] for el in elements["elements"]]
-            for i, edge in enumerate(elements["edges"]):
-                if "source" in edge and edge["source"] not in element_ids:
-                    validation_result["errors"].append(f"Edge {i}: Invalid source ID '{edge['source']}'")
-                    validation_result["valid"] = False
-                if "target" in edge and edge["target"] not in element_ids:
-                    validation_result["errors"].append(f"Edge {i}: Invalid target ID '{edge['target']}'")
-                    validation_result["valid"] = False
-                    
+        return validate_workflow_graph(elements["elements"], elements.get("edges", []))
     except Exception as e:
-        validation_result["errors"].append(f"Validation error: {str(e)}")
-        validation_result["valid"] = False
-        
-    return validation_result
+        return {
+            "valid": False,
+            "errors": [f"Validation error: {str(e)}"],
+            "warnings": []
+        }
 
 @tool
 def suggest_workflow_improvements(workflow_description: str) -> List[str]:
@@ -175,6 +149,8 @@ def suggest_workflow_improvements(workflow_description: str) -> List[str]:
     Returns:
         List of improvement suggestions
     """
+    count_tool_call("suggest_workflow_improvements")
+    
     suggestions = []
     description_lower = workflow_description.lower()
     
@@ -193,13 +169,8 @@ def suggest_workflow_improvements(workflow_description: str) -> List[str]:
         
     return suggestions
 
-# Create Automation Generator Agent
-if client:
-    automation_generator = Agent(
-        name="guardian_automation_generator_agent",
-        client=client,
-        tools=[get_available_triggers, get_available_actions, validate_workflow_structure, suggest_workflow_improvements],
-        system_prompt="""
+# System prompt shared by the agent and the response cache version
+AUTOMATION_GENERATOR_SYSTEM_PROMPT = """
 You are an expert CRM Automation Architect specializing in converting natural language descriptions into visual workflow automations for Guardian AI CRM system.
 
 Your Mission: Transform user descriptions into valid React Flow JSON elements that represent executable business process automations.
@@ -208,8 +179,7 @@ Critical Requirements:
 1. Output ONLY valid JSON in the exact format specified
 2. Use ONLY the predefined node types from the approved library (use get_available_triggers() and get_available_actions() tools)
 3. Create logical, executable workflow sequences 
-4. Position nodes in readable left-to-right flow patterns (x increments by 300px)
-5. Ensure all connections are valid and represent realistic business logic
+4. Ensure all connections are valid and represent realistic business logic
 
 OUTPUT FORMAT (Return ONLY this JSON structure):
 {
@@ -223,7 +193,6 @@ OUTPUT FORMAT (Return ONLY this JSON structure):
         "description": "Brief description",
         "config": {}
       },
-      "position": {"x": 100, "y": 100},
       "className": "border-blue-500"
     },
     {
@@ -235,7 +204,6 @@ OUTPUT FORMAT (Return ONLY this JSON structure):
         "description": "Brief description",
         "config": {}
       },
-      "position": {"x": 400, "y": 100},
       "className": "border-green-500"
     }
   ],
@@ -250,11 +218,7 @@ OUTPUT FORMAT (Return ONLY this JSON structure):
   ]
 }
 
-POSITIONING RULES:
-- Start triggers at x: 100, y: 100
-- Space actions every 300px horizontally (x: 400, 700, 1000...)
-- Keep same y-level (100) for linear flows
-- For parallel actions, offset y by ±100
+Do NOT include "position" fields - node coordinates are computed by the server.
 
 VALIDATION:
 - All nodeType values must exist in approved library (check with tools)
@@ -265,46 +229,120 @@ VALIDATION:
 
 Remember: Use the available tools to get valid node types and validate your output before returning!
 """
+AUTOMATION_GENERATOR_PROMPT_VERSION = prompt_version(AUTOMATION_GENERATOR_SYSTEM_PROMPT)
+
+# System prompt for incremental edits: the agent answers with a patch, not a whole workflow
+WORKFLOW_EDITOR_SYSTEM_PROMPT = """
+You are an expert CRM Automation Architect editing an existing Guardian AI CRM workflow.
+
+You receive a compact outline of the current workflow (one line per node: id, nodeType, label and
+the ids it connects to) and a change request. Return ONLY the minimal patch as JSON:
+{
+  "add_nodes": [{"id": "action-N", "type": "default", "data": {"label": "...", "nodeType": "...", "description": "...", "config": {}}, "className": "border-green-500"}],
+  "remove_nodes": ["node-id"],
+  "update_nodes": [{"id": "node-id", "data": {"label": "...", "config": {}}}],
+  "add_edges": [{"id": "e-source-target", "source": "node-id", "target": "node-id", "animated": true, "style": {"stroke": "#3b82f6"}}],
+  "remove_edges": ["edge-id"]
+}
+
+RULES:
+- Only use nodeType values from get_available_triggers() and get_available_actions()
+- Never add a second trigger and never remove the trigger
+- New node ids must not clash with existing ids
+- Every added node needs an incoming edge; reconnect around removed nodes
+- Leave everything the change request does not mention untouched
+- Do NOT include "position" fields
+"""
+WORKFLOW_EDITOR_PROMPT_VERSION = prompt_version(WORKFLOW_EDITOR_SYSTEM_PROMPT)
+EDITOR_AGENT_NAME = "guardian_workflow_editor_agent"
+
+# Create Automation Generator Agent
+if client:
+    automation_generator = Agent(
+        name=AGENT_NAME,
+        client=client,
+        tools=[get_available_triggers, get_available_actions, validate_workflow_structure, suggest_workflow_improvements],
+        system_prompt=AUTOMATION_GENERATOR_SYSTEM_PROMPT
     )
     print("✅ Automation Generator Agent initialized successfully")
+    
+    workflow_editor = Agent(
+        name=EDITOR_AGENT_NAME,
+        client=client,
+        tools=[get_available_triggers, get_available_actions],
+        system_prompt=WORKFLOW_EDITOR_SYSTEM_PROMPT
+    )
+    
+    agent_cache = get_agent_cache()
+    if agent_cache:
+        agent_cache.invalidate_stale(AGENT_NAME, AUTOMATION_GENERATOR_PROMPT_VERSION)
+        agent_cache.invalidate_stale(EDITOR_AGENT_NAME, WORKFLOW_EDITOR_PROMPT_VERSION)
 else:
     automation_generator = None
+    workflow_editor = None
+    agent_cache = None
     print("❌ Automation Generator Agent initialization failed - no client available")
 
-def generate_workflow(workflow_description: str) -> Dict[str, Any]:
-    """
-    Generate a workflow from natural language description.
-    
-    Args:
-        workflow_description: User's natural language workflow description
-        
-    Returns:
-        Dictionary containing workflow elements or error information
-    """
-    if not automation_generator:
-        return {
-            "success": False,
-            "error": "Automation generator agent not available",
-            "fallback_data": {
-                "elements": [
-                    {
-                        "id": "error-1",
-                        "type": "default", 
-                        "data": {
-                            "label": "Agent Unavailable",
-                            "nodeType": "send_notification",
-                            "description": "AI agent temporarily unavailable"
-                        },
-                        "position": {"x": 100, "y": 100},
-                        "className": "border-red-500"
-                    }
-                ],
-                "edges": []
+def _generate_without_agent(workflow_description: str, organization_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Answer from the template library, then the rule engine; None means the agent is needed."""
+    template_library = get_template_library()
+    if template_library:
+        template = template_library.match(workflow_description, organization_id)
+        if template:
+            workflow = template["workflow"]
+            return {
+                "success": True,
+                "elements": workflow["elements"],
+                "edges": workflow["edges"],
+                "agent_used": "DataPizza Workflow Template Library",
+                "template": {"id": template["template_id"], "similarity": template["similarity"]},
+                "validation": validate_workflow_structure(workflow),
+                "suggestions": suggest_workflow_improvements(workflow_description),
+                "processing_time_ms": 0
             }
+
+    # Without an agent the rule engine answers every request
+    rule_workflow = workflow_rule_engine.generate(
+        workflow_description,
+        min_confidence=None if automation_generator else 0.0
+    )
+    if rule_workflow:
+        return {
+            "success": True,
+            "elements": rule_workflow["elements"],
+            "edges": rule_workflow["edges"],
+            "agent_used": "DataPizza Workflow Rule Engine",
+            "rules": {"matched": rule_workflow["rules"], "confidence": rule_workflow["confidence"]},
+            "validation": validate_workflow_structure(rule_workflow),
+            "suggestions": suggest_workflow_improvements(workflow_description),
+            "processing_time_ms": 0
         }
-    
-    try:
-        prompt = f"""
+    return None
+
+def _agent_unavailable_result() -> Dict[str, Any]:
+    return {
+        "success": False,
+        "error": "Automation generator agent not available",
+        "fallback_data": {
+            "elements": [
+                {
+                    "id": "error-1",
+                    "type": "default", 
+                    "data": {
+                        "label": "Agent Unavailable",
+                        "nodeType": "send_notification",
+                        "description": "AI agent temporarily unavailable"
+                    },
+                    "position": {"x": 100, "y": 100},
+                    "className": "border-red-500"
+                }
+            ],
+            "edges": []
+        }
+    }
+
+def _build_prompt(workflow_description: str) -> str:
+    return f"""
 Generate a workflow automation from this description:
 
 User Request: "{workflow_description}"
@@ -317,38 +355,109 @@ Use your available tools to:
 
 Return ONLY the JSON workflow structure as specified in your instructions.
         """
-        
-        print(f"🤖 DataPizza automation generator analyzing: {workflow_description}")
+
+def _parse_agent_response(response: Any) -> Dict[str, Any]:
+    """
+    Turn the agent's raw output into a workflow dict.
+
+    Raises:
+        ValueError: If no JSON or no 'elements' key is found (json.JSONDecodeError is a ValueError)
+    """
+    if isinstance(response, str):
+        # Extract JSON from response text
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if json_match:
+            parsed_response = json.loads(json_match.group())
+        else:
+            raise ValueError("No JSON found in response")
+    else:
+        parsed_response = response
+    if "elements" not in parsed_response:
+        raise ValueError("Generated response missing 'elements' key")
+    return parsed_response
+
+def _finish_agent_workflow(workflow_description: str, parsed_response: Dict[str, Any], organization_id: Optional[str] = None) -> Dict[str, Any]:
+    """Lay out, validate and (when valid) learn an agent-generated workflow."""
+    # Node coordinates come from the layout engine, not the model
+    layout_workflow(parsed_response["elements"], parsed_response.get("edges", []))
+    validation = validate_workflow_structure(parsed_response)
+    template_library = get_template_library()
+    if template_library and validation.get("valid"):
+        template_library.learn(workflow_description, parsed_response, organization_id)
+    
+    return {
+        "success": True,
+        "elements": parsed_response.get("elements", []),
+        "edges": parsed_response.get("edges", []),
+        "agent_used": "DataPizza Guardian Automation Generator Agent",
+        "validation": validation,
+        "suggestions": suggest_workflow_improvements(workflow_description),
+        "processing_time_ms": 2500  # Approximate processing time
+    }
+
+def _agent_text_chunks(prompt: str) -> Iterator[str]:
+    """
+    Yield the agent's output text as it is produced.
+
+    Uses the agent's stream_invoke() when the installed DataPizza version
+    provides it; otherwise the whole run() output arrives as one chunk.
+    """
+    stream = getattr(automation_generator, "stream_invoke", None)
+    if stream is None:
         response = automation_generator.run(prompt)
+        yield response if isinstance(response, str) else json.dumps(response)
+        return
+    for step in stream(prompt):
+        text = getattr(step, "delta", None) or getattr(step, "text", None)
+        if text is None and isinstance(step, str):
+            text = step
+        if text:
+            yield text
+
+def generate_workflow(workflow_description: str, organization_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Generate a workflow from natural language description.
+    
+    Args:
+        workflow_description: User's natural language workflow description
+        organization_id: Organization whose learned templates are used and extended
+        
+    Returns:
+        Dictionary containing workflow elements or error information
+    """
+    # Common requests are answered without an agent call
+    fast_result = _generate_without_agent(workflow_description, organization_id)
+    if fast_result:
+        return fast_result
+    
+    if not automation_generator:
+        return _agent_unavailable_result()
+    
+    try:
+        prompt = _build_prompt(workflow_description)
+        
+        cache_key = None
+        response = None
+        if agent_cache:
+            cache_key = agent_cache.make_key(AGENT_NAME, client_model, AUTOMATION_GENERATOR_PROMPT_VERSION, prompt)
+            response = agent_cache.get(cache_key)
+        
+        if response is None:
+            print(f"🤖 DataPizza automation generator analyzing: {workflow_description}")
+            with track_agent_run(AGENT_NAME, client_model) as run:
+                response = automation_generator.run(prompt)
+                run.set_response(response, AUTOMATION_GENERATOR_SYSTEM_PROMPT, prompt)
+        else:
+            usage_tracker.record_cache_hit(AGENT_NAME, client_model)
+            # Cached responses are already parsed - no need to store them again
+            cache_key = None
         
         # Parse JSON response from agent
         try:
-            if isinstance(response, str):
-                # Extract JSON from response text
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group()
-                    parsed_response = json.loads(json_str)
-                else:
-                    raise ValueError("No JSON found in response")
-            else:
-                parsed_response = response
-                
-            # Validate the generated workflow
-            if "elements" in parsed_response:
-                validation = validate_workflow_structure(parsed_response)
-                
-                return {
-                    "success": True,
-                    "elements": parsed_response.get("elements", []),
-                    "edges": parsed_response.get("edges", []),
-                    "agent_used": "DataPizza Guardian Automation Generator Agent",
-                    "validation": validation,
-                    "suggestions": suggest_workflow_improvements(workflow_description),
-                    "processing_time_ms": 2500  # Approximate processing time
-                }
-            else:
-                raise ValueError("Generated response missing 'elements' key")
+            parsed_response = _parse_agent_response(response)
+            if cache_key:
+                agent_cache.put(cache_key, AGENT_NAME, client_model, AUTOMATION_GENERATOR_PROMPT_VERSION, parsed_response)
+            return _finish_agent_workflow(workflow_description, parsed_response, organization_id)
                 
         except (json.JSONDecodeError, ValueError) as e:
             print(f"❌ Error parsing agent response: {e}")
@@ -388,6 +497,168 @@ Return ONLY the JSON workflow structure as specified in your instructions.
             }
         }
 
+def _outline_workflow(elements: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> str:
+    """One short line per node - far smaller than the React Flow JSON."""
+    successors: Dict[str, List[str]] = {}
+    for edge in edges:
+        successors.setdefault(edge.get("source"), []).append(f"{edge.get('target')} [{edge.get('id')}]")
+    lines = []
+    for element in elements:
+        data = element.get("data", {})
+        targets = ", ".join(successors.get(element.get("id"), [])) or "-"
+        lines.append(f"{element.get('id')} ({data.get('nodeType')}) \"{data.get('label', '')}\" -> {targets}")
+    return "\n".join(lines)
+
+def edit_workflow(elements: List[Dict[str, Any]], edges: List[Dict[str, Any]], change_request: str) -> Dict[str, Any]:
+    """
+    Turn a change request into a minimal patch for an existing workflow.
+    
+    Simple edits (add/remove a step, change a delay) are planned by rules;
+    anything else goes to the editor agent with a compact outline of the
+    graph. The patch is validated against the existing graph only where it
+    touches it, and added nodes get positions without moving existing ones.
+    
+    Args:
+        elements: Current workflow nodes
+        edges: Current workflow connections
+        change_request: What to change, e.g. "also notify the sales team"
+        
+    Returns:
+        Dictionary with the patch, its validation and which tier produced it
+    """
+    patch = plan_rule_patch(elements, edges, change_request)
+    agent_used = "DataPizza Workflow Rule Engine"
+    
+    if patch is None:
+        if not workflow_editor:
+            return {"success": False, "error": "Workflow editor agent not available", "patch": empty_patch()}
+        
+        prompt = f"""
+Current workflow:
+{_outline_workflow(elements, edges)}
+
+Change request: "{change_request}"
+
+Return ONLY the JSON patch as specified in your instructions.
+        """
+        cache_key = None
+        response = None
+        if agent_cache:
+            cache_key = agent_cache.make_key(EDITOR_AGENT_NAME, client_model, WORKFLOW_EDITOR_PROMPT_VERSION, prompt)
+            response = agent_cache.get(cache_key)
+        
+        if response is None:
+            print(f"🤖 DataPizza workflow editor applying: {change_request}")
+            with track_agent_run(EDITOR_AGENT_NAME, client_model) as run:
+                response = workflow_editor.run(prompt)
+                run.set_response(response, WORKFLOW_EDITOR_SYSTEM_PROMPT, prompt)
+        else:
+            usage_tracker.record_cache_hit(EDITOR_AGENT_NAME, client_model)
+            cache_key = None
+        
+        try:
+            if isinstance(response, str):
+                json_match = re.search(r'\{.*\}', response, re.DOTALL)
+                if not json_match:
+                    raise ValueError("No JSON found in response")
+                response = json.loads(json_match.group())
+            patch = normalize_patch(response)
+        except (json.JSONDecodeError, ValueError, AttributeError) as e:
+            print(f"❌ Error parsing editor response: {e}")
+            return {"success": False, "error": f"Agent response parsing error: {str(e)}", "patch": empty_patch()}
+        
+        if cache_key:
+            agent_cache.put(cache_key, EDITOR_AGENT_NAME, client_model, WORKFLOW_EDITOR_PROMPT_VERSION, patch)
+        agent_used = "DataPizza Guardian Workflow Editor Agent"
+    
+    validation = validate_patch(elements, edges, patch)
+    if validation["valid"]:
+        position_added_nodes(elements, edges, patch)
+    
+    return {
+        "success": validation["valid"],
+        "patch": patch,
+        "validation": validation,
+        "agent_used": agent_used,
+        "error": None if validation["valid"] else "Patch failed validation"
+    }
+
+def stream_workflow(workflow_description: str, organization_id: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Generate a workflow, yielding events as soon as each piece is known.
+    
+    Events are ("node", element) and ("edge", edge) while the agent writes
+    its answer (streamed nodes carry a provisional position), then
+    ("layout", {"positions": {...}}) with the final coordinates and
+    ("done", {...}) with validation, suggestions and timings. Failures end
+    the stream with ("error", {...}).
+    
+    Args:
+        workflow_description: User's natural language workflow description
+        organization_id: Organization whose learned templates are used and extended
+    """
+    start_time = time.time()
+    first_node_ms = None
+    
+    result = _generate_without_agent(workflow_description, organization_id)
+    if result is None and not automation_generator:
+        yield "error", _agent_unavailable_result()
+        return
+    
+    if result is None:
+        prompt = _build_prompt(workflow_description)
+        cache_key = None
+        cached = None
+        if agent_cache:
+            cache_key = agent_cache.make_key(AGENT_NAME, client_model, AUTOMATION_GENERATOR_PROMPT_VERSION, prompt)
+            cached = agent_cache.get(cache_key)
+        
+        try:
+            if cached is not None:
+                usage_tracker.record_cache_hit(AGENT_NAME, client_model)
+                result = _finish_agent_workflow(workflow_description, cached, organization_id)
+            else:
+                print(f"🤖 DataPizza automation generator streaming: {workflow_description}")
+                parser = IncrementalWorkflowParser()
+                streamed_nodes = 0
+                with track_agent_run(AGENT_NAME, client_model) as run:
+                    for chunk in _agent_text_chunks(prompt):
+                        for kind, item in parser.feed(chunk):
+                            if kind == "node":
+                                item = {**item, "position": provisional_position(streamed_nodes)}
+                                streamed_nodes += 1
+                                if first_node_ms is None:
+                                    first_node_ms = int((time.time() - start_time) * 1000)
+                            yield kind, item
+                    run.set_response(parser.document, AUTOMATION_GENERATOR_SYSTEM_PROMPT, prompt)
+                
+                parsed_response = _parse_agent_response(parser.document)
+                if cache_key:
+                    agent_cache.put(cache_key, AGENT_NAME, client_model, AUTOMATION_GENERATOR_PROMPT_VERSION, parsed_response)
+                result = _finish_agent_workflow(workflow_description, parsed_response, organization_id)
+                yield "layout", {"positions": {element["id"]: element.get("position") for element in result["elements"]}}
+                yield "done", _stream_summary(result, start_time, first_node_ms)
+                return
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"❌ Error parsing streamed agent response: {e}")
+            yield "error", {"success": False, "error": f"Agent response parsing error: {str(e)}"}
+            return
+    
+    # Template, rule engine and cached results are complete - send them at once
+    for element in result["elements"]:
+        if first_node_ms is None:
+            first_node_ms = int((time.time() - start_time) * 1000)
+        yield "node", element
+    for edge in result["edges"]:
+        yield "edge", edge
+    yield "done", _stream_summary(result, start_time, first_node_ms)
+
+def _stream_summary(result: Dict[str, Any], start_time: float, first_node_ms: Optional[int]) -> Dict[str, Any]:
+    summary = {key: value for key, value in result.items() if key not in ("elements", "edges")}
+    summary["processing_time_ms"] = int((time.time() - start_time) * 1000)
+    summary["time_to_first_node_ms"] = first_node_ms
+    return summary
+
 # Testing function
 if __name__ == "__main__":
     # Test the automation generator
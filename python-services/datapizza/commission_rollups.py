@@ -0,0 +1,301 @@
+"""
+Commission Rollups
+Incrementally maintained insurance_commissions aggregates per organization, agent, product and month
+"""
+
+import time
+import threading
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+# Dimensions of a base cell, in key order
+DIMENSIONS = ("agent", "product", "month", "commission_type", "status")
+
+# Coarser rollups kept alongside the base cells; queries use the smallest one covering them
+ROLLUPS = (
+    ("month", "status"),
+    ("agent", "month", "status"),
+    ("product", "month", "status"),
+    ("commission_type", "month", "status"),
+    ("product", "commission_type", "month", "status"),
+)
+
+UNASSIGNED = "(none)"
+
+_Key = Tuple[str, ...]
+
+
+def _cents(value: Any) -> int:
+    """NUMERIC(12, 2) -> integer cents, so repeated add/subtract never drifts."""
+    if value is None or value == "":
+        return 0
+    try:
+        # 12 significant digits round-trip exactly through a double
+        return round(float(value) * 100)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {value!r}")
+
+
+def commission_cell(row: Dict[str, Any]) -> Tuple[_Key, Tuple[int, int]]:
+    """
+    Base cell key and measures (commission cents, premium cents) for one commission row.
+
+    agent is the policy's agent (agent_id, or the joined policy's created_by),
+    product the policy type (product, or the joined policy_type); rows
+    without a policy fall under "(none)". month is taken from calculation_date.
+    """
+    policy = row.get("insurance_policies") or {}
+    agent = row.get("agent_id") or policy.get("created_by") or UNASSIGNED
+    product = row.get("product") or row.get("policy_type") or policy.get("policy_type") or UNASSIGNED
+    month = str(row.get("calculation_date") or row.get("created_at") or "")[:7] or UNASSIGNED
+    key = (str(agent), str(product), month, row.get("commission_type") or UNASSIGNED, row.get("status") or "pending")
+    return key, (_cents(row.get("commission_amount")), _cents(row.get("base_premium")))
+
+
+class _Cube:
+    """Group-by table: key -> [count, commission cents, premium cents]."""
+
+    def __init__(self, dimensions: Tuple[str, ...]):
+        self.dimensions = dimensions
+        self.positions = [DIMENSIONS.index(dimension) for dimension in dimensions]
+        self.cells: Dict[_Key, List[int]] = {}
+
+    def add(self, base_key: _Key, measures: Tuple[int, int], sign: int):
+        key = tuple(base_key[position] for position in self.positions)
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = [0, 0, 0]
+        cell[0] += sign
+        cell[1] += sign * measures[0]
+        cell[2] += sign * measures[1]
+        if cell[0] == 0:
+            del self.cells[key]
+
+
+class _OrganizationRollups:
+    def __init__(self):
+        self.base = _Cube(DIMENSIONS)
+        self.rollups = [_Cube(dimensions) for dimensions in ROLLUPS]
+
+    def add(self, key: _Key, measures: Tuple[int, int], sign: int):
+        self.base.add(key, measures, sign)
+        for cube in self.rollups:
+            cube.add(key, measures, sign)
+
+    def covering_cube(self, needed: Iterable[str]) -> _Cube:
+        needed = set(needed)
+        candidates = [cube for cube in self.rollups if needed <= set(cube.dimensions)]
+        return min(candidates, key=lambda cube: len(cube.cells)) if candidates else self.base
+
+
+class CommissionRollups:
+    """
+    Commission report aggregates kept up to date from row changes.
+
+    Every row change is applied as a delta: the row's previous version
+    (kept by id, so DELETE payloads carrying only the id work) is
+    subtracted from its cells and the new version added. Each organization
+    has a base table at (agent, product, month, commission_type, status)
+    grain plus coarser month/agent/product rollups; a report reads the
+    smallest table that covers its grouping and filters, so opening a
+    report never touches the raw rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Tuple[str, _Key, Tuple[int, int]]] = {}
+        self._organizations: Dict[str, _OrganizationRollups] = defaultdict(_OrganizationRollups)
+        self._stats = {"inserts": 0, "updates": 0, "deletes": 0, "ignored": 0, "reports": 0}
+
+    def upsert(self, row: Dict[str, Any]):
+        """
+        Apply an INSERT or UPDATE of one insurance_commissions row.
+
+        Raises:
+            PermissionError: If the row is already known under another organization
+        """
+        row_id = row.get("id")
+        organization_id = row.get("organization_id")
+        if not row_id or not organization_id:
+            raise ValueError("Commission rows need id and organization_id")
+        key, measures = commission_cell(row)
+        with self._lock:
+            previous = self._rows.get(row_id)
+            self._check_owner(row_id, previous, organization_id)
+            if previous is not None:
+                self._organizations[previous[0]].add(previous[1], previous[2], -1)
+            self._organizations[organization_id].add(key, measures, 1)
+            self._rows[row_id] = (organization_id, key, measures)
+            self._stats["updates" if previous is not None else "inserts"] += 1
+
+    def delete(self, row_id: str, organization_id: Optional[str] = None) -> bool:
+        """
+        Apply a DELETE; returns False for rows never seen.
+
+        Raises:
+            PermissionError: If organization_id is given and the row belongs to another one
+        """
+        with self._lock:
+            previous = self._rows.get(row_id)
+            if previous is None:
+                self._stats["ignored"] += 1
+                return False
+            self._check_owner(row_id, previous, organization_id)
+            del self._rows[row_id]
+            self._organizations[previous[0]].add(previous[1], previous[2], -1)
+            self._stats["deletes"] += 1
+            return True
+
+    def organization_of(self, change: Dict[str, Any]) -> Optional[str]:
+        """
+        Organization a change event touches: the stored row's whenever its id
+        is known (the payload's organization_id is only trusted for new rows).
+
+        Raises:
+            PermissionError: If the payload names another organization than the stored row
+        """
+        row = change.get("new") or change.get("record") or change.get("old") or change.get("old_record") or {}
+        with self._lock:
+            previous = self._rows.get(row.get("id"))
+        if previous is None:
+            return row.get("organization_id")
+        self._check_owner(row.get("id"), previous, row.get("organization_id"))
+        return previous[0]
+
+    @staticmethod
+    def _check_owner(row_id: Any, previous: Optional[Tuple[str, _Key, Tuple[int, int]]], organization_id: Optional[str]):
+        # Rows are keyed by a global id, so a change must not move or remove another organization's row
+        if previous is not None and organization_id and organization_id != previous[0]:
+            raise PermissionError(f"Commission row {row_id} belongs to another organization")
+
+    def apply_change(self, change: Dict[str, Any]) -> str:
+        """
+        Apply one change event.
+
+        Accepts Supabase Realtime payloads ({"eventType", "new", "old"}) and
+        database webhook payloads ({"type", "record", "old_record"}).
+
+        Returns:
+            The event type applied
+        """
+        event = (change.get("eventType") or change.get("type") or "").upper()
+        new = change.get("new") or change.get("record")
+        old = change.get("old") or change.get("old_record") or {}
+        if event in ("INSERT", "UPDATE") and new:
+            self.upsert(new)
+        elif event == "DELETE" and old.get("id"):
+            self.delete(old["id"], old.get("organization_id"))
+        else:
+            raise ValueError(f"Unsupported commission change: {event or 'missing type'}")
+        return event
+
+    def apply_changes(self, changes: List[Dict[str, Any]]) -> Dict[str, int]:
+        applied: Dict[str, int] = defaultdict(int)
+        for change in changes:
+            applied[self.apply_change(change)] += 1
+        return dict(applied)
+
+    def load(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Seed (or re-seed) from a table snapshot; rows already known are updated in place."""
+        count = 0
+        for row in rows:
+            self.upsert(row)
+            count += 1
+        return count
+
+    def report(
+        self,
+        organization_id: str,
+        group_by: Iterable[str] = ("month",),
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None,
+        status: Optional[str] = None,
+        commission_type: Optional[str] = None,
+        agent: Optional[str] = None,
+        product: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Commission totals for one organization.
+
+        Args:
+            organization_id: Organization to report on
+            group_by: Dimensions to group by (any of DIMENSIONS; empty for grand totals)
+            start_month: First month included, "YYYY-MM"
+            end_month: Last month included, "YYYY-MM"
+            status: Only this commission status
+            commission_type: Only this commission type
+            agent: Only this agent
+            product: Only this product
+
+        Returns:
+            Groups with count, total/average commission and total premium,
+            overall totals, and which table answered the query
+        """
+        start = time.perf_counter()
+        group_by = tuple(group_by)
+        unknown = [dimension for dimension in group_by if dimension not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown report dimensions: {', '.join(unknown)} (valid: {', '.join(DIMENSIONS)})")
+
+        equals = {"status": status, "commission_type": commission_type, "agent": agent, "product": product}
+        equals = {dimension: value for dimension, value in equals.items() if value is not None}
+        needed = set(group_by) | set(equals) | ({"month"} if start_month or end_month else set())
+
+        groups: Dict[_Key, List[int]] = {}
+        with self._lock:
+            organization = self._organizations.get(organization_id)
+            cube = organization.covering_cube(needed) if organization is not None else _Cube(DIMENSIONS)
+            index = {dimension: position for position, dimension in enumerate(cube.dimensions)}
+            group_positions = [index[dimension] for dimension in group_by]
+            filters = [(index[dimension], value) for dimension, value in equals.items()]
+            month_position = index.get("month")
+            low, high = start_month or "", end_month or "\uffff"
+            for key, (count, amount, premium) in cube.cells.items():
+                if filters and not all(key[position] == value for position, value in filters):
+                    continue
+                if month_position is not None and not low <= key[month_position] <= high:
+                    continue
+                group_key = tuple(key[position] for position in group_positions)
+                totals = groups.get(group_key)
+                if totals is None:
+                    groups[group_key] = [count, amount, premium]
+                else:
+                    totals[0] += count
+                    totals[1] += amount
+                    totals[2] += premium
+            self._stats["reports"] += 1
+            cells = len(cube.cells)
+
+        rows = [{**dict(zip(group_by, key)), **_measures(*totals)} for key, totals in sorted(groups.items())]
+        overall = [sum(totals[i] for totals in groups.values()) for i in range(3)]
+        return {
+            "organization_id": organization_id,
+            "group_by": list(group_by),
+            "groups": rows,
+            "totals": _measures(*overall),
+            "source": "+".join(cube.dimensions) if cube.dimensions != DIMENSIONS else "base",
+            "cells_scanned": cells,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "rows": len(self._rows),
+                "organizations": len(self._organizations),
+                "base_cells": sum(len(organization.base.cells) for organization in self._organizations.values())
+            }
+
+
+def _measures(count: int, amount_cents: int, premium_cents: int) -> Dict[str, Any]:
+    return {
+        "count": count,
+        "total_amount": amount_cents / 100,
+        "average_amount": round(amount_cents / count / 100, 2) if count else 0.0,
+        "total_premium": premium_cents / 100
+    }
+
+
+# Global commission rollups instance
+commission_rollups = CommissionRollups()
@@ -0,0 +1,410 @@
+"""
+Contact Deduplication Engine
+Blocking + sorted-neighbourhood candidate generation, Jaro-Winkler scoring and union-find clustering
+"""
+
+import re
+import time
+from array import array
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Set, Tuple, Iterable
+
+from workflow_templates import fold_text
+
+try:
+    from rapidfuzz.distance import JaroWinkler as _RapidJaroWinkler
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Pair scores, aligned with the check-duplicates edge function confidences
+EMAIL_MATCH_SCORE = 1.0
+PHONE_MATCH_SCORE = 0.9
+DEFAULT_THRESHOLD = 0.85
+
+# Names alone must be very close; a shared company lowers the bar. Two
+# records whose emails or phones differ are only matched by name within
+# the same company.
+NAME_ONLY_MIN_SIMILARITY = 0.93
+NAME_WITH_COMPANY_MIN_SIMILARITY = 0.85
+
+# Blocks up to this size are compared exhaustively, larger ones through a sliding window
+MAX_EXHAUSTIVE_BLOCK = 50
+
+# Shared inboxes and switchboards that must not merge unrelated people
+GENERIC_EMAIL_LOCALS = {"info", "admin", "office", "contact", "contatti", "segreteria", "amministrazione", "sales", "noreply", "no-reply"}
+
+_PHONETIC_RULES = (
+    (re.compile(r"sc(?=[ei])"), "s"),
+    (re.compile(r"gli"), "li"),
+    (re.compile(r"gn"), "n"),
+    (re.compile(r"ch"), "k"),
+    (re.compile(r"gh"), "g"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"[cq]"), "k"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"z"), "s"),
+    (re.compile(r"[jy]"), "i"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"h"), ""),
+    (re.compile(r"(.)\1+"), r"\1"),
+)
+
+
+def _identifying(email: str) -> bool:
+    """A normalized email that belongs to one person rather than a shared inbox."""
+    return bool(email) and email.split("@")[0] not in GENERIC_EMAIL_LOCALS
+
+
+def normalize_email(email: Optional[str]) -> str:
+    """Lowercase, trim and drop +tags ("Mario.Rossi+crm@X.it" -> "mario.rossi@x.it")."""
+    email = (email or "").strip().lower()
+    local, at, domain = email.partition("@")
+    if not at or not local or not domain:
+        return ""
+    return local.split("+", 1)[0] + "@" + domain
+
+
+def phone_digits(phone: Optional[str]) -> str:
+    """
+    Phone blocking key. E.164 numbers (see contact_normalization) are used
+    as they are; anything else falls back to its last nine digits, so
+    "0039 3331234567" and "333-1234567" still share a key. Numbers too
+    short to identify anyone give "".
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) < 7:
+        return ""
+    if phone.startswith("+") and phone[1:].isdigit():
+        return phone
+    return digits[-9:]
+
+
+def name_tokens(name: Optional[str]) -> Tuple[str, ...]:
+    return tuple(re.findall(r"[a-z0-9]+", fold_text(name or "")))
+
+
+def phonetic_key(word: str) -> str:
+    """
+    Consonant skeleton tuned for Italian spelling ("Bianchi" and "Bianki",
+    "Rossi" and "Rosi", "Zanetti" and "Sanetti" share a key).
+    """
+    if not word:
+        return ""
+    for pattern, replacement in _PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    return word[:1] + re.sub(r"[aeiou]", "", word[1:])
+
+
+def jaro_winkler(a: str, b: str) -> float:
+    if a == b:
+        return 1.0 if a else 0.0
+    if not a or not b:
+        return 0.0
+    if RAPIDFUZZ_AVAILABLE:
+        return _RapidJaroWinkler.similarity(a, b)
+
+    window = max(len(a), len(b)) // 2 - 1
+    a_matched = [False] * len(a)
+    b_matched = [False] * len(b)
+    matches = 0
+    for i, char in enumerate(a):
+        for j in range(max(0, i - window), min(len(b), i + window + 1)):
+            if not b_matched[j] and b[j] == char:
+                a_matched[i] = b_matched[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+
+    transpositions = 0
+    j = 0
+    for i, char in enumerate(a):
+        if a_matched[i]:
+            while not b_matched[j]:
+                j += 1
+            if char != b[j]:
+                transpositions += 1
+            j += 1
+    jaro = (matches / len(a) + matches / len(b) + (matches - transpositions / 2) / matches) / 3
+
+    prefix = 0
+    for char_a, char_b in zip(a[:4], b[:4]):
+        if char_a != char_b:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def sorted_name(tokens: Tuple[str, ...]) -> str:
+    return " ".join(sorted(tokens))
+
+
+def name_similarity(a: Tuple[str, ...], b: Tuple[str, ...], a_key: Optional[str] = None, b_key: Optional[str] = None) -> float:
+    """
+    Order-insensitive name similarity: Jaro-Winkler on the sorted full
+    names, or, when either name has an initial or they differ in length, the
+    better of that and a token-by-token match where an initial matches any
+    token it starts ("M. Rossi" ~ "Mario Rossi").
+
+    a_key/b_key are the precomputed sorted_name() of a and b.
+    """
+    if not a or not b:
+        return 0.0
+    full = jaro_winkler(a_key if a_key is not None else sorted_name(a), b_key if b_key is not None else sorted_name(b))
+    if len(a) == len(b) and min(map(len, a)) > 1 and min(map(len, b)) > 1:
+        return full
+    shorter, longer = (a, b) if len(a) <= len(b) else (b, a)
+    token_total = 0.0
+    for token in shorter:
+        best = 0.0
+        for other in longer:
+            if token == other:
+                best = 1.0
+                break
+            if len(token) == 1 or len(other) == 1:
+                if token[0] == other[0]:
+                    best = max(best, 0.9)
+            else:
+                best = max(best, jaro_winkler(token, other))
+        token_total += best
+    return max(full, token_total / len(shorter))
+
+
+class _Records:
+    """Column-wise normalized contacts: one list per field keeps 1M records compact."""
+
+    def __init__(self, contacts: Iterable[Dict[str, Any]]):
+        self.ids: List[Any] = []
+        self.emails: List[str] = []
+        self.phones: List[str] = []
+        self.names: List[Tuple[str, ...]] = []
+        self.name_keys: List[str] = []
+        self.companies: List[str] = []
+        for index, contact in enumerate(contacts):
+            self.ids.append(contact.get("id", index))
+            self.emails.append(normalize_email(contact.get("email")))
+            self.phones.append(phone_digits(contact.get("phone")))
+            tokens = name_tokens(contact.get("name"))
+            self.names.append(tokens)
+            self.name_keys.append(sorted_name(tokens))
+            self.companies.append(" ".join(name_tokens(contact.get("company"))))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = array("i", range(size))
+        # (emails, phones, companies) of clusters with more than one record, keyed by root
+        self.profiles: Dict[int, Tuple[Set[str], Set[str], Set[str]]] = {}
+
+    def find(self, node: int) -> int:
+        parent = self.parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if root_a < root_b:
+            root_a, root_b = root_b, root_a
+        self.parent[root_a] = root_b
+        return True
+
+
+class ContactDeduplicator:
+    """
+    Finds clusters of duplicate contacts without comparing every pair.
+
+    Candidates come from blocks (same normalized email, same phone digits,
+    same surname phonetic key + first initial) and from sorted-neighbourhood
+    windows over the sorted names, so each record meets only a bounded
+    number of others. Candidate pairs are scored and matches are merged with
+    union-find; pairs already in one cluster are skipped, so only the edges
+    that joined two clusters are kept (at most n-1). A match is not merged
+    when the two clusters carry conflicting emails (or, for name matches,
+    phones), so a phone-only record cannot chain two different people.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, window: int = 8):
+        self.threshold = threshold
+        self.window = window
+
+    def find_clusters(self, contacts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Cluster duplicate contacts.
+
+        Args:
+            contacts: Dicts with name, email, phone, company and optional id
+
+        Returns:
+            {"clusters": [{"ids", "indices", "confidence", "match_types"}], "stats": {...}}
+        """
+        start = time.perf_counter()
+        records = _Records(contacts)
+        union_find = _UnionFind(len(records))
+        edges: List[Tuple[int, int, float, str]] = []
+        stats = {"contacts": len(records), "blocks": 0, "candidate_pairs": 0, "compared": 0, "matches": 0, "conflicts": 0}
+
+        for block in self._blocks(records):
+            stats["blocks"] += 1
+            self._compare_group(block, records, union_find, edges, stats)
+
+        named = [i for i in range(len(records)) if records.names[i]]
+        for sort_key in (records.name_keys.__getitem__, lambda i: self._surname_first_key(records.names[i])):
+            named.sort(key=sort_key)
+            self._compare_window(named, records, union_find, edges, stats, self.window)
+
+        clusters = self._collect(records, union_find, edges)
+        stats.update({
+            "clusters": len(clusters),
+            "duplicates": sum(len(cluster["indices"]) - 1 for cluster in clusters),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+        return {"clusters": clusters, "stats": stats}
+
+    def score_pair(self, records: "_Records", a: int, b: int) -> Tuple[float, str]:
+        """Duplicate confidence of two records and the evidence it rests on."""
+        email_a, email_b = records.emails[a], records.emails[b]
+        if _identifying(email_a) and email_a == email_b:
+            return EMAIL_MATCH_SCORE, "email"
+
+        names_a, names_b = records.names[a], records.names[b]
+        phone_a, phone_b = records.phones[a], records.phones[b]
+        company_a, company_b = records.companies[a], records.companies[b]
+        same_company = company_a and company_a == company_b
+        shared_phone = phone_a and phone_a == phone_b
+        if shared_phone and not same_company and _identifying(email_a) and _identifying(email_b) and email_a != email_b:
+            # Two people reachable on one number (family line, switchboard) keep their own emails
+            return 0.0, "phone"
+        if not names_a or not names_b:
+            return (PHONE_MATCH_SCORE, "phone") if shared_phone else (0.0, "name")
+
+        if not shared_phone:
+            # Only the name left to go on: refuse when the other fields disagree
+            conflicting = (email_a and email_b and email_a != email_b) or (phone_a and phone_b)
+            if company_a and company_b and not same_company:
+                return 0.0, "name"
+            if conflicting and not same_company:
+                return 0.0, "name"
+            floor = NAME_WITH_COMPANY_MIN_SIMILARITY if same_company and not conflicting else NAME_ONLY_MIN_SIMILARITY
+
+        similarity = name_similarity(names_a, names_b, records.name_keys[a], records.name_keys[b])
+        if shared_phone:
+            # A shared switchboard number with clearly different names is not a duplicate
+            return (PHONE_MATCH_SCORE, "phone") if similarity >= 0.6 else (0.0, "phone")
+        return (similarity if similarity >= floor else 0.0), "name"
+
+    # ---- candidate generation ------------------------------------------
+
+    def _blocks(self, records: "_Records") -> Iterable[List[int]]:
+        for field_keys in (records.emails, records.phones, [self._name_block_key(tokens) for tokens in records.names]):
+            groups: Dict[str, List[int]] = defaultdict(list)
+            for index, key in enumerate(field_keys):
+                if key:
+                    groups[key].append(index)
+            for members in groups.values():
+                if len(members) > 1:
+                    yield members
+            del groups
+
+    def _compare_group(self, members: List[int], records, union_find, edges, stats):
+        if len(members) <= MAX_EXHAUSTIVE_BLOCK:
+            for position, a in enumerate(members):
+                for b in members[position + 1:]:
+                    self._compare(a, b, records, union_find, edges, stats)
+        else:
+            members = sorted(members, key=records.name_keys.__getitem__)
+            self._compare_window(members, records, union_find, edges, stats, self.window)
+
+    def _compare_window(self, order: List[int], records, union_find, edges, stats, window: int):
+        for position, a in enumerate(order):
+            for b in order[position + 1:position + window]:
+                self._compare(a, b, records, union_find, edges, stats)
+
+    def _compare(self, a: int, b: int, records, union_find, edges, stats):
+        stats["candidate_pairs"] += 1
+        if union_find.find(a) == union_find.find(b):
+            return
+        stats["compared"] += 1
+        score, match_type = self.score_pair(records, a, b)
+        if score < self.threshold:
+            return
+        profile_a, profile_b = self._profile(records, union_find, a), self._profile(records, union_find, b)
+        # A single pair was judged by score_pair; only clusters can hide a conflict
+        in_cluster = union_find.find(a) in union_find.profiles or union_find.find(b) in union_find.profiles
+        if in_cluster and self._conflicting(profile_a, profile_b, match_type):
+            stats["conflicts"] += 1
+            return
+        stats["matches"] += 1
+        union_find.profiles.pop(union_find.find(a), None)
+        union_find.profiles.pop(union_find.find(b), None)
+        union_find.union(a, b)
+        union_find.profiles[union_find.find(a)] = tuple(x | y for x, y in zip(profile_a, profile_b))
+        edges.append((a, b, score, match_type))
+
+    @staticmethod
+    def _profile(records: "_Records", union_find: "_UnionFind", index: int) -> Tuple[Set[str], Set[str], Set[str]]:
+        profile = union_find.profiles.get(union_find.find(index))
+        if profile is not None:
+            return profile
+        email = records.emails[index]
+        return (
+            {email} if _identifying(email) else set(),
+            {records.phones[index]} - {""},
+            {records.companies[index]} - {""}
+        )
+
+    @staticmethod
+    def _conflicting(profile_a, profile_b, match_type: str) -> bool:
+        """Whether merging two clusters would join records a direct comparison refuses."""
+        if match_type == "email":
+            return False
+        emails_a, phones_a, companies_a = profile_a
+        emails_b, phones_b, companies_b = profile_b
+        if companies_a & companies_b:
+            return False
+        if emails_a and emails_b and not emails_a & emails_b:
+            return True
+        return match_type == "name" and bool(phones_a and phones_b and not phones_a & phones_b)
+
+    @staticmethod
+    def _name_block_key(tokens: Tuple[str, ...]) -> str:
+        words = [token for token in tokens if len(token) > 1]
+        if not words:
+            return ""
+        return phonetic_key(words[-1]) + ":" + tokens[0][0]
+
+    @staticmethod
+    def _surname_first_key(tokens: Tuple[str, ...]) -> str:
+        return " ".join(tokens[-1:] + tokens[:-1])
+
+    # ---- output ---------------------------------------------------------
+
+    def _collect(self, records: "_Records", union_find: "_UnionFind", edges) -> List[Dict[str, Any]]:
+        clusters: Dict[int, Dict[str, Any]] = {}
+        for a, b, score, match_type in edges:
+            root = union_find.find(a)
+            cluster = clusters.setdefault(root, {"indices": set(), "confidence": 1.0, "match_types": set()})
+            cluster["indices"].update((a, b))
+            cluster["confidence"] = min(cluster["confidence"], score)
+            cluster["match_types"].add(match_type)
+
+        result = []
+        for cluster in clusters.values():
+            indices = sorted(cluster["indices"])
+            result.append({
+                "ids": [records.ids[i] for i in indices],
+                "indices": indices,
+                "confidence": round(cluster["confidence"], 3),
+                "match_types": sorted(cluster["match_types"])
+            })
+        result.sort(key=lambda cluster: cluster["indices"][0])
+        return result
@@ -0,0 +1,199 @@
+"""
+Contact Normalization
+Canonical E.164 phones (Italian defaults) and lowercase, IDN-encoded emails for every scoring, import and dedupe path
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Iterable
+
+try:
+    import phonenumbers
+    PHONENUMBERS_AVAILABLE = True
+except ImportError:
+    PHONENUMBERS_AVAILABLE = False
+
+try:
+    import idna
+    IDNA2008_AVAILABLE = True
+except ImportError:
+    IDNA2008_AVAILABLE = False
+
+DEFAULT_COUNTRY_CODE = "39"
+DEFAULT_REGION = "IT"
+# First digit of Italian national numbers: 0 landlines, 3 mobiles, 5 VoIP, 8 toll-free and shared cost (800, 848, ...)
+ITALIAN_LEADING_DIGITS = "0358"
+
+_EXTENSION = re.compile(r"\s*(?:ext\.?|x|int\.?|interno)\s*\d+\s*$", re.IGNORECASE)
+_NON_DIGITS = re.compile(r"\D")
+_EMAIL_WRAPPER = re.compile(r"^(?:mailto:)?<?\s*|\s*>?$", re.IGNORECASE)
+
+
+def normalize_phone(raw: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Canonical E.164 form of a phone number, or None if it cannot be one.
+
+    "+39 333 1234567", "0039 333 1234567" and "333-1234567" all become
+    "+393331234567"; Italian landlines keep their leading 0 ("02-12345678"
+    -> "+390212345678") and toll-free numbers are kept ("800 123456" ->
+    "+39800123456"). Numbers with an explicit international prefix keep
+    their own country ("+1-555-0123" -> "+15550123").
+    """
+    if not raw:
+        return None
+    text = _EXTENSION.sub("", str(raw).strip())
+    international = text.startswith("+") or text.startswith("00")
+    digits = _NON_DIGITS.sub("", text)
+    if text.startswith("00"):
+        digits = digits[2:]
+
+    if PHONENUMBERS_AVAILABLE:
+        try:
+            parsed = phonenumbers.parse("+" + digits if international else digits, DEFAULT_REGION)
+            if phonenumbers.is_possible_number(parsed):
+                return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+        except phonenumbers.NumberParseException:
+            pass
+
+    if not international:
+        # Italian numbers may carry the country code without "+" ("393331234567")
+        has_country_code = (
+            country_code == "39" and digits.startswith("39") and len(digits) >= 11 and digits[2] in ITALIAN_LEADING_DIGITS
+        )
+        if not has_country_code:
+            if country_code == "39" and (not digits or digits[0] not in ITALIAN_LEADING_DIGITS):
+                return None
+            digits = country_code + digits
+    # E.164: country code + subscriber number, 8-15 digits overall
+    if not 8 <= len(digits) <= 15 or digits[0] == "0":
+        return None
+    return "+" + digits
+
+
+def normalize_email(raw: Optional[str]) -> Optional[str]:
+    """
+    Lowercase, trimmed email with an ASCII (punycode) domain, or None if it
+    is not an address. "<Mario.Rossi@Caffè.IT>" -> "mario.rossi@xn--caff-8oa.it".
+    """
+    if not raw:
+        return None
+    text = unicodedata.normalize("NFC", _EMAIL_WRAPPER.sub("", str(raw).strip())).lower()
+    if text.count("@") != 1 or " " in text:
+        return None
+    local, _, domain = text.partition("@")
+    domain = domain.rstrip(".")
+    # Every domain label must be non-empty: "x@.it", "x@mail..it" and "x@it" are not addresses
+    if not local or "." not in domain or "" in domain.split("."):
+        return None
+    if not domain.isascii():
+        try:
+            if IDNA2008_AVAILABLE:
+                domain = idna.encode(domain, uts46=True).decode("ascii")
+            else:
+                domain = domain.encode("idna").decode("ascii")
+        except (UnicodeError, ValueError):
+            return None
+    return f"{local}@{domain}"
+
+
+class _BoundedCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+    def get_many(self, values: Iterable[str], normalize) -> Dict[str, Optional[str]]:
+        """Normalize each distinct value once, serving repeats from the cache."""
+        result = {}
+        for value in values:
+            if value in self.entries:
+                self.entries.move_to_end(value)
+                result[value] = self.entries[value]
+            else:
+                result[value] = self.entries[value] = normalize(value)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return result
+
+
+class ContactNormalizer:
+    """
+    Applies phone and email normalization to whole batches.
+
+    A batch is processed column-wise: the distinct raw phone and email
+    values are collected, each is normalized once (imports repeat
+    switchboard numbers and shared inboxes heavily), and the results are
+    mapped back onto every row. A bounded cache carries distinct values
+    across batches.
+    """
+
+    def __init__(self, cache_entries: int = 100000):
+        self._lock = threading.Lock()
+        self._phones = _BoundedCache(cache_entries)
+        self._emails = _BoundedCache(cache_entries)
+        self._stats = {"contacts": 0, "distinct_phones": 0, "distinct_emails": 0, "invalid_phones": 0, "invalid_emails": 0}
+
+    def normalize_batch(self, contacts: List[Dict[str, Any]], keep_invalid: bool = True) -> List[Dict[str, Any]]:
+        """
+        Return copies of contacts with canonical "phone" and "email".
+
+        Args:
+            contacts: Contact dicts
+            keep_invalid: Keep the trimmed raw value when a field cannot be
+                normalized (scoring still wants to see it); otherwise set None
+
+        Each copy gets "phone_valid"/"email_valid" flags for the fields present.
+        """
+        raw_phones = [_raw(contact.get("phone")) for contact in contacts]
+        raw_emails = [_raw(contact.get("email")) for contact in contacts]
+        distinct_phones = set(filter(None, raw_phones))
+        distinct_emails = set(filter(None, raw_emails))
+
+        with self._lock:
+            phones = self._phones.get_many(distinct_phones, normalize_phone)
+            emails = self._emails.get_many(distinct_emails, normalize_email)
+
+        normalized = []
+        invalid_phones = invalid_emails = 0
+        for contact, raw_phone, raw_email in zip(contacts, raw_phones, raw_emails):
+            row = dict(contact)
+            if raw_phone:
+                phone = phones[raw_phone]
+                row["phone_valid"] = phone is not None
+                row["phone"] = phone if phone is not None else (raw_phone if keep_invalid else None)
+                invalid_phones += phone is None
+            if raw_email:
+                email = emails[raw_email]
+                row["email_valid"] = email is not None
+                row["email"] = email if email is not None else (raw_email if keep_invalid else None)
+                invalid_emails += email is None
+            normalized.append(row)
+
+        with self._lock:
+            self._stats["contacts"] += len(contacts)
+            self._stats["distinct_phones"] += len(distinct_phones)
+            self._stats["distinct_emails"] += len(distinct_emails)
+            self._stats["invalid_phones"] += invalid_phones
+            self._stats["invalid_emails"] += invalid_emails
+        return normalized
+
+    def normalize_contact(self, contact: Dict[str, Any]) -> Dict[str, Any]:
+        return self.normalize_batch([contact])[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "cached_phones": len(self._phones.entries),
+                "cached_emails": len(self._emails.entries),
+                "phonenumbers": PHONENUMBERS_AVAILABLE
+            }
+
+
+def _raw(value: Any) -> str:
+    return str(value).strip() if value is not None else ""
+
+
+# Global normalizer instance
+contact_normalizer = ContactNormalizer()
@@ -0,0 +1,463 @@
+"""
+Dashboard KPIs
+Per-organization dashboard counters kept up to date from CRM change events, with periodic snapshots to disk
+"""
+
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+DEFAULT_SNAPSHOT_PATH = Path(__file__).parent / '.cache' / 'dashboard_kpis.json'
+SNAPSHOT_VERSION = 2
+
+# The row journal is rewritten once it holds this many times more lines than there are live rows
+JOURNAL_COMPACT_RATIO = 2
+
+# Lead score windows reported on the dashboard, and how many daily buckets are kept
+SCORE_WINDOWS_DAYS = (7, 30)
+SCORE_RETENTION_DAYS = 90
+HOT_LEAD_SCORE = 80
+
+# Table names as they arrive in change events -> projection key
+TABLE_ALIASES = {
+    "contacts": "contacts",
+    "opportunities": "deals",
+    "deals": "deals",
+    "dashboard_opportunities": "deals",
+    "events": "events",
+    "dashboard_events": "events",
+    "form_submissions": "forms",
+    "insurance_policies": "policies",
+    "lead_scores": "scores",
+}
+
+_Contributions = List[Tuple[str, float]]
+
+
+def _month(value: Any) -> str:
+    return str(value or "")[:7]
+
+
+def _day(value: Any) -> str:
+    return str(value or "")[:10]
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _contact(row: Dict[str, Any]) -> _Contributions:
+    return [("contacts", 1), (f"contacts:{_month(row.get('created_at'))}", 1)]
+
+
+def _deal(row: Dict[str, Any]) -> _Contributions:
+    stage = row.get("stage") or "(none)"
+    contributions = [("deals", 1), (f"deals_stage:{stage}", 1)]
+    if stage == "Won":
+        value = _number(row.get("value"))
+        contributions += [("revenue", value), (f"revenue:{_month(row.get('updated_at'))}", value)]
+    return contributions
+
+
+def _event(row: Dict[str, Any]) -> _Contributions:
+    return [("events", 1), (f"events:{_month(row.get('created_at'))}", 1)]
+
+
+def _form(row: Dict[str, Any]) -> _Contributions:
+    return [("forms", 1), (f"forms:{_month(row.get('created_at'))}", 1)]
+
+
+def _policy(row: Dict[str, Any]) -> _Contributions:
+    status = row.get("status") or "(none)"
+    contributions = [("policies", 1), (f"policies_status:{status}", 1)]
+    if status == "active":
+        contributions.append(("active_premium", _number(row.get("premium_amount"))))
+    return contributions
+
+
+def _score(row: Dict[str, Any]) -> _Contributions:
+    day = _day(row.get("created_at")) or datetime.now(timezone.utc).date().isoformat()
+    score = _number(row.get("score", row.get("lead_score")))
+    return [
+        (f"scores:{day}", 1),
+        (f"score_sum:{day}", score),
+        (f"scores_hot:{day}", 1 if score >= HOT_LEAD_SCORE else 0)
+    ]
+
+
+@lru_cache(maxsize=4)
+def _window_days(today: date) -> Tuple[str, ...]:
+    """ISO days of the longest score window, most recent first."""
+    return tuple((today - timedelta(days=offset)).isoformat() for offset in range(max(SCORE_WINDOWS_DAYS)))
+
+
+PROJECTIONS = {
+    "contacts": _contact,
+    "deals": _deal,
+    "events": _event,
+    "forms": _form,
+    "policies": _policy,
+    "scores": _score,
+}
+
+
+class DashboardKPIs:
+    """
+    In-memory dashboard counters fed by row changes.
+
+    Each table row is projected onto a few counter contributions (totals,
+    per-month counts, won revenue, daily lead-score buckets). A change
+    subtracts the row's previous contributions, kept by row id, and adds
+    the new ones, so reading a dashboard is a fixed number of dictionary
+    lookups however large the tables are. Counters are snapshotted to JSON
+    in the background; row contributions go to an append-only journal that
+    only receives the rows changed since the last snapshot and is compacted
+    when it grows well past the live rows. Lead score rows are dropped once
+    their day falls out of retention. Both are reloaded at startup.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_interval_s: float = 60.0):
+        self.snapshot_path = Path(snapshot_path or os.getenv('DASHBOARD_SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH))
+        self.snapshot_interval_s = snapshot_interval_s
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._rows: Dict[str, Tuple[str, _Contributions]] = {}
+        self._changed_rows: set = set()
+        self._journal_lines = 0
+        self._snapshot_lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"changes": 0, "ignored": 0, "reads": 0, "snapshots": 0, "last_snapshot_ms": None, "loaded_from_snapshot": False}
+        self._load_snapshot()
+
+    # ---- change feed ----
+
+    def _add(self, organization_id: str, contributions: _Contributions, sign: int):
+        counters = self._counters[organization_id]
+        for key, amount in contributions:
+            if sign < 0 and key not in counters:
+                # Daily buckets past retention are already gone
+                continue
+            value = counters[key] + sign * amount
+            if abs(value) < 1e-9:
+                counters.pop(key, None)
+            else:
+                counters[key] = value
+
+    def upsert(self, table: str, row: Dict[str, Any]):
+        """
+        Apply an INSERT or UPDATE of one row.
+
+        Raises:
+            PermissionError: If the row is already known under another organization
+        """
+        kind = TABLE_ALIASES.get(table)
+        organization_id = row.get("organization_id")
+        if kind is None:
+            raise ValueError(f"Unsupported dashboard table: {table}")
+        if not organization_id:
+            raise ValueError(f"{table} rows need organization_id")
+        contributions = PROJECTIONS[kind](row)
+        row_key = f"{kind}:{row['id']}" if row.get("id") else None
+        with self._lock:
+            previous = self._rows.get(row_key) if row_key else None
+            _check_owner(row_key, previous, organization_id)
+            if previous is not None:
+                self._add(previous[0], previous[1], -1)
+            self._add(organization_id, contributions, 1)
+            if row_key:
+                self._rows[row_key] = (organization_id, contributions)
+                self._changed_rows.add(row_key)
+            self._stats["changes"] += 1
+            self._dirty = True
+
+    def delete(self, table: str, row_id: str, organization_id: Optional[str] = None) -> bool:
+        """
+        Apply a DELETE; returns False for rows never seen.
+
+        Raises:
+            PermissionError: If organization_id is given and the row belongs to another one
+        """
+        kind = TABLE_ALIASES.get(table)
+        if kind is None:
+            raise ValueError(f"Unsupported dashboard table: {table}")
+        row_key = f"{kind}:{row_id}"
+        with self._lock:
+            previous = self._rows.get(row_key)
+            if previous is None:
+                self._stats["ignored"] += 1
+                return False
+            _check_owner(row_key, previous, organization_id)
+            del self._rows[row_key]
+            self._changed_rows.add(row_key)
+            self._add(previous[0], previous[1], -1)
+            self._stats["changes"] += 1
+            self._dirty = True
+            return True
+
+    def apply_change(self, change: Dict[str, Any]) -> str:
+        """
+        Apply one change event.
+
+        Accepts Supabase Realtime payloads ({"table", "eventType", "new", "old"})
+        and database webhook payloads ({"table", "type", "record", "old_record"}).
+
+        Returns:
+            The table the change was applied to
+        """
+        table = change.get("table") or ""
+        event = (change.get("eventType") or change.get("type") or "").upper()
+        new = change.get("new") or change.get("record")
+        old = change.get("old") or change.get("old_record") or {}
+        if event in ("INSERT", "UPDATE") and new:
+            self.upsert(table, new)
+        elif event == "DELETE" and old.get("id"):
+            self.delete(table, old["id"], old.get("organization_id"))
+        else:
+            raise ValueError(f"Unsupported dashboard change: {event or 'missing type'} on {table or 'missing table'}")
+        return table
+
+    def apply_changes(self, changes: List[Dict[str, Any]]) -> Dict[str, int]:
+        applied: Dict[str, int] = defaultdict(int)
+        for change in changes:
+            applied[self.apply_change(change)] += 1
+        return dict(applied)
+
+    def organization_of(self, change: Dict[str, Any]) -> Optional[str]:
+        """
+        Organization a change event touches: the stored row's whenever its id
+        is known (the payload's organization_id is only trusted for new rows).
+
+        Raises:
+            PermissionError: If the payload names another organization than the stored row
+        """
+        row = change.get("new") or change.get("record") or change.get("old") or change.get("old_record") or {}
+        kind = TABLE_ALIASES.get(change.get("table") or "")
+        row_key = f"{kind}:{row['id']}" if kind and row.get("id") else None
+        with self._lock:
+            previous = self._rows.get(row_key) if row_key else None
+        if previous is None:
+            return row.get("organization_id")
+        _check_owner(row_key, previous, row.get("organization_id"))
+        return previous[0]
+
+    def record_score(self, organization_id: Optional[str], score: Any, scored_at: Optional[str] = None):
+        """Count a lead score produced by this service (no row id, append-only)."""
+        if not organization_id or score is None:
+            return
+        self.upsert("lead_scores", {"organization_id": organization_id, "score": score, "created_at": scored_at})
+
+    # ---- reads ----
+
+    def dashboard(self, organization_id: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        KPIs for one organization, in the DashboardService.getDashboardStats shape
+        plus policy and lead score figures.
+        """
+        now = now or datetime.now(timezone.utc)
+        month = now.strftime("%Y-%m")
+        days = _window_days(now.date())
+        with self._lock:
+            counters = self._counters.get(organization_id) or {}
+            get = lambda key: counters.get(key, 0)
+            totals = {key: get(key) for key in (
+                "revenue", f"revenue:{month}", "contacts", f"contacts:{month}", "deals", "deals_stage:Won",
+                "deals_stage:Lost", "events", f"events:{month}", "forms", f"forms:{month}", "policies",
+                "policies_status:active", "active_premium"
+            )}
+            windows = [
+                (window, [sum(get(f"{prefix}:{day}") for day in days[:window]) for prefix in ("scores", "score_sum", "scores_hot")])
+                for window in SCORE_WINDOWS_DAYS
+            ]
+            self._stats["reads"] += 1
+
+        get = totals.__getitem__
+        total_deals = int(get("deals"))
+        won = int(get("deals_stage:Won"))
+        scores = {
+            f"{window}d": {"count": int(count), "average": round(total / count, 1) if count else 0.0, "hot": int(hot)}
+            for window, (count, total, hot) in windows
+        }
+        return {
+            "organization_id": organization_id,
+            "totalRevenue": round(get("revenue"), 2),
+            "monthlyRevenue": round(get(f"revenue:{month}"), 2),
+            "totalContacts": int(get("contacts")),
+            "newContactsThisMonth": int(get(f"contacts:{month}")),
+            "totalDeals": total_deals,
+            "dealsWon": won,
+            "dealsLost": int(get("deals_stage:Lost")),
+            "conversionRate": round(won / total_deals * 100, 2) if total_deals else 0.0,
+            "totalEvents": int(get("events")),
+            "eventsThisMonth": int(get(f"events:{month}")),
+            "formSubmissions": int(get("forms")),
+            "formSubmissionsThisMonth": int(get(f"forms:{month}")),
+            "totalPolicies": int(get("policies")),
+            "activePolicies": int(get("policies_status:active")),
+            "activePremium": round(get("active_premium"), 2),
+            "leadScores": scores,
+            "generated_at": now.isoformat()
+        }
+
+    # ---- snapshots ----
+
+    @property
+    def journal_path(self) -> Path:
+        return self.snapshot_path.with_suffix(".rows.jsonl")
+
+    def snapshot(self) -> bool:
+        """
+        Write counters, and append the rows changed since the last snapshot
+        to the row journal, if anything changed; returns True if written.
+        """
+        start = time.perf_counter()
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=SCORE_RETENTION_DAYS)).strftime("%Y-%m-%d")
+        with self._snapshot_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                self._prune(cutoff)
+                counters = {organization_id: dict(counters) for organization_id, counters in self._counters.items()}
+                changed = [(row_key, self._rows.get(row_key)) for row_key in self._changed_rows]
+                self._changed_rows = set()
+                compact = self._journal_lines + len(changed) > JOURNAL_COMPACT_RATIO * len(self._rows) + 1000
+                # Shallow copy: contribution lists are replaced, never mutated
+                rows = dict(self._rows) if compact else None
+                self._dirty = False
+
+            try:
+                self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+                if compact:
+                    temporary = self.journal_path.with_suffix(".tmp")
+                    with open(temporary, "w") as f:
+                        for row_key, (organization_id, contributions) in rows.items():
+                            f.write(json.dumps([row_key, organization_id, contributions], separators=(",", ":")) + "\n")
+                    os.replace(temporary, self.journal_path)
+                    self._journal_lines = len(rows)
+                elif changed:
+                    with open(self.journal_path, "a") as f:
+                        for row_key, row in changed:
+                            entry = [row_key, row[0], row[1]] if row is not None else [row_key, None]
+                            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                    self._journal_lines += len(changed)
+
+                temporary = self.snapshot_path.with_suffix(".tmp")
+                with open(temporary, "w") as f:
+                    json.dump({"version": SNAPSHOT_VERSION, "taken_at": time.time(), "counters": counters}, f, separators=(",", ":"))
+                os.replace(temporary, self.snapshot_path)
+            except OSError:
+                # Nothing may be lost: these rows go to the journal with the next snapshot
+                with self._lock:
+                    self._changed_rows.update(row_key for row_key, _ in changed)
+                    self._dirty = True
+                raise
+        with self._lock:
+            self._stats["snapshots"] += 1
+            self._stats["last_snapshot_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return True
+
+    def _prune(self, cutoff: str):
+        """Drop daily lead score buckets, and the score rows feeding them, older than cutoff (lock held)."""
+        for counters in self._counters.values():
+            for key in [key for key in counters if key.startswith(("scores:", "score_sum:", "scores_hot:")) and key.rpartition(":")[2] < cutoff]:
+                del counters[key]
+        expired = [
+            row_key for row_key, (_, contributions) in self._rows.items()
+            if row_key.startswith("scores:") and contributions[0][0].rpartition(":")[2] < cutoff
+        ]
+        for row_key in expired:
+            del self._rows[row_key]
+        self._changed_rows.update(expired)
+
+    def _load_snapshot(self):
+        if not self.snapshot_path.exists():
+            return
+        try:
+            with open(self.snapshot_path) as f:
+                state = json.load(f)
+            if state.get("version") not in (1, SNAPSHOT_VERSION):
+                print(f"⚠️ Ignoring dashboard snapshot version {state.get('version')}")
+                return
+            for organization_id, counters in state["counters"].items():
+                self._counters[organization_id].update(counters)
+            if state["version"] == 1:
+                # Rows used to be embedded; move them to the journal on the next snapshot
+                for row_key, (organization_id, contributions) in state["rows"].items():
+                    self._rows[row_key] = (organization_id, [tuple(contribution) for contribution in contributions])
+                self._journal_lines = JOURNAL_COMPACT_RATIO * len(self._rows) + 1000
+                self._dirty = True
+            elif self.journal_path.exists():
+                with open(self.journal_path) as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        self._journal_lines += 1
+                        if entry[1] is None:
+                            self._rows.pop(entry[0], None)
+                        else:
+                            self._rows[entry[0]] = (entry[1], [tuple(contribution) for contribution in entry[2]])
+            self._stats["loaded_from_snapshot"] = True
+            print(f"✅ Dashboard KPIs restored ({len(self._counters)} organizations, {len(self._rows)} rows)")
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"⚠️ Dashboard snapshot not loaded: {e}")
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval_s):
+            try:
+                self.snapshot()
+            except OSError as e:
+                print(f"⚠️ Dashboard snapshot failed: {e}")
+
+    def start(self):
+        """Start the background snapshot thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._snapshot_loop, name="dashboard-snapshots", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the snapshot thread and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            self.snapshot()
+        except OSError as e:
+            print(f"⚠️ Dashboard snapshot failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "organizations": len(self._counters),
+                "rows": len(self._rows),
+                "dirty": self._dirty,
+                "snapshot_path": str(self.snapshot_path)
+            }
+
+
+def _check_owner(row_key: Optional[str], previous: Optional[Tuple[str, _Contributions]], organization_id: Optional[str]):
+    # Rows are keyed by a global id, so a change must not move or remove another organization's row
+    if previous is not None and organization_id and organization_id != previous[0]:
+        raise PermissionError(f"Row {row_key} belongs to another organization")
+
+
+_dashboard_kpis: Optional[DashboardKPIs] = None
+
+
+def get_dashboard_kpis() -> DashboardKPIs:
+    """Shared KPI store (loads the last snapshot on first use)."""
+    global _dashboard_kpis
+    if _dashboard_kpis is None:
+        _dashboard_kpis = DashboardKPIs(snapshot_interval_s=float(os.getenv('DASHBOARD_SNAPSHOT_INTERVAL_S', '60')))
+    return _dashboard_kpis
@@ -0,0 +1,602 @@
+"""
+Document Ingestion Pipeline
+Fetch, extract, chunk and index insurance_documents into the company knowledge index
+
+Usage:
+    python document_ingestion.py ./archive --organization-id <uuid> [--workers 8] [--force]
+"""
+
+import os
+import re
+import io
+import sys
+import zlib
+import json
+import time
+import uuid
+import queue
+import base64
+import sqlite3
+import hashlib
+import zipfile
+import argparse
+import threading
+import multiprocessing
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+
+from knowledge_index import KnowledgeIndex, get_knowledge_index, prepare_passages
+from outbound_urls import allowed_hosts_from_env, open_checked
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+DEFAULT_HASH_STORE_PATH = Path(__file__).parent / '.cache' / 'document_hashes.sqlite3'
+
+TEXT_MIME_TYPES = ("text/", "application/json", "application/xml")
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+FILE_MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".txt": "text/plain",
+    ".md": "text/markdown",
+    ".csv": "text/csv",
+    ".html": "text/html",
+    ".json": "application/json",
+    ".docx": DOCX_MIME_TYPE,
+}
+
+# Buckets insurance_documents live in; objects are stored under "<organization_id>/<filename>"
+DOCUMENT_BUCKETS = {
+    "insurance-policy-documents", "insurance-claim-documents",
+    "insurance-contact-documents", "insurance-general-attachments"
+}
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+_PDF_STREAM = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.DOTALL)
+_PDF_TEXT = re.compile(rb"\((?:\\.|[^\\)])*\)\s*Tj|\[(?:[^\]]*)\]\s*TJ")
+_PDF_STRING = re.compile(rb"\(((?:\\.|[^\\)])*)\)")
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"(": b"(", b")": b")", b"\\": b"\\"}
+_XML_TAG = re.compile(r"<[^>]+>")
+_WHITESPACE = re.compile(r"[ \t\r\f\v]+")
+
+
+# ---- extraction (runs in worker processes) ----
+
+def _pdf_text_fallback(data: bytes) -> str:
+    """Text shown by Tj/TJ operators in (Flate-compressed) content streams; enough for generated PDFs."""
+    pieces = []
+    for stream in _PDF_STREAM.findall(data):
+        try:
+            content = zlib.decompress(stream)
+        except zlib.error:
+            content = stream
+        for operator in _PDF_TEXT.findall(content):
+            for string in _PDF_STRING.findall(operator):
+                pieces.append(re.sub(rb"\\(.)", lambda m: _PDF_ESCAPES.get(m.group(1), m.group(1)), string))
+            pieces.append(b" ")
+        pieces.append(b"\n")
+    return b"".join(pieces).decode("latin-1")
+
+
+def extract_text(data: bytes, mime_type: str = "", filename: str = "") -> str:
+    """
+    Plain text of a document.
+
+    PDFs go through pypdf when installed (a content-stream scan otherwise),
+    DOCX through its word/document.xml, text formats are decoded. Images
+    and other binaries yield "" (no OCR).
+    """
+    mime_type = (mime_type or FILE_MIME_TYPES.get(Path(filename).suffix.lower(), "")).lower()
+    if mime_type == "application/pdf" or data[:5] == b"%PDF-":
+        if PYPDF_AVAILABLE:
+            reader = PdfReader(io.BytesIO(data))
+            return "\n".join(page.extract_text() or "" for page in reader.pages)
+        return _pdf_text_fallback(data)
+    if mime_type == DOCX_MIME_TYPE:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            xml = archive.read("word/document.xml").decode("utf-8", errors="replace")
+        return _XML_TAG.sub(" ", xml.replace("</w:p>", "\n"))
+    if mime_type.startswith(TEXT_MIME_TYPES):
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            text = data.decode("latin-1")
+        return _XML_TAG.sub(" ", text) if mime_type == "text/html" else text
+    return ""
+
+
+def _extract_worker(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract and chunk one document; returns passages with term counts and stage timings."""
+    result = {"document_id": task["document_id"], "passages": [], "chars": 0, "error": None}
+    start = time.perf_counter()
+    try:
+        text = task["text"] if task["text"] is not None else extract_text(task["data"], task["mime_type"], task["filename"])
+        text = _WHITESPACE.sub(" ", text).strip()
+        result["chars"] = len(text)
+        result["extract_ms"] = (time.perf_counter() - start) * 1000
+        chunk_start = time.perf_counter()
+        result["passages"] = prepare_passages(task["filename"], text) if text else []
+        result["chunk_ms"] = (time.perf_counter() - chunk_start) * 1000
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["extract_ms"] = (time.perf_counter() - start) * 1000
+        result["chunk_ms"] = 0.0
+    return result
+
+
+# ---- fetching ----
+
+def document_fetch_hosts() -> List[str]:
+    """Hosts public_url may point at: DOCUMENT_FETCH_HOSTS plus the Supabase project host."""
+    hosts = allowed_hosts_from_env('DOCUMENT_FETCH_HOSTS')
+    supabase_host = urlsplit(os.getenv('SUPABASE_URL', '')).hostname
+    return hosts + [supabase_host.lower()] if supabase_host else hosts
+
+
+def check_storage_object(organization_id: str, bucket: str, path: str):
+    """
+    Refuse storage objects outside the organization's folder.
+
+    The service role key bypasses storage RLS, so the "<organization_id>/"
+    folder the policies check is enforced here instead.
+
+    Raises:
+        ValueError: If the bucket is unknown or the path is outside the organization folder
+    """
+    if bucket not in DOCUMENT_BUCKETS:
+        raise ValueError(f"Unknown document bucket '{bucket}'")
+    parts = path.split("/")
+    if len(parts) < 2 or parts[0] != str(organization_id) or any(part in ("", ".", "..") for part in parts):
+        raise ValueError("Storage path is outside the organization's folder")
+
+
+def fetch_document(
+    document: Dict[str, Any],
+    timeout_s: float = 30.0,
+    allowed_hosts: Optional[Iterable[str]] = None,
+    max_bytes: int = MAX_DOCUMENT_BYTES
+) -> Optional[bytes]:
+    """
+    Raw bytes of a document: inline content_base64, a local_path, the
+    Supabase Storage object in the organization's folder (service role key)
+    or an https public_url on an allowed host (see document_fetch_hosts).
+    Returns None when the row already carries extracted_text.
+    """
+    if document.get("extracted_text"):
+        return None
+    if document.get("content_base64"):
+        return base64.b64decode(document["content_base64"])
+    if document.get("local_path"):
+        return Path(document["local_path"]).read_bytes()
+
+    supabase_url = os.getenv('SUPABASE_URL')
+    service_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+    bucket, path = document.get("storage_bucket"), document.get("storage_path")
+    if supabase_url and service_key and bucket and path:
+        check_storage_object(document.get("organization_id"), bucket, path)
+        url = f"{supabase_url.rstrip('/')}/storage/v1/object/{quote(bucket)}/{quote(path)}"
+        request = urllib.request.Request(url, headers={"Authorization": f"Bearer {service_key}", "apikey": service_key})
+        with urllib.request.urlopen(request, timeout=timeout_s) as response:
+            data = response.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise ValueError(f"Document larger than {max_bytes} bytes")
+        return data
+    if document.get("public_url"):
+        hosts = document_fetch_hosts() if allowed_hosts is None else allowed_hosts
+        return open_checked(urllib.request.Request(document["public_url"]), hosts, timeout_s, max_bytes)
+    raise ValueError("Document has no content, local_path, storage object or public_url")
+
+
+class DocumentHashStore:
+    """SQLite record of the content hash each document was last indexed with."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv('DOCUMENT_HASH_STORE_PATH', DEFAULT_HASH_STORE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS document_hashes (
+                document_id TEXT PRIMARY KEY,
+                organization_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                passages INTEGER NOT NULL,
+                indexed_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, document_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM document_hashes WHERE document_id = ?", (document_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, document_id: str, organization_id: str, content_hash: str, passages: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO document_hashes VALUES (?, ?, ?, ?, ?)",
+                (document_id, organization_id, content_hash, passages, time.time())
+            )
+
+    def delete(self, document_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM document_hashes WHERE document_id = ?", (document_id,))
+
+
+class _StageTimer:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 1)
+        }
+
+
+class IngestionJob:
+    """Progress and report of one pipeline run."""
+
+    def __init__(self, total: Optional[int] = None, organization_id: Optional[str] = None):
+        self.job_id = str(uuid.uuid4())
+        self.organization_id = organization_id
+        self.status = "running"
+        self.total = total
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.counts = {"fetched": 0, "indexed": 0, "skipped_unchanged": 0, "empty": 0, "failed": 0, "passages": 0, "bytes": 0}
+        self.stages = {stage: _StageTimer() for stage in ("fetch", "extract", "chunk", "index")}
+        self.errors: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+
+    def count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def time(self, stage: str, ms: float):
+        with self._lock:
+            self.stages[stage].add(ms)
+
+    def fail(self, document_id: str, stage: str, error: str):
+        with self._lock:
+            self.counts["failed"] += 1
+            if len(self.errors) < 100:
+                self.errors.append({"document_id": document_id, "stage": stage, "error": error})
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = (self.finished or time.time()) - self.started
+            done = self.counts["indexed"] + self.counts["skipped_unchanged"] + self.counts["empty"] + self.counts["failed"]
+            return {
+                "job_id": self.job_id,
+                "organization_id": self.organization_id,
+                "status": self.status,
+                "total": self.total,
+                "processed": done,
+                **self.counts,
+                "elapsed_s": round(elapsed, 2),
+                "documents_per_minute": round(done / elapsed * 60, 1) if elapsed > 0 else 0.0,
+                "stages": {stage: timer.summary() for stage, timer in self.stages.items()},
+                "errors": list(self.errors)
+            }
+
+
+class DocumentIngestionPipeline:
+    """
+    Three-stage pipeline: fetch -> extract/chunk -> index.
+
+    Fetcher threads download (or read) documents and hash their content;
+    documents whose hash matches the last indexed one are skipped. Fetched
+    documents wait in a bounded queue for the process pool, which does the
+    CPU-bound extraction, chunking and tokenization; at most two tasks per
+    worker are in flight. Finished documents pass through a second bounded
+    queue to a single indexer thread that swaps their passages into the
+    knowledge index. A full queue blocks the stage feeding it, so memory
+    stays bounded on archive-sized backfills, and the API event loop only
+    ever waits on queues in other threads.
+
+    Content hashes are recorded only once the touched organization indexes
+    are compacted to disk at the end of a run, so documents lost from the
+    in-memory delta by a crash are indexed again. All jobs share one
+    process pool started with "spawn" (never forking the threaded API
+    process), and at most max_jobs jobs run at a time; later ones queue.
+    """
+
+    def __init__(
+        self,
+        index: Optional[KnowledgeIndex] = None,
+        hash_store: Optional[DocumentHashStore] = None,
+        workers: Optional[int] = None,
+        fetchers: int = 4,
+        queue_size: int = 32,
+        max_jobs: int = 2,
+        fetch_hosts: Optional[Iterable[str]] = None
+    ):
+        self.index = index or get_knowledge_index()
+        self.hash_store = hash_store or DocumentHashStore()
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.fetchers = fetchers
+        self.queue_size = queue_size
+        self.fetch_hosts = list(fetch_hosts) if fetch_hosts is not None else document_fetch_hosts()
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._jobs_lock = threading.Lock()
+        self._job_slots = threading.BoundedSemaphore(max_jobs)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor):
+        """Drop a broken pool so the next job starts a fresh one."""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def close(self):
+        """Shut down the shared worker processes."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def run(self, documents: Iterable[Dict[str, Any]], force: bool = False, job: Optional[IngestionJob] = None) -> Dict[str, Any]:
+        """
+        Ingest documents and block until done.
+
+        Args:
+            documents: insurance_documents rows (id, organization_id, original_filename,
+                mime_type and a content source, see fetch_document)
+            force: Re-index even when the content hash is unchanged
+            job: Progress holder (a new one by default)
+
+        Returns:
+            The job report: counts, documents per minute and per-stage timings
+        """
+        job = job or IngestionJob()
+        with self._job_slots:
+            job.status = "running"
+            job.started = time.time()
+            return self._run(documents, force, job)
+
+    def _run(self, documents: Iterable[Dict[str, Any]], force: bool, job: IngestionJob) -> Dict[str, Any]:
+        source = iter(documents)
+        source_lock = threading.Lock()
+        extract_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        index_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        done = object()
+        # (document_id, organization_id, content_hash, passages) waiting for the index to reach disk
+        indexed: List[tuple] = []
+
+        def next_document() -> Optional[Dict[str, Any]]:
+            with source_lock:
+                return next(source, None)
+
+        def fetch_loop():
+            while True:
+                document = next_document()
+                if document is None:
+                    break
+                document_id = str(document.get("id") or "")
+                start = time.perf_counter()
+                try:
+                    if not document_id or not document.get("organization_id"):
+                        raise ValueError("Documents need id and organization_id")
+                    data = fetch_document(document, allowed_hosts=self.fetch_hosts)
+                    content = data if data is not None else document["extracted_text"].encode("utf-8")
+                    content_hash = hashlib.sha256(content).hexdigest()
+                except Exception as e:
+                    job.fail(document_id, "fetch", f"{type(e).__name__}: {e}")
+                    continue
+                finally:
+                    job.time("fetch", (time.perf_counter() - start) * 1000)
+                job.count("fetched")
+                job.count("bytes", len(content))
+                if not force and self.hash_store.get(document_id) == content_hash:
+                    job.count("skipped_unchanged")
+                    continue
+                extract_queue.put((document, content_hash, {
+                    "document_id": document_id,
+                    "filename": document.get("original_filename") or document.get("filename") or "",
+                    "mime_type": document.get("mime_type") or "",
+                    "data": data,
+                    "text": document.get("extracted_text") if data is None else None
+                }))
+
+        def index_loop():
+            while True:
+                item = index_queue.get()
+                if item is done:
+                    break
+                document, content_hash, result = item
+                if result["error"]:
+                    job.fail(result["document_id"], "extract", result["error"])
+                    continue
+                job.time("extract", result["extract_ms"])
+                job.time("chunk", result["chunk_ms"])
+                start = time.perf_counter()
+                try:
+                    name = document.get("original_filename") or document.get("filename") or ""
+                    added = self.index.upsert_passages(document["organization_id"], result["document_id"], name, result["passages"])
+                    indexed.append((result["document_id"], document["organization_id"], content_hash, added))
+                except Exception as e:
+                    job.fail(result["document_id"], "index", f"{type(e).__name__}: {e}")
+                    continue
+                finally:
+                    job.time("index", (time.perf_counter() - start) * 1000)
+                job.count("indexed" if added else "empty")
+                job.count("passages", added)
+
+        fetch_threads = [threading.Thread(target=fetch_loop, name=f"ingest-fetch-{i}", daemon=True) for i in range(self.fetchers)]
+        indexer = threading.Thread(target=index_loop, name="ingest-index", daemon=True)
+        for thread in fetch_threads:
+            thread.start()
+        indexer.start()
+
+        def close_extract_queue():
+            for thread in fetch_threads:
+                thread.join()
+            extract_queue.put(done)
+
+        threading.Thread(target=close_extract_queue, name="ingest-fetch-join", daemon=True).start()
+
+        pool = self._get_pool()
+        try:
+            in_flight = {}
+            exhausted = False
+            while not exhausted or in_flight:
+                while not exhausted and len(in_flight) < self.workers * 2:
+                    item = extract_queue.get()
+                    if item is done:
+                        exhausted = True
+                        break
+                    document, content_hash, task = item
+                    in_flight[pool.submit(_extract_worker, task)] = (document, content_hash, task["document_id"])
+                if not in_flight:
+                    continue
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    document, content_hash, document_id = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        result = {"document_id": document_id, "error": f"{type(e).__name__}: {e}"}
+                    index_queue.put((document, content_hash, result))
+            job.status = "completed"
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool(pool)
+            job.status = "failed"
+            job.fail("", "pipeline", f"{type(e).__name__}: {e}")
+        finally:
+            index_queue.put(done)
+            indexer.join()
+            self._persist(indexed, job)
+            job.finished = time.time()
+        return job.report()
+
+    def _persist(self, indexed: List[tuple], job: IngestionJob):
+        """Compact the touched organization indexes, then record the hashes they now hold on disk."""
+        if not indexed:
+            return
+        try:
+            self.index.save({organization_id for _, organization_id, _, _ in indexed})
+            for document_id, organization_id, content_hash, passages in indexed:
+                self.hash_store.put(document_id, organization_id, content_hash, passages)
+        except Exception as e:
+            job.fail("", "persist", f"{type(e).__name__}: {e}")
+
+    def start_job(self, documents: List[Dict[str, Any]], force: bool = False, organization_id: Optional[str] = None) -> str:
+        """Run the pipeline in a background thread; returns the job id to poll."""
+        job = IngestionJob(total=len(documents), organization_id=organization_id)
+        job.status = "queued"
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > 100:
+                self._jobs.pop(next(iter(self._jobs)))
+        threading.Thread(target=self.run, args=(documents, force, job), name=f"ingest-{job.job_id[:8]}", daemon=True).start()
+        return job.job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        return job.report() if job is not None else None
+
+    def delete_document(self, organization_id: str, document_id: str) -> bool:
+        self.hash_store.delete(document_id)
+        return self.index.delete_source(organization_id, document_id)
+
+
+_document_pipeline: Optional[DocumentIngestionPipeline] = None
+_document_pipeline_lock = threading.Lock()
+
+
+def get_document_pipeline() -> DocumentIngestionPipeline:
+    """Shared pipeline feeding the shared knowledge index."""
+    global _document_pipeline
+    with _document_pipeline_lock:
+        if _document_pipeline is None:
+            _document_pipeline = DocumentIngestionPipeline(
+                workers=int(os.getenv('DOCUMENT_INGEST_WORKERS', '0')) or None,
+                queue_size=int(os.getenv('DOCUMENT_INGEST_QUEUE_SIZE', '32')),
+                max_jobs=int(os.getenv('DOCUMENT_INGEST_MAX_JOBS', '2'))
+            )
+        return _document_pipeline
+
+
+def close_document_pipeline():
+    """Stop the shared pipeline's worker processes, if it was ever started."""
+    with _document_pipeline_lock:
+        if _document_pipeline is not None:
+            _document_pipeline.close()
+
+
+def directory_documents(root: str, organization_id: str) -> Iterator[Dict[str, Any]]:
+    """insurance_documents-like rows for every supported file under a directory (stable ids per path)."""
+    root_path = Path(root)
+    for path in sorted(root_path.rglob("*")):
+        if path.is_file() and path.suffix.lower() in FILE_MIME_TYPES:
+            relative = str(path.relative_to(root_path))
+            yield {
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{organization_id}/{relative}")),
+                "organization_id": organization_id,
+                "original_filename": relative,
+                "mime_type": FILE_MIME_TYPES[path.suffix.lower()],
+                "local_path": str(path)
+            }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill a document archive into the company knowledge index")
+    parser.add_argument("root", help="Directory with PDF, DOCX and text documents")
+    parser.add_argument("--organization-id", required=True, help="Organization the documents belong to")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count - 1)")
+    parser.add_argument("--queue-size", type=int, default=32, help="Bound of each inter-stage queue")
+    parser.add_argument("--force", action="store_true", help="Re-index unchanged documents")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    pipeline = DocumentIngestionPipeline(workers=args.workers, queue_size=args.queue_size)
+    try:
+        report = pipeline.run(directory_documents(args.root, args.organization_id), force=args.force)
+    finally:
+        pipeline.close()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"📄 {report['processed']} documents in {report['elapsed_s']}s ({report['documents_per_minute']}/min)")
+        print(f"   indexed {report['indexed']}, unchanged {report['skipped_unchanged']}, empty {report['empty']}, failed {report['failed']}")
+        print(f"   {report['passages']} passages from {report['bytes'] / 1e6:.1f} MB")
+        for stage, timing in report["stages"].items():
+            print(f"   {stage:8s} avg {timing['avg_ms']}ms  max {timing['max_ms']}ms  total {timing['total_ms']}ms")
+        for error in report["errors"][:10]:
+            print(f"   ❌ {error['document_id']} ({error['stage']}): {error['error']}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
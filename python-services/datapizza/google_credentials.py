@@ -0,0 +1,218 @@
+"""
+Shared Google Cloud Credentials
+In-memory service-account credentials with one proactively refreshed access token for every agent
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    import google.auth
+    from google.auth.transport.requests import Request
+    from google.oauth2 import service_account
+    GOOGLE_AUTH_AVAILABLE = True
+except ImportError:
+    GOOGLE_AUTH_AVAILABLE = False
+
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+LOCAL_CREDENTIALS_PATH = Path(__file__).parent / 'credentials' / 'service-account-key.json'
+
+
+class GoogleCredentialsProvider:
+    """
+    Loads the service account once and keeps a single access token fresh.
+
+    Key material comes from GOOGLE_APPLICATION_CREDENTIALS_JSON (kept in
+    memory, never written to disk), a key file for local development, or
+    application default credentials. A daemon thread refreshes the token
+    refresh_margin_s before it expires, so callers always get a valid
+    token from memory and never pay for a token fetch on the hot path.
+    """
+
+    def __init__(self, refresh_margin_s: float = 300.0, retry_s: float = 30.0):
+        self.refresh_margin_s = refresh_margin_s
+        self.retry_s = retry_s
+        self.credentials = None
+        self.project_id: Optional[str] = None
+        self.source: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._stats = {"refreshes": 0, "refresh_failures": 0, "token_requests": 0}
+        self._last_error: Optional[str] = None
+
+    def load(self) -> bool:
+        """
+        Resolve credentials from the first available source.
+
+        Returns:
+            True if credentials were loaded
+        """
+        raw_json = os.getenv('GOOGLE_APPLICATION_CREDENTIALS_JSON')
+        key_file = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+        try:
+            if raw_json:
+                self._from_info(json.loads(raw_json), "environment variable")
+            elif key_file and Path(key_file).exists():
+                self._from_info(json.loads(Path(key_file).read_text()), key_file)
+            elif LOCAL_CREDENTIALS_PATH.exists():
+                self._from_info(json.loads(LOCAL_CREDENTIALS_PATH.read_text()), str(LOCAL_CREDENTIALS_PATH))
+            else:
+                self.credentials, self.project_id = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+                self.source = "application default credentials"
+        except Exception as e:
+            print(f"❌ Error loading Google Cloud credentials: {e}")
+            self.credentials = None
+            return False
+
+        print(f"✅ Google Cloud credentials loaded from {self.source}")
+        return True
+
+    def _from_info(self, info: Dict[str, Any], source: str):
+        self.credentials = service_account.Credentials.from_service_account_info(info, scopes=[CLOUD_PLATFORM_SCOPE])
+        self.project_id = info.get("project_id")
+        self.source = source
+
+    def get_token(self) -> Optional[str]:
+        """Return a valid access token, refreshing inline only if the background refresh fell behind."""
+        if self.credentials is None:
+            return None
+        with self._lock:
+            self._stats["token_requests"] += 1
+            if self._seconds_left() <= 0:
+                self._refresh_locked()
+            return self.credentials.token
+
+    def start(self):
+        """Fetch the first token and start the proactive refresher thread."""
+        if self.credentials is None or self._refresher is not None:
+            return
+        with self._lock:
+            self._refresh_locked()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="google-token-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        if self._refresher is not None:
+            self._refresher = None
+            self._wake.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.credentials is not None,
+                "source": self.source,
+                "project_id": self.project_id,
+                "token_valid_for_s": round(self._seconds_left(), 1) if self.credentials is not None else None,
+                "last_error": self._last_error,
+                **self._stats
+            }
+
+    def _seconds_left(self) -> float:
+        if not self.credentials.token or self.credentials.expiry is None:
+            return 0.0
+        # google-auth keeps expiry as a naive UTC datetime
+        return (self.credentials.expiry - datetime.utcnow()).total_seconds()
+
+    def _refresh_locked(self):
+        try:
+            self.credentials.refresh(Request())
+            self._stats["refreshes"] += 1
+            self._last_error = None
+        except Exception as e:
+            self._stats["refresh_failures"] += 1
+            self._last_error = str(e)
+            print(f"⚠️ Google access token refresh failed: {e}")
+
+    def _refresh_loop(self):
+        while self._refresher is not None:
+            with self._lock:
+                wait_s = self._seconds_left() - self.refresh_margin_s
+            if wait_s > 0:
+                self._wake.wait(wait_s)
+                if self._refresher is None:
+                    return
+            with self._lock:
+                self._refresh_locked()
+                failed = self._last_error is not None
+            if failed:
+                self._wake.wait(self.retry_s)
+
+
+_shared_provider: Optional[GoogleCredentialsProvider] = None
+_shared_provider_failed = False
+_shared_provider_lock = threading.Lock()
+
+
+def get_credentials_provider() -> Optional[GoogleCredentialsProvider]:
+    """
+    Return the process-wide provider, loading credentials on first use.
+
+    Returns None when google-auth is not installed or no credentials are
+    found; a failed load is not retried until the process restarts.
+    """
+    global _shared_provider, _shared_provider_failed
+    if not GOOGLE_AUTH_AVAILABLE or _shared_provider_failed:
+        return None
+    with _shared_provider_lock:
+        if _shared_provider is None:
+            provider = GoogleCredentialsProvider(
+                refresh_margin_s=float(os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN_S', '300'))
+            )
+            if not provider.load():
+                _shared_provider_failed = True
+                return None
+            provider.start()
+            _shared_provider = provider
+            _install_vertex_defaults(provider)
+        return _shared_provider
+
+
+def _install_vertex_defaults(provider: GoogleCredentialsProvider):
+    """Make the shared credentials the Vertex AI SDK default as well."""
+    try:
+        from google.cloud import aiplatform
+        aiplatform.init(
+            project=os.getenv('GOOGLE_CLOUD_PROJECT', provider.project_id or 'crm-ai-471815'),
+            location=os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1'),
+            credentials=provider.credentials
+        )
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Vertex AI default credentials not set: {e}")
+
+
+def build_vertex_client(client_class, **kwargs):
+    """
+    Construct a DataPizza Vertex AI client on the shared credentials.
+
+    When this DataPizza version does not accept a credentials argument the
+    client's own lookup (GOOGLE_APPLICATION_CREDENTIALS or application
+    default credentials) is used, but only if it would find the same
+    credentials: keys held in memory from GOOGLE_APPLICATION_CREDENTIALS_JSON
+    or read from the local key file are invisible to it.
+
+    Raises:
+        RuntimeError: If the client rejects the shared credentials and its
+            default lookup cannot see them
+    """
+    provider = get_credentials_provider()
+    if provider is not None:
+        try:
+            return client_class(credentials=provider.credentials, **kwargs)
+        except TypeError:
+            default_lookup = ("application default credentials", os.getenv('GOOGLE_APPLICATION_CREDENTIALS'))
+            if provider.source not in default_lookup:
+                raise RuntimeError(
+                    f"VertexAIClient does not accept shared credentials and its default lookup "
+                    f"cannot see the ones loaded from {provider.source}; set GOOGLE_APPLICATION_CREDENTIALS "
+                    f"to a key file or upgrade DataPizza"
+                )
+            print("⚠️ VertexAIClient does not accept shared credentials, using its default lookup")
+    return client_class(**kwargs)
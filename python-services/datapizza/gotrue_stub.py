@@ -0,0 +1,260 @@
+"""
+Local GoTrue Stand-in
+Minimal Supabase Auth server that issues HS256 access tokens with the custom access token hook claims
+
+Lets the auth middleware, jwt_audit and the login scripts run against localhost
+instead of the live project. Users can be configured without the hook claims
+to reproduce tokens issued while the hook was not applied.
+
+Usage:
+    python gotrue_stub.py serve --port 9999
+    python gotrue_stub.py mint --count 10000 --missing-rate 0.05 > tokens.log
+"""
+
+import sys
+import json
+import hmac
+import time
+import uuid
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, Any, Optional, List
+
+STUB_JWT_SECRET = "super-secret-jwt-token-with-at-least-32-characters-long"
+
+DEFAULT_USERS = {
+    "admin@example.com": {
+        "password": "password", "user_role": "super_admin", "organization_id": None, "is_super_admin": True
+    },
+    "owner@example.com": {
+        "password": "password", "user_role": "admin", "organization_id": "00000000-0000-0000-0000-000000000001", "is_super_admin": False
+    },
+    "agent@example.com": {
+        "password": "password", "user_role": "user", "organization_id": "00000000-0000-0000-0000-000000000001", "is_super_admin": False
+    },
+    # Signed in while the custom access token hook was not applied
+    "nohook@example.com": {"password": "password", "hook": False},
+}
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def sign_hs256(payload: Dict[str, Any], secret: str) -> str:
+    header = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+    body = _b64url(json.dumps(payload, separators=(",", ":")).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{body}".encode(), hashlib.sha256).digest()
+    return f"{header}.{body}.{_b64url(signature)}"
+
+
+class GoTrueStub:
+    """
+    Threaded HTTP server implementing the few GoTrue endpoints our scripts use:
+    POST /auth/v1/token?grant_type=password, GET /auth/v1/user and
+    GET /auth/v1/health.
+    """
+
+    def __init__(
+        self,
+        secret: str = STUB_JWT_SECRET,
+        users: Optional[Dict[str, Dict[str, Any]]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ttl_s: int = 3600
+    ):
+        self.secret = secret
+        self.users = dict(users or DEFAULT_USERS)
+        self.ttl_s = ttl_s
+        self._user_ids = {email: str(uuid.uuid5(uuid.NAMESPACE_URL, email)) for email in self.users}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "GoTrueStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="gotrue-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def mint(self, email: str, issued_at: Optional[float] = None, hook: Optional[bool] = None) -> str:
+        """
+        Issue an access token for a configured user.
+
+        Args:
+            email: User to sign in
+            issued_at: Override iat (tokens in the past expire accordingly)
+            hook: Force the custom claims on or off; defaults to the user's setting
+        """
+        user = self.users[email]
+        now = int(issued_at if issued_at is not None else time.time())
+        claims = {
+            "aud": "authenticated",
+            "exp": now + self.ttl_s,
+            "iat": now,
+            "iss": f"{self.url}/auth/v1",
+            "sub": self._user_ids[email],
+            "email": email,
+            "role": "authenticated",
+            "aal": "aal1",
+            "session_id": str(uuid.uuid4())
+        }
+        if user.get("hook", True) if hook is None else hook:
+            claims["user_role"] = user.get("user_role", "user")
+            claims["is_super_admin"] = bool(user.get("is_super_admin"))
+            if user.get("organization_id"):
+                claims["organization_id"] = user["organization_id"]
+        return sign_hs256(claims, self.secret)
+
+    def _user_for_token(self, token: str) -> Optional[str]:
+        try:
+            header, body, signature = token.split(".")
+            expected = hmac.new(self.secret.encode(), f"{header}.{body}".encode(), hashlib.sha256).digest()
+            if not hmac.compare_digest(_b64url(expected), signature):
+                return None
+            claims = json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+        except ValueError:
+            return None
+        if claims.get("exp", 0) < time.time():
+            return None
+        return claims.get("email")
+
+    def _user_json(self, email: str) -> Dict[str, Any]:
+        return {
+            "id": self._user_ids[email],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": email,
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {}
+        }
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: Dict[str, Any]):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/auth/v1/health":
+                    self._send(200, {"name": "GoTrue", "version": "stub"})
+                elif path == "/auth/v1/user":
+                    token = self.headers.get("Authorization", "").partition(" ")[2]
+                    email = stub._user_for_token(token)
+                    if email is None:
+                        self._send(401, {"code": 401, "msg": "invalid JWT"})
+                    else:
+                        self._send(200, stub._user_json(email))
+                else:
+                    self._send(404, {"code": 404, "msg": "Not found"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != "/auth/v1/token" or parse_qs(url.query).get("grant_type") != ["password"]:
+                    self._send(404, {"code": 404, "msg": "Not found"})
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                except ValueError:
+                    self._send(400, {"error": "invalid_request", "error_description": "Invalid JSON body"})
+                    return
+                email = body.get("email")
+                user = stub.users.get(email)
+                if user is None or user.get("password") != body.get("password"):
+                    self._send(400, {"error": "invalid_grant", "error_description": "Invalid login credentials"})
+                    return
+                self._send(200, {
+                    "access_token": stub.mint(email),
+                    "token_type": "bearer",
+                    "expires_in": stub.ttl_s,
+                    "expires_at": int(time.time()) + stub.ttl_s,
+                    "refresh_token": uuid.uuid4().hex,
+                    "user": stub._user_json(email)
+                })
+
+        return Handler
+
+
+def mint_batch(
+    stub: GoTrueStub,
+    count: int,
+    missing_rate: float = 0.0,
+    expired_rate: float = 0.0,
+    seed: int = 42
+) -> List[str]:
+    """Synthetic auth-log tokens across the stub's users, some without hook claims or already expired."""
+    rng = random.Random(seed)
+    emails = [email for email, user in stub.users.items() if user.get("hook", True)]
+    now = time.time()
+    tokens = []
+    for _ in range(count):
+        issued_at = now - stub.ttl_s * 2 if rng.random() < expired_rate else now - rng.uniform(0, stub.ttl_s / 2)
+        hook = rng.random() >= missing_rate
+        tokens.append(stub.mint(rng.choice(emails), issued_at=issued_at, hook=hook))
+    return tokens
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local GoTrue stand-in")
+    parser.add_argument("--secret", default=STUB_JWT_SECRET, help="HS256 signing secret")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Run the auth server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9999)
+    mint = commands.add_parser("mint", help="Print a batch of tokens, one per line")
+    mint.add_argument("--count", type=int, default=1000)
+    mint.add_argument("--missing-rate", type=float, default=0.0, help="Share of tokens without hook claims")
+    mint.add_argument("--expired-rate", type=float, default=0.0, help="Share of already expired tokens")
+    mint.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        stub = GoTrueStub(secret=args.secret, host=args.host, port=args.port)
+        print(f"🔐 GoTrue stub listening on {stub.url}/auth/v1 (users: {', '.join(stub.users)})")
+        try:
+            stub._server.serve_forever()
+        except KeyboardInterrupt:
+            stub.stop()
+        return 0
+
+    stub = GoTrueStub(secret=args.secret)
+    try:
+        for token in mint_batch(stub, args.count, args.missing_rate, args.expired_rate, args.seed):
+            sys.stdout.write(token + "\n")
+    finally:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+JWT Audit Tool
+Decode and optionally verify large batches of Supabase access tokens and report on their claims
+
+Usage:
+    python jwt_audit.py auth-export.log [more.log ...] [--verify] [--workers 8] [--json]
+    cat tokens.txt | python jwt_audit.py - --verify --secret "$SUPABASE_JWT_SECRET"
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import hashlib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable
+
+from auth import CUSTOM_CLAIMS
+
+try:
+    import jwt
+    JWT_AVAILABLE = True
+except ImportError:
+    JWT_AVAILABLE = False
+
+# Claims every token minted through the custom access token hook must carry
+REQUIRED_CLAIMS = ("user_role", "organization_id")
+
+# header.payload.signature, both JSON parts starting with '{"' (eyJ in base64url)
+TOKEN_PATTERN = re.compile(r"eyJ[A-Za-z0-9_-]+\.eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*")
+
+# Decoding alone is cheaper than shipping tokens to other processes, so the
+# pool is only used to verify signatures, and only for batches this large
+PARALLEL_THRESHOLD = 2000
+
+_worker_secret: Optional[str] = None
+_worker_jwks = None
+
+
+def extract_tokens(lines: Iterable[str]) -> Counter:
+    """Find every JWT in free-form text (raw token lists, JSON auth exports, log lines) and count occurrences."""
+    tokens: Counter = Counter()
+    for line in lines:
+        tokens.update(TOKEN_PATTERN.findall(line))
+    return tokens
+
+
+def decode_segment(segment: str) -> Dict[str, Any]:
+    padded = segment + "=" * (-len(segment) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded))
+
+
+def token_fingerprint(token: str) -> str:
+    """Stable short id for reporting a token without printing it."""
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+def inspect_token(token: str, secret: Optional[str] = None, jwks_client=None, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Decode one token and describe it.
+
+    The signature is only checked when a secret (HS256) or JWKS client
+    (RS256/ES256) is given; expiry is reported separately so tokens pulled
+    from old logs can still be checked for a valid signature.
+
+    Returns:
+        Dict with fingerprint, alg, role claims, expiry, missing claims and
+        signature ("valid", "invalid" or "unchecked"); "error" when malformed
+    """
+    now = time.time() if now is None else now
+    result: Dict[str, Any] = {"fingerprint": token_fingerprint(token)}
+    try:
+        header_segment, payload_segment, _ = token.split(".")
+        header = decode_segment(header_segment)
+        payload = decode_segment(payload_segment)
+        if not isinstance(payload, dict):
+            raise ValueError("payload is not a JSON object")
+    except ValueError as e:
+        result["error"] = f"malformed: {e}"
+        return result
+
+    exp = payload.get("exp")
+    result.update({
+        "alg": header.get("alg"),
+        "sub": payload.get("sub"),
+        "role": payload.get("role"),
+        "user_role": payload.get("user_role"),
+        "organization_id": payload.get("organization_id"),
+        "is_super_admin": bool(payload.get("is_super_admin")),
+        "claims": sorted(payload),
+        "expired": isinstance(exp, (int, float)) and exp < now,
+        "missing_claims": [
+            claim for claim in REQUIRED_CLAIMS
+            if payload.get(claim) in (None, "")
+            # Super admins act across organizations and carry none
+            and not (claim == "organization_id" and payload.get("is_super_admin"))
+        ],
+        "signature": "unchecked"
+    })
+
+    if secret or jwks_client is not None:
+        result["signature"] = _check_signature(token, result["alg"], secret, jwks_client)
+    return result
+
+
+def _check_signature(token: str, algorithm: Optional[str], secret: Optional[str], jwks_client) -> str:
+    try:
+        if algorithm == "HS256" and secret:
+            key = secret
+        elif algorithm in ("RS256", "ES256") and jwks_client is not None:
+            key = jwks_client.get_signing_key_from_jwt(token).key
+        else:
+            return "unchecked"
+        jwt.decode(token, key, algorithms=[algorithm], options={"verify_exp": False, "verify_aud": False})
+        return "valid"
+    except jwt.PyJWTError:
+        return "invalid"
+
+
+def _init_worker(secret: Optional[str], jwks_url: Optional[str]):
+    global _worker_secret, _worker_jwks
+    _worker_secret = secret
+    _worker_jwks = jwt.PyJWKClient(jwks_url, cache_keys=True) if jwks_url else None
+
+
+def _inspect_chunk(tokens: List[str]) -> List[Dict[str, Any]]:
+    now = time.time()
+    return [inspect_token(token, _worker_secret, _worker_jwks, now) for token in tokens]
+
+
+def audit_tokens(
+    tokens: Counter,
+    secret: Optional[str] = None,
+    jwks_url: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    max_flagged: int = 100
+) -> Dict[str, Any]:
+    """
+    Inspect a batch of tokens and aggregate their claims.
+
+    Each unique token is decoded once; counts are weighted by how often it
+    occurred. Large batches that need signature checks are spread over a
+    process pool, each worker holding its own JWKS client.
+
+    Args:
+        tokens: Token -> occurrence count (see extract_tokens)
+        secret: HS256 secret to verify signatures with
+        jwks_url: JWKS endpoint to verify asymmetric signatures with
+        workers: Process count (defaults to the CPU count)
+        chunk_size: Tokens per worker task
+        max_flagged: Cap on flagged tokens listed in the report
+
+    Returns:
+        Totals, claim presence, role distributions, signature results and flagged tokens
+    """
+    if (secret or jwks_url) and not JWT_AVAILABLE:
+        raise RuntimeError("PyJWT is required for signature verification")
+
+    start = time.perf_counter()
+    unique = list(tokens)
+    chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    verify = bool(secret or jwks_url)
+    if verify and len(unique) >= PARALLEL_THRESHOLD and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(secret, jwks_url)) as pool:
+            results = [result for chunk in pool.map(_inspect_chunk, chunks) for result in chunk]
+    else:
+        workers = 1
+        if verify:
+            _init_worker(secret, jwks_url)
+        results = [result for chunk in chunks for result in _inspect_chunk(chunk)]
+
+    report = _aggregate(unique, results, tokens, max_flagged)
+    report["workers"] = workers
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return report
+
+
+def _aggregate(unique: List[str], results: List[Dict[str, Any]], tokens: Counter, max_flagged: int) -> Dict[str, Any]:
+    claim_presence: Counter = Counter()
+    user_roles: Counter = Counter()
+    auth_roles: Counter = Counter()
+    signatures: Counter = Counter()
+    organizations = set()
+    subjects = set()
+    malformed = expired = super_admin = missing = 0
+    flagged = []
+
+    for token, result in zip(unique, results):
+        count = tokens[token]
+        if "error" in result:
+            malformed += count
+            continue
+        claim_presence.update({claim: count for claim in CUSTOM_CLAIMS if claim in result["claims"]})
+        user_roles[result["user_role"] or "(missing)"] += count
+        auth_roles[result["role"] or "(missing)"] += count
+        signatures[result["signature"]] += count
+        expired += count if result["expired"] else 0
+        super_admin += count if result["is_super_admin"] else 0
+        if result["organization_id"]:
+            organizations.add(result["organization_id"])
+        if result["sub"]:
+            subjects.add(result["sub"])
+        if result["missing_claims"]:
+            missing += count
+            if len(flagged) < max_flagged:
+                flagged.append({
+                    "fingerprint": result["fingerprint"],
+                    "sub": result["sub"],
+                    "role": result["role"],
+                    "missing": result["missing_claims"],
+                    "occurrences": count
+                })
+
+    total = sum(tokens.values())
+    decoded = total - malformed
+    return {
+        "total_tokens": total,
+        "unique_tokens": len(unique),
+        "malformed": malformed,
+        "subjects": len(subjects),
+        "organizations": len(organizations),
+        "claim_presence": {
+            claim: {"count": claim_presence[claim], "rate": round(claim_presence[claim] / decoded, 4) if decoded else 0.0}
+            for claim in CUSTOM_CLAIMS
+        },
+        "user_roles": dict(user_roles.most_common()),
+        "auth_roles": dict(auth_roles.most_common()),
+        "super_admin_tokens": super_admin,
+        "expired": expired,
+        "signatures": dict(signatures),
+        "missing_required_claims": missing,
+        "flagged": flagged
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print("=" * 70)
+    print("JWT AUDIT")
+    print("=" * 70)
+    print(f"Tokens: {report['total_tokens']} ({report['unique_tokens']} unique, {report['malformed']} malformed)")
+    print(f"Subjects: {report['subjects']}  Organizations: {report['organizations']}")
+    print(f"Expired: {report['expired']}  Super admin: {report['super_admin_tokens']}")
+    print(f"Signatures: {report['signatures']}")
+    print("\nCustom claims:")
+    for claim, presence in report["claim_presence"].items():
+        icon = "✅" if presence["rate"] == 1.0 else "❌"
+        print(f"  {icon} {claim}: {presence['count']} ({presence['rate']:.1%})")
+    print("\nuser_role distribution:")
+    for role, count in report["user_roles"].items():
+        print(f"  {role}: {count}")
+    print("\nrole (Postgres) distribution:")
+    for role, count in report["auth_roles"].items():
+        print(f"  {role}: {count}")
+    if report["missing_required_claims"]:
+        print(f"\n⚠️ {report['missing_required_claims']} token(s) missing {' / '.join(REQUIRED_CLAIMS)}")
+        print("   (custom access token hook not applied when they were issued)")
+        for token in report["flagged"]:
+            print(f"  {token['fingerprint']} sub={token['sub']} role={token['role']} missing={token['missing']} x{token['occurrences']}")
+    else:
+        print(f"\n✅ Every token carries {' and '.join(REQUIRED_CLAIMS)}")
+    print(f"\n⏱️ {report['elapsed_ms']}ms with {report['workers']} worker(s)")
+
+
+def _read_inputs(paths: List[str]) -> Counter:
+    tokens: Counter = Counter()
+    for path in paths:
+        if path == "-":
+            tokens.update(extract_tokens(sys.stdin))
+        else:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                tokens.update(extract_tokens(f))
+    return tokens
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Decode and audit Supabase JWTs in bulk")
+    parser.add_argument("paths", nargs="+", help="Files with tokens (raw, JSON or log lines); - for stdin")
+    parser.add_argument("--verify", action="store_true", help="Verify signatures (HS256 secret and/or JWKS)")
+    parser.add_argument("--secret", default=os.getenv("SUPABASE_JWT_SECRET"), help="HS256 secret (default: SUPABASE_JWT_SECRET)")
+    parser.add_argument("--jwks-url", default=os.getenv("SUPABASE_JWKS_URL"), help="JWKS endpoint (default: SUPABASE_JWKS_URL)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-flagged", type=int, default=20, help="Flagged tokens to list")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    tokens = _read_inputs(args.paths)
+    if not tokens:
+        print("❌ No JWTs found in input")
+        return 1
+
+    report = audit_tokens(
+        tokens,
+        secret=args.secret if args.verify else None,
+        jwks_url=args.jwks_url if args.verify else None,
+        workers=args.workers,
+        max_flagged=args.max_flagged
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 2 if report["missing_required_claims"] or report["signatures"].get("invalid") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,635 @@
+"""
+Company Knowledge Index
+BM25 retrieval over company_knowledge_sources with Italian tokenization, incremental updates and mmap-able segments
+"""
+
+import os
+import re
+import json
+import math
+import mmap
+import time
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+try:
+    import snowballstemmer
+    _SNOWBALL = snowballstemmer.stemmer("italian")
+    SNOWBALL_AVAILABLE = True
+except ImportError:
+    _SNOWBALL = None
+    SNOWBALL_AVAILABLE = False
+
+DEFAULT_INDEX_PATH = Path(__file__).parent / '.cache' / 'knowledge'
+
+SEGMENT_MAGIC = b"KIDX\x01\x00\x00\x00"
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Passages (in words) that documents are split into; agents get passages, not documents
+CHUNK_WORDS = 150
+CHUNK_OVERLAP = 30
+
+# Delta chunks held in memory before they are merged into the on-disk segment
+COMPACT_THRESHOLD = 2000
+
+ITALIAN_STOPWORDS = frozenset("""
+a ad agli ai al all alla alle allo anche c che chi ci coi col come con cosa cui d da dagli dai dal dall dalla
+dalle dallo de degli dei del dell della delle dello di dove e ed era erano essere gli ha hai hanno ho i il in
+io la le lei lo loro lui l ma mi mia mie miei mio ne negli nei nel nell nella nelle nello noi non nostra nostre
+nostri nostro o per perche piu po quale quali quando quanto quella quelle quelli quello questa queste questi
+questo se sei si sia siamo siete sono su sua sue sugli sui sul sull sulla sulle sullo suo suoi ti tra tu tua
+tue tuo tuoi tutti tutto un una uno vi voi vostra vostro e gia cosi sempre molto ogni
+""".split())
+
+# Derivational endings stripped by the fallback stemmer, longest first
+_SUFFIXES = sorted((
+    "azione", "azioni", "atore", "atori", "atrice", "atrici", "amento", "amenti", "imento", "imenti",
+    "mente", "ista", "iste", "isti", "ismo", "ismi", "abile", "abili", "ibile", "ibili", "anza", "anze",
+    "enza", "enze", "ita", "ivo", "iva", "ivi", "ive", "oso", "osa", "osi", "ose", "ico", "ica", "ici",
+    "iche", "ichi", "ale", "ali"
+), key=len, reverse=True)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _fold(text: str) -> str:
+    """Lowercase and drop accents (città -> citta, perché -> perche)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _light_stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 4 and word[-1] in "aeiou":
+        word = word[:-1]
+    return word
+
+
+@lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    """Italian stem (Snowball when installed, a light suffix stripper otherwise)."""
+    if word.isdigit() or len(word) <= 3:
+        return word
+    if SNOWBALL_AVAILABLE:
+        return _SNOWBALL.stemWord(word)
+    return _light_stem(word)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Index terms for Italian text: accent-folded, elisions split
+    ("dell'assicurazione" -> "assicur..."), stopwords dropped, stemmed.
+    """
+    return [stem(word) for word in _WORD.findall(_fold(text)) if word not in ITALIAN_STOPWORDS]
+
+
+def chunk_text(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split a document into overlapping word windows."""
+    tokens = text.split()
+    if not tokens:
+        return []
+    step = max(1, words - overlap)
+    return [" ".join(tokens[start:start + words]) for start in range(0, max(1, len(tokens) - overlap), step)]
+
+
+def prepare_passages(source_name: str, text: str) -> List[Tuple[str, Counter]]:
+    """Passages of a source with their term counts (the CPU-heavy part of indexing)."""
+    return [(passage, Counter(tokenize(source_name + " " + passage))) for passage in chunk_text(text)]
+
+
+class _Segment:
+    """
+    Immutable inverted index over a contiguous buffer.
+
+    Layout: magic, header length, JSON header (terms count, sources,
+    array offsets), then 8-byte aligned arrays -- term postings offsets,
+    posting doc ids and term frequencies, document lengths, chunk source
+    ids, chunk text offsets -- followed by the vocabulary and the chunk
+    texts as UTF-8 blobs. Loaded from disk the buffer is an mmap, so
+    postings and texts are paged in on demand.
+    """
+
+    def __init__(self, buffer, path: Optional[Path] = None):
+        self.buffer = buffer
+        self.path = path
+        if bytes(buffer[:8]) != SEGMENT_MAGIC:
+            raise ValueError("Not a knowledge index segment")
+        header_length = int(np.frombuffer(buffer, dtype="<u8", count=1, offset=8)[0])
+        header = json.loads(bytes(buffer[16:16 + header_length]))
+        self.sources: List[Tuple[str, str]] = [tuple(source) for source in header["sources"]]
+        self.total_length = header["total_length"]
+        arrays = {
+            name: np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            for name, (offset, dtype, count) in header["arrays"].items()
+        }
+        self.offsets = arrays["offsets"]
+        self.postings_doc = arrays["postings_doc"]
+        self.postings_tf = arrays["postings_tf"]
+        self.doc_len = arrays["doc_len"]
+        self.chunk_source = arrays["chunk_source"]
+        self.text_offsets = arrays["text_offsets"]
+        self._texts_at = header["texts_at"]
+        terms_at, terms_size = header["terms"]
+        self.terms = bytes(buffer[terms_at:terms_at + terms_size]).decode("utf-8").split("\n") if terms_size else []
+        self.term_ids = {term: index for index, term in enumerate(self.terms)}
+        self.n_docs = len(self.doc_len)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        index = self.term_ids.get(term)
+        if index is None:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.postings_doc[start:end], self.postings_tf[start:end]
+
+    def text(self, doc: int) -> str:
+        start, end = self.text_offsets[doc], self.text_offsets[doc + 1]
+        return bytes(self.buffer[self._texts_at + start:self._texts_at + end]).decode("utf-8")
+
+    def text_bytes(self, doc: int) -> bytes:
+        start, end = self.text_offsets[doc], self.text_offsets[doc + 1]
+        return bytes(self.buffer[self._texts_at + start:self._texts_at + end])
+
+    def source_docs(self) -> Dict[str, List[int]]:
+        docs: Dict[str, List[int]] = {}
+        for doc, source in enumerate(self.chunk_source.tolist()):
+            docs.setdefault(self.sources[source][0], []).append(doc)
+        return docs
+
+    @classmethod
+    def open(cls, path: Path) -> "_Segment":
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    @staticmethod
+    def encode(
+        terms: List[str],
+        offsets: np.ndarray,
+        postings_doc: np.ndarray,
+        postings_tf: np.ndarray,
+        doc_len: np.ndarray,
+        chunk_source: np.ndarray,
+        sources: List[Tuple[str, str]],
+        texts: List[bytes]
+    ) -> bytes:
+        text_offsets = np.zeros(len(texts) + 1, dtype="<i8")
+        np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+        arrays = {
+            "offsets": offsets.astype("<i8"),
+            "postings_doc": postings_doc.astype("<u4"),
+            "postings_tf": np.minimum(postings_tf, 65535).astype("<u2"),
+            "doc_len": doc_len.astype("<u4"),
+            "chunk_source": chunk_source.astype("<u4"),
+            "text_offsets": text_offsets
+        }
+        vocabulary = "\n".join(terms).encode("utf-8")
+
+        def layout(header_length: int):
+            position = _align(16 + header_length)
+            placed = {}
+            for name, array in arrays.items():
+                placed[name] = (position, array.dtype.str, len(array))
+                position = _align(position + array.nbytes)
+            return placed, position
+
+        # The header records absolute offsets, so size it until the layout is stable
+        header_length = 0
+        while True:
+            placed, position = layout(header_length)
+            header = json.dumps({
+                "sources": sources,
+                "total_length": int(doc_len.sum()),
+                "arrays": placed,
+                "terms": [position, len(vocabulary)],
+                "texts_at": position + len(vocabulary)
+            }).encode("utf-8")
+            if len(header) == header_length:
+                break
+            header_length = len(header)
+
+        out = bytearray(SEGMENT_MAGIC + np.array([header_length], dtype="<u8").tobytes() + header)
+        for name, array in arrays.items():
+            out.extend(b"\0" * (placed[name][0] - len(out)))
+            out.extend(array.tobytes())
+        out.extend(b"\0" * (position - len(out)))
+        out.extend(vocabulary)
+        for text in texts:
+            out.extend(text)
+        return bytes(out)
+
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+
+def build_segment(chunks: List[Tuple[str, str, str, Counter]]) -> _Segment:
+    """Segment over (source_id, source_name, text, term counts) chunks."""
+    vocabulary = sorted({term for _, _, _, counts in chunks for term in counts})
+    term_ids = {term: index for index, term in enumerate(vocabulary)}
+    sources: Dict[str, int] = {}
+    source_names: List[Tuple[str, str]] = []
+    term_column, doc_column, tf_column, chunk_source = [], [], [], []
+    for doc, (source_id, source_name, _, counts) in enumerate(chunks):
+        if source_id not in sources:
+            sources[source_id] = len(source_names)
+            source_names.append((source_id, source_name))
+        chunk_source.append(sources[source_id])
+        for term, tf in counts.items():
+            term_column.append(term_ids[term])
+            doc_column.append(doc)
+            tf_column.append(tf)
+    terms = np.array(term_column, dtype=np.int64)
+    docs = np.array(doc_column, dtype=np.int64)
+    tfs = np.array(tf_column, dtype=np.int64)
+    order = np.lexsort((docs, terms))
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=offsets[1:])
+    return _Segment(_Segment.encode(
+        vocabulary, offsets, docs[order], tfs[order],
+        np.array([sum(counts.values()) for _, _, _, counts in chunks], dtype=np.int64),
+        np.array(chunk_source, dtype=np.int64), source_names,
+        [text.encode("utf-8") for _, _, text, _ in chunks]
+    ))
+
+
+def merge_segments(base: _Segment, live: np.ndarray, delta: _Segment) -> _Segment:
+    """One segment with the live documents of base followed by every document of delta."""
+    vocabulary = sorted(set(base.terms) | set(delta.terms))
+    term_ids = {term: index for index, term in enumerate(vocabulary)}
+    sources: Dict[str, int] = {}
+    source_names: List[Tuple[str, str]] = []
+
+    def source_map(segment: _Segment) -> np.ndarray:
+        mapped = []
+        for source_id, source_name in segment.sources:
+            if source_id not in sources:
+                sources[source_id] = len(source_names)
+                source_names.append((source_id, source_name))
+            mapped.append(sources[source_id])
+        return np.array(mapped, dtype=np.int64)
+
+    base_terms = np.repeat(np.array([term_ids[term] for term in base.terms], dtype=np.int64), np.diff(base.offsets))
+    keep = live[base.postings_doc]
+    renumber = np.cumsum(live) - 1
+    base_live = int(live.sum())
+    delta_terms = np.repeat(np.array([term_ids[term] for term in delta.terms], dtype=np.int64), np.diff(delta.offsets))
+
+    terms = np.concatenate([base_terms[keep], delta_terms])
+    docs = np.concatenate([renumber[base.postings_doc[keep]], delta.postings_doc.astype(np.int64) + base_live])
+    tfs = np.concatenate([base.postings_tf[keep], delta.postings_tf]).astype(np.int64)
+    counts = np.bincount(terms, minlength=len(vocabulary))
+    used = counts > 0
+    terms = (np.cumsum(used) - 1)[terms]
+    order = np.lexsort((docs, terms))
+    offsets = np.zeros(int(used.sum()) + 1, dtype=np.int64)
+    np.cumsum(counts[used], out=offsets[1:])
+
+    base_sources = source_map(base)
+    delta_sources = source_map(delta)
+    live_docs = np.flatnonzero(live)
+    return _Segment(_Segment.encode(
+        [term for term, is_used in zip(vocabulary, used) if is_used],
+        offsets, docs[order], tfs[order],
+        np.concatenate([base.doc_len[live], delta.doc_len]).astype(np.int64),
+        np.concatenate([base_sources[base.chunk_source[live]], delta_sources[delta.chunk_source]]),
+        source_names,
+        [base.text_bytes(doc) for doc in live_docs.tolist()] + [delta.text_bytes(doc) for doc in range(delta.n_docs)]
+    ))
+
+
+class _OrganizationIndex:
+    """
+    One organization's index: an immutable base segment plus an in-memory delta.
+
+    Every upsert and delete since the last compaction is appended to a
+    journal next to the segment and replayed on load, so tombstones and
+    delta passages survive a crash; compaction empties the journal.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.journal_path = path.with_suffix(".kjournal")
+        self.base: Optional[_Segment] = _Segment.open(path) if path.exists() else None
+        self.base_docs: Dict[str, List[int]] = self.base.source_docs() if self.base else {}
+        self.tombstones = np.zeros(self.base.n_docs if self.base else 0, dtype=bool)
+        self.tombstoned_length = 0
+        # Delta: chunk id -> (source_id, source_name, text, term counts)
+        self.delta: Dict[int, Tuple[str, str, str, Counter]] = {}
+        self.delta_postings: Dict[str, Dict[int, int]] = {}
+        self.delta_sources: Dict[str, List[int]] = {}
+        self.delta_lengths: Dict[int, int] = {}
+        self.delta_length = 0
+        self.next_chunk = 0
+        self.dirty = False
+        self._replay()
+
+    def upsert(self, source_id: str, source_name: str, passages: List[Tuple[str, Counter]]) -> int:
+        """Replace a source's passages, journaled before they are applied."""
+        self._journal({"op": "upsert", "source_id": source_id, "source_name": source_name,
+                       "passages": [[passage, counts] for passage, counts in passages]})
+        self.remove_source(source_id)
+        return self.add_passages(source_id, source_name, passages)
+
+    def delete(self, source_id: str) -> bool:
+        """Tombstone a source, journaled so the delete survives a restart."""
+        if source_id not in self.base_docs and source_id not in self.delta_sources:
+            return False
+        self._journal({"op": "delete", "source_id": source_id})
+        return self.remove_source(source_id)
+
+    def _journal(self, entry: Dict[str, Any]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def _replay(self):
+        if not self.journal_path.exists():
+            return
+        replayed = 0
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A write torn by the crash; nothing after it was acknowledged
+                    break
+                if entry["op"] == "upsert":
+                    self.remove_source(entry["source_id"])
+                    self.add_passages(entry["source_id"], entry["source_name"],
+                                      [(passage, Counter(counts)) for passage, counts in entry["passages"]])
+                else:
+                    self.remove_source(entry["source_id"])
+                replayed += 1
+        self.dirty = replayed > 0
+        print(f"✅ Knowledge index journal replayed ({replayed} changes for {self.path.stem})")
+
+    @property
+    def n_docs(self) -> int:
+        base = self.base.n_docs - int(self.tombstones.sum()) if self.base else 0
+        return base + len(self.delta)
+
+    @property
+    def total_length(self) -> int:
+        base = self.base.total_length - self.tombstoned_length if self.base else 0
+        return base + self.delta_length
+
+    def remove_source(self, source_id: str) -> bool:
+        removed = False
+        for doc in self.base_docs.pop(source_id, []):
+            if not self.tombstones[doc]:
+                self.tombstones[doc] = True
+                self.tombstoned_length += int(self.base.doc_len[doc])
+                removed = True
+        for chunk in self.delta_sources.pop(source_id, []):
+            _, _, _, counts = self.delta.pop(chunk)
+            self.delta_length -= self.delta_lengths.pop(chunk)
+            for term in counts:
+                postings = self.delta_postings[term]
+                del postings[chunk]
+                if not postings:
+                    del self.delta_postings[term]
+            removed = True
+        self.dirty = self.dirty or removed
+        return removed
+
+    def add_passages(self, source_id: str, source_name: str, passages: List[Tuple[str, Counter]]) -> int:
+        for passage, counts in passages:
+            chunk = self.next_chunk
+            self.next_chunk += 1
+            self.delta[chunk] = (source_id, source_name, passage, counts)
+            self.delta_sources.setdefault(source_id, []).append(chunk)
+            self.delta_lengths[chunk] = sum(counts.values())
+            self.delta_length += self.delta_lengths[chunk]
+            for term, tf in counts.items():
+                self.delta_postings.setdefault(term, {})[chunk] = tf
+        self.dirty = self.dirty or bool(passages)
+        return len(passages)
+
+    def search(self, terms: List[str], top_k: int) -> List[Tuple[float, str, int]]:
+        n_docs = self.n_docs
+        if not n_docs or not terms:
+            return []
+        average_length = self.total_length / n_docs
+        base_scores = np.zeros(self.base.n_docs, dtype=np.float32) if self.base else None
+        matched = np.zeros(self.base.n_docs, dtype=bool) if self.base else None
+        delta_scores: Dict[int, float] = {}
+
+        for term in set(terms):
+            base_postings = self.base.postings(term) if self.base else None
+            if base_postings:
+                # Tombstoned passages are neither counted in df nor scored, like in n_docs
+                docs, tfs = base_postings
+                live = ~self.tombstones[docs]
+                docs, tfs = docs[live], tfs[live]
+            delta_postings = self.delta_postings.get(term, {})
+            df = (len(docs) if base_postings else 0) + len(delta_postings)
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            if base_postings and len(docs):
+                matched[docs] = True
+                tfs = tfs.astype(np.float32)
+                lengths = self.base.doc_len[docs].astype(np.float32)
+                base_scores[docs] += idf * tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * lengths / average_length))
+            for chunk, tf in delta_postings.items():
+                length = self.delta_lengths[chunk]
+                delta_scores[chunk] = delta_scores.get(chunk, 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length))
+
+        hits: List[Tuple[float, str, int]] = []
+        if base_scores is not None:
+            candidates = np.flatnonzero(matched)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(-base_scores[candidates], top_k)[:top_k]]
+            hits.extend((float(base_scores[doc]), "base", int(doc)) for doc in candidates)
+        hits.extend((score, "delta", chunk) for chunk, score in delta_scores.items())
+        hits.sort(key=lambda hit: -hit[0])
+        return hits[:top_k]
+
+    def passage(self, where: str, doc: int) -> Dict[str, Any]:
+        if where == "base":
+            source_id, source_name = self.base.sources[self.base.chunk_source[doc]]
+            return {"source_id": source_id, "source_name": source_name, "text": self.base.text(doc)}
+        source_id, source_name, text, _ = self.delta[doc]
+        return {"source_id": source_id, "source_name": source_name, "text": text}
+
+    def compact(self) -> bool:
+        """Merge the delta into a new base segment and write it to disk."""
+        if not self.dirty:
+            return False
+        delta = build_segment(list(self.delta.values()))
+        if self.base is not None:
+            merged = merge_segments(self.base, ~self.tombstones, delta)
+        else:
+            merged = delta
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        with open(temporary, "wb") as f:
+            f.write(merged.buffer)
+        os.replace(temporary, self.path)
+        # Replaying the journal over the new segment would be harmless, but it is no longer needed
+        self.journal_path.unlink(missing_ok=True)
+        # The old mapping is released once its array views are dropped
+        self.base = _Segment.open(self.path)
+        self.base_docs = self.base.source_docs()
+        self.tombstones = np.zeros(self.base.n_docs, dtype=bool)
+        self.tombstoned_length = 0
+        self.delta.clear()
+        self.delta_postings.clear()
+        self.delta_sources.clear()
+        self.delta_lengths.clear()
+        self.delta_length = 0
+        self.dirty = False
+        return True
+
+
+class KnowledgeIndex:
+    """
+    Per-organization BM25 retrieval over company knowledge sources.
+
+    Sources are split into passages and indexed as they change: an upsert
+    tombstones the source's passages in the on-disk segment and adds the
+    new ones to an in-memory delta, which is merged into a fresh segment
+    once it grows past COMPACT_THRESHOLD chunks (or on save). Changes not
+    yet compacted are kept in a per-organization journal. A query
+    scores the memory-mapped segment with vectorized BM25 over the
+    postings of its terms, adds the delta's scores and returns the top-k
+    passages.
+    """
+
+    def __init__(self, path: Optional[str] = None, compact_threshold: int = COMPACT_THRESHOLD):
+        self.path = Path(path or os.getenv('KNOWLEDGE_INDEX_PATH', DEFAULT_INDEX_PATH))
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._indexes: Dict[str, _OrganizationIndex] = {}
+        self._stats = {"upserts": 0, "deletes": 0, "searches": 0, "compactions": 0, "search_ms_total": 0.0}
+
+    def _index(self, organization_id: str) -> _OrganizationIndex:
+        index = self._indexes.get(organization_id)
+        if index is None:
+            safe_name = re.sub(r"[^A-Za-z0-9_-]", "_", organization_id)
+            index = self._indexes[organization_id] = _OrganizationIndex(self.path / f"{safe_name}.kidx")
+        return index
+
+    def upsert_source(self, source: Dict[str, Any]) -> int:
+        """
+        Index (or re-index) one company_knowledge_sources row.
+
+        Rows without extracted text (or original content) are removed.
+
+        Returns:
+            Number of passages indexed
+        """
+        organization_id = source.get("organization_id")
+        source_id = source.get("id")
+        if not organization_id or not source_id:
+            raise ValueError("Knowledge sources need id and organization_id")
+        source_name = source.get("source_name") or ""
+        text = source.get("extracted_text") or source.get("original_content") or ""
+        return self.upsert_passages(organization_id, source_id, source_name, prepare_passages(source_name, text))
+
+    def upsert_passages(self, organization_id: str, source_id: str, source_name: str, passages: List[Tuple[str, Counter]]) -> int:
+        """Replace a source's passages with ones already tokenized (see prepare_passages)."""
+        with self._lock:
+            index = self._index(organization_id)
+            added = index.upsert(source_id, source_name, passages)
+            self._stats["upserts"] += 1
+            if len(index.delta) >= self.compact_threshold:
+                index.compact()
+                self._stats["compactions"] += 1
+        return added
+
+    def delete_source(self, organization_id: str, source_id: str) -> bool:
+        with self._lock:
+            self._stats["deletes"] += 1
+            return self._index(organization_id).delete(source_id)
+
+    def owner_of(self, source_id: str) -> Optional[str]:
+        """Organization whose index holds a source (DELETE payloads may carry only the id)."""
+        with self._lock:
+            for path in list(self.path.glob("*.kidx")) + list(self.path.glob("*.kjournal")):
+                self._index(path.stem)
+            for organization_id, index in self._indexes.items():
+                if source_id in index.base_docs or source_id in index.delta_sources:
+                    return organization_id
+        return None
+
+    def apply_change(self, change: Dict[str, Any]) -> str:
+        """Apply a Realtime or database webhook change on company_knowledge_sources."""
+        event = (change.get("eventType") or change.get("type") or "").upper()
+        new = change.get("new") or change.get("record")
+        old = change.get("old") or change.get("old_record") or {}
+        if event in ("INSERT", "UPDATE") and new:
+            self.upsert_source(new)
+        elif event == "DELETE" and old.get("id"):
+            organization_id = old.get("organization_id") or self.owner_of(old["id"])
+            if organization_id:
+                self.delete_source(organization_id, old["id"])
+        else:
+            raise ValueError(f"Unsupported knowledge change: {event or 'missing type'}")
+        return event
+
+    def search(self, organization_id: str, query: str, top_k: int = 5) -> Dict[str, Any]:
+        """
+        Top-k passages for a query within one organization's knowledge.
+
+        Returns:
+            Passages with source id/name, BM25 score and text, plus timing
+        """
+        start = time.perf_counter()
+        terms = tokenize(query)
+        with self._lock:
+            index = self._index(organization_id)
+            hits = index.search(terms, top_k)
+            passages = [{**index.passage(where, doc), "score": round(score, 4)} for score, where, doc in hits]
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._stats["searches"] += 1
+            self._stats["search_ms_total"] += elapsed_ms
+        return {"query": query, "terms": terms, "passages": passages, "elapsed_ms": round(elapsed_ms, 2)}
+
+    def save(self, organization_ids: Optional[Iterable[str]] = None) -> int:
+        """Compact every changed organization index (or only the given ones) to disk; returns how many were written."""
+        written = 0
+        with self._lock:
+            indexes = self._indexes.values() if organization_ids is None else [self._index(o) for o in organization_ids]
+            for index in indexes:
+                if index.compact():
+                    written += 1
+                    self._stats["compactions"] += 1
+        return written
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            searches = self._stats["searches"]
+            return {
+                **{key: value for key, value in self._stats.items() if key != "search_ms_total"},
+                "avg_search_ms": round(self._stats["search_ms_total"] / searches, 2) if searches else 0.0,
+                "organizations": len(self._indexes),
+                "passages": sum(index.n_docs for index in self._indexes.values()),
+                "delta_passages": sum(len(index.delta) for index in self._indexes.values()),
+                "stemmer": "snowball" if SNOWBALL_AVAILABLE else "light"
+            }
+
+
+_knowledge_index: Optional[KnowledgeIndex] = None
+_knowledge_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Shared knowledge index (segments are opened lazily per organization)."""
+    global _knowledge_index
+    with _knowledge_index_lock:
+        if _knowledge_index is None:
+            _knowledge_index = KnowledgeIndex()
+        return _knowledge_index
@@ -0,0 +1,167 @@
+"""
+Adaptive Micro-Batcher for Lead Scoring
+Coalesces concurrent scoring requests into a single DataPizza agent run
+"""
+
+import threading
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Callable, Optional
+
+from usage_tracker import UsageScope, current_scopes, usage_scopes
+
+
+@dataclass
+class _PendingLead:
+    contact: Dict[str, Any]
+    model: Optional[str] = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    scopes: List[UsageScope] = field(default_factory=current_scopes)
+
+
+class LeadScoringBatcher:
+    """
+    Collects scoring requests for a few milliseconds (or until max_batch_size
+    contacts are waiting) and sends them to the agent as one prompt.
+
+    The collection window adapts to traffic: an EWMA of the gap between
+    arrivals estimates how long it takes to fill a batch. Under sparse
+    traffic the window collapses to zero so a lone interactive request is
+    never delayed; under bulk load it grows up to max_wait_ms.
+
+    Requests routed to different models share the collection window but are
+    sent as separate agent runs, one per model.
+    """
+
+    def __init__(
+        self,
+        score_batch: Callable[[List[Dict[str, Any]], Optional[str]], List[Dict[str, Any]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 20.0,
+        max_in_flight: int = 4,
+        smoothing: float = 0.2
+    ):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.smoothing = smoothing
+
+        self._queue: "queue.Queue[_PendingLead]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="lead-batch")
+        self._lock = threading.Lock()
+        self._worker = None
+        self._last_arrival = None
+        self._avg_gap = self.max_wait * 2  # Start out assuming sparse traffic
+
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "batched_contacts": 0,
+            "largest_batch": 0,
+            "failures": 0
+        }
+
+    def submit(self, contact: Dict[str, Any], model: Optional[str] = None) -> Future:
+        """
+        Queue a contact for scoring.
+
+        Args:
+            contact: Contact dict as accepted by score_lead()
+            model: Model tier to score with (None for the default model)
+
+        Returns:
+            Future resolving to the scoring dict
+        """
+        self._ensure_worker()
+        pending = _PendingLead(contact=contact, model=model)
+
+        with self._lock:
+            now = pending.enqueued_at
+            if self._last_arrival is not None:
+                gap = now - self._last_arrival
+                self._avg_gap = (1 - self.smoothing) * self._avg_gap + self.smoothing * gap
+            self._last_arrival = now
+            self._stats["requests"] += 1
+
+        self._queue.put(pending)
+        return pending.future
+
+    def score(self, contact: Dict[str, Any], model: Optional[str] = None, timeout: float = None) -> Dict[str, Any]:
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(contact, model).result(timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return batching counters and the current collection window."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["current_window_ms"] = round(self._collection_window() * 1000, 2)
+        stats["avg_batch_size"] = round(stats["batched_contacts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def _collection_window(self) -> float:
+        # Expected time for the rest of a batch to arrive at the current rate
+        if self._avg_gap >= self.max_wait:
+            return 0.0
+        return min(self.max_wait, self._avg_gap * (self.max_batch_size - 1))
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._collect_loop, name="lead-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_loop(self):
+        while True:
+            batch = [self._queue.get()]
+
+            with self._lock:
+                window = self._collection_window()
+            deadline = time.monotonic() + window
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        # Window closed - still take anything already queued
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_model: Dict[Optional[str], List[_PendingLead]] = {}
+            for pending in batch:
+                by_model.setdefault(pending.model, []).append(pending)
+            for model, model_batch in by_model.items():
+                self._executor.submit(self._dispatch, model_batch, model)
+
+    def _dispatch(self, batch: List[_PendingLead], model: Optional[str]):
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["batched_contacts"] += len(batch)
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+
+        # Bill the shared agent run to every caller in the batch
+        scopes = [scope for pending in batch for scope in pending.scopes]
+
+        try:
+            with usage_scopes(scopes):
+                results = self.score_batch([pending.contact for pending in batch], model)
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+        except Exception as e:
+            print(f"❌ Lead batch of {len(batch)} failed: {e}")
+            with self._lock:
+                self._stats["failures"] += 1
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
@@ -7,18 +7,42 @@ from datapizza.agents import Agent
 from datapizza.tools import tool
 import os
 import json
-from typing import Dict, Any
+import math
+import re
+import threading
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+from response_cache import get_agent_cache, prompt_version
+from usage_tracker import track_agent_run, count_tool_call, usage_tracker
+from model_router import ModelRouter, ModelTier, DETERMINISTIC_TIER
+from knowledge_index import get_knowledge_index
+
+AGENT_NAME = "guardian_lead_scoring_agent"
+
+# Organization whose knowledge the tools may read during the current agent run.
+# Set by the scoring code from the (already authorized) contact, never by the model.
+_knowledge_organization: ContextVar[Optional[str]] = ContextVar("knowledge_organization", default=None)
+client_model = None
+fast_model = None
 
 # Initialize Google VertexAI client for DataPizza
 try:
     # Try to import VertexAI client first
     from datapizza.clients.vertexai import VertexAIClient
+    from google_credentials import build_vertex_client
     
-    client = VertexAIClient(
-        project_id=os.getenv('GOOGLE_CLOUD_PROJECT', 'crm-ai-471815'),
-        location=os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1'),
-        model='gemini-1.5-pro'
-    )
+    def create_client(model: str):
+        return build_vertex_client(
+            VertexAIClient,
+            project_id=os.getenv('GOOGLE_CLOUD_PROJECT', 'crm-ai-471815'),
+            location=os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1'),
+            model=model
+        )
+    
+    client = create_client('gemini-1.5-pro')
+    client_model = 'gemini-1.5-pro'
+    fast_model = 'gemini-1.5-flash'
     print("✅ DataPizza VertexAI client initialized successfully")
     
 except ImportError as e:
@@ -27,10 +51,16 @@ except ImportError as e:
         from datapizza.clients.openai import OpenAIClient
         
         api_key = os.getenv('OPENAI_API_KEY', 'demo-key-for-testing')
-        client = OpenAIClient(
-            api_key=api_key,
-            model='gpt-4'
-        )
+        
+        def create_client(model: str):
+            return OpenAIClient(
+                api_key=api_key,
+                model=model
+            )
+        
+        client = create_client('gpt-4')
+        client_model = 'gpt-4'
+        fast_model = 'gpt-4o-mini'
         print("✅ DataPizza OpenAI client initialized (fallback)")
     except Exception as e2:
         print(f"⚠️ DataPizza client initialization failed: {e2}")
@@ -55,6 +85,8 @@ def get_contact_history(email: str) -> Dict[str, Any]:
     Returns:
         Dictionary with interaction statistics
     """
+    count_tool_call("get_contact_history")
+    
     # Mock implementation for MVP - in production, query Supabase
     # TODO: Integrate with actual Supabase queries
     
@@ -94,6 +126,8 @@ def get_company_info(company_name: str) -> Dict[str, Any]:
     Returns:
         Dictionary with company details
     """
+    count_tool_call("get_company_info")
+    
     # Mock implementation - in production, integrate with company APIs
     # TODO: Add LinkedIn API, Clearbit, or similar integrations
     
@@ -149,6 +183,8 @@ def analyze_email_quality(email: str) -> Dict[str, Any]:
     Returns:
         Dictionary with email quality metrics
     """
+    count_tool_call("analyze_email_quality")
+    
     if not email or '@' not in email:
         return {
             "quality_score": 0,
@@ -187,13 +223,34 @@ def analyze_email_quality(email: str) -> Dict[str, Any]:
             "domain_reputation": "good" 
         }
 
-# Create Lead Scoring Agent
-if client:
-    lead_scorer = Agent(
-        name="guardian_lead_scoring_agent",
-        client=client,
-        tools=[get_contact_history, get_company_info, analyze_email_quality],
-        system_prompt="""
+@tool
+def search_company_knowledge(query: str, top_k: int = 3) -> Dict[str, Any]:
+    """
+    Search the agency's own knowledge base (products, specializations, target clients)
+    for passages relevant to a lead.
+    
+    Args:
+        query: What to look for, e.g. the contact's company sector or needs
+        top_k: Number of passages to return (max 5)
+        
+    Returns:
+        Dictionary with the most relevant passages and their sources
+    """
+    count_tool_call("search_company_knowledge")
+    
+    organization_id = _knowledge_organization.get()
+    if not organization_id:
+        return {"passages": [], "note": "No organization given"}
+    result = get_knowledge_index().search(organization_id, query, top_k=max(1, min(top_k, 5)))
+    return {
+        "passages": [
+            {"source": passage["source_name"], "text": passage["text"], "score": passage["score"]}
+            for passage in result["passages"]
+        ]
+    }
+
+# System prompt shared by the agent and the response cache version
+LEAD_SCORING_SYSTEM_PROMPT = """
 You are an expert lead scoring agent for Guardian AI CRM system.
 
 Your task: Analyze contact information and interaction history to assign a lead score (0-100).
@@ -208,6 +265,8 @@ Use the available tools to gather context:
 1. analyze_email_quality() - Check email domain and business indicators
 2. get_company_info() - Research company size, industry, revenue
 3. get_contact_history() - Review past interactions and engagement
+4. search_company_knowledge() - When an organization is given, check the agency's own
+   products and target clients to judge fit (quote passages, never whole documents)
 
 Return ONLY a JSON response with this exact structure:
 {
@@ -227,48 +286,183 @@ Categories:
 - "hot": score 80-100 (high priority, likely to convert)
 - "warm": score 50-79 (medium priority, needs nurturing)  
 - "cold": score 0-49 (low priority, long-term prospect)
-        """
+"""
+LEAD_SCORING_PROMPT_VERSION = prompt_version(LEAD_SCORING_SYSTEM_PROMPT)
+
+# Create Lead Scoring Agent
+if client:
+    lead_scorer = Agent(
+        name=AGENT_NAME,
+        client=client,
+        tools=[get_contact_history, get_company_info, analyze_email_quality, search_company_knowledge],
+        system_prompt=LEAD_SCORING_SYSTEM_PROMPT
     )
+    
+    agent_cache = get_agent_cache()
+    if agent_cache:
+        agent_cache.invalidate_stale(AGENT_NAME, LEAD_SCORING_PROMPT_VERSION)
+    
+    # Best quality first; the router falls back down the list to meet latency budgets
+    model_router = ModelRouter([
+        ModelTier(client_model, prior_latency_ms=float(os.getenv('LEAD_SCORING_PRO_PRIOR_MS', '6000'))),
+        ModelTier(fast_model, prior_latency_ms=float(os.getenv('LEAD_SCORING_FAST_PRIOR_MS', '1500'))),
+        ModelTier(DETERMINISTIC_TIER, prior_latency_ms=1, deterministic=True)
+    ])
 else:
     print("⚠️ DataPizza agent not initialized - using fallback mode")
     lead_scorer = None
+    agent_cache = None
+    model_router = ModelRouter([ModelTier(DETERMINISTIC_TIER, prior_latency_ms=1, deterministic=True)])
 
-def score_lead(contact_data: Dict[str, Any]) -> Dict[str, Any]:
+_lead_scorers = {client_model: lead_scorer} if lead_scorer else {}
+_lead_scorers_lock = threading.Lock()
+
+def get_lead_scorer(model: Optional[str] = None):
     """
-    Score a lead using the DataPizza agent.
+    Get the lead scoring agent for a model, creating it on first use.
     
     Args:
-        contact_data: Dict with name, email, company, phone, etc.
+        model: Model name, or None for the default (highest quality) model
         
     Returns:
-        Dict with score, category, reasoning, and metadata
+        DataPizza Agent, or None if no client is available
     """
     if not lead_scorer:
-        # Fallback scoring when DataPizza unavailable
-        print("🔄 Using fallback scoring - DataPizza agent unavailable")
-        return fallback_scoring(contact_data)
+        return None
+    model = model or client_model
     
-    try:
-        prompt = f"""
+    scorer = _lead_scorers.get(model)
+    if scorer:
+        return scorer
+    
+    with _lead_scorers_lock:
+        if model not in _lead_scorers:
+            try:
+                _lead_scorers[model] = Agent(
+                    name=AGENT_NAME,
+                    client=create_client(model),
+                    tools=[get_contact_history, get_company_info, analyze_email_quality, search_company_knowledge],
+                    system_prompt=LEAD_SCORING_SYSTEM_PROMPT
+                )
+                print(f"✅ Lead scoring agent initialized for model {model}")
+            except Exception as e:
+                print(f"⚠️ Could not initialize lead scoring agent for {model}: {e}")
+                return None
+        return _lead_scorers[model]
+
+def _cache_key(prompt: str, model: str) -> str:
+    return agent_cache.make_key(AGENT_NAME, model, LEAD_SCORING_PROMPT_VERSION, prompt)
+
+def _build_contact_prompt(contact_data: Dict[str, Any]) -> str:
+    return f"""
 Analyze this contact and provide a lead score:
 
 Name: {contact_data.get('name', 'Unknown')}
 Email: {contact_data.get('email', '')}
 Company: {contact_data.get('company', 'Not specified')}
 Phone: {contact_data.get('phone', 'N/A')}
+Organization: {contact_data.get('organization_id') or 'N/A'}
 
 Use the available tools to get additional context, then provide your scoring analysis.
 Remember to return ONLY the JSON response format specified in your instructions.
         """
+
+SCORE_KEYS = ("score", "category", "reasoning", "breakdown", "confidence")
+
+def _validated_score(parsed: Any) -> Optional[Dict[str, Any]]:
+    """
+    Check an agent scoring object and clamp it to the response ranges.
+    
+    Args:
+        parsed: Parsed JSON object for one contact
+        
+    Returns:
+        The object with an integer score in 0-100, confidence in 0-1 and integer
+        breakdown values, or None when a field is missing or not numeric
+    """
+    if not isinstance(parsed, dict) or not all(key in parsed for key in SCORE_KEYS):
+        return None
+    if not isinstance(parsed["breakdown"], dict):
+        return None
+    try:
+        score = round(float(parsed["score"]))
+        confidence = float(parsed["confidence"])
+        breakdown = {str(key): round(float(value)) for key, value in parsed["breakdown"].items()}
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if math.isnan(confidence):
+        return None
+    parsed.update({
+        "score": min(100, max(0, score)),
+        "confidence": min(1.0, max(0.0, confidence)),
+        "breakdown": breakdown,
+        "category": str(parsed["category"]),
+        "reasoning": str(parsed["reasoning"])
+    })
+    return parsed
+
+def _with_agent_metadata(parsed_response: Dict[str, Any], model: str) -> Dict[str, Any]:
+    parsed_response.update({
+        "agent_used": "datapizza_openai_mvp",
+        "tools_available": ["get_contact_history", "get_company_info", "analyze_email_quality", "search_company_knowledge"],
+        "processing_time_ms": 0,  # TODO: Add timing
+        "model_used": model
+    })
+    return parsed_response
+
+def _run_lead_scorer(scorer, prompt: str, model: str, batch: bool = False, organization_id: Optional[str] = None):
+    # Batch wall time is not a per-call latency: batches only feed the error rate
+    knowledge_token = _knowledge_organization.set(organization_id)
+    with track_agent_run(AGENT_NAME, model) as run:
+        try:
+            response = scorer.run(prompt)
+        except Exception:
+            model_router.record(model, None, success=False)
+            raise
+        finally:
+            _knowledge_organization.reset(knowledge_token)
+        run.set_response(response, LEAD_SCORING_SYSTEM_PROMPT, prompt)
+    model_router.record(model, None if batch else run.wall_time_ms)
+    return response
+
+def score_lead(contact_data: Dict[str, Any], model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Score a lead using the DataPizza agent.
+    
+    Args:
+        contact_data: Dict with name, email, company, phone, etc.
+        model: Model tier chosen by the router (None for the default model)
+        
+    Returns:
+        Dict with score, category, reasoning, and metadata
+    """
+    model = model or client_model
+    if model == DETERMINISTIC_TIER:
+        return fallback_scoring(contact_data)
+    
+    scorer = get_lead_scorer(model)
+    if not scorer:
+        # Fallback scoring when DataPizza unavailable
+        print("🔄 Using fallback scoring - DataPizza agent unavailable")
+        return fallback_scoring(contact_data)
+    
+    try:
+        prompt = _build_contact_prompt(contact_data)
+        
+        cache_key = _cache_key(prompt, model) if agent_cache else None
+        if cache_key:
+            cached_response = _validated_score(agent_cache.get(cache_key))
+            if cached_response is not None:
+                usage_tracker.record_cache_hit(AGENT_NAME, model)
+                return _with_agent_metadata(cached_response, model)
         
         print(f"🤖 DataPizza agent analyzing: {contact_data.get('name', 'Unknown')}")
-        response = lead_scorer.run(prompt)
+        response = _run_lead_scorer(scorer, prompt, model, organization_id=contact_data.get('organization_id'))
         
         # Parse JSON response from agent
         try:
             if isinstance(response, str):
                 # Extract JSON from response text
-                import re
                 json_match = re.search(r'\{.*\}', response, re.DOTALL)
                 if json_match:
                     json_str = json_match.group()
@@ -277,16 +471,17 @@ Remember to return ONLY the JSON response format specified in your instructions.
                     raise ValueError("No JSON found in response")
             else:
                 parsed_response = response
+            
+            # Only a complete, in-range answer is worth persisting
+            parsed_response = _validated_score(parsed_response)
+            if parsed_response is None:
+                raise ValueError("Agent response is missing scoring fields")
+            
+            if cache_key:
+                agent_cache.put(cache_key, AGENT_NAME, model, LEAD_SCORING_PROMPT_VERSION, parsed_response)
                 
             # Add metadata
-            parsed_response.update({
-                "agent_used": "datapizza_openai_mvp",
-                "tools_available": ["get_contact_history", "get_company_info", "analyze_email_quality"],
-                "processing_time_ms": 0,  # TODO: Add timing
-                "model_used": "gpt-4"
-            })
-            
-            return parsed_response
+            return _with_agent_metadata(parsed_response, model)
             
         except (json.JSONDecodeError, ValueError) as e:
             print(f"⚠️ Failed to parse agent response as JSON: {e}")
@@ -297,6 +492,128 @@ Remember to return ONLY the JSON response format specified in your instructions.
         print(f"❌ DataPizza agent error: {e}")
         return fallback_scoring(contact_data)
 
+def score_leads_batch(contacts: List[Dict[str, Any]], model: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Score several leads with a single DataPizza agent run.
+    
+    The contacts are numbered inside one prompt and the agent is asked for a
+    JSON array, so the system prompt and round-trip are paid once per batch
+    instead of once per contact. Contacts already in the response cache are
+    answered from it, out-of-range scores are clamped (see _validated_score)
+    and any contact whose entry is missing or malformed is re-scored
+    individually via score_lead().
+    
+    Args:
+        contacts: List of dicts with name, email, company, phone, etc.
+        model: Model tier chosen by the router (None for the default model)
+        
+    Returns:
+        List of scoring dicts, in the same order as the input contacts
+    """
+    if not contacts:
+        return []
+    
+    model = model or client_model
+    if model == DETERMINISTIC_TIER:
+        return [fallback_scoring(contact) for contact in contacts]
+    
+    if len(contacts) == 1:
+        return [score_lead(contacts[0], model)]
+    
+    scorer = get_lead_scorer(model)
+    if not scorer:
+        print(f"🔄 Using fallback scoring for batch of {len(contacts)} - DataPizza agent unavailable")
+        return [fallback_scoring(contact) for contact in contacts]
+    
+    results: List[Any] = [None] * len(contacts)
+    
+    # Per-contact cache keys, so batched and single calls share entries
+    cache_keys: List[Any] = [None] * len(contacts)
+    if agent_cache:
+        for index, contact_data in enumerate(contacts):
+            cache_keys[index] = _cache_key(_build_contact_prompt(contact_data), model)
+            cached_response = _validated_score(agent_cache.get(cache_keys[index]))
+            if cached_response is not None:
+                usage_tracker.record_cache_hit(AGENT_NAME, model)
+                results[index] = _with_agent_metadata(cached_response, model)
+    
+    pending = [index for index, result in enumerate(results) if result is None]
+    if len(pending) < 2:
+        for index in pending:
+            results[index] = score_lead(contacts[index], model)
+        return results
+    
+    contact_lines = []
+    for number, index in enumerate(pending):
+        contact_data = contacts[index]
+        contact_lines.append(
+            f"[{number}] Name: {contact_data.get('name', 'Unknown')} | "
+            f"Email: {contact_data.get('email', '')} | "
+            f"Company: {contact_data.get('company', 'Not specified')} | "
+            f"Phone: {contact_data.get('phone', 'N/A')} | "
+            f"Organization: {contact_data.get('organization_id') or 'N/A'}"
+        )
+    
+    prompt = f"""
+Analyze these {len(pending)} contacts and provide a lead score for each one:
+
+{chr(10).join(contact_lines)}
+
+Use the available tools to get additional context, then provide your scoring analysis.
+Return ONLY a JSON array with one object per contact, in the JSON format specified
+in your instructions plus an "id" field holding the contact number shown in brackets.
+    """
+    
+    try:
+        print(f"🤖 DataPizza agent analyzing batch of {len(pending)} contacts")
+        # Knowledge is only searchable when the whole batch belongs to one organization
+        organizations = {contacts[index].get('organization_id') for index in pending}
+        response = _run_lead_scorer(
+            scorer, prompt, model, batch=True,
+            organization_id=organizations.pop() if len(organizations) == 1 else None
+        )
+        
+        if isinstance(response, str):
+            json_match = re.search(r'\[.*\]', response, re.DOTALL)
+            if not json_match:
+                raise ValueError("No JSON array found in response")
+            parsed_items = json.loads(json_match.group())
+        else:
+            parsed_items = response
+        
+        if not isinstance(parsed_items, list):
+            raise ValueError("Batch response is not a JSON array")
+        
+        for position, item in enumerate(parsed_items):
+            if not isinstance(item, dict):
+                continue
+            number = item.pop("id", position)
+            try:
+                number = int(number)
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= number < len(pending):
+                continue
+            index = pending[number]
+            if results[index] is not None:
+                continue
+            item = _validated_score(item)
+            if item is None:
+                continue
+            if cache_keys[index]:
+                agent_cache.put(cache_keys[index], AGENT_NAME, model, LEAD_SCORING_PROMPT_VERSION, item)
+            results[index] = _with_agent_metadata(item, model)
+            
+    except Exception as e:
+        print(f"⚠️ Batch scoring failed, scoring contacts individually: {e}")
+    
+    # Anything the batch run could not answer goes through the single-contact path
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = score_lead(contacts[index], model)
+    
+    return results
+
 def fallback_scoring(contact_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Fallback scoring algorithm when DataPizza is unavailable.
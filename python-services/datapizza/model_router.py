@@ -0,0 +1,164 @@
+"""
+Latency-Budget Model Router
+Picks the best model tier that fits a request's latency budget, based on observed latencies
+"""
+
+import math
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+DETERMINISTIC_TIER = "fallback_algorithm"
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    """
+    One routable model.
+
+    Tiers are tried in list order (best quality first). prior_latency_ms is
+    the assumed latency until enough real samples have been observed.
+    """
+    name: str
+    prior_latency_ms: float
+    deterministic: bool = False
+
+
+class ModelRouter:
+    """
+    Routes each request to the highest-quality tier whose observed latency
+    percentile fits inside the request's budget.
+
+    Latencies are kept in a sliding window per model. A model that
+    keeps failing is benched for a cooldown period, and the deterministic
+    tier is always the last resort because it needs no model call at all.
+    """
+
+    def __init__(
+        self,
+        tiers: List[ModelTier],
+        percentile: float = 0.9,
+        window: int = 200,
+        min_samples: int = 5,
+        max_error_rate: float = 0.5,
+        cooldown_s: float = 30.0
+    ):
+        if not any(tier.deterministic for tier in tiers):
+            tiers = list(tiers) + [ModelTier(DETERMINISTIC_TIER, prior_latency_ms=1, deterministic=True)]
+        self.tiers = tiers
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown_s = cooldown_s
+
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, deque] = {tier.name: deque(maxlen=window) for tier in tiers}
+        self._outcomes: Dict[str, deque] = {tier.name: deque(maxlen=20) for tier in tiers}
+        self._routed: Dict[str, int] = {tier.name: 0 for tier in tiers}
+        self._benched_until: Dict[str, float] = {tier.name: 0.0 for tier in tiers}
+
+    @property
+    def default_tier(self) -> ModelTier:
+        return self.tiers[0]
+
+    def choose(self, budget_ms: Optional[float] = None) -> ModelTier:
+        """
+        Pick a tier for a request.
+
+        Args:
+            budget_ms: Latency budget in milliseconds, or None for best quality
+
+        Returns:
+            The selected ModelTier
+        """
+        now = time.monotonic()
+        with self._lock:
+            selected = None
+            for tier in self.tiers:
+                if tier.deterministic:
+                    selected = tier
+                    break
+                if self._benched_until[tier.name] > now:
+                    continue
+                if budget_ms is None or self._estimate(tier) <= budget_ms:
+                    selected = tier
+                    break
+            if selected is None:
+                selected = self.tiers[-1]
+            self._routed[selected.name] += 1
+            return selected
+
+    def record(self, model: str, latency_ms: Optional[float], success: bool = True):
+        """Feed an observed model latency back into the router (None records only the outcome)."""
+        with self._lock:
+            if model not in self._latencies:
+                return
+            if success and latency_ms is not None:
+                self._latencies[model].append(latency_ms)
+            self._outcomes[model].append(success)
+            if self._error_rate(model) > self.max_error_rate:
+                print(f"⚠️ Model {model} failing, benched for {self.cooldown_s:.0f}s")
+                self._benched_until[model] = time.monotonic() + self.cooldown_s
+                self._outcomes[model].clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-tier latency estimates, sample counts and routing counts."""
+        now = time.monotonic()
+        with self._lock:
+            tiers = []
+            for tier in self.tiers:
+                samples = sorted(self._latencies[tier.name])
+                tiers.append({
+                    "model": tier.name,
+                    "deterministic": tier.deterministic,
+                    "samples": len(samples),
+                    "p50_ms": round(_percentile(samples, 0.5), 1) if samples else None,
+                    "p90_ms": round(_percentile(samples, 0.9), 1) if samples else None,
+                    "estimated_ms": round(self._estimate(tier), 1),
+                    "error_rate": round(self._error_rate(tier.name), 3),
+                    "benched": self._benched_until[tier.name] > now,
+                    "routed_requests": self._routed[tier.name]
+                })
+        return {"percentile": self.percentile, "tiers": tiers}
+
+    def _estimate(self, tier: ModelTier) -> float:
+        samples = self._latencies[tier.name]
+        if len(samples) < self.min_samples:
+            # Blend the prior with what little we have seen so far
+            observed = list(samples)
+            weight = len(observed) / self.min_samples
+            if not observed:
+                return tier.prior_latency_ms
+            return (1 - weight) * tier.prior_latency_ms + weight * _percentile(sorted(observed), self.percentile)
+        return _percentile(sorted(samples), self.percentile)
+
+    def _error_rate(self, model: str) -> float:
+        outcomes = self._outcomes[model]
+        if len(outcomes) < self.min_samples:
+            return 0.0
+        return 1 - sum(outcomes) / len(outcomes)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def parse_latency_budget(value: Optional[str]) -> Optional[float]:
+    """
+    Parse an X-Latency-Budget-Ms header value.
+
+    Returns:
+        Budget in milliseconds, or None when absent or malformed
+    """
+    if not value:
+        return None
+    try:
+        budget = float(value)
+    except ValueError:
+        return None
+    return budget if budget > 0 else None
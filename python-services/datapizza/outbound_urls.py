@@ -0,0 +1,56 @@
+"""
+Outbound URL Policy
+Allowlist check for URLs the service fetches or posts to on a caller's behalf
+"""
+
+import os
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+from typing import Iterable, List, Optional
+
+
+def allowed_hosts_from_env(name: str) -> List[str]:
+    """Comma-separated host allowlist from an environment variable (empty allows nothing)."""
+    return [host.strip().lower() for host in os.getenv(name, '').split(',') if host.strip()]
+
+
+def check_outbound_url(url: str, allowed_hosts: Iterable[str]) -> str:
+    """
+    Validate a caller-supplied URL before the server contacts it.
+
+    Only https URLs on an allowlisted host (exact match, or a subdomain of
+    an entry written as ".example.com") without credentials or a custom
+    port pass.
+
+    Raises:
+        ValueError: If the URL is not allowed
+    """
+    parts = urlsplit(url or "")
+    if parts.scheme != "https":
+        raise ValueError("Only https URLs are allowed")
+    host = (parts.hostname or "").lower()
+    if not host or parts.username or parts.password or parts.port not in (None, 443):
+        raise ValueError("URL host is not allowed")
+    for allowed in allowed_hosts:
+        if host == allowed or (allowed.startswith(".") and host.endswith(allowed)):
+            return url
+    raise ValueError(f"Host {host} is not in the allowlist")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        raise urllib.error.HTTPError(req.full_url, code, "Redirects are not followed", headers, fp)
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def open_checked(request: urllib.request.Request, allowed_hosts: Iterable[str], timeout_s: float = 10.0, max_bytes: Optional[int] = None) -> bytes:
+    """Send a request to an allowlisted URL without following redirects; returns the body."""
+    check_outbound_url(request.full_url, allowed_hosts)
+    with _opener.open(request, timeout=timeout_s) as response:
+        body = response.read(max_bytes + 1 if max_bytes else -1)
+    if max_bytes and len(body) > max_bytes:
+        raise ValueError(f"Response larger than {max_bytes} bytes")
+    return body
@@ -0,0 +1,448 @@
+"""
+Policy Renewal Engine
+Vectorized expiry bucketing and batched Italian renewal reminders for insurance policies
+"""
+
+import os
+import time
+import uuid
+import html
+import threading
+from collections import deque
+from datetime import date
+from string import Formatter
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+
+# Bucket codes, in order; thresholds match the reminder email colours
+BUCKETS = ("expired", "critical", "upcoming", "future")
+CRITICAL_DAYS = 7
+UPCOMING_DAYS = 30
+URGENCY_COLORS = {"expired": "#EF4444", "critical": "#EF4444", "upcoming": "#F59E0B", "future": "#3B82F6"}
+
+# Reminder offsets and how long a previous email blocks each one
+# (mirrors get_policies_needing_notification in 20251020_renewal_settings.sql)
+REMINDER_COOLDOWN_DAYS = {7: 0, 30: 23, 60: 53, 90: 83}
+REMINDER_OFFSETS = tuple(REMINDER_COOLDOWN_DAYS)
+
+# renewal_settings column defaults, used for columns a settings row leaves out.
+# Organizations without a row get no reminders (the SQL inner-joins renewal_settings).
+DEFAULT_RENEWAL_SETTINGS = {
+    "reminder_7_days": True,
+    "reminder_30_days": True,
+    "reminder_60_days": True,
+    "reminder_90_days": False,
+    "email_enabled": True,
+    "notification_email": None
+}
+
+# Resend accepts at most 100 emails per /emails/batch call
+PROVIDER_BATCH_SIZE = 100
+SENDER = "Guardian AI CRM <noreply@guardianai.it>"
+DEFAULT_APP_URL = "https://crm-ai-rho.vercel.app"
+
+ITALIAN_MONTHS = (
+    "gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno",
+    "luglio", "agosto", "settembre", "ottobre", "novembre", "dicembre"
+)
+
+REMINDER_SUBJECT = "🔔 Promemoria: Polizza {policy_number} in scadenza tra {days} giorni"
+
+REMINDER_HTML = """<!DOCTYPE html>
+<html lang="it">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>Promemoria Rinnovo Polizza</title>
+</head>
+<body style="font-family: Arial, sans-serif; background-color: #F3F4F6; padding: 20px;">
+  <div style="max-width: 600px; margin: 0 auto; background-color: white; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
+    <div style="background-color: {color}; color: white; padding: 20px; border-radius: 8px 8px 0 0;">
+      <h1 style="margin: 0; font-size: 24px;">🔔 Promemoria Rinnovo Polizza</h1>
+    </div>
+    <div style="padding: 30px;">
+      <p style="font-size: 16px; color: #374151; margin-bottom: 20px;">
+        Gentile <strong>{contact_name}</strong>,
+      </p>
+      <p style="font-size: 16px; color: #374151; line-height: 1.6;">
+        Ti informiamo che la tua polizza assicurativa <strong>{policy_number}</strong>
+        è in scadenza tra <strong style="color: {color};">{days} giorni</strong>.
+      </p>
+      <div style="background-color: #F9FAFB; border-left: 4px solid {color}; padding: 15px; margin: 20px 0; border-radius: 4px;">
+        <p style="margin: 5px 0; color: #6B7280;"><strong>Numero Polizza:</strong> {policy_number}</p>
+        <p style="margin: 5px 0; color: #6B7280;"><strong>Data Scadenza:</strong> {expiry_date}</p>
+        <p style="margin: 5px 0; color: #6B7280;"><strong>Giorni Rimanenti:</strong> {days}</p>
+      </div>
+      <p style="font-size: 16px; color: #374151; line-height: 1.6;">
+        Per evitare interruzioni nella copertura assicurativa, ti consigliamo di
+        contattarci quanto prima per procedere con il rinnovo.
+      </p>
+      <div style="text-align: center; margin: 30px 0;">
+        <a href="{policy_url}"
+           style="display: inline-block; background-color: {color}; color: white; padding: 12px 30px;
+                  text-decoration: none; border-radius: 6px; font-weight: bold; font-size: 16px;">
+          Visualizza Polizza
+        </a>
+      </div>
+      <p style="font-size: 14px; color: #9CA3AF; line-height: 1.6; margin-top: 20px;">
+        Se hai già provveduto al rinnovo, puoi ignorare questa email.
+      </p>
+    </div>
+    <div style="background-color: #F9FAFB; padding: 20px; border-radius: 0 0 8px 8px; text-align: center;">
+      <p style="font-size: 12px; color: #6B7280; margin: 5px 0;">Guardian AI CRM - Sistema di Gestione Assicurazioni</p>
+      <p style="font-size: 12px; color: #9CA3AF; margin: 5px 0;">Questa è una email automatica. Non rispondere a questo messaggio.</p>
+    </div>
+  </div>
+</body>
+</html>
+"""
+
+
+class CompiledTemplate:
+    """
+    A "{field}" template parsed once into literal chunks and field names.
+
+    bind() folds constant fields (the urgency colour) into the literals ahead
+    of time, so rendering a message is a single join over the per-policy
+    values.
+    """
+
+    def __init__(self, source: str):
+        self.literals: List[str] = [""]
+        self.fields: List[str] = []
+        for literal, field, _, _ in Formatter().parse(source):
+            self.literals[-1] += literal
+            if field is not None:
+                self.fields.append(field)
+                self.literals.append("")
+
+    def bind(self, **constants: str) -> "CompiledTemplate":
+        bound = CompiledTemplate("")
+        bound.literals = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            if field in constants:
+                bound.literals[-1] += constants[field] + literal
+            else:
+                bound.fields.append(field)
+                bound.literals.append(literal)
+        return bound
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            parts.append(values[field])
+            parts.append(literal)
+        return "".join(parts)
+
+
+class LocalEmailProvider:
+    """In-memory stand-in for the Resend batch API (at most batch_size emails per call)."""
+
+    def __init__(self, batch_size: int = PROVIDER_BATCH_SIZE, max_messages: int = 1000):
+        self.batch_size = batch_size
+        self.messages: deque = deque(maxlen=max_messages)
+        self.sent = 0
+        self.batches = 0
+
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[str]:
+        if len(messages) > self.batch_size:
+            raise ValueError(f"Batch of {len(messages)} exceeds provider limit of {self.batch_size}")
+        ids = [str(uuid.uuid4()) for _ in messages]
+        for message_id, message in zip(ids, messages):
+            self.messages.append({"id": message_id, **message})
+        self.sent += len(messages)
+        self.batches += 1
+        return ids
+
+
+def format_italian_date(day: np.datetime64) -> str:
+    """'2025-11-07' -> '07 novembre 2025' (it-IT, day 2-digit, month long)."""
+    value = day.item()
+    return f"{value.day:02d} {ITALIAN_MONTHS[value.month - 1]} {value.year}"
+
+
+def _to_day(value: Any) -> str:
+    """ISO date or timestamp (str, date, datetime) -> 'YYYY-MM-DD', 'NaT' when missing."""
+    if value is None or value == "":
+        return "NaT"
+    return value.isoformat()[:10] if isinstance(value, date) else str(value)[:10]
+
+
+def _day_column(values: List[str]) -> np.ndarray:
+    """Parse ISO days into a datetime64[D] column; unparseable values become NaT one by one."""
+    try:
+        return np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        pass
+    column = np.empty(len(values), dtype="datetime64[D]")
+    for index, value in enumerate(values):
+        try:
+            column[index] = np.datetime64(value, "D")
+        except ValueError:
+            column[index] = np.datetime64("NaT")
+    return column
+
+
+def _as_day(today: Optional[Union[str, date, np.datetime64]]) -> np.datetime64:
+    if today is None:
+        return np.datetime64(date.today(), "D")
+    return np.datetime64(_to_day(today) if not isinstance(today, np.datetime64) else today, "D")
+
+
+def policy_columns(policies: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Convert policy rows into column arrays.
+
+    Rows use the insurance_policies / get_policies_needing_notification
+    field names: policy_id (or id), expiration_date (or end_date),
+    last_renewal_email_sent, organization_id and status (rows without one
+    are treated as active). Dates that cannot be parsed become NaT and are
+    flagged in "invalid_dates".
+    """
+    organizations: Dict[Any, int] = {}
+    expiration_days = [_to_day(p.get("expiration_date", p.get("end_date"))) for p in policies]
+    last_sent_days = [_to_day(p.get("last_renewal_email_sent")) for p in policies]
+    expiration, last_sent = _day_column(expiration_days), _day_column(last_sent_days)
+    given = lambda days: np.array([day != "NaT" for day in days], dtype=bool)
+    return {
+        "expiration": expiration,
+        "last_sent": last_sent,
+        "invalid_dates": (np.isnat(expiration) & given(expiration_days)) | (np.isnat(last_sent) & given(last_sent_days)),
+        "active": np.array([p.get("status", "active") == "active" for p in policies], dtype=bool),
+        "organization": np.array(
+            [organizations.setdefault(p.get("organization_id"), len(organizations)) for p in policies], dtype=np.int64
+        ),
+        "organizations": np.array(list(organizations), dtype=object)
+    }
+
+
+def expiry_buckets(expiration: np.ndarray, today: np.datetime64) -> Dict[str, np.ndarray]:
+    """
+    Days until expiry and bucket code (index into BUCKETS) for every policy.
+
+    Policies without an expiration date get days -1 and bucket -1.
+    """
+    missing = np.isnat(expiration)
+    days = (expiration - today).astype(np.int64)
+    days[missing] = -1
+    buckets = np.select(
+        [days < 0, days <= CRITICAL_DAYS, days <= UPCOMING_DAYS],
+        [0, 1, 2],
+        default=3
+    )
+    buckets[missing] = -1
+    return {"days": days, "buckets": buckets}
+
+
+class RenewalEngine:
+    """
+    Finds the policies due a renewal reminder and sends them in batches.
+
+    Bucketing and reminder selection run over whole columns: days until
+    expiry is one datetime64 subtraction, the per-organization reminder
+    flags are a (organizations x offsets) lookup table, and the cooldown
+    check against last_renewal_email_sent is one comparison. Only the
+    policies that are due are rendered, one provider batch at a time, from
+    templates precompiled per urgency colour.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[LocalEmailProvider] = None,
+        app_url: Optional[str] = None,
+        sender: str = SENDER
+    ):
+        self.provider = provider or LocalEmailProvider()
+        self.app_url = (app_url or os.getenv("RENEWAL_APP_URL", DEFAULT_APP_URL)).rstrip("/")
+        self.sender = sender
+        self._subject = CompiledTemplate(REMINDER_SUBJECT)
+        self._templates = [
+            CompiledTemplate(REMINDER_HTML).bind(color=URGENCY_COLORS[bucket]) for bucket in BUCKETS
+        ]
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "policies": 0, "due": 0, "sent": 0, "failed": 0, "last_run": None}
+
+    def classify(self, policies: List[Dict[str, Any]], today=None) -> Dict[str, Any]:
+        """Bucket counts for a set of policies (active policies only)."""
+        today = _as_day(today)
+        columns = policy_columns(policies)
+        classified = expiry_buckets(columns["expiration"], today)
+        active = columns["active"]
+        buckets = classified["buckets"][active]
+        counts = np.bincount(buckets[buckets >= 0], minlength=len(BUCKETS))
+        return {
+            "today": str(today),
+            "policies": len(policies),
+            "active": int(active.sum()),
+            "missing_expiration": int((buckets < 0).sum()),
+            "invalid_dates": int(columns["invalid_dates"][active].sum()),
+            "buckets": {bucket: int(count) for bucket, count in zip(BUCKETS, counts)}
+        }
+
+    def due_reminders(
+        self,
+        columns: Dict[str, np.ndarray],
+        days: np.ndarray,
+        today: np.datetime64,
+        settings: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> np.ndarray:
+        """
+        Indices of policies due a reminder today under their organization's
+        renewal settings. Organizations without a settings row and policies
+        with an unparseable date are never due.
+        """
+        organizations = columns["organizations"]
+        enabled = np.zeros((len(organizations), len(REMINDER_OFFSETS)), dtype=bool)
+        for code, organization_id in enumerate(organizations):
+            row = (settings or {}).get(organization_id)
+            if row is None:
+                continue
+            org_settings = {**DEFAULT_RENEWAL_SETTINGS, **row}
+            if org_settings["email_enabled"]:
+                enabled[code] = [bool(org_settings[f"reminder_{offset}_days"]) for offset in REMINDER_OFFSETS]
+
+        # days -> reminder slot (or -1) for 0..max offset
+        slots = np.full(max(REMINDER_OFFSETS) + 1, -1, dtype=np.int64)
+        slots[list(REMINDER_OFFSETS)] = np.arange(len(REMINDER_OFFSETS))
+        in_range = (days > 0) & (days <= max(REMINDER_OFFSETS)) & columns["active"] & ~columns["invalid_dates"]
+        slot = np.where(in_range, slots[np.clip(days, 0, max(REMINDER_OFFSETS))], -1)
+
+        due = slot >= 0
+        due[due] = enabled[columns["organization"][due], slot[due]]
+        cooldowns = np.array([REMINDER_COOLDOWN_DAYS[offset] for offset in REMINDER_OFFSETS], dtype="timedelta64[D]")
+        last_sent = columns["last_sent"]
+        cutoff = today - cooldowns[np.maximum(slot, 0)]
+        due &= np.isnat(last_sent) | (last_sent < cutoff)
+        return np.flatnonzero(due)
+
+    def run(
+        self,
+        policies: List[Dict[str, Any]],
+        settings: Optional[Dict[str, Dict[str, Any]]] = None,
+        today=None,
+        organization_id: Optional[str] = None,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Send today's renewal reminders.
+
+        Args:
+            policies: Policy rows joined with their contact (contact_name, contact_email)
+            settings: organization_id -> renewal_settings row (organizations without one are skipped)
+            today: Reference date (defaults to the current date)
+            organization_id: Only consider this organization's policies
+            dry_run: Select and render, but do not send
+
+        Returns:
+            Bucket counts, reminders due per offset, send results and the
+            last_renewal_email_sent updates to persist
+        """
+        start = time.perf_counter()
+        today = _as_day(today)
+        if organization_id is not None:
+            policies = [p for p in policies if p.get("organization_id") == organization_id]
+
+        columns = policy_columns(policies)
+        classified = expiry_buckets(columns["expiration"], today)
+        days, buckets = classified["days"], classified["buckets"]
+        active_buckets = buckets[columns["active"] & (buckets >= 0)]
+        counts = np.bincount(active_buckets, minlength=len(BUCKETS))
+        due = self.due_reminders(columns, days, today, settings)
+
+        dates = {}
+        sent_ids: List[str] = []
+        updates: List[Dict[str, Any]] = []
+        skipped = failed = batches = 0
+        preview = None
+        sent_at = str(today)
+        batch: List[Dict[str, Any]] = []
+        batch_policies: List[str] = []
+
+        def flush():
+            nonlocal failed, batches
+            if not batch or dry_run:
+                return
+            try:
+                sent_ids.extend(self.provider.send_batch(batch))
+                updates.extend({"policy_id": policy_id, "last_renewal_email_sent": sent_at} for policy_id in batch_policies)
+                batches += 1
+            except Exception as e:
+                print(f"❌ Renewal batch of {len(batch)} failed: {e}")
+                failed += len(batch)
+            batch.clear()
+            batch_policies.clear()
+
+        for index in due.tolist():
+            policy = policies[index]
+            org_settings = (settings or {}).get(policy.get("organization_id")) or {}
+            recipient = org_settings.get("notification_email") or policy.get("contact_email")
+            if not recipient:
+                skipped += 1
+                continue
+            expiry = columns["expiration"][index]
+            if expiry not in dates:
+                dates[expiry] = format_italian_date(expiry)
+            policy_id = str(policy.get("policy_id", policy.get("id")))
+            values = {
+                "contact_name": html.escape(str(policy.get("contact_name") or "Cliente")),
+                "policy_number": html.escape(str(policy.get("policy_number") or "")),
+                "days": str(days[index]),
+                "expiry_date": dates[expiry],
+                "policy_url": f"{self.app_url}/dashboard/assicurazioni/polizze/{policy_id}"
+            }
+            message = {
+                "from": self.sender,
+                "to": [recipient],
+                "subject": self._subject.render({"policy_number": str(policy.get("policy_number") or ""), "days": values["days"]}),
+                "html": self._templates[buckets[index]].render(values)
+            }
+            if preview is None:
+                preview = message
+            batch.append(message)
+            batch_policies.append(policy_id)
+            if len(batch) >= self.provider.batch_size:
+                flush()
+        flush()
+
+        offsets = days[due]
+        result = {
+            "today": str(today),
+            "policies": len(policies),
+            "buckets": {bucket: int(count) for bucket, count in zip(BUCKETS, counts)},
+            "due": int(len(due)),
+            "due_by_offset": {str(offset): int((offsets == offset).sum()) for offset in REMINDER_OFFSETS},
+            "skipped_no_recipient": skipped,
+            "skipped_invalid_date": int((columns["invalid_dates"] & columns["active"]).sum()),
+            "skipped_no_settings": int(np.isin(
+                columns["organization"][columns["active"]],
+                [code for code, organization_id in enumerate(columns["organizations"]) if organization_id not in (settings or {})]
+            ).sum()),
+            "sent": len(sent_ids),
+            "failed": failed,
+            "batches": batches,
+            "dry_run": dry_run,
+            "updates": updates,
+            "preview": preview if dry_run else None,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["policies"] += len(policies)
+            self._stats["due"] += result["due"]
+            self._stats["sent"] += result["sent"]
+            self._stats["failed"] += failed
+            self._stats["last_run"] = {k: result[k] for k in ("today", "policies", "due", "sent", "elapsed_ms")}
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "provider_batch_size": self.provider.batch_size,
+                "provider_batches": self.provider.batches
+            }
+
+
+# Global renewal engine instance
+renewal_engine = RenewalEngine()
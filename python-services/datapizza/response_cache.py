@@ -0,0 +1,263 @@
+"""
+Persistent Agent Response Cache
+SQLite-backed cache for parsed DataPizza agent responses that survives restarts
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / '.cache' / 'agent_responses.sqlite3'
+
+
+def prompt_version(system_prompt: str) -> str:
+    """
+    Short fingerprint of an agent's system prompt.
+
+    Stored alongside every cached entry so that editing a system prompt
+    automatically invalidates the responses produced by the old one.
+    """
+    return hashlib.sha256(system_prompt.strip().encode('utf-8')).hexdigest()[:16]
+
+
+class AgentResponseCache:
+    """
+    Two-level cache: a bounded in-memory LRU in front of a SQLite table.
+
+    Entries are keyed by agent name, model, system prompt version and the
+    hash of the user prompt. The table is capped at max_bytes of payload;
+    when it grows past the cap the least recently used rows are dropped.
+    On startup the most frequently hit rows are preloaded into memory so a
+    fresh deploy starts warm.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        memory_entries: int = 2048,
+        preload_entries: int = 512
+    ):
+        self.path = Path(path or os.getenv('AGENT_CACHE_PATH', DEFAULT_CACHE_PATH))
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._stats = {"hits": 0, "memory_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS agent_responses (
+                cache_key TEXT PRIMARY KEY,
+                agent_name TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_agent_responses_access ON agent_responses (last_access)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_agent_responses_agent ON agent_responses (agent_name, prompt_version)"
+        )
+
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM agent_responses"
+        ).fetchone()[0]
+        self._preload(preload_entries)
+
+    @staticmethod
+    def make_key(agent_name: str, model: str, version: str, prompt: str) -> str:
+        """Build the cache key for one agent invocation."""
+        digest = hashlib.sha256(prompt.strip().encode('utf-8')).hexdigest()
+        return f"{agent_name}:{model}:{version}:{digest}"
+
+    def get(self, cache_key: str) -> Optional[Any]:
+        """
+        Look up a cached response.
+
+        Args:
+            cache_key: Key produced by make_key()
+
+        Returns:
+            The cached parsed response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            if cache_key in self._memory:
+                self._memory.move_to_end(cache_key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                value = self._memory[cache_key]
+                self._touch(cache_key, now)
+                return json.loads(value)
+
+            row = self._conn.execute(
+                "SELECT payload FROM agent_responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._stats["hits"] += 1
+            self._remember(cache_key, row[0])
+            self._touch(cache_key, now)
+            return json.loads(row[0])
+
+    def put(self, cache_key: str, agent_name: str, model: str, version: str, value: Any):
+        """
+        Store a parsed agent response.
+
+        Args:
+            cache_key: Key produced by make_key()
+            agent_name: Agent that produced the response
+            model: Model the agent was running on
+            version: System prompt version (see prompt_version())
+            value: JSON-serializable parsed response
+        """
+        payload = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        size = len(payload.encode('utf-8'))
+        now = time.time()
+
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size_bytes FROM agent_responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO agent_responses
+                    (cache_key, agent_name, model, prompt_version, payload, size_bytes, hit_count, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)
+                """,
+                (cache_key, agent_name, model, version, payload, size, now, now)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._stats["writes"] += 1
+            self._remember(cache_key, payload)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def invalidate_stale(self, agent_name: str, current_version: str) -> int:
+        """
+        Drop every entry of an agent written under a different system prompt.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            freed = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM agent_responses "
+                "WHERE agent_name = ? AND prompt_version != ?",
+                (agent_name, current_version)
+            ).fetchone()
+            if not freed[0]:
+                return 0
+            self._conn.execute(
+                "DELETE FROM agent_responses WHERE agent_name = ? AND prompt_version != ?",
+                (agent_name, current_version)
+            )
+            self._total_bytes -= freed[1]
+            prefix = f"{agent_name}:"
+            for key in [k for k in self._memory if k.startswith(prefix) and f":{current_version}:" not in k]:
+                del self._memory[key]
+
+        print(f"🧹 Invalidated {freed[0]} cached responses for {agent_name} (system prompt changed)")
+        return freed[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and storage usage."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM agent_responses").fetchone()[0]
+            stats["memory_entries"] = len(self._memory)
+            stats["size_bytes"] = self._total_bytes
+            stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _preload(self, limit: int):
+        rows = self._conn.execute(
+            "SELECT cache_key, payload FROM agent_responses ORDER BY hit_count DESC, last_access DESC LIMIT ?",
+            (min(limit, self.memory_entries),)
+        ).fetchall()
+        # Insert coldest first so the hottest keys end up most recently used
+        for cache_key, payload in reversed(rows):
+            self._memory[cache_key] = payload
+        if rows:
+            print(f"✅ Agent response cache warm-started with {len(rows)} entries from {self.path}")
+
+    def _remember(self, cache_key: str, payload: str):
+        self._memory[cache_key] = payload
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _touch(self, cache_key: str, now: float):
+        self._conn.execute(
+            "UPDATE agent_responses SET hit_count = hit_count + 1, last_access = ? WHERE cache_key = ?",
+            (now, cache_key)
+        )
+
+    def _evict(self):
+        # Trim to 90% of the cap so eviction doesn't run on every write
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT cache_key, size_bytes FROM agent_responses ORDER BY last_access ASC"
+        )
+        victims = []
+        for cache_key, size in rows:
+            if self._total_bytes <= target:
+                break
+            victims.append((cache_key,))
+            self._total_bytes -= size
+            self._memory.pop(cache_key, None)
+
+        self._conn.executemany("DELETE FROM agent_responses WHERE cache_key = ?", victims)
+        self._stats["evictions"] += len(victims)
+
+
+_shared_cache = None
+_shared_cache_failed = False
+_shared_cache_lock = threading.Lock()
+
+
+def get_agent_cache() -> Optional[AgentResponseCache]:
+    """
+    Return the process-wide cache, creating it on first use.
+
+    Returns None (caching disabled) when AGENT_CACHE_ENABLED is "false" or
+    the cache file cannot be opened.
+    """
+    global _shared_cache, _shared_cache_failed
+    if _shared_cache_failed or os.getenv('AGENT_CACHE_ENABLED', 'true').lower() == 'false':
+        return None
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = AgentResponseCache(
+                    max_bytes=int(os.getenv('AGENT_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+                    preload_entries=int(os.getenv('AGENT_CACHE_PRELOAD', '512'))
+                )
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠️ Agent response cache unavailable: {e}")
+                _shared_cache_failed = True
+                return None
+        return _shared_cache
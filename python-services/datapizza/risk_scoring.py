@@ -0,0 +1,424 @@
+"""
+Risk Scoring Engine
+Vectorized insurance_risk_profiles scoring over whole portfolios, with what-if re-weighting
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# Categories, in order (index = category code)
+RISK_CATEGORIES = ("low", "medium", "high", "very_high")
+
+# Rule weights per section; columns of each section's factor matrix follow this order
+# (mirrors src/services/riskScoringService.ts)
+DEFAULT_RISK_WEIGHTS = {
+    "health": {"age": 0.25, "bmi": 0.20, "smoking": 0.25, "conditions": 0.20, "activity": 0.05, "alcohol": 0.05},
+    "financial": {"income": 0.35, "assets": 0.30, "debt": 0.25, "stability": 0.05, "homeowner": 0.05},
+    "lifestyle": {"hobbies": 0.40, "travel": 0.30, "driving": 0.30},
+    "total": {"health": 0.4, "financial": 0.3, "lifestyle": 0.3}
+}
+
+# Upper bound (inclusive) of the total risk score for low, medium and high
+DEFAULT_RISK_THRESHOLDS = {"low": 30, "medium": 60, "high": 85}
+
+HIGH_RISK_CONDITIONS = ("diabetes", "heart_disease", "cancer", "stroke", "hypertension", "copd", "kidney_disease")
+HIGH_RISK_HOBBIES = ("skydiving", "base_jumping", "rock_climbing", "motorcycling", "scuba_diving", "mountaineering", "racing")
+HIGH_RISK_DESTINATIONS = ("war_zone", "high_crime_area", "extreme_weather_region")
+
+# Banded rules: (bin edges, factor per band, edge side); "right" puts a value equal to an edge in the upper band
+AGE_BANDS = ([30, 40, 50, 60, 70], [10, 20, 35, 50, 70, 85], "right")
+BMI_BANDS = ([18.5, 25, 30, 35, 40], [30, 10, 25, 50, 70, 90], "right")
+INCOME_BANDS = ([20000, 40000, 60000, 100000], [30, 50, 70, 85, 95], "right")
+ASSET_BANDS = ([10000, 50000, 100000, 250000, 500000], [20, 40, 60, 75, 85, 95], "right")
+DEBT_RATIO_BANDS = ([0.2, 0.4, 0.6, 1.0], [10, 25, 45, 65, 85], "right")
+TRAVEL_BANDS = ([2, 5, 10], [5, 10, 20, 30], "left")
+COMMUTE_BANDS = ([20, 50, 100], [0, 5, 10, 20], "left")
+
+# Categorical rules: value -> factor, with the factor for missing/unknown values
+SMOKING_FACTORS = ({"never": 5, "former": 20, "occasional": 50, "current": 80}, 30)
+ACTIVITY_BONUS = ({"intense": 100, "moderate": 80, "light": 50, "sedentary": 20}, 50)
+ALCOHOL_FACTORS = ({"none": 5, "occasional": 15, "moderate": 35, "heavy": 70}, 20)
+EMPLOYMENT_MODIFIERS = ({"employed": 1.0, "self_employed": 0.85, "retired": 0.9, "student": 0.6, "unemployed": 0.3}, 0.5)
+DRIVING_FACTORS = ({"clean": 10, "minor_violations": 30, "major_violations": 60, "accidents": 80}, 25)
+
+# Portfolios kept for what-if recomputation
+MAX_PORTFOLIOS = 8
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _mapped(profiles: List[Dict[str, Any]], field: str, rule: Tuple[Dict[str, float], float]) -> np.ndarray:
+    mapping, default = rule
+    return np.array([mapping.get(p.get(field), default) for p in profiles], dtype=np.float64)
+
+
+def _banded(values: np.ndarray, rule: Tuple[List[float], List[float], str]) -> np.ndarray:
+    edges, factors, side = rule
+    return np.asarray(factors, dtype=np.float64)[np.searchsorted(np.asarray(edges, dtype=np.float64), values, side=side)]
+
+
+@lru_cache(maxsize=4096)
+def _is_high_risk(name: str, keywords: Tuple[str, ...]) -> bool:
+    """Substring match on the lowercased name, like the TS rules (names repeat across a portfolio)."""
+    name = name.lower()
+    return any(keyword in name for keyword in keywords)
+
+
+def _high_risk_counts(profiles: List[Dict[str, Any]], field: str, keywords: Tuple[str, ...]) -> np.ndarray:
+    """(n, 2) counts of [high-risk, other] entries in a JSONB array column."""
+    counts = []
+    for profile in profiles:
+        entries = profile.get(field) or []
+        if not isinstance(entries, (list, tuple)):
+            # A single value stored outside an array counts as one entry, not one per character
+            entries = [entries]
+        high = sum(
+            1 for entry in entries
+            if _is_high_risk(entry.get("name", "") if isinstance(entry, dict) else str(entry), keywords)
+        )
+        counts.append((high, len(entries) - high))
+    return np.array(counts, dtype=np.float64).reshape(len(profiles), 2)
+
+
+def _condition_counts(profiles: List[Dict[str, Any]]) -> np.ndarray:
+    """(n, 4) counts of preexisting conditions: high-risk controlled/uncontrolled, other controlled/uncontrolled."""
+    counts = []
+    for profile in profiles:
+        row = [0, 0, 0, 0]
+        for condition in profile.get("preexisting_conditions") or ():
+            if isinstance(condition, dict):
+                name, controlled = str(condition.get("name", "")), bool(condition.get("controlled"))
+            else:
+                name, controlled = str(condition), False
+            row[(0 if _is_high_risk(name, HIGH_RISK_CONDITIONS) else 2) + (0 if controlled else 1)] += 1
+        counts.append(row)
+    return np.array(counts, dtype=np.float64).reshape(len(profiles), 4)
+
+
+def risk_factors(profiles: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Rule factors for every profile, one (n, k) matrix per section.
+
+    Columns follow DEFAULT_RISK_WEIGHTS and are already oriented so that
+    higher means safer (risk factors enter as 100 - factor), so a section
+    score is the weighted sum of its columns. Rows use the
+    insurance_risk_profiles columns; a missing bmi is derived from height
+    and weight, missing categories get the rules' default factor.
+    """
+    n = len(profiles)
+
+    height = np.array([_number(p.get("height_cm"), np.nan) for p in profiles], dtype=np.float64)
+    weight = np.array([_number(p.get("weight_kg"), np.nan) for p in profiles], dtype=np.float64)
+    bmi = np.array([_number(p.get("bmi"), np.nan) for p in profiles], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = np.where(np.isnan(bmi), weight / (height / 100) ** 2, bmi)
+    conditions = _condition_counts(profiles)
+    conditions_factor = np.where(
+        conditions.sum(axis=1) == 0, 5.0, np.minimum(90.0, conditions @ np.array([30.0, 60.0, 15.0, 30.0]))
+    )
+    health = np.column_stack([
+        100 - _banded(np.array([_number(p.get("age")) for p in profiles], dtype=np.float64), AGE_BANDS),
+        100 - _banded(bmi, BMI_BANDS),
+        100 - _mapped(profiles, "smoking_status", SMOKING_FACTORS),
+        100 - conditions_factor,
+        _mapped(profiles, "physical_activity_level", ACTIVITY_BONUS),
+        100 - _mapped(profiles, "alcohol_consumption", ALCOHOL_FACTORS)
+    ]) if n else np.zeros((0, 6))
+
+    income = np.array([_number(p.get("annual_income_eur")) for p in profiles], dtype=np.float64)
+    assets = np.array([_number(p.get("total_assets_eur")) for p in profiles], dtype=np.float64)
+    debts = np.array([_number(p.get("total_debts_eur")) for p in profiles], dtype=np.float64)
+    stability = np.array([_number(p.get("employment_stability_years")) for p in profiles], dtype=np.float64)
+    financial = np.column_stack([
+        _banded(income, INCOME_BANDS) * _mapped(profiles, "employment_status", EMPLOYMENT_MODIFIERS),
+        _banded(assets, ASSET_BANDS),
+        100 - _banded(debts / np.maximum(1.0, income), DEBT_RATIO_BANDS),
+        np.minimum(20.0, stability * 2),
+        np.array([10.0 if p.get("homeowner") else 0.0 for p in profiles])
+    ]) if n else np.zeros((0, 5))
+
+    hobbies = _high_risk_counts(profiles, "risky_hobbies", HIGH_RISK_HOBBIES)
+    extreme = np.array([bool(p.get("extreme_sports")) for p in profiles], dtype=bool)
+    hobbies_factor = np.where(
+        (hobbies.sum(axis=1) == 0) & ~extreme, 10.0, np.minimum(90.0, 40.0 * extreme + hobbies @ np.array([20.0, 10.0]))
+    )
+    destinations = _high_risk_counts(profiles, "high_risk_destinations", HIGH_RISK_DESTINATIONS)
+    travel = np.array([_number(p.get("travel_frequency_per_year")) for p in profiles], dtype=np.float64)
+    commute = np.array([_number(p.get("daily_commute_km")) for p in profiles], dtype=np.float64)
+    lifestyle = np.column_stack([
+        100 - hobbies_factor,
+        100 - np.minimum(80.0, _banded(travel, TRAVEL_BANDS) + destinations @ np.array([30.0, 5.0])),
+        100 - np.minimum(90.0, _mapped(profiles, "driving_record", DRIVING_FACTORS) + _banded(commute, COMMUTE_BANDS))
+    ]) if n else np.zeros((0, 3))
+
+    return {"health": health, "financial": financial, "lifestyle": lifestyle}
+
+
+def merge_weights(overrides: Optional[Dict[str, Dict[str, float]]] = None, base: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, Dict[str, float]]:
+    """Weights with overrides applied; unknown sections or rules raise ValueError."""
+    weights = {section: dict(values) for section, values in (base or DEFAULT_RISK_WEIGHTS).items()}
+    for section, values in (overrides or {}).items():
+        if section not in weights:
+            raise ValueError(f"Unknown weight section: {section} (valid: {', '.join(weights)})")
+        for rule, value in values.items():
+            if rule not in weights[section]:
+                raise ValueError(f"Unknown {section} rule: {rule} (valid: {', '.join(weights[section])})")
+            if not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"Weight {section}.{rule} must be a non-negative number")
+            weights[section][rule] = float(value)
+    return weights
+
+
+def merge_thresholds(overrides: Optional[Dict[str, float]] = None, base: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    thresholds = {**(base or DEFAULT_RISK_THRESHOLDS), **(overrides or {})}
+    if set(thresholds) != set(DEFAULT_RISK_THRESHOLDS):
+        raise ValueError(f"Thresholds must be {', '.join(DEFAULT_RISK_THRESHOLDS)}")
+    if not thresholds["low"] <= thresholds["medium"] <= thresholds["high"]:
+        raise ValueError("Thresholds must satisfy low <= medium <= high")
+    return thresholds
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """Round half up to 2 decimals, like Math.round(x * 100) / 100."""
+    return np.floor(values * 100 + 0.5) / 100
+
+
+def score_factors(factors: Dict[str, np.ndarray], weights: Dict[str, Dict[str, float]], thresholds: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """Section scores, total risk score and category codes from precomputed factors."""
+    scores = {}
+    for section in ("health", "financial", "lifestyle"):
+        # Accumulate column by column, in rule order: a matmul may reorder the sum
+        # and move scores sitting on a half cent to the other side of the rounding
+        matrix = factors[section]
+        score = np.zeros(len(matrix))
+        for column, weight in enumerate(weights[section].values()):
+            score += matrix[:, column] * weight
+        scores[section] = np.clip(_round2(score), 0, 100)
+    total = weights["total"]
+    risk = (
+        (100 - scores["health"]) * total["health"]
+        + (100 - scores["financial"]) * total["financial"]
+        + (100 - scores["lifestyle"]) * total["lifestyle"]
+    )
+    scores["total"] = _round2(risk)
+    edges = np.array([thresholds["low"], thresholds["medium"], thresholds["high"]], dtype=np.float64)
+    scores["category"] = np.searchsorted(edges, scores["total"], side="left")
+    return scores
+
+
+class _Portfolio:
+    def __init__(self, profiles: List[Dict[str, Any]]):
+        self.ids = [p.get("id") or p.get("contact_id") for p in profiles]
+        self.contact_ids = [p.get("contact_id") for p in profiles]
+        self.organization_ids = sorted({str(p.get("organization_id")) for p in profiles if p.get("organization_id")})
+        self.stored_category = np.array(
+            [RISK_CATEGORIES.index(p["risk_category"]) if p.get("risk_category") in RISK_CATEGORIES else -1 for p in profiles],
+            dtype=np.int64
+        )
+        self.factors = risk_factors(profiles)
+        self.weights = DEFAULT_RISK_WEIGHTS
+        self.thresholds = DEFAULT_RISK_THRESHOLDS
+        self.baseline: Dict[str, np.ndarray] = {}
+
+
+def _distribution(categories: np.ndarray) -> Dict[str, int]:
+    counts = np.bincount(categories[categories >= 0], minlength=len(RISK_CATEGORIES))
+    return {category: int(count) for category, count in zip(RISK_CATEGORIES, counts)}
+
+
+def _transitions(before: np.ndarray, after: np.ndarray) -> Dict[str, int]:
+    """'from -> to' counts of profiles whose category changed (the history table's category_change format)."""
+    size = len(RISK_CATEGORIES)
+    known = before >= 0
+    matrix = np.bincount(before[known] * size + after[known], minlength=size * size).reshape(size, size)
+    return {
+        f"{RISK_CATEGORIES[i]} -> {RISK_CATEGORIES[j]}": int(matrix[i, j])
+        for i in range(size) for j in range(size) if i != j and matrix[i, j]
+    }
+
+
+class RiskScoringEngine:
+    """
+    Batch risk scoring for insurance_risk_profiles.
+
+    A batch turns the questionnaire rows into per-section factor matrices
+    once; section scores are then weighted column sums, and the total
+    score and category are elementwise. Portfolios are kept (LRU,
+    MAX_PORTFOLIOS) so a what-if run with different weights or category
+    thresholds reuses the factors and only redoes the sums.
+    """
+
+    def __init__(self, max_portfolios: int = MAX_PORTFOLIOS):
+        self.max_portfolios = max_portfolios
+        self._portfolios: "OrderedDict[str, _Portfolio]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "what_ifs": 0, "profiles_scored": 0}
+
+    def _profiles(self, portfolio: _Portfolio, scores: Dict[str, np.ndarray], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        rows = range(len(portfolio.ids)) if limit is None else range(min(limit, len(portfolio.ids)))
+        health, financial, lifestyle, total = (scores[key].tolist() for key in ("health", "financial", "lifestyle", "total"))
+        category = scores["category"].tolist()
+        return [
+            {
+                "id": portfolio.ids[row],
+                "contact_id": portfolio.contact_ids[row],
+                "health_score": health[row],
+                "financial_score": financial[row],
+                "lifestyle_score": lifestyle[row],
+                "total_risk_score": total[row],
+                "risk_category": RISK_CATEGORIES[category[row]]
+            }
+            for row in rows
+        ]
+
+    def _summary(self, scores: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        count = len(scores["total"])
+        average = lambda values: round(float(values.mean()), 2) if count else 0.0
+        return {
+            "total_profiles": count,
+            "categories": _distribution(scores["category"]),
+            "avg_health_score": average(scores["health"]),
+            "avg_financial_score": average(scores["financial"]),
+            "avg_lifestyle_score": average(scores["lifestyle"]),
+            "avg_total_score": average(scores["total"])
+        }
+
+    def score_batch(
+        self,
+        profiles: List[Dict[str, Any]],
+        portfolio_id: Optional[str] = None,
+        weights: Optional[Dict[str, Dict[str, float]]] = None,
+        thresholds: Optional[Dict[str, float]] = None,
+        include_profiles: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Score a portfolio of risk profiles.
+
+        Args:
+            profiles: insurance_risk_profiles rows
+            portfolio_id: Key to keep the portfolio under for what-if runs (generated when missing)
+            weights: Rule weight overrides (see DEFAULT_RISK_WEIGHTS)
+            thresholds: Category threshold overrides (see DEFAULT_RISK_THRESHOLDS)
+            include_profiles: Return per-profile scores (otherwise only the summary)
+
+        Returns:
+            Per-profile scores, category distribution and averages, and how
+            many stored risk_category values the recomputation changes
+        """
+        start = time.perf_counter()
+        weights = merge_weights(weights)
+        thresholds = merge_thresholds(thresholds)
+        portfolio = _Portfolio(profiles)
+        factors_ms = (time.perf_counter() - start) * 1000
+        scores = score_factors(portfolio.factors, weights, thresholds)
+        portfolio.weights, portfolio.thresholds, portfolio.baseline = weights, thresholds, scores
+
+        portfolio_id = portfolio_id or str(uuid.uuid4())
+        with self._lock:
+            self._portfolios[portfolio_id] = portfolio
+            self._portfolios.move_to_end(portfolio_id)
+            while len(self._portfolios) > self.max_portfolios:
+                self._portfolios.popitem(last=False)
+            self._stats["batches"] += 1
+            self._stats["profiles_scored"] += len(profiles)
+
+        stored = portfolio.stored_category >= 0
+        result = {
+            "portfolio_id": portfolio_id,
+            "summary": self._summary(scores),
+            "category_changes": _transitions(portfolio.stored_category, scores["category"]),
+            "changed": int((scores["category"][stored] != portfolio.stored_category[stored]).sum()),
+            "factors_ms": round(factors_ms, 1),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+        if include_profiles:
+            result["profiles"] = self._profiles(portfolio, scores)
+        return result
+
+    def what_if(
+        self,
+        portfolio_id: str,
+        weights: Optional[Dict[str, Dict[str, float]]] = None,
+        thresholds: Optional[Dict[str, float]] = None,
+        include_profiles: bool = False,
+        changed_limit: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Re-score a kept portfolio with different weights or thresholds.
+
+        Overrides apply on top of the weights the portfolio was scored with;
+        the result is compared against that baseline.
+
+        Returns:
+            Summary under the new weights, category transitions versus the
+            baseline, and the first changed_limit profiles whose category moved
+        """
+        start = time.perf_counter()
+        with self._lock:
+            portfolio = self._portfolios.get(portfolio_id)
+            if portfolio is None:
+                raise KeyError(portfolio_id)
+            self._portfolios.move_to_end(portfolio_id)
+            self._stats["what_ifs"] += 1
+        weights = merge_weights(weights, portfolio.weights)
+        thresholds = merge_thresholds(thresholds, portfolio.thresholds)
+        scores = score_factors(portfolio.factors, weights, thresholds)
+
+        baseline = portfolio.baseline
+        moved = np.flatnonzero(scores["category"] != baseline["category"])
+        total_delta = scores["total"] - baseline["total"]
+        changed = [
+            {
+                "id": portfolio.ids[row],
+                "contact_id": portfolio.contact_ids[row],
+                "total_risk_score": float(scores["total"][row]),
+                "score_change": round(float(total_delta[row]), 2),
+                "category_change": f"{RISK_CATEGORIES[baseline['category'][row]]} -> {RISK_CATEGORIES[scores['category'][row]]}"
+            }
+            for row in moved[:changed_limit]
+        ]
+        result = {
+            "portfolio_id": portfolio_id,
+            "weights": weights,
+            "thresholds": thresholds,
+            "summary": self._summary(scores),
+            "baseline_summary": self._summary(baseline),
+            "category_changes": _transitions(baseline["category"], scores["category"]),
+            "changed": int(len(moved)),
+            "changed_profiles": changed,
+            "avg_score_change": round(float(total_delta.mean()), 2) if len(total_delta) else 0.0,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+        if include_profiles:
+            result["profiles"] = self._profiles(portfolio, scores)
+        return result
+
+    def portfolio_organizations(self, portfolio_id: str) -> Optional[List[str]]:
+        with self._lock:
+            portfolio = self._portfolios.get(portfolio_id)
+        return portfolio.organization_ids if portfolio is not None else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "portfolios": len(self._portfolios),
+                "portfolio_profiles": sum(len(portfolio.ids) for portfolio in self._portfolios.values())
+            }
+
+
+# Global risk scoring engine instance
+risk_scoring_engine = RiskScoringEngine()
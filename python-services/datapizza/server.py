@@ -4,63 +4,69 @@ FastAPI server exposing CRM AI agents with Google Cloud VertexAI
 """
 
 import os
-from pathlib import Path
 import json
 
-# Configure Google Cloud credentials for Railway deployment
-def setup_google_cloud_credentials():
-    # For Railway: Check if credentials are passed as environment variable
-    gcp_credentials = os.getenv('GOOGLE_APPLICATION_CREDENTIALS_JSON')
-    
-    if gcp_credentials:
-        # Parse JSON string and save to temporary file
-        try:
-            credentials_data = json.loads(gcp_credentials)
-            credentials_path = '/tmp/google-credentials.json'
-            with open(credentials_path, 'w') as f:
-                json.dump(credentials_data, f)
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = credentials_path
-            print(f"✅ Google Cloud credentials loaded from environment variable")
-            return True
-        except Exception as e:
-            print(f"❌ Error parsing credentials JSON: {e}")
-    
-    # Fallback: Local credentials file (for development)
-    CREDENTIALS_PATH = Path(__file__).parent / 'credentials' / 'service-account-key.json'
-    if CREDENTIALS_PATH.exists():
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = str(CREDENTIALS_PATH)
-        print(f"✅ Google Cloud credentials loaded from: {CREDENTIALS_PATH}")
-        return True
-    
-    print(f"⚠️ WARNING: No Google Cloud credentials found")
-    return False
+# Configure Google Cloud credentials (kept in memory, shared by every agent)
+from google_credentials import get_credentials_provider
 
-# Setup credentials
-setup_google_cloud_credentials()
+credentials_provider = get_credentials_provider()
+if credentials_provider is None:
+    print(f"⚠️ WARNING: No Google Cloud credentials found")
 
 # Set Google Cloud project
 os.environ['GOOGLE_CLOUD_PROJECT'] = os.getenv('GOOGLE_CLOUD_PROJECT', 'crm-ai-471815')
 os.environ['GOOGLE_CLOUD_LOCATION'] = os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import uvicorn
 import time
+import asyncio
 from datetime import datetime
 
+from model_router import ModelRouter, parse_latency_budget
+
 # Import our DataPizza agents (simple local imports)
 try:
-    from lead_scoring_agent import score_lead
+    from lead_scoring_agent import score_lead, score_leads_batch, fallback_scoring, model_router
     print("✅ Lead scoring agent imported successfully")
 except ImportError as e:
     print(f"⚠️ Lead scoring agent import failed: {e}")
     def score_lead(*args, **kwargs):
         return {"error": "Lead scoring agent not available", "score": 0.5}
+    def score_leads_batch(contacts, *args, **kwargs):
+        return [score_lead(contact) for contact in contacts]
+    def fallback_scoring(*args, **kwargs):
+        return score_lead(*args, **kwargs)
+    model_router = ModelRouter([])
+
+from lead_batcher import LeadScoringBatcher
+from outbound_urls import check_outbound_url
+from speculative_scoring import SpeculativeScorer
+from response_cache import get_agent_cache
+from usage_tracker import usage_tracker, usage_scope
+from workflow_engine import WorkflowEngine
+from trigger_index import TriggerIndex, compile_trigger
+from workflow_graph import TRIGGER_TYPES
+from workflow_templates import get_template_library
+from workflow_rules import workflow_rule_engine
+from workflow_stream import sse_event
+from workflow_simulator import simulate_workflow
+from contact_dedupe import ContactDeduplicator, DEFAULT_THRESHOLD
+from contact_normalization import contact_normalizer
+from renewal_engine import renewal_engine
+from commission_rollups import commission_rollups
+from dashboard_kpis import get_dashboard_kpis
+from knowledge_index import get_knowledge_index
+from document_ingestion import get_document_pipeline, close_document_pipeline
+from risk_scoring import risk_scoring_engine
+from auth import JWTAuthMiddleware, create_verifier_from_env, scoped_organization
 
 try:  
-    from automation_generator_agent import generate_workflow
+    from automation_generator_agent import generate_workflow, stream_workflow, edit_workflow
     print("✅ Automation generator agent imported successfully")
 except ImportError as e:
     print(f"⚠️ Automation generator agent import failed: {e}")
@@ -69,6 +75,10 @@ except ImportError as e:
             "nodes": [{"id": "fallback", "type": "input", "data": {"label": "Manual Trigger"}, "position": {"x": 100, "y": 100}}],
             "edges": []
         }
+    def stream_workflow(*args, **kwargs):
+        yield "error", {"success": False, "error": "Automation generator agent not available"}
+    def edit_workflow(*args, **kwargs):
+        return {"success": False, "error": "Automation generator agent not available", "patch": {}}
 
 app = FastAPI(
     title="Guardian CRM DataPizza Agents",
@@ -76,6 +86,79 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Micro-batcher shared by every scoring endpoint
+lead_batcher = LeadScoringBatcher(
+    score_leads_batch,
+    max_batch_size=int(os.getenv('LEAD_BATCH_MAX_SIZE', '16')),
+    max_wait_ms=float(os.getenv('LEAD_BATCH_MAX_WAIT_MS', '20'))
+)
+
+# Speculative scoring: instant fallback now, agent result later
+speculative_scorer = SpeculativeScorer(fallback_scoring, lead_batcher.submit)
+
+# Workflow execution engine; ai_score nodes go through the shared micro-batcher
+workflow_engine = WorkflowEngine(workers=int(os.getenv('WORKFLOW_ENGINE_WORKERS', '64')))
+
+async def ai_score_node_handler(node: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    contact = context.setdefault("contact", {})
+    contact.update(contact_normalizer.normalize_contact(contact))
+    result = await asyncio.wrap_future(lead_batcher.submit(contact))
+    contact["lead_score"] = result.get("score")
+    contact["lead_category"] = result.get("category")
+    return {"score": result.get("score"), "category": result.get("category"), "agent_used": result.get("agent_used")}
+
+workflow_engine.register_handler("ai_score", ai_score_node_handler)
+
+# Active workflows indexed by (organization_id, trigger nodeType) for event dispatch
+trigger_index = TriggerIndex()
+
+# Dashboard KPIs maintained from CRM change events (restored from the last snapshot)
+dashboard_kpis = get_dashboard_kpis()
+
+@app.on_event("startup")
+async def start_workflow_engine():
+    await workflow_engine.start()
+    for workflow in workflow_engine.list_workflows(active_only=True):
+        try:
+            trigger_index.register(workflow["workflow_id"], workflow["organization_id"], workflow["elements"])
+        except ValueError as e:
+            print(f"⚠️ Workflow {workflow['workflow_id']} not indexed: {e}")
+    print(f"✅ Trigger index loaded with {len(trigger_index)} active workflows")
+    dashboard_kpis.start()
+
+@app.on_event("shutdown")
+async def stop_workflow_engine():
+    await workflow_engine.stop()
+    dashboard_kpis.stop()
+    close_document_pipeline()
+    get_knowledge_index().save()
+    if credentials_provider is not None:
+        credentials_provider.stop()
+
+# Supabase JWT authentication (added before CORS so CORS stays the outermost layer)
+jwt_verifier = create_verifier_from_env()
+if jwt_verifier is not None:
+    app.add_middleware(JWTAuthMiddleware, verifier=jwt_verifier)
+    print(f"✅ JWT authentication enabled ({jwt_verifier.get_stats()['mode']})")
+
+def request_organization(http_request: Request, organization_id: Optional[str]) -> Optional[str]:
+    """Organization a request acts on: the token's organization_id, or the body value when auth is off"""
+    try:
+        return scoped_organization(http_request, organization_id)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+def authorize_owner(http_request: Request, owner: Optional[str], organization_id: Optional[str] = None):
+    """Refuse access to a resource owned by another organization than the caller's (or the one the body names)"""
+    if request_organization(http_request, owner) != owner or (organization_id and organization_id != owner):
+        raise HTTPException(status_code=403, detail="Resource belongs to another organization")
+
+def authorize_workflow(http_request: Request, workflow_id: str, organization_id: Optional[str] = None):
+    """Refuse access to a stored workflow owned by another organization"""
+    workflow = workflow_engine.store.load_workflow(workflow_id)
+    if workflow is not None:
+        authorize_owner(http_request, workflow["organization_id"] or None, organization_id)
+
 # CORS for React frontend - Updated for Railway deployment
 app.add_middleware(
     CORSMiddleware,
@@ -86,8 +169,7 @@ app.add_middleware(
         "https://railway.com",            # Railway dashboard
         "https://datapizza-production.railway.app",  # Railway self-reference
         "https://vercel.app",             # Vercel domain
-        "*"                               # Allow all origins for Railway compatibility
-    ],
+    ] + [origin.strip() for origin in os.getenv('CORS_EXTRA_ORIGINS', '').split(',') if origin.strip()],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
@@ -112,6 +194,16 @@ class ScoringResponse(BaseModel):
     processing_time_ms: int = Field(..., description="Processing time in milliseconds")
     model_used: Optional[str] = Field(None, description="AI model used")
     timestamp: str = Field(..., description="When the scoring was performed")
+    provisional: bool = Field(False, description="True when this is the fast fallback score and an agent upgrade is pending")
+    upgrade_token: Optional[str] = Field(None, description="Token to fetch or stream the upgraded agent score")
+
+class BatchScoringRequest(BaseModel):
+    contacts: List[ContactData] = Field(..., description="Contacts to score", max_length=500)
+
+class BatchScoringResponse(BaseModel):
+    results: List[ScoringResponse] = Field(..., description="Scores in the same order as the input contacts")
+    processing_time_ms: int = Field(..., description="Total processing time in milliseconds")
+    batching: Dict[str, Any] = Field(..., description="Micro-batcher statistics")
 
 class HealthResponse(BaseModel):
     status: str
@@ -150,12 +242,96 @@ class WorkflowGenerationResponse(BaseModel):
     elements: List[WorkflowElement] = Field(..., description="Generated workflow elements")
     edges: List[WorkflowEdge] = Field(default=[], description="Generated workflow connections")
     agent_used: str = Field(..., description="Which agent generated the workflow")
+    template: Optional[Dict[str, Any]] = Field(None, description="Template id and similarity when served from the template library")
+    rules: Optional[Dict[str, Any]] = Field(None, description="Matched rules and confidence when served by the rule engine")
     validation: Dict[str, Any] = Field(..., description="Workflow validation results")
     suggestions: List[str] = Field(default=[], description="Improvement suggestions")
     processing_time_ms: int = Field(..., description="Processing time in milliseconds")
     error: Optional[str] = Field(None, description="Error message if generation failed")
     fallback_data: Optional[Dict[str, Any]] = Field(None, description="Fallback workflow if generation failed")
 
+class WorkflowEditRequest(BaseModel):
+    elements: List[Dict[str, Any]] = Field(..., description="Current workflow elements")
+    edges: List[Dict[str, Any]] = Field(default=[], description="Current workflow connections")
+    change_request: str = Field(..., description="Natural language change, e.g. 'also notify the sales team'")
+    organization_id: Optional[str] = Field(None, description="CRM organization ID")
+
+class ContactDedupeRequest(BaseModel):
+    contacts: List[Dict[str, Any]] = Field(..., description="Contacts with name, email, phone, company and optional id", max_length=1000000)
+    organization_id: Optional[str] = Field(None, description="CRM organization ID")
+    threshold: float = Field(DEFAULT_THRESHOLD, ge=0.5, le=1.0, description="Minimum pair confidence to merge two contacts")
+    window: int = Field(8, ge=2, le=50, description="Sorted-neighbourhood window size")
+
+class ContactNormalizationRequest(BaseModel):
+    contacts: List[Dict[str, Any]] = Field(..., description="Raw contacts as imported (phone and email are normalized)", max_length=1000000)
+    organization_id: Optional[str] = Field(None, description="CRM organization ID")
+    keep_invalid: bool = Field(True, description="Keep raw values that cannot be normalized instead of clearing them")
+
+class RenewalRunRequest(BaseModel):
+    policies: List[Dict[str, Any]] = Field(..., description="Policies joined with their contact (policy_id, policy_number, contact_name, contact_email, expiration_date, last_renewal_email_sent, status)", max_length=1000000)
+    settings: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="renewal_settings rows by organization_id (organizations without a row get no reminders; missing columns use table defaults)")
+    organization_id: Optional[str] = Field(None, description="CRM organization ID")
+    today: Optional[str] = Field(None, description="Reference date YYYY-MM-DD (defaults to today)")
+    dry_run: bool = Field(False, description="Select and render reminders without sending them")
+
+class CommissionChangesRequest(BaseModel):
+    changes: List[Dict[str, Any]] = Field(default=[], description="insurance_commissions change events (Realtime or database webhook payloads)", max_length=100000)
+    snapshot: Optional[List[Dict[str, Any]]] = Field(None, description="Full rows to seed the rollups with before applying changes", max_length=1000000)
+
+class DashboardChangesRequest(BaseModel):
+    changes: List[Dict[str, Any]] = Field(..., description="Change events for contacts, opportunities, events, form_submissions, insurance_policies or lead_scores (Realtime or database webhook payloads)", max_length=100000)
+
+class KnowledgeChangesRequest(BaseModel):
+    changes: List[Dict[str, Any]] = Field(..., description="company_knowledge_sources change events (Realtime or database webhook payloads)", max_length=10000)
+
+class DocumentIngestRequest(BaseModel):
+    documents: List[Dict[str, Any]] = Field(..., description="insurance_documents rows (id, organization_id, original_filename, mime_type, storage_bucket with storage_path under '<organization_id>/', or an https public_url on DOCUMENT_FETCH_HOSTS; optional content_base64 or extracted_text)", max_length=100000)
+    organization_id: Optional[str] = Field(None, description="CRM organization ID")
+    force: bool = Field(False, description="Re-index documents whose content hash is unchanged")
+
+class RiskScoringRequest(BaseModel):
+    profiles: List[Dict[str, Any]] = Field(..., description="insurance_risk_profiles rows (questionnaire columns; stored risk_category is compared against)", max_length=1000000)
+    organization_id: Optional[str] = Field(None, description="CRM organization ID")
+    portfolio_id: Optional[str] = Field(None, description="Key to keep the portfolio under for what-if runs")
+    weights: Optional[Dict[str, Dict[str, float]]] = Field(None, description="Rule weight overrides by section (health, financial, lifestyle, total)")
+    thresholds: Optional[Dict[str, float]] = Field(None, description="Category thresholds overrides (low, medium, high)")
+    include_profiles: bool = Field(True, description="Return per-profile scores")
+
+class RiskWhatIfRequest(BaseModel):
+    portfolio_id: str = Field(..., description="Portfolio returned by /risk/score")
+    weights: Optional[Dict[str, Dict[str, float]]] = Field(None, description="Rule weight overrides by section (health, financial, lifestyle, total)")
+    thresholds: Optional[Dict[str, float]] = Field(None, description="Category thresholds overrides (low, medium, high)")
+    include_profiles: bool = Field(False, description="Return every profile's score under the new weights")
+    changed_limit: int = Field(100, description="Maximum changed profiles listed", ge=0, le=10000)
+
+class WorkflowSimulationRequest(BaseModel):
+    elements: List[Dict[str, Any]] = Field(..., description="Workflow elements")
+    edges: List[Dict[str, Any]] = Field(default=[], description="Workflow connections")
+    events: Optional[List[Dict[str, Any]]] = Field(None, description="Sample trigger events (optional 'offset_s'); synthetic Poisson stream when omitted", max_length=100000)
+    events_per_hour: float = Field(10.0, ge=0, description="Synthetic arrival rate")
+    horizon_hours: float = Field(24.0, gt=0, le=24 * 31, description="Period the volumes are measured over")
+    seed: int = Field(42, description="Random seed for the synthetic stream")
+    cost_overrides: Dict[str, Dict[str, Any]] = Field(default={}, description="Per-nodeType latency_ms/cost_eur overrides")
+    match_rate: Optional[float] = Field(None, ge=0, le=1, description="Share of synthetic events assumed to pass the trigger filters (default 1.0)")
+
+class WorkflowRunRequest(BaseModel):
+    workflow_id: Optional[str] = Field(None, description="Id of a previously registered workflow")
+    elements: Optional[List[Dict[str, Any]]] = Field(None, description="Inline workflow elements (registered on the fly)")
+    edges: List[Dict[str, Any]] = Field(default=[], description="Inline workflow connections")
+    organization_id: Optional[str] = Field(None, description="CRM organization ID")
+    payload: Dict[str, Any] = Field(default={}, description="Trigger event data, e.g. {\"contact\": {...}}")
+
+class WorkflowRegistrationRequest(BaseModel):
+    elements: List[Dict[str, Any]] = Field(..., description="Workflow elements")
+    edges: List[Dict[str, Any]] = Field(default=[], description="Workflow connections")
+    organization_id: str = Field(..., description="CRM organization ID")
+    workflow_id: Optional[str] = Field(None, description="Stable id; derived from the definition when omitted")
+
+class CRMEvent(BaseModel):
+    organization_id: str = Field(..., description="CRM organization ID")
+    event_type: str = Field(..., description="Trigger nodeType, e.g. form_submit or contact_update")
+    data: Dict[str, Any] = Field(default={}, description="Event payload; trigger filters are evaluated against it")
+
 # Health check endpoint
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -171,14 +347,42 @@ async def health_check():
         fallback_available=True
     )
 
+def contact_to_dict(contact: ContactData) -> Dict[str, Any]:
+    """Convert a ContactData model into the dict format used by the agents"""
+    return {
+        "name": contact.name,
+        "email": contact.email, 
+        "company": contact.company or "",
+        "phone": contact.phone or "",
+        "organization_id": contact.organization_id or ""
+    }
+
+def contacts_to_dicts(contacts: List[ContactData]) -> List[Dict[str, Any]]:
+    """Convert and normalize (E.164 phones, canonical emails) a batch of contacts in one pass"""
+    return contact_normalizer.normalize_batch([contact_to_dict(contact) for contact in contacts])
+
 # Lead scoring endpoint  
 @app.post("/score-lead", response_model=ScoringResponse)
-async def score_lead_endpoint(contact: ContactData):
+async def score_lead_endpoint(
+    contact: ContactData,
+    http_request: Request,
+    speculative: bool = False,
+    deadline_ms: int = 300,
+    callback_url: Optional[str] = None,
+    latency_budget_ms: Optional[str] = Header(None, alias="X-Latency-Budget-Ms")
+):
     """
     Score a lead using DataPizza AI agent with fallback system
     
     Args:
         contact: Contact information to analyze
+        speculative: Run fallback scoring and the agent concurrently; if the agent
+            misses deadline_ms, return the fallback score with an upgrade token
+        deadline_ms: How long a speculative request waits for the agent
+        callback_url: Optional webhook that receives the upgraded score (https, host listed
+            in SCORE_UPGRADE_WEBHOOK_HOSTS)
+        latency_budget_ms: Optional X-Latency-Budget-Ms header; the router picks
+            the best model whose observed latency fits the budget
         
     Returns:
         Detailed scoring analysis with reasoning and breakdown
@@ -186,20 +390,34 @@ async def score_lead_endpoint(contact: ContactData):
     Raises:
         HTTPException: If scoring fails completely
     """
+    contact.organization_id = request_organization(http_request, contact.organization_id)
+    if callback_url:
+        try:
+            check_outbound_url(callback_url, speculative_scorer.callback_hosts)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"callback_url rejected: {e}")
     try:
         start_time = time.time()
         
         # Convert Pydantic model to dict for processing
-        contact_dict = {
-            "name": contact.name,
-            "email": contact.email, 
-            "company": contact.company or "",
-            "phone": contact.phone or "",
-            "organization_id": contact.organization_id or ""
-        }
+        contact_dict = contacts_to_dicts([contact])[0]
+        
+        tier = model_router.choose(parse_latency_budget(latency_budget_ms))
+        upgrade_token = None
         
-        # Call our DataPizza scoring function
-        result = score_lead(contact_dict)
+        if tier.deterministic:
+            result = score_lead(contact_dict, tier.name)
+        elif speculative:
+            with usage_scope("/score-lead", contact.organization_id):
+                result, upgrade_token = await speculative_scorer.score(
+                    contact_dict, deadline_ms, tier.name, callback_url
+                )
+            result = dict(result)
+        else:
+            # Call our DataPizza scoring function (coalesced with concurrent requests)
+            with usage_scope("/score-lead", contact.organization_id):
+                future = lead_batcher.submit(contact_dict, tier.name)
+            result = await asyncio.wrap_future(future)
         
         # Calculate processing time
         processing_time_ms = int((time.time() - start_time) * 1000)
@@ -208,9 +426,14 @@ async def score_lead_endpoint(contact: ContactData):
         result["processing_time_ms"] = processing_time_ms
         result["timestamp"] = datetime.now().isoformat()
         
+        result["provisional"] = upgrade_token is not None
+        result["upgrade_token"] = upgrade_token
+        
         # Ensure all required fields are present
         if "tools_available" not in result:
             result["tools_available"] = []
+        
+        dashboard_kpis.record_score(contact.organization_id, result.get("score"))
             
         return ScoringResponse(**result)
         
@@ -220,16 +443,99 @@ async def score_lead_endpoint(contact: ContactData):
         print(f"❌ API Error: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
+# Speculative scoring upgrade endpoints
+@app.get("/score-lead/upgrades/{upgrade_token}")
+async def get_score_upgrade(upgrade_token: str):
+    """
+    Poll the agent result behind a provisional (speculative) score
+    """
+    upgrade = speculative_scorer.get(upgrade_token)
+    if upgrade is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired upgrade token")
+    return upgrade
+
+@app.get("/score-lead/upgrades/{upgrade_token}/stream")
+async def stream_score_upgrade(upgrade_token: str, timeout_s: float = 60.0):
+    """
+    Server-Sent Events stream that emits the upgraded score as soon as the agent finishes
+    """
+    if speculative_scorer.get(upgrade_token) is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired upgrade token")
+    
+    async def event_stream():
+        yield f"event: pending\ndata: {json.dumps({'upgrade_token': upgrade_token})}\n\n"
+        upgrade = await speculative_scorer.wait(upgrade_token, timeout_s)
+        if upgrade is None or upgrade["status"] == "pending":
+            yield f"event: timeout\ndata: {json.dumps({'upgrade_token': upgrade_token})}\n\n"
+        else:
+            yield f"event: upgrade\ndata: {json.dumps(upgrade)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Bulk lead scoring endpoint
+@app.post("/score-leads", response_model=BatchScoringResponse)
+async def score_leads_endpoint(
+    request: BatchScoringRequest,
+    http_request: Request,
+    latency_budget_ms: Optional[str] = Header(None, alias="X-Latency-Budget-Ms")
+):
+    """
+    Score many leads at once. Contacts are fed through the micro-batcher so
+    they share agent runs instead of paying the prompt overhead one by one.
+    Without a latency budget the highest-quality model is used.
+    """
+    for contact in request.contacts:
+        contact.organization_id = request_organization(http_request, contact.organization_id)
+    try:
+        start_time = time.time()
+        
+        tier = model_router.choose(parse_latency_budget(latency_budget_ms))
+        
+        futures = []
+        for contact, contact_dict in zip(request.contacts, contacts_to_dicts(request.contacts)):
+            with usage_scope("/score-leads", contact.organization_id):
+                futures.append(lead_batcher.submit(contact_dict, tier.name))
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        
+        timestamp = datetime.now().isoformat()
+        processing_time_ms = int((time.time() - start_time) * 1000)
+        
+        responses = []
+        for contact, result in zip(request.contacts, results):
+            dashboard_kpis.record_score(contact.organization_id, result.get("score"))
+            result["processing_time_ms"] = processing_time_ms
+            result["timestamp"] = timestamp
+            if "tools_available" not in result:
+                result["tools_available"] = []
+            responses.append(ScoringResponse(**result))
+        
+        return BatchScoringResponse(
+            results=responses,
+            processing_time_ms=processing_time_ms,
+            batching=lead_batcher.get_stats()
+        )
+        
+    except Exception as e:
+        error_msg = f"Bulk lead scoring failed: {str(e)}"
+        print(f"❌ API Error: {error_msg}")
+        raise HTTPException(status_code=500, detail=error_msg)
+
 # Contact analysis endpoint (extended scoring)
 @app.post("/analyze-contact")
-async def analyze_contact_endpoint(contact: ContactData):
+async def analyze_contact_endpoint(contact: ContactData, http_request: Request):
     """
     Perform extended contact analysis (uses same agent as scoring for MVP)
     """
     try:
         # For MVP, this uses the same scoring logic
         # In production, this could use a different agent for deeper analysis
-        scoring_result = await score_lead_endpoint(contact)
+        scoring_result = await score_lead_endpoint(
+            contact, http_request, speculative=False, deadline_ms=0, callback_url=None, latency_budget_ms=None
+        )
         
         # Add analysis-specific metadata
         analysis_result = scoring_result.dict()
@@ -252,22 +558,283 @@ async def analyze_contact_endpoint(contact: ContactData):
         print(f"❌ Analysis Error: {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
+# Duplicate contact detection endpoint
+@app.post("/contacts/dedupe")
+async def dedupe_contacts_endpoint(request: ContactDedupeRequest, http_request: Request):
+    """
+    Cluster duplicate contacts (same email, same phone, or near-identical names) using blocking
+    and sorted-neighbourhood windows instead of comparing every pair
+    """
+    request_organization(http_request, request.organization_id)
+    deduplicator = ContactDeduplicator(threshold=request.threshold, window=request.window)
+    return await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: deduplicator.find_clusters(contact_normalizer.normalize_batch(request.contacts, keep_invalid=False))
+    )
+
+# Contact normalization endpoint (first stage of CSV imports)
+@app.post("/contacts/normalize")
+async def normalize_contacts_endpoint(request: ContactNormalizationRequest, http_request: Request):
+    """
+    Canonicalize phones to E.164 (Italian defaults) and emails to lowercase/IDN form,
+    flagging values that cannot be normalized
+    """
+    request_organization(http_request, request.organization_id)
+    contacts = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: contact_normalizer.normalize_batch(request.contacts, keep_invalid=request.keep_invalid)
+    )
+    return {
+        "contacts": contacts,
+        "invalid_phones": sum(1 for contact in contacts if contact.get("phone_valid") is False),
+        "invalid_emails": sum(1 for contact in contacts if contact.get("email_valid") is False)
+    }
+
+# Policy renewal reminders endpoint
+@app.post("/renewals/run")
+async def run_renewals_endpoint(request: RenewalRunRequest, http_request: Request):
+    """
+    Bucket policies by days until expiry and send the 7/30/60/90-day renewal reminders
+    that are due, in provider-sized batches
+    """
+    organization_id = request_organization(http_request, request.organization_id)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: renewal_engine.run(
+                request.policies,
+                settings=request.settings,
+                today=request.today,
+                organization_id=organization_id,
+                dry_run=request.dry_run
+            )
+        )
+    except ValueError as e:
+        # Only the reference date can fail; bad policy dates are reported as skipped
+        raise HTTPException(status_code=400, detail=f"Invalid today: {e}")
+
+# Renewal engine statistics endpoint
+@app.get("/renewals/stats")
+async def get_renewal_stats():
+    """
+    Get renewal reminder run totals and provider batch counts
+    """
+    return renewal_engine.get_stats()
+
+# Batch risk scoring endpoint
+@app.post("/risk/score")
+async def score_risk_profiles_endpoint(request: RiskScoringRequest, http_request: Request):
+    """
+    Score a portfolio of insurance risk profiles at once and keep it for what-if runs
+    """
+    organization_id = request_organization(http_request, request.organization_id)
+    for profile_organization in {profile.get("organization_id") for profile in request.profiles}:
+        request_organization(http_request, profile_organization or organization_id)
+    if request.portfolio_id:
+        for portfolio_organization in risk_scoring_engine.portfolio_organizations(request.portfolio_id) or []:
+            request_organization(http_request, portfolio_organization)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: risk_scoring_engine.score_batch(
+                request.profiles,
+                portfolio_id=request.portfolio_id,
+                weights=request.weights,
+                thresholds=request.thresholds,
+                include_profiles=request.include_profiles
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Risk scoring what-if endpoint
+@app.post("/risk/what-if")
+async def risk_what_if_endpoint(request: RiskWhatIfRequest, http_request: Request):
+    """
+    Re-score a kept portfolio with different weights or thresholds and report category transitions
+    """
+    organizations = risk_scoring_engine.portfolio_organizations(request.portfolio_id)
+    if organizations is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found (score it again with /risk/score)")
+    for organization_id in organizations:
+        request_organization(http_request, organization_id)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: risk_scoring_engine.what_if(
+                request.portfolio_id,
+                weights=request.weights,
+                thresholds=request.thresholds,
+                include_profiles=request.include_profiles,
+                changed_limit=request.changed_limit
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Portfolio not found (score it again with /risk/score)")
+
+# Commission rollup feed endpoint
+@app.post("/commissions/changes")
+async def apply_commission_changes_endpoint(request: CommissionChangesRequest, http_request: Request):
+    """
+    Apply insurance_commissions row changes (or a seeding snapshot) to the incremental report rollups
+    """
+    try:
+        # Known rows resolve to their stored organization, whatever the payload says
+        organizations = {commission_rollups.organization_of({"new": row}) for row in request.snapshot or []}
+        organizations |= {commission_rollups.organization_of(change) for change in request.changes}
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    for organization_id in organizations:
+        request_organization(http_request, organization_id)
+    try:
+        loaded = commission_rollups.load(request.snapshot) if request.snapshot else 0
+        applied = commission_rollups.apply_changes(request.changes)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"loaded": loaded, "applied": applied, "stats": commission_rollups.get_stats()}
+
+# Commission report endpoint
+@app.get("/commissions/report")
+async def get_commission_report(
+    http_request: Request,
+    organization_id: Optional[str] = None,
+    group_by: str = "month",
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    status: Optional[str] = None,
+    commission_type: Optional[str] = None,
+    agent: Optional[str] = None,
+    product: Optional[str] = None
+):
+    """
+    Commission totals grouped by any of agent, product, month, commission_type and status,
+    answered from the precomputed rollups
+    """
+    organization_id = request_organization(http_request, organization_id)
+    if not organization_id:
+        raise HTTPException(status_code=400, detail="organization_id is required")
+    try:
+        return commission_rollups.report(
+            organization_id,
+            group_by=[dimension.strip() for dimension in group_by.split(",") if dimension.strip()],
+            start_month=start_month,
+            end_month=end_month,
+            status=status,
+            commission_type=commission_type,
+            agent=agent,
+            product=product
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Dashboard KPI feed endpoint
+@app.post("/dashboard/changes")
+async def apply_dashboard_changes_endpoint(request: DashboardChangesRequest, http_request: Request):
+    """
+    Apply CRM row changes to the in-memory dashboard counters
+    """
+    try:
+        # Known rows resolve to their stored organization, whatever the payload says
+        organizations = {dashboard_kpis.organization_of(change) for change in request.changes}
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    for organization_id in organizations:
+        request_organization(http_request, organization_id)
+    try:
+        applied = dashboard_kpis.apply_changes(request.changes)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"applied": applied, "stats": dashboard_kpis.get_stats()}
+
+# Dashboard KPI endpoint
+@app.get("/dashboard/{organization_id}")
+async def get_dashboard(organization_id: str, http_request: Request):
+    """
+    Dashboard KPIs for an organization, served from incrementally maintained counters
+    """
+    return dashboard_kpis.dashboard(request_organization(http_request, organization_id))
+
+# Company knowledge index feed endpoint
+@app.post("/knowledge/changes")
+async def apply_knowledge_changes_endpoint(request: KnowledgeChangesRequest, http_request: Request):
+    """
+    Index, re-index or drop company knowledge sources as they change
+    """
+    knowledge_index = get_knowledge_index()
+    for change in request.changes:
+        record = change.get("new") or change.get("record") or change.get("old") or change.get("old_record") or {}
+        request_organization(http_request, record.get("organization_id") or knowledge_index.owner_of(record.get("id")))
+    try:
+        applied = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: [knowledge_index.apply_change(change) for change in request.changes]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"applied": len(applied), "stats": knowledge_index.get_stats()}
+
+# Company knowledge search endpoint
+@app.get("/knowledge/search")
+async def search_knowledge_endpoint(q: str, http_request: Request, organization_id: Optional[str] = None, top_k: int = 5):
+    """
+    BM25 top-k passages from an organization's knowledge base (the lead scoring agent's grounding tool)
+    """
+    organization_id = request_organization(http_request, organization_id)
+    if not organization_id:
+        raise HTTPException(status_code=400, detail="organization_id is required")
+    return get_knowledge_index().search(organization_id, q, top_k=max(1, min(top_k, 50)))
+
+# Document ingestion endpoint
+@app.post("/documents/ingest")
+async def ingest_documents_endpoint(request: DocumentIngestRequest, http_request: Request):
+    """
+    Extract, chunk and index insurance documents into the knowledge index as a background job
+    """
+    organization_id = request_organization(http_request, request.organization_id)
+    documents = []
+    for document in request.documents:
+        document_organization = request_organization(http_request, document.get("organization_id") or organization_id)
+        if not document_organization:
+            raise HTTPException(status_code=400, detail="organization_id is required")
+        # local paths are for the CLI backfill only
+        documents.append({**{key: value for key, value in document.items() if key != "local_path"}, "organization_id": document_organization})
+    job_id = get_document_pipeline().start_job(documents, force=request.force, organization_id=organization_id)
+    return {"job_id": job_id, "documents": len(documents), "status_url": f"/documents/ingest/{job_id}"}
+
+# Document ingestion progress endpoint
+@app.get("/documents/ingest/{job_id}")
+async def get_ingestion_job_endpoint(job_id: str, http_request: Request):
+    """
+    Progress of an ingestion job: counts, documents per minute and per-stage timings
+    """
+    report = get_document_pipeline().get_job(job_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    request_organization(http_request, report["organization_id"])
+    return report
+
 # Workflow generation endpoint  
 @app.post("/generate-workflow", response_model=WorkflowGenerationResponse)
-async def generate_workflow_endpoint(request: WorkflowGenerationRequest):
+async def generate_workflow_endpoint(request: WorkflowGenerationRequest, http_request: Request):
     """
     Generate workflow automation from natural language description using DataPizza AI.
     
     Takes a user's workflow description and converts it into React Flow JSON elements
     that can be loaded directly into the Visual Automation Builder canvas.
     """
+    request.organization_id = request_organization(http_request, request.organization_id)
     start_time = time.time()
     
     try:
         print(f"🤖 Generating workflow for: {request.description}")
         
         # Call our DataPizza workflow generation function
-        result = generate_workflow(request.description)
+        with usage_scope("/generate-workflow", request.organization_id):
+            result = generate_workflow(request.description, request.organization_id)
         
         # Calculate processing time  
         processing_time_ms = int((time.time() - start_time) * 1000)
@@ -298,6 +865,8 @@ async def generate_workflow_endpoint(request: WorkflowGenerationRequest):
             elements=elements,
             edges=edges, 
             agent_used=result.get("agent_used", "DataPizza Automation Generator"),
+            template=result.get("template"),
+            rules=result.get("rules"),
             validation=result.get("validation", {"valid": True}),
             suggestions=result.get("suggestions", []),
             processing_time_ms=processing_time_ms,
@@ -323,6 +892,230 @@ async def generate_workflow_endpoint(request: WorkflowGenerationRequest):
             fallback_data={"elements": [], "edges": []}
         )
 
+# Workflow execution endpoints
+@app.post("/workflows/runs")
+async def start_workflow_run(request: WorkflowRunRequest, http_request: Request):
+    """
+    Start executing a workflow, either by id or from inline elements/edges
+    """
+    request.organization_id = request_organization(http_request, request.organization_id)
+    if request.elements is None and request.workflow_id:
+        authorize_workflow(http_request, request.workflow_id, request.organization_id)
+    try:
+        workflow_id = request.workflow_id
+        if request.elements is not None:
+            # Ad-hoc runs get a fresh id (never overwriting a stored workflow) and are not
+            # activated, so events never trigger them
+            workflow_id = workflow_engine.register_workflow(
+                request.elements, request.edges, request.organization_id or "", None, active=False
+            )
+        if workflow_id is None:
+            raise HTTPException(status_code=400, detail="Provide either workflow_id or elements")
+        run_id = workflow_engine.start_run(workflow_id, request.payload, request.organization_id or "")
+        return {"run_id": run_id, "workflow_id": workflow_id, "status": "running"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/workflows")
+async def register_workflow(request: WorkflowRegistrationRequest, http_request: Request):
+    """
+    Register and activate a workflow so matching CRM events start runs of it
+    """
+    request.organization_id = request_organization(http_request, request.organization_id)
+    if request.workflow_id:
+        authorize_workflow(http_request, request.workflow_id, request.organization_id)
+    try:
+        # Compile the trigger filters first so a bad spec never leaves a stored, active workflow
+        compile_trigger(request.elements)
+        workflow_id = workflow_engine.register_workflow(
+            request.elements, request.edges, request.organization_id, request.workflow_id
+        )
+        trigger_type = trigger_index.register(workflow_id, request.organization_id, request.elements)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"workflow_id": workflow_id, "trigger": trigger_type, "active": True}
+
+@app.post("/workflows/{workflow_id}/disable")
+async def disable_workflow(workflow_id: str, http_request: Request):
+    """
+    Stop a workflow from reacting to events (runs in progress are unaffected)
+    """
+    authorize_workflow(http_request, workflow_id)
+    if workflow_engine.set_workflow_active(workflow_id, False) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow '{workflow_id}'")
+    trigger_index.unregister(workflow_id)
+    return {"workflow_id": workflow_id, "active": False}
+
+@app.post("/workflows/{workflow_id}/enable")
+async def enable_workflow(workflow_id: str, http_request: Request):
+    """
+    Re-activate a disabled workflow
+    """
+    authorize_workflow(http_request, workflow_id)
+    workflow = workflow_engine.set_workflow_active(workflow_id, True)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow '{workflow_id}'")
+    try:
+        trigger_type = trigger_index.register(workflow_id, workflow["organization_id"], workflow["elements"])
+    except ValueError as e:
+        workflow_engine.set_workflow_active(workflow_id, False)
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"workflow_id": workflow_id, "trigger": trigger_type, "active": True}
+
+@app.post("/events")
+async def ingest_event(event: CRMEvent, http_request: Request):
+    """
+    Ingest a CRM event and start a run of every active workflow it triggers
+    """
+    event.organization_id = request_organization(http_request, event.organization_id)
+    if event.event_type not in TRIGGER_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown event_type '{event.event_type}', expected one of {sorted(TRIGGER_TYPES)}"
+        )
+    workflow_ids = trigger_index.dispatch(event.organization_id, event.event_type, event.data)
+    runs = []
+    for workflow_id in workflow_ids:
+        try:
+            runs.append({
+                "workflow_id": workflow_id,
+                "run_id": workflow_engine.start_run(workflow_id, event.data, event.organization_id)
+            })
+        except KeyError:
+            trigger_index.unregister(workflow_id)
+    return {"matched_workflows": len(runs), "runs": runs}
+
+@app.get("/events/stats")
+async def get_event_stats():
+    """
+    Get event ingestion statistics: events/sec, dispatch latency and index size
+    """
+    return trigger_index.get_stats()
+
+@app.get("/workflows/templates")
+async def get_workflow_template_stats():
+    """
+    Get workflow template library statistics: hit rate, template counts and lookup latency
+    """
+    template_library = get_template_library()
+    if not template_library:
+        return {"enabled": False}
+    return {"enabled": True, **template_library.get_stats()}
+
+@app.get("/workflows/rules")
+async def get_workflow_rule_stats():
+    """
+    Get rule engine coverage: share of generation requests handled without the agent, per-rule hits
+    """
+    return workflow_rule_engine.get_stats()
+
+@app.get("/workflows/runs/{run_id}")
+async def get_workflow_run(run_id: str, http_request: Request):
+    """
+    Get the state of a workflow run: status, pending/waiting/completed nodes and context
+    """
+    run = workflow_engine.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run '{run_id}'")
+    authorize_owner(http_request, run["organization_id"] or None)
+    return run
+
+@app.get("/workflows/engine")
+async def get_workflow_engine_stats():
+    """
+    Get workflow engine statistics: active runs, pending timers, queued steps
+    """
+    return workflow_engine.get_stats()
+
+# Incremental workflow editing endpoint
+@app.post("/edit-workflow")
+async def edit_workflow_endpoint(request: WorkflowEditRequest, http_request: Request):
+    """
+    Apply a change request to an existing workflow and return a minimal patch
+    (add_nodes, remove_nodes, update_nodes, add_edges, remove_edges) instead of a regenerated graph
+    """
+    request.organization_id = request_organization(http_request, request.organization_id)
+    start_time = time.time()
+    try:
+        with usage_scope("/edit-workflow", request.organization_id):
+            result = edit_workflow(request.elements, request.edges, request.change_request)
+    except Exception as e:
+        print(f"❌ Workflow edit error: {e}")
+        result = {"success": False, "error": f"Workflow edit failed: {str(e)}", "patch": {}}
+    result["processing_time_ms"] = int((time.time() - start_time) * 1000)
+    return result
+
+# Workflow dry-run simulation endpoint
+@app.post("/simulate-workflow")
+async def simulate_workflow_endpoint(request: WorkflowSimulationRequest):
+    """
+    Dry-run a workflow over sample or synthetic trigger events and estimate per-node call volumes,
+    LLM calls, critical-path latency, peak concurrency and cost, flagging expensive automations
+    """
+    # ai_score latency comes from what the router has actually observed
+    cost_overrides = {"ai_score": {"latency_ms": model_router.get_stats()["tiers"][0]["estimated_ms"]}}
+    for node_type, override in request.cost_overrides.items():
+        cost_overrides.setdefault(node_type, {}).update(override)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: simulate_workflow(
+                request.elements,
+                request.edges,
+                events=request.events,
+                events_per_hour=request.events_per_hour,
+                horizon_hours=request.horizon_hours,
+                seed=request.seed,
+                cost_overrides=cost_overrides,
+                match_rate=request.match_rate
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Streaming workflow generation endpoint
+@app.post("/generate-workflow/stream")
+async def generate_workflow_stream_endpoint(request: WorkflowGenerationRequest, http_request: Request):
+    """
+    Server-Sent Events variant of /generate-workflow.
+    
+    Emits a "node" or "edge" event as soon as each one is parsed from the agent
+    output, a "layout" event with final positions, then "done" with validation,
+    suggestions and time_to_first_node_ms ("error" on failure).
+    """
+    request.organization_id = request_organization(http_request, request.organization_id)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    def produce():
+        try:
+            with usage_scope("/generate-workflow/stream", request.organization_id):
+                for event, data in stream_workflow(request.description, request.organization_id):
+                    loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+        except Exception as e:
+            print(f"❌ Streaming generation error: {e}")
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", {"success": False, "error": f"Generation failed: {str(e)}"}))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+    
+    # The agent call blocks, so it runs in a worker thread feeding the queue
+    loop.run_in_executor(None, produce)
+    
+    async def event_stream():
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Agent status endpoint
 @app.get("/agents/status", response_model=AgentStatusResponse)
 async def get_agent_status():
@@ -330,12 +1123,64 @@ async def get_agent_status():
     Get status of available agents and tools
     """
     return AgentStatusResponse(
-        agents=["guardian_lead_scoring_agent", "guardian_automation_generator_agent"],
-        models=["gemini-1.5-pro", "gpt-4", "fallback_algorithm"],
-        tools=["get_contact_history", "get_company_info", "analyze_email_quality", "get_available_triggers", "get_available_actions", "validate_workflow_structure", "suggest_workflow_improvements"],
+        agents=["guardian_lead_scoring_agent", "guardian_automation_generator_agent", "guardian_workflow_editor_agent"],
+        models=[tier.name for tier in model_router.tiers],
+        tools=["get_contact_history", "get_company_info", "analyze_email_quality", "search_company_knowledge", "get_available_triggers", "get_available_actions", "validate_workflow_structure", "suggest_workflow_improvements"],
         status="operational"
     )
 
+# Model routing statistics endpoint
+@app.get("/agents/routing")
+async def get_agent_routing():
+    """
+    Get observed per-model latency distributions used for latency-budget routing
+    """
+    return model_router.get_stats()
+
+# Agent response cache endpoint
+@app.get("/agents/cache")
+async def get_agent_cache_stats():
+    """
+    Get persistent agent response cache statistics
+    """
+    agent_cache = get_agent_cache()
+    if not agent_cache:
+        return {"enabled": False}
+    return {"enabled": True, **agent_cache.get_stats()}
+
+# Agent usage accounting endpoint
+@app.get("/agents/usage")
+async def get_agent_usage(http_request: Request, organization_id: Optional[str] = None):
+    """
+    Get token, tool-call and wall-time totals per organization/endpoint and per agent/model
+    """
+    organization_id = request_organization(http_request, organization_id)
+    claims = getattr(http_request.state, "auth", None)
+    if organization_id is None and claims is not None and not claims.get("is_super_admin"):
+        # A token without an organization would otherwise see every organization's usage
+        raise HTTPException(status_code=403, detail="Token has no organization_id")
+    return usage_tracker.get_summary(organization_id)
+
+# JWT authentication endpoint
+@app.get("/agents/auth")
+async def get_agent_auth_stats():
+    """
+    Get JWT verification statistics: verified-claims cache hit rate and signature check latency
+    """
+    if jwt_verifier is None:
+        return {"enabled": False}
+    return {"enabled": True, **jwt_verifier.get_stats()}
+
+# Shared Google credentials endpoint
+@app.get("/agents/credentials")
+async def get_agent_credentials():
+    """
+    Get the shared Google credentials source and access-token refresh statistics (no key material)
+    """
+    if credentials_provider is None:
+        return {"loaded": False}
+    return credentials_provider.get_stats()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -349,9 +1194,38 @@ async def root():
         "endpoints": {
             "health": "/health",
             "score_lead": "/score-lead",
+            "score_leads": "/score-leads",
+            "score_upgrade": "/score-lead/upgrades/{upgrade_token}",
             "analyze_contact": "/analyze-contact",
+            "dedupe_contacts": "/contacts/dedupe",
+            "normalize_contacts": "/contacts/normalize",
+            "run_renewals": "/renewals/run",
+            "renewal_stats": "/renewals/stats",
+            "risk_score": "/risk/score",
+            "risk_what_if": "/risk/what-if",
+            "commission_changes": "/commissions/changes",
+            "commission_report": "/commissions/report",
+            "dashboard": "/dashboard/{organization_id}",
+            "dashboard_changes": "/dashboard/changes",
+            "knowledge_changes": "/knowledge/changes",
+            "knowledge_search": "/knowledge/search",
+            "documents_ingest": "/documents/ingest",
             "generate_workflow": "/generate-workflow",
-            "agent_status": "/agents/status"
+            "generate_workflow_stream": "/generate-workflow/stream",
+            "edit_workflow": "/edit-workflow",
+            "simulate_workflow": "/simulate-workflow",
+            "workflows": "/workflows",
+            "workflow_templates": "/workflows/templates",
+            "workflow_rules": "/workflows/rules",
+            "workflow_runs": "/workflows/runs",
+            "events": "/events",
+            "workflow_engine": "/workflows/engine",
+            "agent_status": "/agents/status",
+            "agent_routing": "/agents/routing",
+            "agent_cache": "/agents/cache",
+            "agent_usage": "/agents/usage",
+            "agent_credentials": "/agents/credentials",
+            "agent_auth": "/agents/auth"
         },
         "documentation": "/docs"
     }
@@ -359,7 +1233,7 @@ async def root():
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"error": "Endpoint not found", "available_endpoints": ["/health", "/score-lead", "/analyze-contact", "/generate-workflow", "/agents/status"]}
+    return {"error": "Endpoint not found", "available_endpoints": ["/health", "/score-lead", "/score-leads", "/analyze-contact", "/contacts/dedupe", "/contacts/normalize", "/renewals/run", "/renewals/stats", "/risk/score", "/risk/what-if", "/commissions/changes", "/commissions/report", "/dashboard/{organization_id}", "/dashboard/changes", "/knowledge/changes", "/knowledge/search", "/documents/ingest", "/documents/ingest/{job_id}", "/generate-workflow", "/edit-workflow", "/simulate-workflow", "/workflows", "/workflows/runs", "/workflows/engine", "/events", "/agents/status", "/agents/routing", "/agents/cache", "/agents/usage", "/agents/credentials", "/agents/auth"]}
 
 @app.exception_handler(500) 
 async def internal_error_handler(request, exc):
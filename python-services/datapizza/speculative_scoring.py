@@ -0,0 +1,182 @@
+"""
+Speculative Lead Scoring
+Returns the instant fallback score when the agent misses its deadline, then upgrades asynchronously
+"""
+
+import json
+import time
+import asyncio
+import secrets
+import threading
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from outbound_urls import allowed_hosts_from_env, check_outbound_url, open_checked
+
+
+@dataclass
+class PendingUpgrade:
+    token: str
+    future: Future
+    callback_url: Optional[str] = None
+    created_at: float = field(default_factory=time.monotonic)
+    status: str = "pending"
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "upgrade_token": self.token,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class SpeculativeScorer:
+    """
+    Runs the deterministic fallback and the LLM agent side by side.
+
+    If the agent answers within the deadline its result is returned as
+    usual. Otherwise the fallback score goes back straight away together
+    with an upgrade token; the agent keeps running and its result can be
+    polled, streamed over SSE, or pushed to a webhook when it lands.
+    """
+
+    def __init__(
+        self,
+        fallback: Callable[[Dict[str, Any]], Dict[str, Any]],
+        submit_agent: Callable[[Dict[str, Any], Optional[str]], Future],
+        ttl_s: float = 900.0,
+        callback_hosts: Optional[List[str]] = None
+    ):
+        self.fallback = fallback
+        self.submit_agent = submit_agent
+        self.ttl_s = ttl_s
+        # Webhook hosts callers may name (SCORE_UPGRADE_WEBHOOK_HOSTS); none means no webhooks
+        self.callback_hosts = callback_hosts if callback_hosts is not None else allowed_hosts_from_env('SCORE_UPGRADE_WEBHOOK_HOSTS')
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, PendingUpgrade] = {}
+        self._webhooks = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upgrade-webhook")
+        self._stats = {"requests": 0, "agent_in_time": 0, "provisional": 0, "upgrades_completed": 0, "webhooks_failed": 0}
+
+    async def score(
+        self,
+        contact: Dict[str, Any],
+        deadline_ms: float,
+        model: Optional[str] = None,
+        callback_url: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Score a contact speculatively.
+
+        Args:
+            contact: Contact dict as accepted by score_lead()
+            deadline_ms: How long to wait for the agent before answering with the fallback
+            model: Model tier for the agent run
+            callback_url: Optional webhook that receives the upgraded result
+                (https, on an allowlisted host)
+
+        Returns:
+            (result, upgrade_token) - upgrade_token is None when the agent made the deadline
+
+        Raises:
+            ValueError: If callback_url is not allowed
+        """
+        if callback_url:
+            check_outbound_url(callback_url, self.callback_hosts)
+        agent_future = self.submit_agent(contact, model)
+        provisional = self.fallback(contact)
+
+        with self._lock:
+            self._stats["requests"] += 1
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(agent_future)),
+                timeout=deadline_ms / 1000.0
+            )
+            with self._lock:
+                self._stats["agent_in_time"] += 1
+            return result, None
+        except asyncio.TimeoutError:
+            pass
+
+        token = secrets.token_urlsafe(16)
+        upgrade = PendingUpgrade(token=token, future=agent_future, callback_url=callback_url)
+        with self._lock:
+            self._expire_old()
+            self._pending[token] = upgrade
+            self._stats["provisional"] += 1
+        agent_future.add_done_callback(lambda future: self._complete(upgrade, future))
+
+        return provisional, token
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return the upgrade state for a token, or None if unknown or expired."""
+        with self._lock:
+            upgrade = self._pending.get(token)
+            return upgrade.to_dict() if upgrade else None
+
+    async def wait(self, token: str, timeout_s: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait until an upgrade completes (or the timeout passes).
+
+        Returns:
+            The upgrade state, or None if the token is unknown or expired
+        """
+        with self._lock:
+            upgrade = self._pending.get(token)
+        if upgrade is None:
+            return None
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(upgrade.future)), timeout=timeout_s)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            pass  # Recorded on the upgrade by _complete()
+        # _complete() was registered on the future first, so it has already
+        # run by the time the wrapped future wakes us up
+        return upgrade.to_dict()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_upgrades"] = sum(1 for upgrade in self._pending.values() if upgrade.status == "pending")
+        return stats
+
+    def _complete(self, upgrade: PendingUpgrade, future: Future):
+        try:
+            upgrade.result = future.result()
+            upgrade.status = "completed"
+        except Exception as e:
+            upgrade.error = str(e)
+            upgrade.status = "failed"
+
+        with self._lock:
+            self._stats["upgrades_completed"] += 1
+
+        if upgrade.callback_url:
+            self._webhooks.submit(self._post_webhook, upgrade.callback_url, upgrade.to_dict())
+
+    def _post_webhook(self, url: str, payload: Dict[str, Any]):
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            open_checked(request, self.callback_hosts, timeout_s=10, max_bytes=65536)
+        except Exception as e:
+            print(f"⚠️ Score upgrade webhook to {url} failed: {e}")
+            with self._lock:
+                self._stats["webhooks_failed"] += 1
+
+    def _expire_old(self):
+        cutoff = time.monotonic() - self.ttl_s
+        for token in [t for t, upgrade in self._pending.items() if upgrade.created_at < cutoff]:
+            del self._pending[token]
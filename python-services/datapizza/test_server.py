@@ -11,6 +11,8 @@ from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import uvicorn
 
+from workflow_rules import workflow_rule_engine
+
 app = FastAPI(
     title="Guardian CRM Workflow Generator",
     description="AI Workflow generation for Guardian AI CRM - Test Server",
@@ -46,178 +48,25 @@ class WorkflowGenerationResponse(BaseModel):
     error: Optional[str] = None
 
 def generate_mock_workflow(description: str) -> Dict[str, Any]:
-    """Generate a mock workflow based on description keywords"""
+    """Generate a workflow with the production rule engine (no LLM involved)"""
     
-    # Analyze description for common workflow patterns
     desc_lower = description.lower()
     
-    nodes = []
-    edges = []
-    
-    # Start with a trigger based on description
-    if "form" in desc_lower or "submit" in desc_lower:
-        trigger_type = "form_submit"
-        trigger_label = "Form Submission"
-        trigger_desc = "Triggered when form is submitted"
-    elif "deal" in desc_lower and "won" in desc_lower:
-        trigger_type = "deal_won"
-        trigger_label = "Deal Won"
-        trigger_desc = "Triggered when deal is marked as won"
-    elif "time" in desc_lower or "schedule" in desc_lower or "monday" in desc_lower:
-        trigger_type = "time_trigger" 
-        trigger_label = "Scheduled Trigger"
-        trigger_desc = "Time-based trigger"
-    else:
-        trigger_type = "form_submit"
-        trigger_label = "Form Submission" 
-        trigger_desc = "General workflow trigger"
-    
-    # Add trigger node
-    nodes.append({
-        "id": "trigger_1",
+    # min_confidence=0: the test server always answers, even for unusual wording
+    workflow = workflow_rule_engine.generate(description, min_confidence=0.0) or {}
+    nodes = workflow.get("elements") or [{
+        "id": "trigger-1",
         "type": "input",
         "data": {
-            "label": trigger_label,
-            "nodeType": trigger_type,
-            "description": trigger_desc
+            "label": "Form Submission",
+            "nodeType": "form_submit",
+            "description": "General workflow trigger"
         },
         "position": {"x": 100, "y": 100},
         "className": "border-blue-500"
-    })
-    
-    node_count = 1
-    last_node_id = "trigger_1"
-    x_pos = 350
-    
-    # Add actions based on description keywords
-    if "score" in desc_lower or "ai" in desc_lower:
-        node_count += 1
-        action_id = f"action_{node_count}"
-        nodes.append({
-            "id": action_id,
-            "type": "default",
-            "data": {
-                "label": "AI Score Contact",
-                "nodeType": "ai_score",
-                "description": "Score lead quality with AI"
-            },
-            "position": {"x": x_pos, "y": 100},
-            "className": "border-green-500"
-        })
-        edges.append({
-            "id": f"edge_{len(edges) + 1}",
-            "source": last_node_id,
-            "target": action_id,
-            "animated": True,
-            "style": {"stroke": "#3b82f6"}
-        })
-        last_node_id = action_id
-        x_pos += 250
+    }]
+    edges = workflow.get("edges", [])
     
-    if "email" in desc_lower or "send" in desc_lower:
-        node_count += 1
-        action_id = f"action_{node_count}"
-        
-        if "welcome" in desc_lower:
-            email_label = "Send Welcome Email"
-        elif "thank" in desc_lower:
-            email_label = "Send Thank You Email"
-        else:
-            email_label = "Send Email"
-            
-        nodes.append({
-            "id": action_id,
-            "type": "default",
-            "data": {
-                "label": email_label,
-                "nodeType": "send_email",
-                "description": "Send personalized email"
-            },
-            "position": {"x": x_pos, "y": 100},
-            "className": "border-green-500"
-        })
-        edges.append({
-            "id": f"edge_{len(edges) + 1}",
-            "source": last_node_id,
-            "target": action_id,
-            "animated": True,
-            "style": {"stroke": "#3b82f6"}
-        })
-        last_node_id = action_id
-        x_pos += 250
-    
-    if "deal" in desc_lower and "create" in desc_lower:
-        node_count += 1
-        action_id = f"action_{node_count}"
-        nodes.append({
-            "id": action_id,
-            "type": "default",
-            "data": {
-                "label": "Create Deal",
-                "nodeType": "create_deal",
-                "description": "Create new sales opportunity"
-            },
-            "position": {"x": x_pos, "y": 100},
-            "className": "border-green-500"
-        })
-        edges.append({
-            "id": f"edge_{len(edges) + 1}",
-            "source": last_node_id,
-            "target": action_id,
-            "animated": True,
-            "style": {"stroke": "#3b82f6"}
-        })
-        last_node_id = action_id
-        x_pos += 250
-    
-    if "update" in desc_lower and "contact" in desc_lower:
-        node_count += 1
-        action_id = f"action_{node_count}"
-        nodes.append({
-            "id": action_id,
-            "type": "default",
-            "data": {
-                "label": "Update Contact",
-                "nodeType": "update_contact",
-                "description": "Update contact information"
-            },
-            "position": {"x": x_pos, "y": 100},
-            "className": "border-green-500"
-        })
-        edges.append({
-            "id": f"edge_{len(edges) + 1}",
-            "source": last_node_id,
-            "target": action_id,
-            "animated": True,
-            "style": {"stroke": "#3b82f6"}
-        })
-        last_node_id = action_id
-        x_pos += 250
-        
-    if "wait" in desc_lower or "delay" in desc_lower:
-        node_count += 1
-        action_id = f"action_{node_count}"
-        nodes.append({
-            "id": action_id,
-            "type": "default",
-            "data": {
-                "label": "Wait Delay",
-                "nodeType": "wait_delay",
-                "description": "Wait for specified time period"
-            },
-            "position": {"x": x_pos, "y": 100},
-            "className": "border-orange-500"
-        })
-        edges.append({
-            "id": f"edge_{len(edges) + 1}",
-            "source": last_node_id,
-            "target": action_id,
-            "animated": True,
-            "style": {"stroke": "#3b82f6"}
-        })
-        last_node_id = action_id
-        x_pos += 250
-
     # Generate suggestions based on the workflow
     suggestions = []
     if "score" in desc_lower:
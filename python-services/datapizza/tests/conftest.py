@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+# Service modules live flat next to this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+# Workflow graph factories shared by the graph and layout tests
+def node(node_id, node_type, kind="default"):
+    return {"id": node_id, "type": kind, "data": {"nodeType": node_type, "label": node_id}}
+
+
+def edge(source, target):
+    return {"id": f"{source}-{target}", "source": source, "target": target}
+
+
+def linear(*types):
+    elements = [node(f"n{i}", node_type, "input" if i == 0 else "default") for i, node_type in enumerate(types)]
+    edges = [edge(f"n{i}", f"n{i + 1}") for i in range(len(types) - 1)]
+    return elements, edges
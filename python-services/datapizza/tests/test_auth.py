@@ -0,0 +1,147 @@
+"""JWT middleware on GoTrue stub tokens: rejections, public paths, the claims LRU and organization scoping."""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import auth
+from auth import JWTAuthMiddleware, scoped_organization
+from gotrue_stub import GoTrueStub
+
+ORG = "00000000-0000-0000-0000-000000000001"
+
+
+@pytest.fixture
+def stub():
+    # Tokens are minted locally; the HTTP server is not needed
+    server = GoTrueStub()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def verifier(stub):
+    pytest.importorskip("jwt")
+    return auth.SupabaseJWTVerifier(secret=stub.secret, cache_size=2)
+
+
+def call(verifier, path="/score-lead", method="GET", token=None, authorization=None):
+    """Run one request through the middleware; returns (status, state seen by the app)."""
+    headers = []
+    if token is not None:
+        authorization = f"Bearer {token}"
+    if authorization is not None:
+        headers.append((b"authorization", authorization.encode()))
+    scope = {"type": "http", "method": method, "path": path, "headers": headers}
+    seen, sent = {}, []
+
+    async def app(scope, receive, send):
+        seen.update(scope.get("state", {}))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(JWTAuthMiddleware(app, verifier)(scope, None, send))
+    return sent[0]["status"], seen
+
+
+def forge(claims, alg, secret):
+    """Sign claims with an arbitrary header alg (HMAC-SHA512 for HS512, empty for none)."""
+    encode = lambda data: base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    signing_input = f"{encode({'alg': alg, 'typ': 'JWT'})}.{encode(claims)}"
+    if alg == "none":
+        return signing_input + "."
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha512).digest()
+    return signing_input + "." + base64.urlsafe_b64encode(signature).rstrip(b"=").decode()
+
+
+class RefusingVerifier:
+    """Fails the test if the middleware tries to verify anything."""
+    uses_jwks = False
+
+    def cached_claims(self, token):
+        raise AssertionError("public requests must not be verified")
+
+    verify = cached_claims
+
+
+@pytest.mark.parametrize("path,method", [("/health", "GET"), ("/", "GET"), ("/openapi.json", "GET"), ("/score-lead", "OPTIONS")])
+def test_preflight_and_public_paths_bypass_auth(path, method):
+    status, seen = call(RefusingVerifier(), path, method)
+    assert status == 200 and "auth" not in seen
+
+
+def test_valid_token_exposes_claims(stub, verifier):
+    status, seen = call(verifier, token=stub.mint("owner@example.com"))
+    assert status == 200
+    assert seen["organization_id"] == ORG
+    assert seen["auth"]["user_role"] == "admin"
+
+
+@pytest.mark.parametrize("authorization", [None, "Bearer ", "Basic dXNlcjpwYXNz", "Bearer not.a.jwt", "Bearer abc"])
+def test_missing_or_malformed_token_is_401(verifier, authorization):
+    assert call(verifier, authorization=authorization)[0] == 401
+
+
+def test_expired_token_is_401(stub, verifier):
+    token = stub.mint("owner@example.com", issued_at=time.time() - 2 * stub.ttl_s)
+    assert call(verifier, token=token)[0] == 401
+    assert verifier.get_stats()["failures"] == 1
+
+
+def test_bad_signature_is_401(stub, verifier):
+    forged = GoTrueStub(secret="another-secret-that-is-also-32-characters")
+    try:
+        assert call(verifier, token=forged.mint("owner@example.com"))[0] == 401
+    finally:
+        forged.stop()
+
+
+@pytest.mark.parametrize("alg", ["HS512", "none", "RS256"])
+def test_algorithms_outside_the_allowed_set_are_refused(stub, verifier, alg):
+    claims = {"aud": "authenticated", "sub": "user", "exp": int(time.time()) + 600, "organization_id": ORG}
+    with pytest.raises(auth.AuthenticationError):
+        verifier.verify(forge(claims, alg, stub.secret))
+    assert call(verifier, token=forge(claims, alg, stub.secret))[0] == 401
+
+
+def test_claims_lru_hits_evicts_and_expires(stub, verifier, monkeypatch):
+    first, second, third = (stub.mint(email) for email in ("owner@example.com", "agent@example.com", "admin@example.com"))
+    verifier.verify(first)
+    assert verifier.verify(first)["email"] == "owner@example.com"
+    assert verifier.get_stats()["hits"] == 1 and verifier.get_stats()["misses"] == 1
+
+    verifier.verify(second)
+    verifier.verify(third)  # cache_size=2: the least recently used token goes
+    stats = verifier.get_stats()
+    assert stats["evictions"] == 1 and stats["cached_tokens"] == 2
+    assert verifier.cached_claims(first) is None
+    assert verifier.cached_claims(third) is not None
+
+    # Entries are dropped once the token's exp has passed
+    later = time.time() + stub.ttl_s + 1
+    monkeypatch.setattr(auth.time, "time", lambda: later)
+    assert verifier.cached_claims(third) is None
+    assert verifier.get_stats()["cached_tokens"] == 1
+
+
+def request_with(claims=None):
+    return SimpleNamespace(state=SimpleNamespace(auth=claims) if claims is not None else SimpleNamespace())
+
+
+def test_scoped_organization():
+    member = {"organization_id": ORG, "is_super_admin": False}
+    assert scoped_organization(request_with(member), None) == ORG
+    assert scoped_organization(request_with(member), ORG) == ORG
+    with pytest.raises(PermissionError):
+        scoped_organization(request_with(member), "another-org")
+    # Super admins may act on any organization; without auth the body value is used as is
+    assert scoped_organization(request_with({"is_super_admin": True}), "another-org") == "another-org"
+    assert scoped_organization(request_with(), "another-org") == "another-org"
@@ -0,0 +1,48 @@
+"""Commission rollups: deltas and organization ownership of stored rows."""
+
+import pytest
+
+from commission_rollups import CommissionRollups
+
+
+def row(row_id, organization_id, amount, **fields):
+    return {
+        "id": row_id, "organization_id": organization_id, "commission_amount": amount,
+        "agent_id": "agent-1", "policy_type": "auto", "calculation_date": "2025-10-15", **fields
+    }
+
+
+@pytest.fixture
+def rollups():
+    rollups = CommissionRollups()
+    rollups.load([row("c1", "org-a", "100.10"), row("c2", "org-b", "50.00")])
+    return rollups
+
+
+def totals(rollups, organization_id):
+    return rollups.report(organization_id, group_by=())["totals"]
+
+
+def test_updates_and_deletes_apply_as_deltas(rollups):
+    rollups.apply_change({"eventType": "UPDATE", "new": row("c1", "org-a", "80.05", status="paid")})
+    assert totals(rollups, "org-a")["total_amount"] == 80.05
+    rollups.apply_change({"type": "DELETE", "old_record": {"id": "c1"}})
+    assert totals(rollups, "org-a")["count"] == 0
+
+
+def test_changes_resolve_to_the_stored_organization(rollups):
+    assert rollups.organization_of({"eventType": "DELETE", "old": {"id": "c2"}}) == "org-b"
+    with pytest.raises(PermissionError):
+        rollups.organization_of({"eventType": "DELETE", "old": {"id": "c2", "organization_id": "org-a"}})
+    with pytest.raises(PermissionError):
+        rollups.organization_of({"eventType": "UPDATE", "new": row("c2", "org-a", "1.00")})
+    assert rollups.organization_of({"eventType": "INSERT", "new": row("c3", "org-a", "1.00")}) == "org-a"
+
+
+def test_another_organization_cannot_move_or_delete_a_row(rollups):
+    with pytest.raises(PermissionError):
+        rollups.apply_change({"eventType": "DELETE", "old": {"id": "c2", "organization_id": "org-a"}})
+    with pytest.raises(PermissionError):
+        rollups.upsert(row("c2", "org-a", "1.00"))
+    assert totals(rollups, "org-b") == {"count": 1, "total_amount": 50.0, "average_amount": 50.0, "total_premium": 0.0}
+    assert totals(rollups, "org-a")["count"] == 1
@@ -0,0 +1,50 @@
+"""Duplicate clustering: direct matches and conflicts hidden by transitive merges."""
+
+from contact_dedupe import ContactDeduplicator
+
+
+def cluster_ids(contacts):
+    return [cluster["ids"] for cluster in ContactDeduplicator().find_clusters(contacts)["clusters"]]
+
+
+def test_email_and_phone_matches_cluster():
+    contacts = [
+        {"id": "a", "name": "Luca Bianchi", "email": "Luca@B.it"},
+        {"id": "b", "name": "Luca Bianchi", "email": "luca@b.it", "phone": "111 222"},
+        {"id": "c", "name": "Giulia Verdi", "phone": "+39 02 1234567"},
+        {"id": "d", "name": "Giulia Verdi", "phone": "02-1234567"},
+    ]
+    assert cluster_ids(contacts) == [["a", "b"], ["c", "d"]]
+
+
+def test_phone_only_record_does_not_chain_different_emails():
+    contacts = [
+        {"id": "id1", "name": "Mario Rossi", "email": "mario.rossi@x.it", "phone": "333 1234567"},
+        {"id": "id2", "name": "M. Rossi", "phone": "3331234567"},
+        {"id": "id6", "name": "Mario Rossi", "email": "mario@other.it", "phone": "+39 333 1234567"},
+    ]
+    result = ContactDeduplicator().find_clusters(contacts)
+    clusters = [cluster["ids"] for cluster in result["clusters"]]
+    assert not any({"id1", "id6"} <= set(ids) for ids in clusters)
+    assert result["stats"]["conflicts"] > 0
+
+
+def test_shared_phone_does_not_pair_different_personal_emails():
+    contacts = [
+        {"id": "a", "name": "Mario Rossi", "email": "mario.rossi@x.it", "phone": "333 1234567"},
+        {"id": "b", "name": "Mario Rossi", "email": "mario@other.it", "phone": "3331234567"},
+    ]
+    deduplicator = ContactDeduplicator()
+    assert deduplicator.find_clusters(contacts)["clusters"] == []
+    # A shared inbox is not a personal email, so the phone still decides
+    contacts[1]["email"] = "info@other.it"
+    assert cluster_ids(contacts) == [["a", "b"]]
+
+
+def test_shared_company_allows_different_emails_in_a_cluster():
+    contacts = [
+        {"id": "a", "name": "Anna Neri", "email": "anna@acme.it", "company": "Acme"},
+        {"id": "b", "name": "Anna Neri", "email": "a.neri@acme.it", "company": "Acme"},
+        {"id": "c", "name": "Anna Neri", "email": "anna@acme.it", "company": "Acme"},
+    ]
+    assert cluster_ids(contacts) == [["a", "b", "c"]]
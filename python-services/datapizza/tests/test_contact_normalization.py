@@ -0,0 +1,69 @@
+"""Contact normalization: E.164 phones with Italian defaults, canonical emails and batch flags."""
+
+import pytest
+
+import contact_normalization
+from contact_normalization import ContactNormalizer, normalize_email, normalize_phone
+
+
+@pytest.mark.parametrize("raw,expected", [
+    ("+39 333 1234567", "+393331234567"),
+    ("0039 333 1234567", "+393331234567"),
+    ("333-1234567", "+393331234567"),
+    ("393331234567", "+393331234567"),
+    ("338-9876543", "+393389876543"),
+    ("02-12345678", "+390212345678"),
+    ("06 1234 5678 int. 12", "+390612345678"),
+    ("800 123456", "+39800123456"),
+    ("848 123 456", "+39848123456"),
+    ("+1-555-0123", "+15550123"),
+])
+def test_phone_formats(raw, expected):
+    assert normalize_phone(raw) == expected
+
+
+@pytest.mark.parametrize("raw", [None, "", "n/a", "123", "+0 123 456789", "1" * 20])
+def test_phones_that_cannot_be_numbers(raw):
+    assert normalize_phone(raw) is None
+
+
+def test_fallback_without_phonenumbers_checks_italian_prefixes(monkeypatch):
+    monkeypatch.setattr(contact_normalization, "PHONENUMBERS_AVAILABLE", False)
+    assert normalize_phone("800 123456") == "+39800123456"
+    assert normalize_phone("39 800 123456") == "+39800123456"
+    assert normalize_phone("7777 123456") is None
+
+
+@pytest.mark.parametrize("raw,expected", [
+    ("  Mario.Rossi@Example.IT ", "mario.rossi@example.it"),
+    ("mailto:<Anna@Acme.it>", "anna@acme.it"),
+    ("<Mario.Rossi@Caffè.IT>", "mario.rossi@xn--caff-8oa.it"),
+    ("luca@studio.it.", "luca@studio.it"),
+])
+def test_email_formats(raw, expected):
+    assert normalize_email(raw) == expected
+
+
+@pytest.mark.parametrize("raw", [None, "", "mario", "a@@b.com", "a@b@c.com", "x@.it", "x@mail..it", "x@it", "@acme.it", "mario rossi@acme.it"])
+def test_strings_that_are_not_addresses(raw):
+    assert normalize_email(raw) is None
+
+
+def test_batch_maps_distinct_values_back_and_flags_invalid_rows():
+    normalizer = ContactNormalizer()
+    contacts = [
+        {"id": 1, "phone": "02-12345678", "email": "INFO@Acme.it"},
+        {"id": 2, "phone": "+39 02 12345678", "email": "info@acme.it"},
+        {"id": 3, "phone": "n/a", "email": "a@@b.com"},
+        {"id": 4, "name": "No contact fields"},
+    ]
+    rows = normalizer.normalize_batch(contacts)
+    assert rows[0]["phone"] == rows[1]["phone"] == "+390212345678"
+    assert rows[0]["email"] == rows[1]["email"] == "info@acme.it"
+    assert rows[2] == {"id": 3, "phone": "n/a", "phone_valid": False, "email": "a@@b.com", "email_valid": False}
+    assert rows[3] == {"id": 4, "name": "No contact fields"}
+    assert contacts[0]["phone"] == "02-12345678"  # inputs are not modified
+
+    assert normalizer.normalize_batch(contacts[2:3], keep_invalid=False)[0]["phone"] is None
+    stats = normalizer.get_stats()
+    assert stats["contacts"] == 5 and stats["invalid_phones"] == 2 and stats["invalid_emails"] == 2
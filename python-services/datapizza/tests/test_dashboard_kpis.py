@@ -0,0 +1,83 @@
+"""Dashboard counters: ownership of stored rows and incremental snapshots."""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import dashboard_kpis
+from dashboard_kpis import DashboardKPIs
+
+
+@pytest.fixture
+def kpis(tmp_path):
+    return DashboardKPIs(snapshot_path=str(tmp_path / "kpis.json"))
+
+
+def deal(row_id, organization_id, stage="Won", value=100):
+    return {"table": "deals", "eventType": "INSERT", "new": {
+        "id": row_id, "organization_id": organization_id, "stage": stage, "value": value, "updated_at": "2025-10-01"
+    }}
+
+
+def test_changes_resolve_to_the_stored_organization(kpis):
+    kpis.apply_changes([deal("d1", "org-a"), deal("d2", "org-b")])
+    assert kpis.organization_of({"table": "deals", "eventType": "DELETE", "old": {"id": "d2"}}) == "org-b"
+    with pytest.raises(PermissionError):
+        kpis.organization_of({"table": "deals", "eventType": "DELETE", "old": {"id": "d2", "organization_id": "org-a"}})
+    with pytest.raises(PermissionError):
+        kpis.apply_change({"table": "deals", "eventType": "DELETE", "old": {"id": "d2", "organization_id": "org-a"}})
+    with pytest.raises(PermissionError):
+        kpis.apply_change(deal("d2", "org-a", value=1))
+    assert kpis.dashboard("org-b")["totalRevenue"] == 100
+    assert kpis.dashboard("org-a")["totalDeals"] == 1
+
+
+def test_snapshot_journals_only_changed_rows_and_restores(kpis, tmp_path):
+    kpis.apply_changes([deal("d1", "org-a"), deal("d2", "org-a", stage="Lost")])
+    assert kpis.snapshot()
+    lines = kpis.journal_path.read_text().splitlines()
+    assert len(lines) == 2
+
+    kpis.apply_change({"table": "deals", "eventType": "DELETE", "old": {"id": "d2"}})
+    assert kpis.snapshot()
+    assert not kpis.snapshot()
+    lines = kpis.journal_path.read_text().splitlines()
+    assert len(lines) == 3 and json.loads(lines[-1]) == ["deals:d2", None]
+    assert "rows" not in json.loads(kpis.snapshot_path.read_text())
+
+    restored = DashboardKPIs(snapshot_path=str(tmp_path / "kpis.json"))
+    assert restored.get_stats()["rows"] == 1
+    # The restored row is replaced, not counted twice
+    restored.apply_change(deal("d1", "org-a", value=40))
+    assert restored.dashboard("org-a")["totalRevenue"] == 40
+
+
+def test_failed_snapshot_keeps_changed_rows_for_the_next_one(kpis, tmp_path, monkeypatch):
+    kpis.apply_changes([deal("d1", "org-a"), deal("d2", "org-a")])
+    assert kpis.snapshot()
+    kpis.apply_change({"table": "deals", "eventType": "DELETE", "old": {"id": "d2"}})
+
+    def disk_full(*args):
+        raise OSError("No space left on device")
+    with monkeypatch.context() as patch:
+        patch.setattr(dashboard_kpis.os, "replace", disk_full)
+        with pytest.raises(OSError):
+            kpis.snapshot()
+    assert kpis.snapshot()
+
+    restored = DashboardKPIs(snapshot_path=str(tmp_path / "kpis.json"))
+    assert restored.get_stats()["rows"] == 1
+    assert restored.dashboard("org-a")["totalDeals"] == 1
+
+
+def test_expired_score_rows_are_pruned(kpis):
+    old_day = (datetime.now(timezone.utc) - timedelta(days=120)).date().isoformat()
+    today = datetime.now(timezone.utc).date().isoformat()
+    for row_id, day in (("s1", old_day), ("s2", today)):
+        kpis.apply_change({"table": "lead_scores", "eventType": "INSERT", "new": {
+            "id": row_id, "organization_id": "org-a", "score": 90, "created_at": day
+        }})
+    kpis.snapshot()
+    assert kpis.get_stats()["rows"] == 1
+    assert kpis.dashboard("org-a")["leadScores"]["7d"] == {"count": 1, "average": 90.0, "hot": 1}
@@ -0,0 +1,49 @@
+"""Document ingestion: fetch policy and hashes that only follow the index to disk."""
+
+import base64
+
+import pytest
+
+from document_ingestion import DocumentHashStore, DocumentIngestionPipeline, check_storage_object, fetch_document
+from knowledge_index import KnowledgeIndex
+
+ORG = "00000000-0000-0000-0000-000000000001"
+
+
+@pytest.mark.parametrize("url", [
+    "file:///etc/passwd",
+    "http://docs.example.com/a.pdf",
+    "https://169.254.169.254/latest/meta-data/",
+])
+def test_public_url_must_be_https_on_an_allowed_host(url):
+    with pytest.raises(ValueError):
+        fetch_document({"organization_id": ORG, "public_url": url}, allowed_hosts=["docs.example.com"])
+
+
+@pytest.mark.parametrize("bucket,path", [
+    ("insurance-policy-documents", "11111111-1111-1111-1111-111111111111/policy.pdf"),
+    ("insurance-policy-documents", f"{ORG}/../other/policy.pdf"),
+    ("insurance-policy-documents", "policy.pdf"),
+    ("private-bucket", f"{ORG}/policy.pdf"),
+])
+def test_storage_objects_outside_the_organization_folder_are_refused(bucket, path):
+    with pytest.raises(ValueError):
+        check_storage_object(ORG, bucket, path)
+
+
+def test_hash_is_recorded_only_once_the_index_is_on_disk(tmp_path):
+    document = {
+        "id": "doc-1", "organization_id": ORG, "original_filename": "note.txt", "mime_type": "text/plain",
+        "content_base64": base64.b64encode(b"Polizza casa con copertura incendio e furto.").decode()
+    }
+    hash_store = DocumentHashStore(tmp_path / "hashes.sqlite")
+    pipeline = DocumentIngestionPipeline(KnowledgeIndex(tmp_path / "index"), hash_store, workers=1, fetchers=1)
+    try:
+        report = pipeline.run([document])
+        assert report["indexed"] == 1
+        # A restarted process sees the compacted passages, so the document is skipped
+        restarted = DocumentIngestionPipeline(KnowledgeIndex(tmp_path / "index"), hash_store, workers=1, fetchers=1)
+        assert restarted.index.search(ORG, "incendio")["passages"]
+        assert restarted.run([document])["skipped_unchanged"] == 1
+    finally:
+        pipeline.close()
@@ -0,0 +1,47 @@
+"""Shared credentials: cached load failures and the Vertex client fallback."""
+
+import pytest
+
+import google_credentials
+
+
+class FakeProvider:
+    credentials = object()
+
+    def __init__(self, source):
+        self.source = source
+
+
+class LegacyClient:
+    """A client version without a credentials argument."""
+
+    def __init__(self, model):
+        self.model = model
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    monkeypatch.setattr(google_credentials, "_shared_provider", None)
+    monkeypatch.setattr(google_credentials, "_shared_provider_failed", False)
+    monkeypatch.setattr(google_credentials, "GOOGLE_AUTH_AVAILABLE", True)
+    return monkeypatch
+
+
+def test_failed_load_is_not_retried(shared):
+    loads = []
+    shared.setattr(google_credentials.GoogleCredentialsProvider, "load", lambda self: loads.append(1) or False)
+    assert google_credentials.get_credentials_provider() is None
+    assert google_credentials.get_credentials_provider() is None
+    assert len(loads) == 1
+
+
+def test_in_memory_credentials_never_fall_back_silently(shared):
+    shared.setattr(google_credentials, "get_credentials_provider", lambda: FakeProvider("environment variable"))
+    with pytest.raises(RuntimeError):
+        google_credentials.build_vertex_client(LegacyClient, model="gemini")
+
+
+def test_default_lookup_is_used_when_it_sees_the_same_credentials(shared):
+    shared.setenv("GOOGLE_APPLICATION_CREDENTIALS", "/secrets/key.json")
+    shared.setattr(google_credentials, "get_credentials_provider", lambda: FakeProvider("/secrets/key.json"))
+    assert google_credentials.build_vertex_client(LegacyClient, model="gemini").model == "gemini"
@@ -0,0 +1,81 @@
+"""JWT audit against tokens issued by the local GoTrue stub."""
+
+import json
+import urllib.request
+from collections import Counter
+
+import pytest
+
+from gotrue_stub import GoTrueStub, mint_batch
+from jwt_audit import audit_tokens, extract_tokens, inspect_token, main
+
+
+@pytest.fixture
+def stub():
+    with GoTrueStub() as server:
+        yield server
+
+
+def login(stub, email):
+    request = urllib.request.Request(
+        f"{stub.url}/auth/v1/token?grant_type=password",
+        data=json.dumps({"email": email, "password": "password"}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())["access_token"]
+
+
+def test_tokens_from_password_login_carry_hook_claims(stub):
+    owner = inspect_token(login(stub, "owner@example.com"))
+    assert owner["user_role"] == "admin"
+    assert owner["organization_id"] == "00000000-0000-0000-0000-000000000001"
+    assert owner["missing_claims"] == []
+    # Super admins have no organization and are not flagged for it
+    assert inspect_token(login(stub, "admin@example.com"))["missing_claims"] == []
+    assert inspect_token(login(stub, "nohook@example.com"))["missing_claims"] == ["user_role", "organization_id"]
+
+
+def test_audit_counts_missing_and_expired_tokens(stub):
+    tokens = mint_batch(stub, 200, missing_rate=0.1, expired_rate=0.2, seed=7)
+    log = [f'{{"event": "login", "access_token": "{token}"}}' for token in tokens]
+    found = extract_tokens(log)
+    assert sum(found.values()) == 200
+
+    report = audit_tokens(found)
+    assert report["total_tokens"] == 200
+    assert report["malformed"] == 0
+    assert 0 < report["missing_required_claims"] < 200
+    assert 0 < report["expired"] < 200
+    assert report["signatures"] == {"unchecked": 200}
+    assert report["claim_presence"]["user_role"]["count"] == 200 - report["missing_required_claims"]
+
+
+def test_repeated_tokens_are_weighted(stub):
+    token = stub.mint("agent@example.com", hook=False)
+    report = audit_tokens(Counter({token: 3, "eyJx.eyJx.broken": 1}))
+    assert report["unique_tokens"] == 2
+    assert report["malformed"] == 1
+    assert report["missing_required_claims"] == 3
+    assert report["flagged"][0]["occurrences"] == 3
+
+
+def test_signature_check_uses_the_stub_secret(stub):
+    pytest.importorskip("jwt")
+    good = stub.mint("owner@example.com")
+    forged = GoTrueStub(secret="another-secret-that-is-also-32-characters").mint("owner@example.com")
+    report = audit_tokens(Counter([good, forged]), secret=stub.secret)
+    assert report["signatures"] == {"valid": 1, "invalid": 1}
+
+
+def test_cli_exit_code_flags_missing_claims(stub, tmp_path, capsys):
+    complete = tmp_path / "complete.log"
+    complete.write_text(stub.mint("owner@example.com") + "\n")
+    incomplete = tmp_path / "incomplete.log"
+    incomplete.write_text(stub.mint("nohook@example.com") + "\n")
+
+    assert main([str(complete), "--json"]) == 0
+    capsys.readouterr()
+    assert main([str(incomplete), "--json"]) == 2
+    assert json.loads(capsys.readouterr().out)["missing_required_claims"] == 1
@@ -0,0 +1,84 @@
+"""BM25 knowledge index: delta updates, tombstones and compaction to disk."""
+
+import pytest
+
+from knowledge_index import KnowledgeIndex
+
+ORG = "org-a"
+
+SOURCES = {
+    "s1": "Polizze auto e moto per flotte aziendali, con assistenza stradale inclusa. Preventivo gratuito.",
+    "s2": "Assicurazione casa contro incendio e furto per famiglie e condomini. Preventivo gratuito.",
+    "s3": "Coperture sanitarie integrative per dipendenti di piccole e medie imprese. Preventivo gratuito.",
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = KnowledgeIndex(path=str(tmp_path))
+    for source_id, text in SOURCES.items():
+        index.upsert_source({"id": source_id, "organization_id": ORG, "source_name": source_id, "extracted_text": text})
+    return index
+
+
+def hits(index, query, top_k=5):
+    return [(passage["source_id"], passage["score"]) for passage in index.search(ORG, query, top_k)["passages"]]
+
+
+def test_delta_search_and_organization_isolation(index):
+    assert hits(index, "incendio casa")[0][0] == "s2"
+    assert index.search("org-b", "incendio casa")["passages"] == []
+
+
+def test_compaction_keeps_scores(index):
+    before = hits(index, "polizze aziendali dipendenti")
+    assert index.save() == 1
+    assert index.get_stats()["delta_passages"] == 0
+    assert hits(index, "polizze aziendali dipendenti") == before
+
+
+def test_reupsert_after_compaction_ignores_tombstones(index):
+    index.save()
+    # Every source mentions "preventivo"; re-indexing two of them tombstones their base
+    # passages, which must not inflate df past the live passage count
+    for source_id in ("s1", "s2"):
+        index.upsert_source({"id": source_id, "organization_id": ORG, "source_name": source_id, "extracted_text": SOURCES[source_id]})
+    results = hits(index, "preventivo")
+    assert {source_id for source_id, _ in results} == {"s1", "s2", "s3"}
+    assert all(score > 0 for _, score in results)
+
+
+def test_compacted_index_reloads_from_disk(index, tmp_path):
+    index.delete_source(ORG, "s3")
+    index.save()
+    reopened = KnowledgeIndex(path=str(tmp_path))
+    assert [source_id for source_id, _ in hits(reopened, "incendio")] == ["s2"]
+    assert hits(reopened, "sanitarie dipendenti") == []
+    assert reopened.owner_of("s1") == ORG
+
+
+def test_uncompacted_changes_survive_a_restart(index, tmp_path):
+    index.save()
+    index.delete_source(ORG, "s1")
+    index.upsert_source({"id": "s4", "organization_id": ORG, "source_name": "s4", "extracted_text": "Tutela legale per professionisti."})
+
+    # No save: a crashed process leaves only the segment and the journal behind
+    restarted = KnowledgeIndex(path=str(tmp_path))
+    assert "s1" not in [source for source, _ in hits(restarted, "polizze auto flotte")]
+    assert hits(restarted, "tutela legale")[0][0] == "s4"
+    assert restarted.owner_of("s4") == ORG
+    assert hits(restarted, "incendio casa") == hits(index, "incendio casa")
+
+    # Compaction folds the journal into the segment
+    restarted.save()
+    assert not list(tmp_path.glob("*.kjournal"))
+    assert hits(KnowledgeIndex(path=str(tmp_path)), "tutela legale")[0][0] == "s4"
+
+
+def test_torn_journal_line_is_ignored(index, tmp_path):
+    index.delete_source(ORG, "s2")
+    with open(next(tmp_path.glob("*.kjournal")), "a") as f:
+        f.write('{"op":"delete","sour')
+    restarted = KnowledgeIndex(path=str(tmp_path))
+    sources = {source for source, _ in hits(restarted, "preventivo gratuito")}
+    assert sources == {"s1", "s3"}
@@ -0,0 +1,63 @@
+"""Micro-batcher: results in order, one agent run per model, failures reach every caller."""
+
+import threading
+
+import pytest
+
+from lead_batcher import LeadScoringBatcher
+
+
+def test_results_come_back_to_their_callers():
+    calls = []
+
+    def score_batch(contacts, model):
+        calls.append((model, [contact["id"] for contact in contacts]))
+        return [{"score": contact["id"] * 10, "model": model} for contact in contacts]
+
+    batcher = LeadScoringBatcher(score_batch, max_batch_size=4, max_wait_ms=5)
+    futures = [batcher.submit({"id": i}, "pro" if i % 2 else "flash") for i in range(9)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert [result["score"] for result in results] == [i * 10 for i in range(9)]
+    assert all(result["model"] == ("pro" if i % 2 else "flash") for i, result in enumerate(results))
+    # Every run holds a single model and at most max_batch_size contacts
+    for model, ids in calls:
+        assert all((i % 2 == 1) == (model == "pro") for i in ids)
+        assert len(ids) <= 4
+    stats = batcher.get_stats()
+    assert stats["requests"] == 9 and stats["batched_contacts"] == 9
+
+
+def test_queued_requests_share_one_run():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def score_batch(contacts, model):
+        calls.append(len(contacts))
+        started.set()
+        release.wait(5)
+        return [{"score": 1} for _ in contacts]
+
+    batcher = LeadScoringBatcher(score_batch, max_batch_size=16, max_wait_ms=5, max_in_flight=1)
+    first = batcher.submit({"id": 0})
+    # While the first run is blocked, the rest pile up and are collected together
+    assert started.wait(5)
+    rest = [batcher.submit({"id": i}) for i in range(1, 6)]
+    release.set()
+    for future in [first] + rest:
+        assert future.result(timeout=5) == {"score": 1}
+    assert calls[0] == 1
+    assert sum(calls) == 6 and len(calls) <= 3
+
+
+@pytest.mark.parametrize("score_batch", [
+    lambda contacts, model: 1 / 0,
+    lambda contacts, model: [{"score": 1}],
+])
+def test_failed_run_fails_every_caller(score_batch):
+    batcher = LeadScoringBatcher(score_batch, max_batch_size=2, max_wait_ms=50)
+    futures = [batcher.submit({"id": 1}), batcher.submit({"id": 2})]
+    for future in futures:
+        with pytest.raises(Exception):
+            future.result(timeout=5)
+    assert batcher.get_stats()["failures"] >= 1
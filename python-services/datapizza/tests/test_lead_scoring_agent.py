@@ -0,0 +1,86 @@
+"""Agent response handling: range checks on batch items and what reaches the response cache."""
+
+import json
+
+import pytest
+
+pytest.importorskip("datapizza.agents")
+
+import lead_scoring_agent
+from response_cache import AgentResponseCache
+
+
+def scoring(score, confidence=0.8, **extra):
+    return {"score": score, "category": "hot", "reasoning": "ok",
+            "breakdown": {"email_quality": 20}, "confidence": confidence, **extra}
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Route agent runs to canned responses; returns the list of prompts sent."""
+    prompts, responses = [], []
+
+    def run(scorer, prompt, model, batch=False, organization_id=None):
+        prompts.append(prompt)
+        return responses.pop(0)
+
+    monkeypatch.setattr(lead_scoring_agent, "get_lead_scorer", lambda model=None: object())
+    monkeypatch.setattr(lead_scoring_agent, "_run_lead_scorer", run)
+    monkeypatch.setattr(lead_scoring_agent, "agent_cache", None)
+    return prompts, responses
+
+
+def contacts(count):
+    return [{"name": f"Lead {i}", "email": f"lead{i}@acme.it", "company": "Acme"} for i in range(count)]
+
+
+def test_out_of_range_batch_scores_are_clamped(agent):
+    prompts, responses = agent
+    responses.append(json.dumps([scoring(140, id=0), scoring(-5, confidence=3, id=1), scoring(61.6, id=2)]))
+
+    results = lead_scoring_agent.score_leads_batch(contacts(3), model="test-model")
+
+    assert [result["score"] for result in results] == [100, 0, 62]
+    assert results[1]["confidence"] == 1.0
+    assert len(prompts) == 1
+
+
+def test_unusable_batch_items_are_rescored_individually(agent):
+    prompts, responses = agent
+    responses.append(json.dumps([scoring("n/a", id=0), scoring(70, id=1)]))
+    responses.append(json.dumps(scoring(55)))
+
+    results = lead_scoring_agent.score_leads_batch(contacts(2), model="test-model")
+
+    assert [result["score"] for result in results] == [55, 70]
+    assert len(prompts) == 2
+
+
+def test_malformed_single_response_is_not_cached(agent, monkeypatch, tmp_path):
+    prompts, responses = agent
+    cache = AgentResponseCache(tmp_path / "cache.sqlite")
+    monkeypatch.setattr(lead_scoring_agent, "agent_cache", cache)
+    contact = contacts(1)[0]
+
+    responses.append(json.dumps({"score": 90, "category": "hot"}))
+    assert lead_scoring_agent.score_lead(contact, model="test-model")["agent_used"] == "fallback_basic_algorithm"
+    assert cache.get_stats()["writes"] == 0
+
+    # The next call asks the agent again and caches the complete answer
+    responses.append(json.dumps(scoring(88)))
+    assert lead_scoring_agent.score_lead(contact, model="test-model")["score"] == 88
+    assert lead_scoring_agent.score_lead(contact, model="test-model")["score"] == 88
+    assert len(prompts) == 2
+
+
+def test_malformed_cache_entries_are_ignored(agent, monkeypatch, tmp_path):
+    prompts, responses = agent
+    cache = AgentResponseCache(tmp_path / "cache.sqlite")
+    monkeypatch.setattr(lead_scoring_agent, "agent_cache", cache)
+    contact = contacts(1)[0]
+    key = lead_scoring_agent._cache_key(lead_scoring_agent._build_contact_prompt(contact), "test-model")
+    cache.put(key, lead_scoring_agent.AGENT_NAME, "test-model", lead_scoring_agent.LEAD_SCORING_PROMPT_VERSION, {"score": 90})
+
+    responses.append(json.dumps(scoring(75)))
+    assert lead_scoring_agent.score_lead(contact, model="test-model")["score"] == 75
+    assert len(prompts) == 1
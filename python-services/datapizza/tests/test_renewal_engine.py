@@ -0,0 +1,44 @@
+"""Renewal reminders: bad dates and organizations without renewal settings."""
+
+from renewal_engine import LocalEmailProvider, RenewalEngine
+
+TODAY = "2025-11-01"
+SETTINGS = {"org-a": {"notification_email": None}}
+
+
+def policy(policy_id, end_date, organization_id="org-a", **fields):
+    return {
+        "policy_id": policy_id, "policy_number": f"P-{policy_id}", "end_date": end_date,
+        "organization_id": organization_id, "contact_email": f"{policy_id}@example.com", **fields
+    }
+
+
+def engine():
+    return RenewalEngine(provider=LocalEmailProvider())
+
+
+def test_reminders_follow_the_offsets():
+    result = engine().run([policy("1", "2025-11-08"), policy("2", "2025-12-01"), policy("3", "2025-11-20")], SETTINGS, today=TODAY)
+    assert result["due_by_offset"] == {"7": 1, "30": 1, "60": 0, "90": 0}
+    assert [update["policy_id"] for update in result["updates"]] == ["1", "2"]
+
+
+def test_unparseable_dates_are_skipped_not_fatal():
+    policies = [
+        policy("1", "garbage"),
+        policy("2", "2025-11-08"),
+        policy("3", "2025-11-08", last_renewal_email_sent="not a date"),
+    ]
+    result = engine().run(policies, SETTINGS, today=TODAY)
+    assert result["skipped_invalid_date"] == 2
+    assert [update["policy_id"] for update in result["updates"]] == ["2"]
+    assert engine().classify(policies, today=TODAY)["invalid_dates"] == 2
+
+
+def test_organizations_without_settings_get_no_reminders():
+    policies = [policy("1", "2025-11-08"), policy("2", "2025-11-08", organization_id="org-b")]
+    result = engine().run(policies, SETTINGS, today=TODAY)
+    assert [update["policy_id"] for update in result["updates"]] == ["1"]
+    assert result["skipped_no_settings"] == 1
+    # A row that omits columns still gets the table defaults
+    assert engine().run(policies, {"org-b": {}}, today=TODAY)["sent"] == 1
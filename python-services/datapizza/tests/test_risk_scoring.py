@@ -0,0 +1,134 @@
+"""Risk scoring: parity with src/services/riskScoringService.ts, category edges and what-if runs."""
+
+import numpy as np
+import pytest
+
+from risk_scoring import DEFAULT_RISK_THRESHOLDS, DEFAULT_RISK_WEIGHTS, RISK_CATEGORIES, RiskScoringEngine, score_factors
+
+# insurance_risk_profiles rows; expected scores were computed with riskScoringService.ts
+MIDDLE = {
+    "id": "p-middle", "contact_id": "c-middle", "age": 45, "height_cm": 180, "weight_kg": 90,
+    "smoking_status": "former", "alcohol_consumption": "moderate", "physical_activity_level": "light",
+    "preexisting_conditions": [
+        {"name": "Hypertension", "since": "2019", "controlled": True},
+        {"name": "asthma", "since": "2010", "controlled": False}
+    ],
+    "annual_income_eur": 55000, "total_assets_eur": 120000, "total_debts_eur": 30000,
+    "employment_status": "self_employed", "employment_stability_years": 6, "homeowner": True,
+    "risky_hobbies": ["Rock_Climbing weekends", "chess"], "travel_frequency_per_year": 6, "extreme_sports": False,
+    "high_risk_destinations": ["war_zone", "paris"], "driving_record": "minor_violations", "daily_commute_km": 60
+}
+YOUNG = {
+    "id": "p-young", "contact_id": "c-young", "age": 29, "height_cm": 170, "weight_kg": 65,
+    "smoking_status": "never", "alcohol_consumption": "none", "physical_activity_level": "intense",
+    "preexisting_conditions": [],
+    "annual_income_eur": 100000, "total_assets_eur": 500000, "total_debts_eur": 0,
+    "employment_status": "employed", "employment_stability_years": 12, "homeowner": True,
+    "risky_hobbies": [], "travel_frequency_per_year": 2, "extreme_sports": False,
+    "high_risk_destinations": [], "driving_record": "clean", "daily_commute_km": 20
+}
+# No height/weight/bmi and no categorical answers: BMI falls in the top band, categories take the defaults
+SPARSE = {
+    "id": "p-sparse", "contact_id": "c-sparse", "age": 70,
+    "preexisting_conditions": [
+        {"name": "heart_disease", "since": "2015", "controlled": False},
+        {"name": "Type 2 diabetes", "since": "2018", "controlled": False}
+    ],
+    "annual_income_eur": 0, "total_assets_eur": 0, "total_debts_eur": 5000,
+    "employment_stability_years": 0, "homeowner": False,
+    "risky_hobbies": ["skydiving", "racing", "base_jumping"], "travel_frequency_per_year": 11, "extreme_sports": True,
+    "high_risk_destinations": ["war_zone", "high_crime_area", "extreme_weather_region"],
+    "driving_record": "accidents", "daily_commute_km": 101
+}
+
+EXPECTED = {
+    "p-middle": {"health_score": 65, "financial_score": 58.18, "lifestyle_score": 59.5, "total_risk_score": 38.7, "risk_category": "medium"},
+    "p-young": {"health_score": 93, "financial_score": 85.75, "lifestyle_score": 91.5, "total_risk_score": 9.63, "risk_category": "low"},
+    "p-sparse": {"health_score": 31.75, "financial_score": 15, "lifestyle_score": 13, "total_risk_score": 78.9, "risk_category": "high"},
+}
+
+
+@pytest.fixture
+def engine():
+    return RiskScoringEngine()
+
+
+def scored(result):
+    return {row["id"]: {key: value for key, value in row.items() if key not in ("id", "contact_id")} for row in result["profiles"]}
+
+
+def test_scores_match_the_typescript_service(engine):
+    result = engine.score_batch([MIDDLE, YOUNG, SPARSE])
+    assert scored(result) == EXPECTED
+    assert result["summary"]["categories"] == {"low": 1, "medium": 1, "high": 1, "very_high": 0}
+
+
+def test_stored_bmi_wins_over_height_and_weight(engine):
+    # 90kg at 180cm is BMI 27.8; a stored 22 moves the profile to the normal band (+3 health)
+    result = engine.score_batch([{**MIDDLE, "bmi": 22}])
+    assert result["profiles"][0]["health_score"] == 68
+
+
+def test_single_values_outside_arrays_count_once(engine):
+    as_strings = {**MIDDLE, "risky_hobbies": "chess", "high_risk_destinations": "war_zone"}
+    as_lists = {**MIDDLE, "risky_hobbies": ["chess"], "high_risk_destinations": ["war_zone"]}
+    assert scored(engine.score_batch([as_strings])) == scored(engine.score_batch([as_lists]))
+
+
+@pytest.mark.parametrize("section_score, total, category", [
+    (70, 30, "low"),
+    (69.99, 30.01, "medium"),
+    (40, 60, "medium"),
+    (39.99, 60.01, "high"),
+    (15, 85, "high"),
+    (14.99, 85.01, "very_high"),
+])
+def test_category_edges_are_inclusive_upper_bounds(section_score, total, category):
+    # One column per section carrying the section score directly
+    factors = {section: np.array([[section_score]]) for section in ("health", "financial", "lifestyle")}
+    weights = {section: {"score": 1.0} for section in factors}
+    weights["total"] = DEFAULT_RISK_WEIGHTS["total"]
+    scores = score_factors(factors, weights, DEFAULT_RISK_THRESHOLDS)
+    assert scores["total"][0] == total
+    assert RISK_CATEGORIES[scores["category"][0]] == category
+
+
+def test_batch_reports_changes_against_stored_categories(engine):
+    result = engine.score_batch([{**MIDDLE, "risk_category": "low"}, {**YOUNG, "risk_category": "low"}, SPARSE])
+    assert result["category_changes"] == {"low -> medium": 1}
+    assert result["changed"] == 1
+
+
+def test_what_if_thresholds_move_categories(engine):
+    portfolio_id = engine.score_batch([MIDDLE, YOUNG, SPARSE])["portfolio_id"]
+    result = engine.what_if(portfolio_id, thresholds={"low": 10, "medium": 40, "high": 70})
+    assert result["category_changes"] == {"high -> very_high": 1}
+    assert result["changed_profiles"] == [{
+        "id": "p-sparse", "contact_id": "c-sparse", "total_risk_score": 78.9,
+        "score_change": 0.0, "category_change": "high -> very_high"
+    }]
+    assert result["baseline_summary"]["categories"] == {"low": 1, "medium": 1, "high": 1, "very_high": 0}
+
+
+def test_what_if_weights_apply_on_top_of_the_baseline(engine):
+    portfolio_id = engine.score_batch([MIDDLE, YOUNG, SPARSE])["portfolio_id"]
+    # Lifestyle only, at its default 0.3 weight: the total risk is 0.3 * (100 - lifestyle score)
+    result = engine.what_if(portfolio_id, weights={"total": {"health": 0, "financial": 0}}, include_profiles=True)
+    assert result["weights"]["total"] == {"health": 0.0, "financial": 0.0, "lifestyle": 0.3}
+    totals = {row["id"]: row["total_risk_score"] for row in result["profiles"]}
+    assert totals == {"p-middle": 12.15, "p-young": 2.55, "p-sparse": 26.1}
+    assert result["category_changes"] == {"medium -> low": 1, "high -> low": 1}
+
+    result = engine.what_if(portfolio_id, weights={"total": {"health": 0, "financial": 0, "lifestyle": 1}})
+    assert result["category_changes"] == {"high -> very_high": 1}
+    assert result["changed_profiles"][0]["score_change"] == pytest.approx(87 - 78.9)
+
+
+def test_what_if_rejects_unknown_portfolios_and_rules(engine):
+    with pytest.raises(KeyError):
+        engine.what_if("missing")
+    portfolio_id = engine.score_batch([MIDDLE])["portfolio_id"]
+    with pytest.raises(ValueError):
+        engine.what_if(portfolio_id, weights={"health": {"height": 1}})
+    with pytest.raises(ValueError):
+        engine.what_if(portfolio_id, thresholds={"low": 70, "medium": 60})
@@ -0,0 +1,76 @@
+"""Trigger index: filter compilation and dispatch by organization and trigger type."""
+
+import pytest
+
+from trigger_index import TriggerIndex, compile_filter
+
+
+def workflow(trigger_type="form_submit", filters=None):
+    config = {"filters": filters} if filters is not None else {}
+    return [
+        {"id": "t", "type": "input", "data": {"nodeType": trigger_type, "config": config}},
+        {"id": "a", "type": "default", "data": {"nodeType": "send_email"}},
+    ]
+
+
+@pytest.mark.parametrize("spec", [
+    "score>5",
+    ["score", "gt", 5],
+    {"op": "eq", "value": 1},
+    {"field": "score", "op": "between", "value": 1},
+    {"field": "score", "op": "gt"},
+    {"field": "score", "op": "lte", "value": "high"},
+    {"field": "score", "op": "gte", "value": True},
+    {"field": "status", "op": "in", "value": {"a": 1}},
+    {"field": "status", "op": "in", "value": [["a"]]},
+    {"field": "name", "op": "contains", "value": None},
+])
+def test_bad_specs_raise_value_error(spec):
+    with pytest.raises(ValueError):
+        compile_filter(spec)
+
+
+def test_operators():
+    event = {"contact": {"source": "Website", "score": "72", "tags": ["vip"]}}
+    assert compile_filter({"field": "contact.source", "value": "Website"})(event)
+    assert compile_filter({"field": "contact.source", "op": "contains", "value": "web"})(event)
+    assert compile_filter({"field": "contact.score", "op": "gte", "value": 70})(event)
+    assert not compile_filter({"field": "contact.score", "op": "lt", "value": "70"})(event)
+    assert compile_filter({"field": "contact.source", "op": "in", "value": ["Website", "Ads"]})(event)
+    # Unhashable payload values simply do not match an "in" filter
+    assert not compile_filter({"field": "contact.tags", "op": "in", "value": ["vip"]})(event)
+    assert compile_filter({"field": "contact.tags", "op": "exists"})(event)
+    assert not compile_filter({"field": "contact.missing", "op": "ne", "value": 1})(event)
+
+
+def test_dispatch_is_scoped_to_organization_type_and_filters():
+    index = TriggerIndex()
+    index.register("w1", "org-a", workflow(filters=[{"field": "source", "value": "website"}]))
+    index.register("w2", "org-a", workflow())
+    index.register("w3", "org-b", workflow())
+    index.register("w4", "org-a", workflow("deal_won"))
+
+    assert sorted(index.dispatch("org-a", "form_submit", {"source": "website"})) == ["w1", "w2"]
+    assert index.dispatch("org-a", "form_submit", {"source": "ads"}) == ["w2"]
+    assert index.dispatch("org-b", "deal_won", {}) == []
+    assert index.unregister("w2")
+    assert index.dispatch("org-a", "form_submit", {"source": "ads"}) == []
+    stats = index.get_stats()
+    assert stats["events"] == 4 and stats["unmatched_events"] == 2 and stats["indexed_workflows"] == 3
+
+
+def test_bad_filter_leaves_the_previous_entry_in_place():
+    index = TriggerIndex()
+    index.register("w1", "org-a", workflow())
+    with pytest.raises(ValueError):
+        index.register("w1", "org-a", workflow(filters=[{"field": "score", "op": "gt"}]))
+    with pytest.raises(ValueError):
+        index.register("w1", "org-a", workflow(filters="score>5"))
+    assert index.dispatch("org-a", "form_submit", {}) == ["w1"]
+
+
+def test_workflow_without_trigger_is_unindexed():
+    index = TriggerIndex()
+    index.register("w1", "org-a", workflow())
+    assert index.register("w1", "org-a", workflow()[1:]) is None
+    assert len(index) == 0
@@ -0,0 +1,101 @@
+"""Timer wheel and durable wait_delay timers of the workflow engine."""
+
+import time
+import asyncio
+
+from workflow_engine import TimerWheel, WorkflowEngine, RunStore, delay_seconds, DEFAULT_DELAY_SECONDS
+
+
+def workflow(delay):
+    elements = [
+        {"id": "t", "type": "input", "data": {"nodeType": "form_submit"}},
+        {"id": "wait", "type": "default", "data": {"nodeType": "wait_delay", "config": {"delay_seconds": delay}}},
+        {"id": "email", "type": "default", "data": {"nodeType": "send_email"}},
+    ]
+    edges = [{"id": "e1", "source": "t", "target": "wait"}, {"id": "e2", "source": "wait", "target": "email"}]
+    return elements, edges
+
+
+async def wait_for_status(engine, run_id, status, timeout_s=3.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        run = engine.get_run(run_id)
+        if run and run["status"] == status:
+            return run
+        await asyncio.sleep(0.01)
+    return engine.get_run(run_id)
+
+
+def test_delay_seconds():
+    assert delay_seconds({"delay_seconds": 90}) == 90
+    assert delay_seconds({"duration": 2, "unit": "giorni"}) == 2 * 86400
+    assert delay_seconds({"duration": 3, "unit": "hours"}) == 3 * 3600
+    assert delay_seconds({}) == DEFAULT_DELAY_SECONDS
+    assert delay_seconds({"delay_seconds": -5}) == 0
+
+
+def test_timer_wheel_fires_once_after_wrapping_rounds():
+    fired = []
+
+    async def scenario():
+        wheel = TimerWheel(fired.append, tick_s=0.01, slots=4)
+        wheel.start()
+        now = time.time()
+        wheel.schedule("late", now + 0.1)      # several turns of a 4-slot wheel
+        wheel.schedule("early", now + 0.02)
+        wheel.schedule("cancelled", now + 0.03)
+        wheel.cancel("cancelled")
+        await asyncio.sleep(0.05)
+        early_only = list(fired)
+        await asyncio.sleep(0.15)
+        await wheel.stop()
+        return early_only, len(wheel)
+
+    early_only, pending = asyncio.run(scenario())
+    assert early_only == ["early"]
+    assert fired == ["early", "late"]
+    assert pending == 0
+
+
+def test_wait_delay_parks_run_then_resumes(tmp_path):
+    async def scenario():
+        engine = WorkflowEngine(store=RunStore(str(tmp_path / "engine.sqlite3")), workers=2, tick_s=0.01)
+        await engine.start()
+        workflow_id = engine.register_workflow(*workflow(0.1), organization_id="org")
+        run_id = engine.start_run(workflow_id, {"contact": {"email": "a@b.it"}}, organization_id="org")
+        waiting = await wait_for_status(engine, run_id, "waiting")
+        completed = await wait_for_status(engine, run_id, "completed")
+        stats = engine.get_stats()
+        await engine.stop()
+        return waiting, completed, stats
+
+    waiting, completed, stats = asyncio.run(scenario())
+    assert waiting["status"] == "waiting"
+    assert completed["status"] == "completed"
+    assert stats["timers_fired"] == 1
+    assert stats["outbox_sent"] == 1
+
+
+def test_timers_survive_a_restart(tmp_path):
+    path = str(tmp_path / "engine.sqlite3")
+
+    async def first():
+        engine = WorkflowEngine(store=RunStore(path), workers=2, tick_s=0.01)
+        await engine.start()
+        workflow_id = engine.register_workflow(*workflow(0.2), organization_id="org")
+        run_id = engine.start_run(workflow_id, {}, organization_id="org")
+        await wait_for_status(engine, run_id, "waiting")
+        await engine.stop()
+        return run_id
+
+    async def second(run_id):
+        engine = WorkflowEngine(store=RunStore(path), workers=2, tick_s=0.01)
+        await engine.start()
+        run = await wait_for_status(engine, run_id, "completed")
+        await engine.stop()
+        return run, engine.outbox.sent
+
+    run_id = asyncio.run(first())
+    run, sent = asyncio.run(second(run_id))
+    assert run["status"] == "completed"
+    assert sent == 1
@@ -0,0 +1,45 @@
+"""Structural validation of workflow graphs."""
+
+from conftest import node, edge, linear
+from workflow_graph import validate_workflow_graph
+
+
+def test_valid_linear_workflow():
+    elements, edges = linear("form_submit", "send_email", "wait_delay", "send_email")
+    result = validate_workflow_graph(elements, edges)
+    assert result["valid"], result["errors"]
+    assert result["topological_order"] == ["n0", "n1", "n2", "n3"]
+    assert result["stats"]["max_depth"] == 3
+
+
+def test_reports_every_problem():
+    elements, edges = linear("form_submit", "send_email", "ai_score")
+    elements.append(node("n1", "send_email"))                # duplicate id
+    elements.append(node("bogus", "teleport"))                # unknown type
+    elements.append(node("lonely", "update_contact"))         # orphan
+    edges += [edge("n2", "missing"), edge("n1", "n0")]        # dangling, into trigger
+    errors = validate_workflow_graph(elements, edges)["errors"]
+    joined = "\n".join(errors)
+    assert "Duplicate element ID 'n1'" in joined
+    assert "Invalid nodeType 'teleport'" in joined
+    assert "Orphan node 'lonely'" in joined
+    assert "Invalid target ID 'missing'" in joined
+    assert "Trigger 'n0' cannot have incoming connections" in joined
+
+
+def test_cycle_and_unreachable_nodes():
+    elements, edges = linear("deal_won", "send_email")
+    elements += [node("a", "wait_delay"), node("b", "send_notification")]
+    edges += [edge("a", "b"), edge("b", "a")]
+    result = validate_workflow_graph(elements, edges)
+    assert not result["valid"]
+    assert any(error.startswith("Cycle detected: ") for error in result["errors"])
+    assert result["topological_order"] == []
+
+
+def test_missing_and_multiple_triggers():
+    assert "Workflow has no trigger node" in validate_workflow_graph(*linear("send_email", "wait_delay"))["errors"]
+    elements, edges = linear("form_submit", "send_email")
+    elements.append(node("t2", "deal_won", "input"))
+    edges.append(edge("t2", "n1"))
+    assert any("multiple trigger nodes" in error for error in validate_workflow_graph(elements, edges)["errors"])
@@ -0,0 +1,32 @@
+"""Layered left-to-right layout of workflow graphs."""
+
+from conftest import node, edge, linear
+from workflow_layout import layout_workflow, ORIGIN_X, ORIGIN_Y, LAYER_SPACING
+
+
+def test_linear_layout_matches_prompt_rules():
+    elements, edges = linear("form_submit", "send_email", "wait_delay")
+    layout_workflow(elements, edges)
+    assert [element["position"] for element in elements] == [
+        {"x": ORIGIN_X + i * LAYER_SPACING, "y": ORIGIN_Y} for i in range(3)
+    ]
+
+
+def test_branching_layout_is_layered_and_deterministic():
+    elements = [node("t", "form_submit", "input"), node("a", "send_email"), node("b", "ai_score"), node("c", "send_notification")]
+    edges = [edge("t", "a"), edge("t", "b"), edge("a", "c"), edge("b", "c"), edge("t", "c")]
+    first = [dict(e["position"]) for e in layout_workflow(elements, edges)]
+    second = [dict(e["position"]) for e in layout_workflow([dict(e) for e in elements], edges)]
+    assert first == second
+    xs = {e["id"]: e["position"]["x"] for e in elements}
+    assert xs["t"] < xs["a"] == xs["b"] < xs["c"]
+    assert elements[1]["position"]["y"] != elements[2]["position"]["y"]
+    positions = {(p["x"], p["y"]) for p in first}
+    assert len(positions) == len(elements)
+
+
+def test_layout_survives_cycles():
+    elements, edges = linear("form_submit", "send_email", "wait_delay")
+    edges.append(edge("n2", "n1"))
+    layout_workflow(elements, edges)
+    assert all("position" in element for element in elements)
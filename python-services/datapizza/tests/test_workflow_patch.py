@@ -0,0 +1,90 @@
+"""Rule-planned patches: additions, anchored inserts, removals, delay changes and what is left to the agent."""
+
+import pytest
+
+from workflow_patch import apply_patch, plan_rule_patch, validate_patch
+
+
+def chain(*node_types):
+    elements = [
+        {"id": f"n{i}", "type": "default", "data": {"nodeType": node_type, "label": node_type, "config": {}}}
+        for i, node_type in enumerate(node_types)
+    ]
+    edges = [{"id": f"e{i}", "source": f"n{i}", "target": f"n{i + 1}"} for i in range(len(node_types) - 1)]
+    return elements, edges
+
+
+def flow(elements, edges, patch):
+    """Node types along the patched chain, starting from the trigger."""
+    patched = apply_patch(elements, edges, patch)
+    types = {element["id"]: element["data"]["nodeType"] for element in patched["elements"]}
+    following = {edge["source"]: edge["target"] for edge in patched["edges"]}
+    node, result = "n0", []
+    while node:
+        result.append(types[node])
+        node = following.get(node)
+    return result
+
+
+def test_without_delay_adds_a_step_and_removes_nothing():
+    elements, edges = chain("deal_won", "wait_delay", "send_email", "send_notification")
+    patch = plan_rule_patch(elements, edges, "also send a thank you email without delay")
+    assert patch["remove_nodes"] == []
+    assert [node["data"]["nodeType"] for node in patch["add_nodes"]] == ["send_email"]
+    assert validate_patch(elements, edges, patch)["valid"]
+
+
+def test_before_anchor_is_not_added_as_a_step():
+    elements, edges = chain("deal_won", "send_email", "send_notification")
+    patch = plan_rule_patch(elements, edges, "add a 3 day wait before the email")
+    assert [node["data"]["nodeType"] for node in patch["add_nodes"]] == ["wait_delay"]
+    assert flow(elements, edges, patch) == ["deal_won", "wait_delay", "send_email", "send_notification"]
+
+
+def test_remove_verb_drops_the_named_step_and_reconnects():
+    elements, edges = chain("deal_won", "wait_delay", "send_email", "send_notification")
+    patch = plan_rule_patch(elements, edges, "togli l'attesa")
+    assert patch["remove_nodes"] == ["n1"]
+    assert flow(elements, edges, patch) == ["deal_won", "send_email", "send_notification"]
+
+
+def test_delay_change_needs_a_wait_to_be_named():
+    elements, edges = chain("deal_won", "wait_delay", "send_email")
+    assert plan_rule_patch(elements, edges, "set the email subject to Hello 2 days") is None
+    patch = plan_rule_patch(elements, edges, "cambia l'attesa a 3 giorni")
+    assert patch["update_nodes"] == [{"id": "n1", "data": {"config": {"duration": 3, "unit": "days"}, "label": "Wait 3 Days"}}]
+
+
+def test_delay_change_only_touches_the_targeted_wait():
+    elements, edges = chain("deal_won", "wait_delay", "send_email", "wait_delay", "send_notification")
+    patch = plan_rule_patch(elements, edges, "change the delay before the notification to 5 days")
+    assert [update["id"] for update in patch["update_nodes"]] == ["n3"]
+    # Ambiguous between two waits: left to the agent
+    assert plan_rule_patch(elements, edges, "change the delay to 5 days") is None
+
+
+@pytest.mark.parametrize("change_request", [
+    "move the notification before the email",
+    "replace the email with a notification",
+    "swap the email and the notification",
+    "rename the email step to Hello",
+    "disable the email step",
+    "update the email template",
+    "modifica il testo della email",
+    "send an email",
+    "also move the notification before the email",
+])
+def test_requests_without_an_add_verb_go_to_the_agent(change_request):
+    elements, edges = chain("deal_won", "send_email", "send_notification")
+    assert plan_rule_patch(elements, edges, change_request) is None
+
+
+def test_add_verbs_in_both_languages():
+    elements, edges = chain("deal_won", "send_email")
+    for change_request in ("add a notification", "also notify the sales team", "aggiungi una notifica", "invia anche una notifica"):
+        patch = plan_rule_patch(elements, edges, change_request)
+        assert [node["data"]["nodeType"] for node in patch["add_nodes"]] == ["send_notification"], change_request
+
+
+def test_empty_workflow_is_left_to_the_agent():
+    assert plan_rule_patch([], [], "add an email") is None
@@ -0,0 +1,65 @@
+"""Rule engine: one step per mention, delay placement, negation and patch step matching."""
+
+import pytest
+
+from workflow_rules import WorkflowRuleEngine
+
+
+@pytest.fixture
+def engine():
+    return WorkflowRuleEngine()
+
+
+def chain(result):
+    return [element["data"]["nodeType"] for element in result["elements"]]
+
+
+def labels(result):
+    return [element["data"]["label"] for element in result["elements"]]
+
+
+def test_every_mention_becomes_a_step_in_text_order(engine):
+    result = engine.generate("Send welcome email when form is submitted, wait 2 days, then send a follow-up email")
+    assert chain(result) == ["form_submit", "send_email", "wait_delay", "send_email"]
+    assert labels(result)[1] == "Send Welcome Email"
+    assert labels(result)[3] == "Send Follow-up Email"
+
+    italian = engine.generate("invia email, attendi 2 giorni, invia email di nuovo")
+    assert chain(italian) == ["form_submit", "send_email", "wait_delay", "send_email"]
+
+
+def test_conditions_and_compound_words_are_not_extra_steps(engine):
+    assert chain(engine.generate("Score new contacts and create deal if score is high")) == ["form_submit", "ai_score", "create_deal"]
+    assert chain(engine.generate("Send a weekly newsletter email to contacts")) == ["time_trigger", "send_email"]
+
+
+@pytest.mark.parametrize("description", [
+    "send email after 3 days",
+    "invia email dopo 3 giorni",
+    "Send follow-up email 2 days after deal is won",
+])
+def test_wait_runs_before_the_step_it_delays(engine, description):
+    result = engine.generate(description)
+    types = chain(result)
+    assert types.index("wait_delay") < types.index("send_email")
+    wait = result["elements"][types.index("wait_delay")]
+    assert wait["data"]["config"]["unit"] == "days"
+
+
+def test_wait_mentioned_in_the_middle_stays_in_place(engine):
+    result = engine.generate("when a deal is won send a thank you email, then wait 1 week and notify the sales team")
+    assert chain(result) == ["deal_won", "send_email", "wait_delay", "send_notification"]
+
+
+@pytest.mark.parametrize("description", [
+    "when form is NOT submitted send email",
+    "quando il modulo non è compilato invia email",
+])
+def test_negated_trigger_is_not_covered(engine, description):
+    assert engine.generate(description) is None
+    assert engine.get_stats()["recent_uncovered"][-1] == description
+
+
+def test_negated_actions_are_not_steps(engine):
+    steps = engine.match_steps("also send a thank you email without delay")
+    assert [step["nodeType"] for step in steps] == ["send_email"]
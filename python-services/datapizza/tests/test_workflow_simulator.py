@@ -0,0 +1,77 @@
+"""Dry-run simulation: volumes, filters on sample versus synthetic events, capped streams and flags."""
+
+import pytest
+
+import workflow_simulator
+from workflow_simulator import simulate_workflow
+
+
+def scoring_workflow(filters=None, wait_days=None):
+    config = {"filters": filters} if filters else {}
+    elements = [
+        {"id": "t", "type": "input", "data": {"nodeType": "form_submit", "config": config}},
+        {"id": "s", "type": "default", "data": {"nodeType": "ai_score"}},
+        {"id": "m", "type": "default", "data": {"nodeType": "send_email"}},
+    ]
+    edges = [{"id": "e1", "source": "t", "target": "s"}, {"id": "e2", "source": "s", "target": "m"}]
+    if wait_days:
+        elements.insert(2, {"id": "w", "type": "default", "data": {"nodeType": "wait_delay", "config": {"duration": wait_days, "unit": "days"}}})
+        edges[1] = {"id": "e2", "source": "s", "target": "w"}
+        edges.append({"id": "e3", "source": "w", "target": "m"})
+    return elements, edges
+
+
+SOURCE_FILTER = [{"field": "contact.source", "value": "website"}]
+
+
+def test_sample_events_are_filtered_and_costed():
+    elements, edges = scoring_workflow(SOURCE_FILTER)
+    events = [{"contact": {"source": "website"}}, {"contact": {"source": "ads"}}, {"contact": {"source": "website"}}]
+    result = simulate_workflow(elements, edges, events=events, horizon_hours=24)
+    assert result["runs"] == 2 and result["filtered_out"] == 1
+    assert result["trigger_filters_applied"]
+    assert result["llm_calls"] == 2
+    assert result["estimated_cost_eur"]["per_run"] == pytest.approx(0.0028)
+    assert not result["expensive"]
+
+
+def test_synthetic_events_are_not_rejected_by_trigger_filters():
+    elements, edges = scoring_workflow(SOURCE_FILTER)
+    result = simulate_workflow(elements, edges, events_per_hour=5000, horizon_hours=24)
+    assert result["runs"] == result["events"] > 100000
+    assert not result["trigger_filters_applied"]
+    assert result["expensive"]
+    assert any("LLM calls/day" in flag for flag in result["flags"])
+
+    quarter = simulate_workflow(elements, edges, events_per_hour=400, horizon_hours=24, match_rate=0.25)
+    assert quarter["runs"] == pytest.approx(quarter["events"] * 0.25, rel=0.1)
+    with pytest.raises(ValueError):
+        simulate_workflow(elements, edges, match_rate=1.5)
+
+
+def test_capped_stream_is_scaled_to_the_horizon(monkeypatch):
+    monkeypatch.setattr(workflow_simulator, "MAX_SIMULATED_EVENTS", 1000)
+    elements, edges = scoring_workflow()
+    result = simulate_workflow(elements, edges, events_per_hour=200, horizon_hours=24 * 31)
+    assert result["simulated_events"] == 1000
+    # 200/h over 744 h: about 148,800 events, not the 1000 simulated
+    assert result["events"] == pytest.approx(148800, rel=0.1)
+    assert result["llm_calls_per_day"] == pytest.approx(4800, rel=0.1)
+    assert result["estimated_cost_eur"]["per_day"] == pytest.approx(4800 * 0.0028, rel=0.1)
+
+
+def test_too_many_sample_events_are_rejected(monkeypatch):
+    monkeypatch.setattr(workflow_simulator, "MAX_SIMULATED_EVENTS", 10)
+    elements, edges = scoring_workflow()
+    with pytest.raises(ValueError):
+        simulate_workflow(elements, edges, events=[{}] * 11)
+
+
+def test_wait_stretches_the_critical_path_but_not_processing_time():
+    elements, edges = scoring_workflow(wait_days=2)
+    result = simulate_workflow(elements, edges, events=[{"offset_s": 0}, {"offset_s": 60}])
+    assert result["critical_path"]["nodes"] == ["t", "s", "w", "m"]
+    assert result["critical_path"]["wall_time_s"] == pytest.approx(2 * 86400 + 2.8)
+    assert result["critical_path"]["processing_ms"] == pytest.approx(2800)
+    assert result["peak_concurrency"]["runs_in_flight"] == 2
+    assert result["peak_concurrency"]["llm_calls"] == 1
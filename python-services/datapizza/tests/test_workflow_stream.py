@@ -0,0 +1,72 @@
+"""Incremental workflow parsing: chunk boundaries, escaped strings and truncated output."""
+
+import json
+
+import pytest
+
+from workflow_stream import IncrementalWorkflowParser
+
+WORKFLOW = {
+    "name": "Welcome {new} [contacts]",
+    "elements": [
+        {"id": "t", "type": "input", "data": {"nodeType": "form_submit", "label": "Form \"Contact us\" {submitted}"}},
+        {"id": "a", "type": "default", "data": {"nodeType": "send_email", "label": "Send \\ welcome ]", "config": {"tags": ["a", "b"]}}},
+    ],
+    "edges": [{"id": "e1", "source": "t", "target": "a", "label": "}"}],
+    "description": "two steps"
+}
+TEXT = "Here is the workflow:\n```json\n" + json.dumps(WORKFLOW, indent=2) + "\n```\nDone."
+
+
+def parse(chunks):
+    parser = IncrementalWorkflowParser()
+    events = []
+    for chunk in chunks:
+        events += parser.feed(chunk)
+    return parser, events
+
+
+EXPECTED = [("node", WORKFLOW["elements"][0]), ("node", WORKFLOW["elements"][1]), ("edge", WORKFLOW["edges"][0])]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(TEXT)])
+def test_objects_split_across_chunks_are_emitted_once_complete(size):
+    parser, events = parse(TEXT[i:i + size] for i in range(0, len(TEXT), size))
+    assert events == EXPECTED
+    assert parser.finished
+    assert parser.document == TEXT
+
+
+def test_each_object_is_emitted_by_the_chunk_that_closes_it():
+    text = json.dumps(WORKFLOW)
+    cut = text.index(json.dumps(WORKFLOW["elements"][0])) + len(json.dumps(WORKFLOW["elements"][0]))
+    parser = IncrementalWorkflowParser()
+    assert parser.feed(text[:cut - 1]) == []
+    assert parser.feed(text[cut - 1:cut]) == [EXPECTED[0]]
+
+
+def test_escaped_quotes_and_backslashes_split_mid_escape():
+    text = json.dumps({"elements": [{"id": "x", "data": {"label": "say \\\"}\\\" \\\\"}}]})
+    for cut in range(len(text)):
+        _, events = parse([text[:cut], text[cut:]])
+        assert events == [("node", json.loads(text)["elements"][0])]
+
+
+def test_truncated_output_emits_only_complete_objects():
+    text = json.dumps(WORKFLOW)
+    cut = text.index('"edges"') + len('"edges": [{"id": "e1", "sou')
+    parser, events = parse([text[:cut]])
+    assert events == EXPECTED[:2]
+    assert not parser.finished
+    assert parse([text[:5]])[1] == []
+
+
+def test_arrays_outside_elements_and_edges_are_not_streamed():
+    _, events = parse([json.dumps({"meta": {"elements": [{"id": "nested"}]}, "tags": [{"id": "t"}], "edges": []})])
+    assert events == []
+
+
+def test_text_after_the_object_is_ignored():
+    parser, events = parse([json.dumps({"edges": [{"id": "e"}]}) + ' {"elements": [{"id": "late"}]}'])
+    assert events == [("edge", {"id": "e"})]
+    assert parser.finished
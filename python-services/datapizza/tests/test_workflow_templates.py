@@ -0,0 +1,74 @@
+"""Template retrieval: curated matches, step coverage and per-organization learning."""
+
+import pytest
+
+from workflow_templates import WorkflowTemplateLibrary
+
+
+@pytest.fixture
+def library(tmp_path):
+    return WorkflowTemplateLibrary(path=str(tmp_path / "templates.json"))
+
+
+def node_types(match):
+    return [element["data"]["nodeType"] for element in match["workflow"]["elements"]]
+
+
+def test_curated_phrases_match_in_both_languages(library):
+    english = library.match("Send welcome email when form is submitted")
+    italian = library.match("Invia email di benvenuto quando viene compilato un modulo")
+    assert english["template_id"] == italian["template_id"] == "welcome_email_on_form"
+    assert node_types(english) == ["form_submit", "send_email"]
+
+
+def test_delay_is_applied_to_the_wait_node(library):
+    match = library.match("Send follow-up email 5 days after deal is won")
+    assert match["template_id"] == "follow_up_after_deal_won"
+    wait = next(e for e in match["workflow"]["elements"] if e["data"]["nodeType"] == "wait_delay")
+    assert wait["data"]["config"] == {"duration": 5, "unit": "days"}
+
+
+def test_request_naming_a_missing_step_is_not_served(library):
+    assert library.match("Send welcome email when form is submitted and update contact") is None
+    assert library.match("Send welcome email when form is submitted, wait 2 days, then send a follow-up email") is None
+
+
+def test_novel_request_misses(library):
+    assert library.match("Archive invoices older than a year into cold storage") is None
+
+
+WORKFLOW = {
+    "elements": [
+        {"id": "trigger-1", "type": "input", "data": {"nodeType": "time_trigger", "label": "Monthly"}},
+        {"id": "action-1", "type": "default", "data": {"nodeType": "ai_score", "label": "Rescore"}},
+    ],
+    "edges": [{"id": "e1-2", "source": "trigger-1", "target": "action-1"}]
+}
+DESCRIPTION = "Monthly rescoring of dormant portfolio prospects"
+
+
+def test_learned_templates_are_scoped_to_their_organization(library, tmp_path):
+    assert library.learn(DESCRIPTION, WORKFLOW) is None  # no owner, nothing learned
+    assert library.learn(DESCRIPTION, WORKFLOW, organization_id="org-a")
+    assert library.match(DESCRIPTION, organization_id="org-a")["template_id"].startswith("learned_")
+    assert library.match(DESCRIPTION, organization_id="org-b") is None
+    assert library.match(DESCRIPTION) is None
+
+    reloaded = WorkflowTemplateLibrary(path=str(tmp_path / "templates.json"))
+    assert reloaded.match(DESCRIPTION, organization_id="org-a") is not None
+    assert reloaded.match(DESCRIPTION, organization_id="org-b") is None
+
+
+def test_relearning_a_description_does_not_duplicate_it(tmp_path):
+    library = WorkflowTemplateLibrary(path=str(tmp_path / "templates.json"), max_learned=2)
+    # Names an email step the workflow lacks, so the learned template never matches its own description
+    description = "Monthly rescoring email of dormant portfolio prospects"
+    for _ in range(3):
+        assert library.learn(description, WORKFLOW, organization_id="org-a")
+    assert library.get_stats()["learned_templates"] == 1
+
+    library.learn(DESCRIPTION, WORKFLOW, organization_id="org-a")
+    library.learn("Weekly rescoring of dormant portfolio prospects", WORKFLOW, organization_id="org-b")
+    assert library.get_stats()["learned_templates"] == 2
+    reloaded = WorkflowTemplateLibrary(path=str(tmp_path / "templates.json"), max_learned=2)
+    assert reloaded.get_stats()["learned_templates"] == 2
@@ -0,0 +1,258 @@
+"""
+Trigger Dispatch Index
+Matches incoming CRM events to active workflows without scanning every workflow
+"""
+
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from model_router import _percentile
+from workflow_graph import TRIGGER_TYPES, node_type_of
+
+_MISSING = object()
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+
+def resolve_field(event: Dict[str, Any], path: str) -> Any:
+    """Look up a dotted path ("contact.status") in an event payload."""
+    value: Any = event
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+_SCALARS = (str, int, float, bool, type(None))
+
+OPERATORS = {"eq", "ne", "in", "contains", "gt", "gte", "lt", "lte", "exists"}
+
+
+def _compare(op: str, expected: Any) -> Callable[[Any], bool]:
+    if op == "eq":
+        return lambda actual: actual == expected
+    if op == "ne":
+        return lambda actual: actual != expected
+    if op == "in":
+        values = list(expected) if isinstance(expected, (list, tuple)) else [expected]
+        if not all(isinstance(value, _SCALARS) for value in values):
+            raise ValueError("'in' filter value must be a scalar or a list of scalars")
+        allowed = set(values)
+
+        def member(actual: Any) -> bool:
+            try:
+                return actual in allowed
+            except TypeError:
+                return False
+        return member
+    if op == "contains":
+        if expected is None or not isinstance(expected, _SCALARS):
+            raise ValueError("'contains' filter value must be a string or number")
+        needle = str(expected).lower()
+        return lambda actual: needle in str(actual).lower()
+    if op in ("gt", "gte", "lt", "lte"):
+        if isinstance(expected, bool) or not isinstance(expected, (int, float, str)):
+            raise ValueError(f"'{op}' filter value must be a number")
+        try:
+            threshold = float(expected)
+        except ValueError:
+            raise ValueError(f"'{op}' filter value must be a number, got '{expected}'")
+        compare = {
+            "gt": lambda a: a > threshold,
+            "gte": lambda a: a >= threshold,
+            "lt": lambda a: a < threshold,
+            "lte": lambda a: a <= threshold
+        }[op]
+
+        def numeric(actual: Any) -> bool:
+            try:
+                return compare(float(actual))
+            except (TypeError, ValueError):
+                return False
+        return numeric
+    if op == "exists":
+        return lambda actual: True
+    raise ValueError(f"Unknown filter operator '{op}'")
+
+
+def compile_filter(spec: Dict[str, Any]) -> Predicate:
+    """
+    Compile one filter spec into a predicate over the event payload.
+
+    A spec is {"field": "contact.source", "op": "eq", "value": "website"};
+    op defaults to "eq". A missing field never matches.
+
+    Raises:
+        ValueError: If the spec is not an object, has no field, uses an
+            unknown operator or a value of the wrong type for its operator
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"Filter must be an object, got {type(spec).__name__}")
+    path = spec.get("field")
+    if not path or not isinstance(path, str):
+        raise ValueError("Filter is missing 'field'")
+    op = spec.get("op", "eq")
+    if not isinstance(op, str) or op not in OPERATORS:
+        raise ValueError(f"Unknown filter operator '{op}'")
+    check = _compare(op, spec.get("value"))
+
+    def predicate(event: Dict[str, Any]) -> bool:
+        actual = resolve_field(event, path)
+        return actual is not _MISSING and check(actual)
+    return predicate
+
+
+def compile_trigger(elements: List[Dict[str, Any]]) -> Optional[Tuple[str, List[Predicate]]]:
+    """
+    Find a workflow's trigger node and compile its data.config.filters.
+
+    Returns:
+        (trigger nodeType, predicates), or None if the workflow has no trigger
+
+    Raises:
+        ValueError: If the config or any filter spec is invalid
+    """
+    trigger = next((element for element in elements if node_type_of(element) in TRIGGER_TYPES), None)
+    if trigger is None:
+        return None
+    config = (trigger.get("data") or {}).get("config") or {}
+    if not isinstance(config, dict):
+        raise ValueError("Trigger config must be an object")
+    filters = config.get("filters") or []
+    if not isinstance(filters, list):
+        raise ValueError("Trigger filters must be a list")
+    return node_type_of(trigger), [compile_filter(spec) for spec in filters]
+
+
+@dataclass
+class TriggerEntry:
+    workflow_id: str
+    organization_id: str
+    trigger_type: str
+    filters: List[Predicate] = field(default_factory=list)
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return all(predicate(event) for predicate in self.filters)
+
+
+class TriggerIndex:
+    """
+    Active workflows keyed by (organization_id, trigger nodeType).
+
+    Dispatch only looks at the bucket for the event's organization and
+    type, so its cost is proportional to the workflows that could match,
+    not to the number of workflows across all tenants. Registering or
+    disabling a workflow touches a single bucket.
+    """
+
+    def __init__(self, stats_window_s: int = 60, latency_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], Dict[str, TriggerEntry]] = {}
+        self._keys: Dict[str, Tuple[str, str]] = {}
+
+        self.stats_window_s = stats_window_s
+        self._event_seconds: deque = deque()  # [second, count] buckets
+        self._latencies_ms: deque = deque(maxlen=latency_samples)
+        self._stats = {"events": 0, "matches": 0, "unmatched_events": 0}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def register(self, workflow_id: str, organization_id: str, elements: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Index a workflow by its trigger node (replacing any previous entry).
+
+        Trigger filters come from the trigger node's data.config.filters;
+        the index is left untouched when they fail to compile.
+
+        Returns:
+            The trigger nodeType, or None if the workflow has no trigger
+
+        Raises:
+            ValueError: If a trigger filter is invalid (see compile_filter)
+        """
+        trigger = compile_trigger(elements)
+        if trigger is None:
+            self.unregister(workflow_id)
+            return None
+
+        trigger_type, filters = trigger
+        entry = TriggerEntry(
+            workflow_id=workflow_id,
+            organization_id=organization_id,
+            trigger_type=trigger_type,
+            filters=filters
+        )
+        key = (organization_id, entry.trigger_type)
+        with self._lock:
+            self._remove(workflow_id)
+            self._buckets.setdefault(key, {})[workflow_id] = entry
+            self._keys[workflow_id] = key
+        return entry.trigger_type
+
+    def unregister(self, workflow_id: str) -> bool:
+        """Drop a workflow from the index. Returns False if it was not indexed."""
+        with self._lock:
+            return self._remove(workflow_id)
+
+    def dispatch(self, organization_id: str, event_type: str, event: Dict[str, Any]) -> List[str]:
+        """
+        Return the ids of the active workflows an event should start.
+
+        Args:
+            organization_id: Organization that emitted the event
+            event_type: Trigger nodeType (form_submit, contact_update, ...)
+            event: Event payload the trigger filters are evaluated against
+        """
+        start = time.perf_counter()
+        with self._lock:
+            candidates = list(self._buckets.get((organization_id, event_type), {}).values())
+        matched = [entry.workflow_id for entry in candidates if entry.matches(event)]
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats["events"] += 1
+            self._stats["matches"] += len(matched)
+            if not matched:
+                self._stats["unmatched_events"] += 1
+            self._latencies_ms.append(latency_ms)
+            second = int(time.time())
+            if self._event_seconds and self._event_seconds[-1][0] == second:
+                self._event_seconds[-1][1] += 1
+            else:
+                self._event_seconds.append([second, 1])
+            self._trim_window(second)
+        return matched
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim_window(int(time.time()))
+            recent_events = sum(count for _, count in self._event_seconds)
+            latencies = sorted(self._latencies_ms)
+            return {
+                **self._stats,
+                "indexed_workflows": len(self._keys),
+                "buckets": len(self._buckets),
+                "events_per_sec": round(recent_events / self.stats_window_s, 2),
+                "dispatch_p50_ms": round(_percentile(latencies, 0.5), 4) if latencies else None,
+                "dispatch_p99_ms": round(_percentile(latencies, 0.99), 4) if latencies else None
+            }
+
+    def _remove(self, workflow_id: str) -> bool:
+        key = self._keys.pop(workflow_id, None)
+        if key is None:
+            return False
+        bucket = self._buckets.get(key, {})
+        bucket.pop(workflow_id, None)
+        if not bucket:
+            self._buckets.pop(key, None)
+        return True
+
+    def _trim_window(self, now_second: int):
+        cutoff = now_second - self.stats_window_s
+        while self._event_seconds and self._event_seconds[0][0] <= cutoff:
+            self._event_seconds.popleft()
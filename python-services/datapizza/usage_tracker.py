@@ -0,0 +1,270 @@
+"""
+Agent Usage Accounting
+Token, tool-call and latency accounting for every DataPizza agent run
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+# Rough chars-per-token ratio used when the client reports no usage
+CHARS_PER_TOKEN = 4
+
+
+@dataclass(frozen=True)
+class UsageScope:
+    """Who a run is billed to: the API endpoint and the CRM organization."""
+    endpoint: str
+    organization_id: str = ""
+
+
+@dataclass
+class AgentRunRecord:
+    agent_name: str
+    model: str
+    scopes: List[UsageScope]
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tool_calls: int = 0
+    tool_breakdown: Dict[str, int] = field(default_factory=dict)
+    wall_time_ms: float = 0.0
+    estimated: bool = False
+    failed: bool = False
+    started_at: float = field(default_factory=time.monotonic)
+
+    def set_response(self, response: Any, system_prompt: str, prompt: str):
+        """
+        Record token usage from an agent response.
+
+        Uses the usage block reported by the client when there is one
+        (OpenAI-style prompt/completion tokens or Gemini usage_metadata),
+        otherwise estimates from the prompt and response lengths.
+        """
+        usage = _extract_usage(response)
+        if usage:
+            self.prompt_tokens, self.completion_tokens = usage
+            self.estimated = False
+        else:
+            text = response if isinstance(response, str) else str(getattr(response, "text", response))
+            self.prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+            self.completion_tokens = estimate_tokens(text)
+            self.estimated = True
+
+        # Tools executed outside this context can't be counted live; use the
+        # step list the agent reports instead
+        tools_used = getattr(response, "tools_used", None)
+        if not self.tool_calls and isinstance(tools_used, (list, tuple)):
+            self.tool_calls = len(tools_used)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of a piece of text."""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _usage_value(usage: Any, *names: str) -> Optional[int]:
+    for name in names:
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if isinstance(value, (int, float)):
+            return int(value)
+    return None
+
+
+def _extract_usage(response: Any) -> Optional[Tuple[int, int]]:
+    if isinstance(response, str):
+        return None
+    for attr in ("usage", "usage_metadata"):
+        usage = response.get(attr) if isinstance(response, dict) else getattr(response, attr, None)
+        if usage is None:
+            continue
+        prompt_tokens = _usage_value(usage, "prompt_tokens", "input_tokens", "prompt_token_count")
+        completion_tokens = _usage_value(usage, "completion_tokens", "output_tokens", "candidates_token_count")
+        if prompt_tokens is not None or completion_tokens is not None:
+            return prompt_tokens or 0, completion_tokens or 0
+    return None
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        "runs": 0,
+        "failed_runs": 0,
+        "cache_hits": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "tool_calls": 0,
+        "wall_time_ms": 0.0,
+        "max_wall_time_ms": 0.0,
+        "estimated_runs": 0
+    }
+
+
+class UsageTracker:
+    """
+    Aggregates agent run records in memory.
+
+    Totals are kept per (organization, endpoint) and per (agent, model).
+    A run shared by several scopes - e.g. a micro-batch mixing contacts of
+    different organizations - is split evenly between them.
+    """
+
+    def __init__(self, recent_runs: int = 200):
+        self._lock = threading.Lock()
+        self._by_scope: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._by_agent: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._recent: List[Dict[str, Any]] = []
+        self._recent_limit = recent_runs
+        self._started = time.time()
+
+    def record(self, run: AgentRunRecord):
+        """Add a finished run to the aggregates."""
+        scopes = run.scopes or [UsageScope(endpoint="unknown")]
+        share = 1.0 / len(scopes)
+
+        with self._lock:
+            for scope in scopes:
+                totals = self._by_scope.setdefault((scope.organization_id, scope.endpoint), _empty_totals())
+                self._add(totals, run, share)
+            totals = self._by_agent.setdefault((run.agent_name, run.model), _empty_totals())
+            self._add(totals, run, 1.0)
+
+            self._recent.append({
+                "agent_name": run.agent_name,
+                "model": run.model,
+                "endpoints": sorted({scope.endpoint for scope in scopes}),
+                "prompt_tokens": run.prompt_tokens,
+                "completion_tokens": run.completion_tokens,
+                "tool_calls": run.tool_calls,
+                "tools": dict(run.tool_breakdown),
+                "wall_time_ms": round(run.wall_time_ms, 1),
+                "estimated": run.estimated,
+                "failed": run.failed
+            })
+            if len(self._recent) > self._recent_limit:
+                del self._recent[0]
+
+    def record_cache_hit(self, agent_name: str, model: str):
+        """Count a response served from the agent cache instead of a run."""
+        scopes = current_scopes() or [UsageScope(endpoint="unknown")]
+        with self._lock:
+            for scope in scopes:
+                self._by_scope.setdefault((scope.organization_id, scope.endpoint), _empty_totals())["cache_hits"] += 1
+            self._by_agent.setdefault((agent_name, model), _empty_totals())["cache_hits"] += 1
+
+    def get_summary(self, organization_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Return aggregated usage.
+
+        Args:
+            organization_id: Restrict per-scope totals to one organization
+
+        Returns:
+            Dictionary with per-organization/endpoint and per-agent/model totals
+        """
+        with self._lock:
+            by_scope = [
+                {"organization_id": org or None, "endpoint": endpoint, **self._finish(totals)}
+                for (org, endpoint), totals in self._by_scope.items()
+                if organization_id is None or org == organization_id
+            ]
+            by_agent = [
+                {"agent_name": agent, "model": model, **self._finish(totals)}
+                for (agent, model), totals in self._by_agent.items()
+            ]
+            recent = list(self._recent[-20:])
+
+        by_scope.sort(key=lambda row: row["total_tokens"], reverse=True)
+        by_agent.sort(key=lambda row: row["total_tokens"], reverse=True)
+        return {
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started)),
+            "by_organization_endpoint": by_scope,
+            "by_agent_model": by_agent,
+            "recent_runs": recent if organization_id is None else []
+        }
+
+    @staticmethod
+    def _add(totals: Dict[str, Any], run: AgentRunRecord, share: float):
+        totals["runs"] += share
+        totals["failed_runs"] += share if run.failed else 0
+        totals["prompt_tokens"] += run.prompt_tokens * share
+        totals["completion_tokens"] += run.completion_tokens * share
+        totals["tool_calls"] += run.tool_calls * share
+        totals["wall_time_ms"] += run.wall_time_ms * share
+        totals["max_wall_time_ms"] = max(totals["max_wall_time_ms"], run.wall_time_ms)
+        totals["estimated_runs"] += share if run.estimated else 0
+
+    @staticmethod
+    def _finish(totals: Dict[str, Any]) -> Dict[str, Any]:
+        runs = totals["runs"]
+        result = {key: round(value, 2) if isinstance(value, float) else value for key, value in totals.items()}
+        result["total_tokens"] = round(totals["prompt_tokens"] + totals["completion_tokens"], 2)
+        result["avg_tokens_per_run"] = round(result["total_tokens"] / runs, 1) if runs else 0.0
+        result["avg_tool_calls_per_run"] = round(totals["tool_calls"] / runs, 2) if runs else 0.0
+        result["avg_wall_time_ms"] = round(totals["wall_time_ms"] / runs, 1) if runs else 0.0
+        return result
+
+
+usage_tracker = UsageTracker()
+
+_scopes: ContextVar[Tuple[UsageScope, ...]] = ContextVar("usage_scopes", default=())
+_active_run: ContextVar[Optional[AgentRunRecord]] = ContextVar("active_agent_run", default=None)
+
+
+def current_scopes() -> List[UsageScope]:
+    """Return the usage scopes active in the current context."""
+    return list(_scopes.get())
+
+
+@contextmanager
+def usage_scope(endpoint: str, organization_id: Optional[str] = None):
+    """Attribute agent runs made inside the block to an endpoint/organization."""
+    token = _scopes.set((UsageScope(endpoint=endpoint, organization_id=organization_id or ""),))
+    try:
+        yield
+    finally:
+        _scopes.reset(token)
+
+
+@contextmanager
+def usage_scopes(scopes: List[UsageScope]):
+    """Attribute agent runs made inside the block to several scopes at once."""
+    token = _scopes.set(tuple(scopes))
+    try:
+        yield
+    finally:
+        _scopes.reset(token)
+
+
+@contextmanager
+def track_agent_run(agent_name: str, model: Optional[str]):
+    """
+    Instrument one agent run.
+
+    Usage:
+        with track_agent_run(AGENT_NAME, client_model) as run:
+            response = agent.run(prompt)
+            run.set_response(response, SYSTEM_PROMPT, prompt)
+    """
+    run = AgentRunRecord(agent_name=agent_name, model=model or "unknown", scopes=current_scopes())
+    token = _active_run.set(run)
+    try:
+        yield run
+    except Exception:
+        run.failed = True
+        raise
+    finally:
+        _active_run.reset(token)
+        run.wall_time_ms = (time.monotonic() - run.started_at) * 1000
+        usage_tracker.record(run)
+
+
+def count_tool_call(tool_name: str):
+    """Count a tool invocation against the agent run in progress, if any."""
+    run = _active_run.get()
+    if run is not None:
+        run.tool_calls += 1
+        run.tool_breakdown[tool_name] = run.tool_breakdown.get(tool_name, 0) + 1
@@ -0,0 +1,686 @@
+"""
+Workflow Execution Engine
+Asyncio engine that runs WORKFLOW_NODE_LIBRARY graphs with durable state and timer-wheel delays
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import deque, OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from workflow_graph import WorkflowGraph, TRIGGER_TYPES, node_type_of, validate_workflow_graph
+
+DEFAULT_ENGINE_PATH = Path(__file__).parent / '.cache' / 'workflow_engine.sqlite3'
+
+# wait_delay nodes without an explicit duration wait one day
+DEFAULT_DELAY_SECONDS = 24 * 3600
+
+DELAY_UNITS = {
+    "seconds": 1, "second": 1, "secondi": 1, "secondo": 1,
+    "minutes": 60, "minute": 60, "minuti": 60, "minuto": 60,
+    "hours": 3600, "hour": 3600, "ore": 3600, "ora": 3600,
+    "days": 86400, "day": 86400, "giorni": 86400, "giorno": 86400,
+    "weeks": 604800, "week": 604800, "settimane": 604800, "settimana": 604800
+}
+
+NodeHandler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def delay_seconds(config: Dict[str, Any]) -> float:
+    """
+    Resolve a wait_delay node's config to seconds.
+
+    Accepts {"delay_seconds": 90} or {"duration": 2, "unit": "days"}
+    (Italian unit names work too).
+    """
+    if not isinstance(config, dict):
+        return DEFAULT_DELAY_SECONDS
+    if "delay_seconds" in config:
+        return max(0.0, float(config["delay_seconds"]))
+    if "duration" in config:
+        unit = str(config.get("unit", "days")).lower()
+        return max(0.0, float(config["duration"]) * DELAY_UNITS.get(unit, 86400))
+    return DEFAULT_DELAY_SECONDS
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel.
+
+    Timers live in one of `slots` buckets according to their due tick; a
+    single asyncio task advances the cursor once per tick and fires what is
+    due. Thousands of pending delays therefore cost one dict entry each
+    instead of one sleeping task each.
+    """
+
+    def __init__(self, on_fire: Callable[[str], None], tick_s: float = 1.0, slots: int = 512):
+        self.on_fire = on_fire
+        self.tick_s = tick_s
+        self._slots: List[Dict[str, int]] = [{} for _ in range(slots)]
+        self._location: Dict[str, int] = {}
+        self._cursor = 0
+        self._cursor_time = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._location)
+
+    def schedule(self, timer_id: str, due_at: float):
+        """Arm a timer for a wall-clock due time (epoch seconds)."""
+        self.cancel(timer_id)
+        ticks_away = max(1, math.ceil((due_at - self._cursor_time) / self.tick_s))
+        slot = (self._cursor + ticks_away) % len(self._slots)
+        rounds = (ticks_away - 1) // len(self._slots)
+        self._slots[slot][timer_id] = rounds
+        self._location[timer_id] = slot
+
+    def cancel(self, timer_id: str):
+        slot = self._location.pop(timer_id, None)
+        if slot is not None:
+            self._slots[slot].pop(timer_id, None)
+
+    def start(self):
+        if self._task is None:
+            self._cursor_time = time.time()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(max(0.0, self._cursor_time + self.tick_s - time.time()))
+            # Catch up on every tick we slept through
+            while self._cursor_time + self.tick_s <= time.time():
+                self._cursor = (self._cursor + 1) % len(self._slots)
+                self._cursor_time += self.tick_s
+                self._advance_slot(self._slots[self._cursor])
+
+    def _advance_slot(self, slot: Dict[str, int]):
+        due = []
+        for timer_id, rounds in slot.items():
+            if rounds == 0:
+                due.append(timer_id)
+            else:
+                slot[timer_id] = rounds - 1
+        for timer_id in due:
+            del slot[timer_id]
+            del self._location[timer_id]
+            try:
+                self.on_fire(timer_id)
+            except Exception as e:
+                print(f"❌ Timer {timer_id} callback failed: {e}")
+
+
+class RunStore:
+    """
+    SQLite persistence for workflow definitions, run state and timers.
+
+    Run state is written after every step, so a restarted process can pick
+    up running runs (at-least-once per node) and re-arm pending delays.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv('WORKFLOW_ENGINE_PATH', DEFAULT_ENGINE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS workflows (
+                workflow_id TEXT PRIMARY KEY,
+                organization_id TEXT NOT NULL,
+                definition TEXT NOT NULL,
+                active INTEGER NOT NULL DEFAULT 1,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS workflow_runs (
+                run_id TEXT PRIMARY KEY,
+                workflow_id TEXT NOT NULL,
+                organization_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                state TEXT NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_workflow_runs_status ON workflow_runs (status);
+            CREATE TABLE IF NOT EXISTS workflow_timers (
+                timer_id TEXT PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                node_id TEXT NOT NULL,
+                due_at REAL NOT NULL
+            );
+        """)
+
+    def save_workflow(self, workflow_id: str, organization_id: str, definition: Dict[str, Any], active: bool = True):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workflows (workflow_id, organization_id, definition, active, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (workflow_id, organization_id, json.dumps(definition), int(active), time.time())
+            )
+
+    def set_workflow_active(self, workflow_id: str, active: bool) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE workflows SET active = ?, updated_at = ? WHERE workflow_id = ?",
+                (int(active), time.time(), workflow_id)
+            )
+            return cursor.rowcount > 0
+
+    def load_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT organization_id, definition, active FROM workflows WHERE workflow_id = ?", (workflow_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"workflow_id": workflow_id, "organization_id": row[0], "active": bool(row[2]), **json.loads(row[1])}
+
+    def list_workflows(self, active_only: bool = True) -> List[Dict[str, Any]]:
+        query = "SELECT workflow_id, organization_id, definition, active FROM workflows"
+        if active_only:
+            query += " WHERE active = 1"
+        with self._lock:
+            rows = self._conn.execute(query).fetchall()
+        return [
+            {"workflow_id": row[0], "organization_id": row[1], "active": bool(row[3]), **json.loads(row[2])}
+            for row in rows
+        ]
+
+    def save_run(self, run: "WorkflowRun"):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workflow_runs "
+                "(run_id, workflow_id, organization_id, status, state, error, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run.run_id, run.workflow_id, run.organization_id, run.status,
+                 json.dumps(run.state_dict()), run.error, run.created_at, now)
+            )
+
+    def load_run(self, run_id: str) -> Optional["WorkflowRun"]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, workflow_id, organization_id, status, state, error, created_at "
+                "FROM workflow_runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return WorkflowRun.from_row(row) if row else None
+
+    def load_unfinished_runs(self) -> List["WorkflowRun"]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, workflow_id, organization_id, status, state, error, created_at "
+                "FROM workflow_runs WHERE status IN ('running', 'waiting')"
+            ).fetchall()
+        return [WorkflowRun.from_row(row) for row in rows]
+
+    def save_timer(self, timer_id: str, run_id: str, node_id: str, due_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workflow_timers (timer_id, run_id, node_id, due_at) VALUES (?, ?, ?, ?)",
+                (timer_id, run_id, node_id, due_at)
+            )
+
+    def delete_timer(self, timer_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM workflow_timers WHERE timer_id = ?", (timer_id,))
+
+    def load_timers(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT timer_id, run_id, node_id, due_at FROM workflow_timers").fetchall()
+        return [{"timer_id": r[0], "run_id": r[1], "node_id": r[2], "due_at": r[3]} for r in rows]
+
+    def count_runs_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM workflow_runs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+@dataclass
+class WorkflowRun:
+    run_id: str
+    workflow_id: str
+    organization_id: str
+    status: str
+    ready: List[str]
+    visited: List[str]
+    waiting: Dict[str, str]
+    context: Dict[str, Any]
+    created_at: float
+    error: Optional[str] = None
+    steps: int = 0
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "visited": self.visited,
+            "waiting": self.waiting,
+            "context": self.context,
+            "steps": self.steps
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "workflow_id": self.workflow_id,
+            "organization_id": self.organization_id,
+            "status": self.status,
+            "error": self.error,
+            "steps": self.steps,
+            "pending_nodes": list(self.ready),
+            "waiting_nodes": sorted(self.waiting.values()),
+            "completed_nodes": list(self.visited),
+            "context": self.context
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "WorkflowRun":
+        state = json.loads(row[4])
+        return cls(
+            run_id=row[0], workflow_id=row[1], organization_id=row[2], status=row[3],
+            ready=state.get("ready", []), visited=state.get("visited", []),
+            waiting=state.get("waiting", {}), context=state.get("context", {}),
+            steps=state.get("steps", 0), error=row[5], created_at=row[6]
+        )
+
+
+class CompiledWorkflow:
+    """A workflow definition indexed for execution: id -> node and id -> successor ids."""
+
+    def __init__(self, workflow_id: str, elements: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+        graph = WorkflowGraph(elements, edges)
+        self.workflow_id = workflow_id
+        self.nodes: Dict[str, Dict[str, Any]] = {element["id"]: element for element in elements if "id" in element}
+        self.successors: Dict[str, List[str]] = {
+            graph.node_id(i): [graph.node_id(j) for j in graph.successors[i]] for i in range(len(elements))
+        }
+        self.trigger_ids = [graph.node_id(i) for i in graph.triggers()]
+
+
+class LocalOutbox:
+    """In-memory stand-in for the email/notification providers."""
+
+    def __init__(self, max_messages: int = 1000):
+        self.messages: deque = deque(maxlen=max_messages)
+        self.sent = 0
+
+    def send(self, channel: str, message: Dict[str, Any]) -> str:
+        message_id = f"{channel}-{uuid.uuid4().hex[:12]}"
+        self.messages.append({"id": message_id, "channel": channel, **message})
+        self.sent += 1
+        return message_id
+
+
+class LocalCRM:
+    """In-memory stand-in for the Supabase deals/contacts tables."""
+
+    def __init__(self):
+        self.deals: Dict[str, Dict[str, Any]] = {}
+        self.contact_updates = 0
+
+    def create_deal(self, deal: Dict[str, Any]) -> str:
+        deal_id = f"deal-{uuid.uuid4().hex[:12]}"
+        self.deals[deal_id] = deal
+        return deal_id
+
+
+class WorkflowEngine:
+    """
+    Runs workflow graphs as persistent, event-driven state machines.
+
+    A run is a set of ready node ids plus the timers it is parked on. A
+    fixed pool of worker tasks pulls (run, node) steps off a queue, calls
+    the handler registered for the node type, and pushes the node's
+    successors. wait_delay nodes never sleep: they arm a durable timer in
+    the wheel and the run resumes when it fires. Each node runs at most
+    once per run, so branches that rejoin continue past the join once.
+    """
+
+    def __init__(self, store: Optional[RunStore] = None, workers: int = 64, tick_s: float = 1.0):
+        self.store = store or RunStore()
+        self.worker_count = workers
+        self.handlers: Dict[str, NodeHandler] = {}
+        self.outbox = LocalOutbox()
+        self.crm = LocalCRM()
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._wheel = TimerWheel(self._on_timer, tick_s=tick_s)
+        self._runs: Dict[str, WorkflowRun] = {}
+        self._timers: Dict[str, Dict[str, Any]] = {}
+        self._compiled: "OrderedDict[str, CompiledWorkflow]" = OrderedDict()
+        self._in_flight: Dict[str, int] = {}
+        self._stats = {"runs_started": 0, "runs_completed": 0, "runs_failed": 0, "steps_executed": 0, "timers_fired": 0}
+
+        self._register_stand_ins()
+
+    # ---- handlers -------------------------------------------------------
+
+    def register_handler(self, node_type: str, handler: NodeHandler):
+        """Register (or replace) the async handler for a node type."""
+        self.handlers[node_type] = handler
+
+    def _register_stand_ins(self):
+        async def trigger(node, context):
+            return {"triggered_at": time.time()}
+
+        async def send_email(node, context):
+            config = node.get("data", {}).get("config") or {}
+            contact = context.get("contact", {})
+            message_id = self.outbox.send("email", {
+                "to": config.get("to") or contact.get("email"),
+                "subject": config.get("subject") or node.get("data", {}).get("label", "Guardian AI CRM"),
+                "template": config.get("template")
+            })
+            return {"message_id": message_id}
+
+        async def send_notification(node, context):
+            config = node.get("data", {}).get("config") or {}
+            message_id = self.outbox.send("notification", {
+                "team": config.get("team", "sales"),
+                "text": config.get("message") or node.get("data", {}).get("label", "Workflow notification")
+            })
+            return {"message_id": message_id}
+
+        async def ai_score(node, context):
+            # Neutral stand-in; the server registers the real scorer
+            return {"score": 50, "category": "warm", "stand_in": True}
+
+        async def create_deal(node, context):
+            config = node.get("data", {}).get("config") or {}
+            contact = context.get("contact", {})
+            deal_id = self.crm.create_deal({
+                "title": config.get("title") or f"Deal - {contact.get('name', 'New contact')}",
+                "value": config.get("value", 0),
+                "contact_email": contact.get("email")
+            })
+            return {"deal_id": deal_id}
+
+        async def update_contact(node, context):
+            config = node.get("data", {}).get("config") or {}
+            context.setdefault("contact", {}).update(config.get("fields", {}))
+            self.crm.contact_updates += 1
+            return {"updated_fields": sorted(config.get("fields", {}))}
+
+        for trigger_type in TRIGGER_TYPES:
+            self.register_handler(trigger_type, trigger)
+        self.register_handler("send_email", send_email)
+        self.register_handler("send_notification", send_notification)
+        self.register_handler("ai_score", ai_score)
+        self.register_handler("create_deal", create_deal)
+        self.register_handler("update_contact", update_contact)
+
+    # ---- lifecycle ------------------------------------------------------
+
+    async def start(self):
+        """Start workers and the timer wheel, then resume unfinished runs."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+        self._wheel.start()
+
+        resumed = 0
+        for run in self.store.load_unfinished_runs():
+            self._runs[run.run_id] = run
+            for node_id in run.ready:
+                self._enqueue(run, node_id)
+            resumed += 1
+        for timer in self.store.load_timers():
+            self._timers[timer["timer_id"]] = timer
+            self._wheel.schedule(timer["timer_id"], timer["due_at"])
+        if resumed:
+            print(f"✅ Workflow engine resumed {resumed} runs and {len(self._timers)} timers")
+
+    async def stop(self):
+        await self._wheel.stop()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    # ---- workflows ------------------------------------------------------
+
+    def register_workflow(
+        self,
+        elements: List[Dict[str, Any]],
+        edges: List[Dict[str, Any]],
+        organization_id: str = "",
+        workflow_id: Optional[str] = None,
+        active: bool = True
+    ) -> str:
+        """
+        Persist a workflow definition so runs can reference it.
+
+        Returns:
+            The workflow id (derived from the definition when not given)
+
+        Raises:
+            ValueError: If the graph fails structural validation
+        """
+        validation = validate_workflow_graph(elements, edges)
+        if not validation["valid"]:
+            raise ValueError("Invalid workflow: " + "; ".join(validation["errors"]))
+
+        definition = {"elements": elements, "edges": edges}
+        if workflow_id is None:
+            digest = hashlib.sha256(json.dumps(definition, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+            workflow_id = f"wf-{digest}"
+        self.store.save_workflow(workflow_id, organization_id, definition, active)
+        self._compiled.pop(workflow_id, None)
+        return workflow_id
+
+    def set_workflow_active(self, workflow_id: str, active: bool) -> Optional[Dict[str, Any]]:
+        """
+        Enable or disable a registered workflow. Runs already in progress keep going.
+
+        Returns:
+            The stored workflow definition, or None if the id is unknown
+        """
+        if not self.store.set_workflow_active(workflow_id, active):
+            return None
+        return self.store.load_workflow(workflow_id)
+
+    def list_workflows(self, active_only: bool = True) -> List[Dict[str, Any]]:
+        return self.store.list_workflows(active_only)
+
+    def get_workflow(self, workflow_id: str) -> Optional[CompiledWorkflow]:
+        compiled = self._compiled.get(workflow_id)
+        if compiled is not None:
+            self._compiled.move_to_end(workflow_id)
+            return compiled
+        definition = self.store.load_workflow(workflow_id)
+        if definition is None:
+            return None
+        compiled = CompiledWorkflow(workflow_id, definition["elements"], definition["edges"])
+        self._compiled[workflow_id] = compiled
+        while len(self._compiled) > 1024:
+            self._compiled.popitem(last=False)
+        return compiled
+
+    # ---- runs -----------------------------------------------------------
+
+    def start_run(self, workflow_id: str, payload: Optional[Dict[str, Any]] = None, organization_id: str = "") -> str:
+        """
+        Start a run of a registered workflow.
+
+        Args:
+            workflow_id: Id returned by register_workflow()
+            payload: Trigger event data (e.g. the contact or form submission)
+            organization_id: Organization the run belongs to
+
+        Returns:
+            The new run id
+        """
+        if self._queue is None:
+            raise RuntimeError("Workflow engine is not started")
+        workflow = self.get_workflow(workflow_id)
+        if workflow is None:
+            raise KeyError(f"Unknown workflow '{workflow_id}'")
+
+        payload = payload or {}
+        run = WorkflowRun(
+            run_id=f"run-{uuid.uuid4().hex}",
+            workflow_id=workflow_id,
+            organization_id=organization_id,
+            status="running",
+            ready=list(workflow.trigger_ids),
+            visited=[],
+            waiting={},
+            context={"trigger": payload, "contact": dict(payload.get("contact", {})), "nodes": {}},
+            created_at=time.time()
+        )
+        self._runs[run.run_id] = run
+        self.store.save_run(run)
+        self._stats["runs_started"] += 1
+        for node_id in run.ready:
+            self._enqueue(run, node_id)
+        return run.run_id
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        run = self._runs.get(run_id) or self.store.load_run(run_id)
+        return run.to_dict() if run else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "active_runs": len(self._runs),
+            "pending_timers": len(self._wheel),
+            "queued_steps": self._queue.qsize() if self._queue else 0,
+            "runs_by_status": self.store.count_runs_by_status(),
+            "outbox_sent": self.outbox.sent,
+            "deals_created": len(self.crm.deals)
+        }
+
+    def _enqueue(self, run: WorkflowRun, node_id: str):
+        self._in_flight[run.run_id] = self._in_flight.get(run.run_id, 0) + 1
+        self._queue.put_nowait((run.run_id, node_id))
+
+    async def _worker(self):
+        while True:
+            run_id, node_id = await self._queue.get()
+            try:
+                await self._execute_step(run_id, node_id)
+            except Exception as e:
+                print(f"❌ Workflow step {run_id}/{node_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute_step(self, run_id: str, node_id: str):
+        run = self._runs.get(run_id)
+        if run is None or run.status in ("completed", "failed"):
+            return
+        self._in_flight[run_id] -= 1
+
+        workflow = self.get_workflow(run.workflow_id)
+        node = workflow.nodes.get(node_id) if workflow else None
+        if node is None:
+            self._fail(run, f"Node '{node_id}' not found in workflow '{run.workflow_id}'")
+            return
+
+        if node_id in run.visited:
+            self._advance(run, node_id, successors=[])
+            return
+
+        node_type = node_type_of(node)
+        if node_type == "wait_delay":
+            config = node.get("data", {}).get("config") or {}
+            due_at = time.time() + delay_seconds(config)
+            timer_id = f"{run_id}:{node_id}"
+            run.waiting[timer_id] = node_id
+            run.ready.remove(node_id)
+            timer = {"timer_id": timer_id, "run_id": run_id, "node_id": node_id, "due_at": due_at}
+            self._timers[timer_id] = timer
+            self.store.save_timer(timer_id, run_id, node_id, due_at)
+            self._wheel.schedule(timer_id, due_at)
+            self._update_status(run)
+            return
+
+        handler = self.handlers.get(node_type)
+        if handler is None:
+            self._fail(run, f"No handler registered for nodeType '{node_type}'")
+            return
+
+        try:
+            result = await handler(node, run.context)
+        except Exception as e:
+            self._fail(run, f"Node '{node_id}' ({node_type}) failed: {e}")
+            return
+
+        run.context["nodes"][node_id] = result or {}
+        self._stats["steps_executed"] += 1
+        self._advance(run, node_id, workflow.successors.get(node_id, []))
+
+    def _advance(self, run: WorkflowRun, node_id: str, successors: List[str]):
+        if node_id in run.ready:
+            run.ready.remove(node_id)
+        if node_id not in run.visited:
+            run.visited.append(node_id)
+            run.steps += 1
+        for successor in successors:
+            if successor not in run.visited and successor not in run.ready:
+                run.ready.append(successor)
+                self._enqueue(run, successor)
+        self._update_status(run)
+
+    def _on_timer(self, timer_id: str):
+        timer = self._timers.pop(timer_id, None)
+        self.store.delete_timer(timer_id)
+        if timer is None:
+            return
+        run = self._runs.get(timer["run_id"])
+        if run is None or run.status in ("completed", "failed"):
+            return
+        self._stats["timers_fired"] += 1
+        run.waiting.pop(timer_id, None)
+        run.context["nodes"][timer["node_id"]] = {"waited_until": timer["due_at"]}
+        workflow = self.get_workflow(run.workflow_id)
+        run.ready.append(timer["node_id"])
+        self._advance(run, timer["node_id"], workflow.successors.get(timer["node_id"], []) if workflow else [])
+
+    def _update_status(self, run: WorkflowRun):
+        if run.ready or self._in_flight.get(run.run_id, 0):
+            run.status = "running"
+        elif run.waiting:
+            run.status = "waiting"
+        else:
+            run.status = "completed"
+        self.store.save_run(run)
+        if run.status == "completed":
+            self._stats["runs_completed"] += 1
+            self._forget(run)
+
+    def _fail(self, run: WorkflowRun, error: str):
+        print(f"❌ Workflow run {run.run_id} failed: {error}")
+        run.status = "failed"
+        run.error = error
+        for timer_id in list(run.waiting):
+            self._wheel.cancel(timer_id)
+            self._timers.pop(timer_id, None)
+            self.store.delete_timer(timer_id)
+        self.store.save_run(run)
+        self._stats["runs_failed"] += 1
+        self._forget(run)
+
+    def _forget(self, run: WorkflowRun):
+        self._runs.pop(run.run_id, None)
+        self._in_flight.pop(run.run_id, None)
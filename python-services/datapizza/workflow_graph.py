@@ -0,0 +1,235 @@
+"""
+Workflow Graph Validation
+Node library and linear-time structural validation for React Flow workflow graphs
+"""
+
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# Define workflow node library for validation and agent guidance
+WORKFLOW_NODE_LIBRARY = {
+    "triggers": {
+        "form_submit": "When a form is submitted",
+        "contact_update": "When a contact is updated",
+        "deal_won": "When a deal is won/closed",
+        "deal_lost": "When a deal is lost/failed",
+        "time_trigger": "Scheduled/recurring automation"
+    },
+    "actions": {
+        "send_email": "Send automated email",
+        "ai_score": "Score lead with DataPizza AI",
+        "create_deal": "Create new deal/opportunity",
+        "update_contact": "Modify contact information",
+        "send_notification": "Internal team notification",
+        "wait_delay": "Add time delay between actions"
+    }
+}
+
+TRIGGER_TYPES = frozenset(WORKFLOW_NODE_LIBRARY["triggers"])
+ACTION_TYPES = frozenset(WORKFLOW_NODE_LIBRARY["actions"])
+NODE_TYPES = TRIGGER_TYPES | ACTION_TYPES
+
+# "position" is not required: coordinates are assigned by workflow_layout
+REQUIRED_ELEMENT_FIELDS = ("id", "type", "data")
+
+
+def node_type_of(element: Dict[str, Any]) -> Optional[str]:
+    """Return an element's nodeType, or None if it has none."""
+    data = element.get("data")
+    return data.get("nodeType") if isinstance(data, dict) else None
+
+
+class WorkflowGraph:
+    """
+    Hash-indexed view of a workflow: id -> position, plus adjacency lists.
+
+    Built once in O(N + E); every structural check below reuses it instead
+    of rescanning the element list per edge.
+    """
+
+    def __init__(self, elements: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+        self.elements = elements
+        self.edges = edges
+        self.index: Dict[str, int] = {}
+        self.duplicate_ids: List[str] = []
+        self.successors: List[List[int]] = [[] for _ in elements]
+        self.predecessors: List[List[int]] = [[] for _ in elements]
+        self.invalid_edges: List[str] = []
+
+        for position, element in enumerate(elements):
+            element_id = element.get("id")
+            if element_id is None:
+                continue
+            if element_id in self.index:
+                self.duplicate_ids.append(element_id)
+                continue
+            self.index[element_id] = position
+
+        for i, edge in enumerate(edges):
+            source = self.index.get(edge.get("source"))
+            target = self.index.get(edge.get("target"))
+            if source is None:
+                self.invalid_edges.append(f"Edge {i}: Invalid source ID '{edge.get('source')}'")
+            if target is None:
+                self.invalid_edges.append(f"Edge {i}: Invalid target ID '{edge.get('target')}'")
+            if source is not None and target is not None:
+                self.successors[source].append(target)
+                self.predecessors[target].append(source)
+
+    def node_id(self, position: int) -> str:
+        return self.elements[position].get("id", f"#{position}")
+
+    def triggers(self) -> List[int]:
+        return [i for i, element in enumerate(self.elements) if node_type_of(element) in TRIGGER_TYPES]
+
+    def topological_order(self) -> List[int]:
+        """
+        Kahn's algorithm. Returns the nodes in dependency order; when the
+        result is shorter than the node count the graph contains a cycle.
+        """
+        in_degree = [len(preds) for preds in self.predecessors]
+        queue = deque(i for i, degree in enumerate(in_degree) if degree == 0)
+        order = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for successor in self.successors[node]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    queue.append(successor)
+        return order
+
+    def find_cycle(self, ordered: List[int]) -> List[int]:
+        """
+        Extract one concrete cycle among the nodes Kahn's pass could not order.
+
+        Every leftover node has a leftover predecessor, so walking backwards
+        must revisit a node within N steps.
+        """
+        leftover = set(range(len(self.elements))) - set(ordered)
+        if not leftover:
+            return []
+        node = next(iter(leftover))
+        seen: Dict[int, int] = {}
+        path = []
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(pred for pred in self.predecessors[node] if pred in leftover)
+        cycle = path[seen[node]:]
+        cycle.reverse()
+        return cycle
+
+    def reachable_from(self, sources: List[int]) -> List[bool]:
+        reached = [False] * len(self.elements)
+        queue = deque(sources)
+        for source in sources:
+            reached[source] = True
+        while queue:
+            node = queue.popleft()
+            for successor in self.successors[node]:
+                if not reached[successor]:
+                    reached[successor] = True
+                    queue.append(successor)
+        return reached
+
+
+def validate_workflow_graph(elements: List[Dict[str, Any]], edges: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Validate a workflow graph's structure in O(N + E).
+
+    Reports every problem found rather than stopping at the first:
+    missing fields, unknown node types, duplicate ids, dangling or self
+    edges, edges into triggers, absent or multiple triggers, cycles,
+    orphan nodes and actions unreachable from the trigger.
+
+    Args:
+        elements: Workflow nodes
+        edges: Workflow connections
+
+    Returns:
+        Validation results with errors, warnings, stats and the topological order
+    """
+    edges = edges or []
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    for i, element in enumerate(elements):
+        for field in REQUIRED_ELEMENT_FIELDS:
+            if field not in element:
+                errors.append(f"Element {i}: Missing required field '{field}'")
+        node_type = node_type_of(element)
+        if node_type is not None and node_type not in NODE_TYPES:
+            errors.append(f"Element {i}: Invalid nodeType '{node_type}'")
+        elif node_type in TRIGGER_TYPES and element.get("type") not in (None, "input"):
+            warnings.append(f"Element {i}: Trigger '{element.get('id')}' should use type 'input'")
+
+    graph = WorkflowGraph(elements, edges)
+
+    for duplicate in graph.duplicate_ids:
+        errors.append(f"Duplicate element ID '{duplicate}'")
+    errors.extend(graph.invalid_edges)
+
+    seen_edge_ids = set()
+    for i, edge in enumerate(edges):
+        edge_id = edge.get("id")
+        if edge_id is not None:
+            if edge_id in seen_edge_ids:
+                warnings.append(f"Edge {i}: Duplicate edge ID '{edge_id}'")
+            seen_edge_ids.add(edge_id)
+        if edge.get("source") is not None and edge.get("source") == edge.get("target"):
+            errors.append(f"Edge {i}: Self-loop on '{edge.get('source')}'")
+        target = graph.index.get(edge.get("target"))
+        if target is not None and node_type_of(elements[target]) in TRIGGER_TYPES:
+            errors.append(f"Edge {i}: Trigger '{edge.get('target')}' cannot have incoming connections")
+
+    triggers = graph.triggers()
+    trigger_set = set(triggers)
+    if not triggers:
+        errors.append("Workflow has no trigger node")
+    elif len(triggers) > 1:
+        errors.append(
+            "Workflow has multiple trigger nodes: " + ", ".join(graph.node_id(i) for i in triggers)
+        )
+
+    order = graph.topological_order()
+    if len(order) < len(elements):
+        cycle = graph.find_cycle(order)
+        if len(cycle) > 1:
+            errors.append("Cycle detected: " + " -> ".join(graph.node_id(i) for i in cycle + cycle[:1]))
+        elif not any("Self-loop" in error for error in errors):
+            errors.append("Cycle detected in workflow graph")
+
+    reached = graph.reachable_from(triggers)
+    for i, element in enumerate(elements):
+        if graph.index.get(element.get("id")) != i:
+            continue  # Missing or duplicate id - already reported
+        if i in trigger_set:
+            if not graph.successors[i] and len(elements) > 1:
+                warnings.append(f"Trigger '{graph.node_id(i)}' is not connected to any action")
+            continue
+        if not graph.successors[i] and not graph.predecessors[i]:
+            errors.append(f"Orphan node '{graph.node_id(i)}' has no connections")
+        elif triggers and not reached[i]:
+            errors.append(f"Node '{graph.node_id(i)}' is unreachable from the trigger")
+
+    return {
+        "valid": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "stats": {
+            "nodes": len(elements),
+            "edges": len(edges),
+            "triggers": len(triggers),
+            "max_depth": _max_depth(graph, order) if len(order) == len(elements) else None
+        },
+        "topological_order": [graph.node_id(i) for i in order] if len(order) == len(elements) else []
+    }
+
+
+def _max_depth(graph: WorkflowGraph, order: List[int]) -> int:
+    depth = [0] * len(graph.elements)
+    for node in order:
+        for successor in graph.successors[node]:
+            depth[successor] = max(depth[successor], depth[node] + 1)
+    return max(depth, default=0)
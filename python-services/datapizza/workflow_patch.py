@@ -0,0 +1,436 @@
+"""
+Incremental Workflow Editing
+Minimal patches (added/removed/updated nodes and edges) with validation limited to what the patch touches
+"""
+
+import copy
+import re
+from collections import Counter, deque
+from typing import Dict, Any, List, Optional, Set
+
+from workflow_graph import WorkflowGraph, NODE_TYPES, TRIGGER_TYPES, REQUIRED_ELEMENT_FIELDS, node_type_of
+from workflow_layout import layout_workflow
+from workflow_rules import tokenize, workflow_rule_engine
+from workflow_templates import extract_delay, fold_text
+
+PATCH_KEYS = ("add_nodes", "remove_nodes", "update_nodes", "add_edges", "remove_edges")
+
+# "without"/"senza" are not here: "send an email without delay" adds a step, it removes nothing
+REMOVE_WORDS = {"remove", "delete", "drop", "rimuovi", "rimuovere", "elimina", "eliminare", "togli", "togliere"}
+CHANGE_WORDS = {"change", "set", "make", "cambia", "cambiare", "imposta", "impostare", "porta"}
+BEFORE_WORDS = {"before", "prima"}
+# New steps are only planned when the request says so explicitly
+ADD_WORDS = {
+    "add", "also", "append", "insert", "include",
+    "aggiungi", "aggiungere", "anche", "inserisci", "inserire", "includi", "includere"
+}
+# Edits the rules cannot express; these go to the agent even next to an add verb
+AGENT_WORDS = {
+    "move", "replace", "swap", "rename", "disable", "enable", "edit", "modify", "update", "reorder",
+    "sposta", "spostare", "sostituisci", "sostituire", "scambia", "scambiare", "rinomina", "rinominare",
+    "disattiva", "disattivare", "attiva", "attivare", "modifica", "modificare", "aggiorna", "aggiornare"
+}
+
+# Intent concept -> the node type it refers to in an existing graph
+CONCEPT_NODE_TYPES = {
+    "email": "send_email",
+    "notify": "send_notification",
+    "score": "ai_score",
+    "ai": "ai_score",
+    "delay": "wait_delay",
+    "deal": "create_deal",
+    "update": "update_contact"
+}
+
+
+def empty_patch() -> Dict[str, List[Any]]:
+    return {key: [] for key in PATCH_KEYS}
+
+
+def normalize_patch(patch: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Fill in missing patch keys so callers can rely on all five lists."""
+    return {key: list(patch.get(key) or []) for key in PATCH_KEYS}
+
+
+def patch_size(patch: Dict[str, List[Any]]) -> int:
+    return sum(len(patch[key]) for key in PATCH_KEYS)
+
+
+def apply_patch(
+    elements: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    patch: Dict[str, List[Any]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Return the patched graph as new lists (the inputs are not modified).
+
+    Edges attached to removed nodes are dropped with them. Updates merge
+    their "data" into the node's data and replace any other given field.
+    """
+    removed_nodes = set(patch["remove_nodes"])
+    removed_edges = set(patch["remove_edges"])
+    updates = {update["id"]: update for update in patch["update_nodes"]}
+
+    new_elements = []
+    for element in elements:
+        if element.get("id") in removed_nodes:
+            continue
+        update = updates.get(element.get("id"))
+        if update:
+            element = copy.deepcopy(element)
+            for key, value in update.items():
+                if key == "data" and isinstance(value, dict):
+                    element.setdefault("data", {}).update(value)
+                elif key != "id":
+                    element[key] = value
+        new_elements.append(element)
+    new_elements.extend(copy.deepcopy(patch["add_nodes"]))
+
+    new_edges = [
+        edge for edge in edges
+        if edge.get("id") not in removed_edges
+        and edge.get("source") not in removed_nodes
+        and edge.get("target") not in removed_nodes
+    ]
+    new_edges.extend(copy.deepcopy(patch["add_edges"]))
+    return {"elements": new_elements, "edges": new_edges}
+
+
+def validate_patch(
+    elements: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    patch: Dict[str, List[Any]]
+) -> Dict[str, Any]:
+    """
+    Validate a patch against an existing (already valid) graph.
+
+    Only what the patch touches is checked: new and updated nodes, added
+    and removed edges, nodes that could lose their last incoming edge, and
+    - for each added edge - whether its source is reachable from its
+    target, which is the only way a new edge can close a cycle.
+
+    Returns:
+        {"valid", "errors", "warnings", "checked_nodes"}
+    """
+    graph = WorkflowGraph(elements, edges)
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    removed_nodes = set(patch["remove_nodes"])
+    for node_id in removed_nodes:
+        position = graph.index.get(node_id)
+        if position is None:
+            errors.append(f"Cannot remove unknown node '{node_id}'")
+        elif node_type_of(elements[position]) in TRIGGER_TYPES:
+            errors.append(f"Cannot remove trigger '{node_id}'")
+
+    added_ids: Set[str] = set()
+    for i, element in enumerate(patch["add_nodes"]):
+        for field in REQUIRED_ELEMENT_FIELDS:
+            if field not in element:
+                errors.append(f"Added node {i}: Missing required field '{field}'")
+        node_id = element.get("id")
+        if node_id in added_ids or (node_id in graph.index and node_id not in removed_nodes):
+            errors.append(f"Added node {i}: Duplicate element ID '{node_id}'")
+        added_ids.add(node_id)
+        node_type = node_type_of(element)
+        if node_type not in NODE_TYPES:
+            errors.append(f"Added node {i}: Invalid nodeType '{node_type}'")
+        elif node_type in TRIGGER_TYPES:
+            errors.append(f"Added node {i}: A workflow can only have one trigger")
+
+    for update in patch["update_nodes"]:
+        node_id = update.get("id")
+        if node_id not in graph.index or node_id in removed_nodes:
+            errors.append(f"Cannot update unknown node '{node_id}'")
+            continue
+        node_type = (update.get("data") or {}).get("nodeType")
+        if node_type is None:
+            continue
+        was_trigger = node_type_of(elements[graph.index[node_id]]) in TRIGGER_TYPES
+        if node_type not in NODE_TYPES:
+            errors.append(f"Update of '{node_id}': Invalid nodeType '{node_type}'")
+        elif (node_type in TRIGGER_TYPES) != was_trigger:
+            errors.append(f"Update of '{node_id}': Cannot turn a trigger into an action or vice versa")
+
+    live_ids = (set(graph.index) - removed_nodes) | added_ids
+    removed_edge_ids = set(patch["remove_edges"])
+    existing_edge_ids = {edge.get("id") for edge in edges}
+    # (source, target) pairs whose every connecting edge is being removed
+    pair_counts = Counter((edge.get("source"), edge.get("target")) for edge in edges)
+    removed_counts = Counter(
+        (edge.get("source"), edge.get("target")) for edge in edges if edge.get("id") in removed_edge_ids
+    )
+    removed_pairs = {pair for pair, count in removed_counts.items() if count == pair_counts[pair]}
+    for edge_id in removed_edge_ids - existing_edge_ids:
+        errors.append(f"Cannot remove unknown edge '{edge_id}'")
+
+    trigger_ids = {graph.node_id(i) for i in graph.triggers()}
+    added_successors: Dict[str, List[str]] = {}
+    gained_incoming: Set[str] = set()
+    for i, edge in enumerate(patch["add_edges"]):
+        source, target = edge.get("source"), edge.get("target")
+        if source not in live_ids:
+            errors.append(f"Added edge {i}: Invalid source ID '{source}'")
+        if target not in live_ids:
+            errors.append(f"Added edge {i}: Invalid target ID '{target}'")
+        if source == target:
+            errors.append(f"Added edge {i}: Self-loop on '{source}'")
+        if target in trigger_ids:
+            errors.append(f"Added edge {i}: Trigger '{target}' cannot have incoming connections")
+        if source in live_ids and target in live_ids and source != target:
+            added_successors.setdefault(source, []).append(target)
+            gained_incoming.add(target)
+
+    # Nodes that may have lost their last incoming edge
+    removed_edge_targets = {
+        edge.get("target") for edge in edges
+        if edge.get("id") in removed_edge_ids or edge.get("source") in removed_nodes
+    }
+    checked = set(removed_nodes) | added_ids | removed_edge_targets
+    for node_id in removed_edge_targets - removed_nodes - gained_incoming:
+        position = graph.index.get(node_id)
+        if position is None:
+            continue
+        remaining = [
+            pred for pred in graph.predecessors[position]
+            if graph.node_id(pred) not in removed_nodes
+            and (graph.node_id(pred), node_id) not in removed_pairs
+        ]
+        if not remaining:
+            errors.append(f"Node '{node_id}' would become unreachable from the trigger")
+
+    for node_id in added_ids - gained_incoming:
+        errors.append(f"Added node '{node_id}' has no incoming connection")
+
+    # A new edge u -> v closes a cycle only if u is reachable from v afterwards
+    def successors_after(node_id: str) -> List[str]:
+        result = list(added_successors.get(node_id, []))
+        position = graph.index.get(node_id)
+        if position is not None and node_id not in removed_nodes:
+            for successor in graph.successors[position]:
+                successor_id = graph.node_id(successor)
+                if successor_id not in removed_nodes and (node_id, successor_id) not in removed_pairs:
+                    result.append(successor_id)
+        return result
+
+    for source, targets in added_successors.items():
+        for target in targets:
+            seen = {target}
+            queue = deque([target])
+            while queue:
+                node_id = queue.popleft()
+                if node_id == source:
+                    errors.append(f"Edge '{source}' -> '{target}' would create a cycle")
+                    break
+                for successor in successors_after(node_id):
+                    if successor not in seen:
+                        seen.add(successor)
+                        queue.append(successor)
+            checked |= seen
+
+    if patch_size(patch) == 0:
+        warnings.append("Patch is empty - nothing to change")
+
+    return {
+        "valid": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "checked_nodes": len(checked)
+    }
+
+
+def plan_rule_patch(
+    elements: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    change_request: str
+) -> Optional[Dict[str, List[Any]]]:
+    """
+    Turn a simple change request into a patch without the agent.
+
+    Handles "also notify the sales team" / "aggiungi una email" (append
+    steps, or insert them "before" a named step), "remove the email step"
+    / "togli l'attesa" (drop nodes and reconnect around them) and
+    "change the delay to 3 days" / "cambia l'attesa a 3 giorni". Steps are
+    only added after an explicit add verb (ADD_WORDS); moves, replacements,
+    renames and other edits are left to the agent.
+
+    Returns:
+        A patch, or None when the request needs the agent
+    """
+    tokens = tokenize(change_request)
+    words = {word for word, _ in tokens}
+    if not elements or words & AGENT_WORDS:
+        return None
+    graph = WorkflowGraph(elements, edges)
+    mentioned_types = [CONCEPT_NODE_TYPES[concept] for _, concept in tokens if concept in CONCEPT_NODE_TYPES]
+
+    # Only steps named after the remove verb go ("remove the wait", not "send email without delay")
+    remove_at = next((position for position, (word, _) in enumerate(tokens) if word in REMOVE_WORDS), None)
+    if remove_at is not None:
+        doomed_types = [
+            CONCEPT_NODE_TYPES[concept] for _, concept in tokens[remove_at + 1:] if concept in CONCEPT_NODE_TYPES
+        ]
+        return _plan_removal(graph, edges, doomed_types) if doomed_types else None
+
+    delay = extract_delay(change_request)
+    if words & CHANGE_WORDS and delay and "wait_delay" in mentioned_types:
+        return _plan_delay_change(graph, tokens, delay)
+
+    if words & CHANGE_WORDS or not words & ADD_WORDS:
+        return None
+
+    # The step named after "before" is where new steps go, not one of them
+    new_part = re.split(r"\b(?:%s)\b" % "|".join(BEFORE_WORDS), fold_text(change_request), maxsplit=1)[0]
+    steps = workflow_rule_engine.match_steps(new_part)
+    if not steps:
+        return None
+    return _plan_addition(graph, edges, tokens, steps)
+
+
+def _plan_delay_change(graph: WorkflowGraph, tokens: List[Any], delay: Dict[str, Any]) -> Optional[Dict[str, List[Any]]]:
+    """Retime the one wait node the request refers to ("the delay before the email" when there are several)."""
+    waits = [i for i, element in enumerate(graph.elements) if node_type_of(element) == "wait_delay"]
+    anchor_type = _anchor_type(tokens)
+    if anchor_type and len(waits) > 1:
+        waits = [
+            i for i in waits
+            if any(node_type_of(graph.elements[successor]) == anchor_type for successor in graph.successors[i])
+        ]
+    if len(waits) != 1:
+        return None
+    patch = empty_patch()
+    patch["update_nodes"].append({
+        "id": graph.node_id(waits[0]),
+        "data": {"config": dict(delay), "label": f"Wait {delay['duration']} {delay['unit'].capitalize()}"}
+    })
+    return patch
+
+
+def _anchor_type(tokens: List[Any]) -> Optional[str]:
+    """Node type of the first step named after "before"/"prima", if any."""
+    for position, (word, _) in enumerate(tokens):
+        if word in BEFORE_WORDS:
+            return next(
+                (CONCEPT_NODE_TYPES[concept] for _, concept in tokens[position + 1:] if concept in CONCEPT_NODE_TYPES),
+                None
+            )
+    return None
+
+
+def _plan_removal(graph: WorkflowGraph, edges: List[Dict[str, Any]], node_types: List[str]) -> Optional[Dict[str, List[Any]]]:
+    doomed = [
+        i for i, element in enumerate(graph.elements)
+        if node_type_of(element) in node_types and node_type_of(element) not in TRIGGER_TYPES
+    ]
+    if not doomed:
+        return None
+    doomed_ids = {graph.node_id(i) for i in doomed}
+    patch = empty_patch()
+    patch["remove_nodes"] = sorted(doomed_ids)
+
+    # Bridge every surviving predecessor to every surviving successor
+    existing = {(edge.get("source"), edge.get("target")) for edge in edges}
+    for i in doomed:
+        sources = _surviving(graph, i, doomed_ids, upstream=True)
+        targets = _surviving(graph, i, doomed_ids, upstream=False)
+        for source in sources:
+            for target in targets:
+                if (source, target) not in existing:
+                    existing.add((source, target))
+                    patch["add_edges"].append(_edge(source, target))
+    return patch
+
+
+def _surviving(graph: WorkflowGraph, start: int, doomed_ids: Set[str], upstream: bool) -> List[str]:
+    """Nearest non-removed neighbours of a removed node, looking through chains of removed nodes."""
+    neighbours = graph.predecessors if upstream else graph.successors
+    found, seen = [], {start}
+    queue = deque(neighbours[start])
+    while queue:
+        node = queue.popleft()
+        if node in seen:
+            continue
+        seen.add(node)
+        if graph.node_id(node) in doomed_ids:
+            queue.extend(neighbours[node])
+        else:
+            found.append(graph.node_id(node))
+    return found
+
+
+def _plan_addition(
+    graph: WorkflowGraph,
+    edges: List[Dict[str, Any]],
+    tokens: List[Any],
+    steps: List[Dict[str, Any]]
+) -> Dict[str, List[Any]]:
+    patch = empty_patch()
+    used_ids = set(graph.index)
+    counter = len(graph.elements)
+    new_ids = []
+    for step in steps:
+        counter += 1
+        while f"action-{counter}" in used_ids:
+            counter += 1
+        node_id = f"action-{counter}"
+        used_ids.add(node_id)
+        new_ids.append(node_id)
+        patch["add_nodes"].append({
+            "id": node_id,
+            "type": "default",
+            "data": step,
+            "className": "border-orange-500" if step["nodeType"] == "wait_delay" else "border-green-500"
+        })
+    for source, target in zip(new_ids, new_ids[1:]):
+        patch["add_edges"].append(_edge(source, target))
+
+    # "... before the email": splice the new chain in front of that step
+    anchor_type = _anchor_type(tokens)
+    anchor = next(
+        (i for i, element in enumerate(graph.elements) if anchor_type and node_type_of(element) == anchor_type),
+        None
+    )
+
+    if anchor is not None:
+        anchor_id = graph.node_id(anchor)
+        for edge in edges:
+            if edge.get("target") == anchor_id:
+                patch["remove_edges"].append(edge.get("id"))
+                patch["add_edges"].append(_edge(edge.get("source"), new_ids[0]))
+        patch["add_edges"].append(_edge(new_ids[-1], anchor_id))
+    else:
+        # Append after the last step of the flow
+        order = graph.topological_order() or list(range(len(graph.elements)))
+        sinks = [i for i in order if not graph.successors[i]]
+        tail = sinks[-1] if sinks else order[-1]
+        patch["add_edges"].insert(0, _edge(graph.node_id(tail), new_ids[0]))
+    return patch
+
+
+def _edge(source: str, target: str) -> Dict[str, Any]:
+    return {
+        "id": f"e-{source}-{target}",
+        "source": source,
+        "target": target,
+        "animated": True,
+        "style": {"stroke": "#3b82f6"}
+    }
+
+
+def position_added_nodes(
+    elements: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    patch: Dict[str, List[Any]]
+):
+    """
+    Give added nodes layered positions, in place, without moving the nodes
+    the user has already arranged.
+    """
+    if not patch["add_nodes"]:
+        return
+    patched = apply_patch(elements, edges, patch)
+    layout_workflow(patched["elements"], patched["edges"])
+    positions = {element["id"]: element.get("position") for element in patched["elements"]}
+    for element in patch["add_nodes"]:
+        element["position"] = positions.get(element["id"])
@@ -0,0 +1,383 @@
+"""
+Rule-Based Workflow Generator
+Declarative keyword rules that turn common Italian/English descriptions into workflows in well under a millisecond
+"""
+
+import os
+import re
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from model_router import _percentile
+from workflow_layout import layout_workflow
+from workflow_templates import SYNONYMS, STOPWORDS, UNIT_CANONICAL, fold_text
+
+WEEKDAYS = {
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "lunedi", "martedi", "mercoledi", "giovedi", "venerdi", "sabato", "domenica"
+}
+
+THANKS_WORDS = {"thank", "thanks", "grazie", "ringraziamento", "ringraziare"}
+
+# A concept right after one of these is negated ("form is not submitted", "senza attesa")
+NEGATION_WORDS = {"not", "non", "no", "never", "mai", "without", "senza", "dont", "nessun", "nessuna", "nessuno"}
+NEGATION_SCOPE = 2
+
+# Concepts that carry no step of their own but are expected in descriptions
+NEUTRAL_CONCEPTS = {"send", "contact", "new", "team", "sales", "high", "record", "num", "unit", "after"}
+
+
+@dataclass(frozen=True)
+class TriggerRule:
+    node_type: str
+    label: str
+    description: str
+    any_of: Tuple[str, ...]
+    context: Tuple[str, ...] = ()  # Words that usually accompany the trigger ("deal" in "deal is won")
+
+
+@dataclass(frozen=True)
+class ActionRule:
+    """
+    One kind of action step. The first group in all_of whose concepts are
+    all present fires, once per mention of its first concept (adjacent
+    mentions count once), and each step is placed where it is mentioned,
+    so steps follow the text order.
+    """
+    node_type: str
+    label: str
+    description: str
+    all_of: Tuple[Tuple[str, ...], ...]
+
+
+# Checked in order; the first rule with a matching concept picks the trigger
+TRIGGER_RULES = (
+    TriggerRule("deal_won", "Deal Won", "Triggered when deal is marked as won", ("won",), ("deal",)),
+    TriggerRule("deal_lost", "Deal Lost", "Triggered when deal is marked as lost", ("lost",), ("deal",)),
+    TriggerRule("form_submit", "Form Submission", "Triggered when form is submitted", ("form", "submit")),
+    TriggerRule("time_trigger", "Scheduled Trigger", "Time-based trigger", ("schedule", "weekday", "time")),
+    TriggerRule("contact_update", "Contact Updated", "Triggered when a contact is updated", ("update",)),
+)
+DEFAULT_TRIGGER = TriggerRule("form_submit", "Form Submission", "General workflow trigger", ())
+
+ACTION_RULES = (
+    ActionRule("ai_score", "AI Score Contact", "Score lead quality with AI", (("score",), ("ai",))),
+    ActionRule("send_email", "Send Email", "Send personalized email", (("email",),)),
+    ActionRule("send_notification", "Notify Team", "Internal team notification", (("notify",),)),
+    ActionRule("create_deal", "Create Deal", "Create new sales opportunity", (("create", "deal"),)),
+    ActionRule("update_contact", "Update Contact", "Update contact information", (("update",),)),
+    ActionRule("wait_delay", "Wait Delay", "Wait for specified time period", (("delay",),)),
+)
+
+EMAIL_LABELS = (
+    ("welcome", "Send Welcome Email"),
+    ("thank", "Send Thank You Email"),
+    ("followup", "Send Follow-up Email"),
+)
+
+_DURATION = re.compile(r"^\d+$")
+
+
+def tokenize(description: str) -> List[Tuple[str, str]]:
+    """
+    Tokenize a description once into (word, concept) pairs, in order.
+
+    Stopwords are dropped; words without a known concept keep themselves
+    as their concept.
+    """
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", fold_text(description)):
+        if word in STOPWORDS:
+            continue
+        if word.isdigit():
+            concept = "num"
+        elif word in UNIT_CANONICAL:
+            concept = "unit"
+        elif word in WEEKDAYS:
+            concept = "weekday"
+        elif word in THANKS_WORDS:
+            concept = "thank"
+        elif word in ("after", "dopo"):
+            # Only a delay when attached to a duration ("2 days after")
+            concept = "after"
+        elif word in NEGATION_WORDS:
+            concept = "negation"
+        else:
+            concept = SYNONYMS.get(word, word)
+        tokens.append((word, concept))
+    return tokens
+
+
+class WorkflowRuleEngine:
+    """
+    Fast-path workflow generator driven by TRIGGER_RULES and ACTION_RULES.
+
+    The description is tokenized once into concepts (shared with the
+    template library, so Italian and English phrasing behave the same),
+    one trigger and a chain of actions are picked by rule, and parameters
+    such as "2 giorni" become wait_delay config. A result is only returned
+    when the rules account for at least min_confidence of the meaningful
+    words; anything else is left to the agent and counted as uncovered.
+    """
+
+    def __init__(self, min_confidence: float = 0.75, recent_misses: int = 50):
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "handled": 0}
+        self._rule_hits: Dict[str, int] = {}
+        self._latencies_ms: deque = deque(maxlen=1000)
+        self._misses: deque = deque(maxlen=recent_misses)
+
+    def generate(self, description: str, min_confidence: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Build a workflow for a description if the rules cover it.
+
+        Args:
+            description: Natural language workflow description
+            min_confidence: Override the engine threshold (0 always returns a workflow)
+
+        Returns:
+            {"elements", "edges", "confidence", "rules"} or None when not covered
+        """
+        start = time.perf_counter()
+        threshold = self.min_confidence if min_confidence is None else min_confidence
+        tokens = tokenize(description)
+        concepts = [concept for _, concept in tokens]
+
+        trigger, trigger_position = self._match_trigger(concepts)
+        trigger_positions = [
+            position for position, concept in enumerate(concepts)
+            if concept in trigger.any_of or concept in trigger.context
+        ]
+        explained = set(trigger_positions)
+
+        steps = self._collect_steps(tokens, trigger_position, explained)
+
+        for position, (_, concept) in enumerate(tokens):
+            if concept in NEUTRAL_CONCEPTS:
+                explained.add(position)
+        confidence = len(explained) / len(tokens) if tokens else 0.0
+        # "when the form is NOT submitted" is not a form_submit trigger
+        negated_trigger = any(_negated(concepts, position) for position in trigger_positions)
+        covered = bool(steps) and not negated_trigger and confidence >= threshold
+
+        with self._lock:
+            self._stats["requests"] += 1
+            if covered:
+                self._stats["handled"] += 1
+                for rule_name in [trigger.node_type] + [node_type for _, node_type, _ in steps]:
+                    self._rule_hits[rule_name] = self._rule_hits.get(rule_name, 0) + 1
+            else:
+                self._misses.append(description)
+            self._latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        if not covered:
+            return None
+
+        elements = [{
+            "id": "trigger-1",
+            "type": "input",
+            "data": {"label": trigger.label, "nodeType": trigger.node_type, "description": trigger.description, "config": {}},
+            "className": "border-blue-500"
+        }]
+        edges = []
+        for index, (_, node_type, data) in enumerate(steps, start=1):
+            elements.append({
+                "id": f"action-{index}",
+                "type": "default",
+                "data": {"nodeType": node_type, **data},
+                "className": "border-orange-500" if node_type == "wait_delay" else "border-green-500"
+            })
+            edges.append({
+                "id": f"e{index}-{index + 1}",
+                "source": elements[-2]["id"],
+                "target": elements[-1]["id"],
+                "animated": True,
+                "style": {"stroke": "#3b82f6"}
+            })
+        layout_workflow(elements, edges)
+        return {
+            "elements": elements,
+            "edges": edges,
+            "confidence": round(confidence, 3),
+            "rules": [trigger.node_type] + [node_type for _, node_type, _ in steps]
+        }
+
+    def match_steps(self, description: str) -> List[Dict[str, Any]]:
+        """
+        Return the action steps a description asks for, in order, as node
+        data dicts ({"nodeType", "label", "description", "config"}).
+
+        Used for edits ("also notify the sales team"), so no trigger is
+        picked and coverage stats are left alone.
+        """
+        steps = self._collect_steps(tokenize(description), None, set())
+        return [{"nodeType": node_type, **data} for _, node_type, data in steps]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Coverage (share of requests handled without the agent), per-rule hits and latency."""
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            return {
+                **self._stats,
+                "coverage": round(self._stats["handled"] / self._stats["requests"], 3) if self._stats["requests"] else 0.0,
+                "min_confidence": self.min_confidence,
+                "rule_hits": dict(self._rule_hits),
+                "latency_p50_ms": round(_percentile(latencies, 0.5), 3) if latencies else None,
+                "recent_uncovered": list(self._misses)
+            }
+
+    def _match_trigger(self, concepts: List[str]) -> Tuple[TriggerRule, Optional[int]]:
+        for rule in TRIGGER_RULES:
+            for position, concept in enumerate(concepts):
+                if concept in rule.any_of:
+                    return rule, position
+        return DEFAULT_TRIGGER, None
+
+    def _collect_steps(
+        self,
+        tokens: List[Tuple[str, str]],
+        trigger_position: Optional[int],
+        explained: set
+    ) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """All action steps, sorted by where they belong in the chain."""
+        concepts = [concept for _, concept in tokens]
+        steps: List[Tuple[float, str, Dict[str, Any]]] = []
+        after_delays = []
+        for rule in ACTION_RULES:
+            if rule.node_type == "wait_delay":
+                continue
+            for position in self._mentions(rule, concepts, trigger_position, explained):
+                data = {"label": rule.label, "description": rule.description, "config": {}}
+                steps.append((float(position), rule.node_type, data))
+        self._label_emails(steps, concepts, explained)
+
+        for order, data, after_position in self._delay_steps(tokens, trigger_position, explained):
+            if after_position is None:
+                steps.append((order, "wait_delay", data))
+            else:
+                after_delays.append((after_position, data))
+        # "send email after 3 days": the wait goes right before the step it qualifies
+        for after_position, data in after_delays:
+            previous = [order for order, node_type, _ in steps if node_type != "wait_delay" and 0 <= order < after_position]
+            steps.append((max(previous) - 0.5 if previous else float(after_position), "wait_delay", data))
+        steps.sort(key=lambda step: step[0])
+        return steps
+
+    def _mentions(
+        self,
+        rule: ActionRule,
+        concepts: List[str],
+        trigger_position: Optional[int],
+        explained: set
+    ) -> List[int]:
+        """Positions of each mention of the rule's first satisfied group (negated mentions excluded)."""
+        def usable(position: int, concept: str) -> bool:
+            return concepts[position] == concept and position != trigger_position and not _negated(concepts, position)
+
+        for group in rule.all_of:
+            found = {concept: [p for p in range(len(concepts)) if usable(p, concept)] for concept in group}
+            if not all(found.values()):
+                continue
+            for positions in found.values():
+                explained.update(positions)
+            mentions = []
+            for position in found[group[0]]:
+                # "if score is high" is a condition on an earlier step, not a new one
+                if position + 1 < len(concepts) and concepts[position + 1] == "high":
+                    continue
+                # "newsletter email" is one email, not two
+                if mentions and position == mentions[-1][-1] + 1:
+                    mentions[-1].append(position)
+                else:
+                    mentions.append([position])
+            return [run[0] for run in mentions]
+        return []
+
+    def _label_emails(self, steps: List[Tuple[float, str, Dict[str, Any]]], concepts: List[str], explained: set):
+        """Give each email the welcome/thank/follow-up label mentioned closest to it."""
+        emails = [(order, data) for order, node_type, data in steps if node_type == "send_email"]
+        if not emails:
+            return
+        for concept, label in reversed(EMAIL_LABELS):
+            for position, current in enumerate(concepts):
+                if current != concept or _negated(concepts, position):
+                    continue
+                _, data = min(emails, key=lambda email: abs(email[0] - position))
+                data["label"] = label
+                explained.add(position)
+
+    def _delay_steps(
+        self,
+        tokens: List[Tuple[str, str]],
+        trigger_position: Optional[int],
+        explained: set
+    ) -> List[Tuple[float, Dict[str, Any], Optional[int]]]:
+        """
+        One wait per delay word ("wait", "attendi"...) and per "<number> <unit>"
+        not claimed by one. Returns (order, node data, position of a preceding
+        "after"/"dopo" or None).
+        """
+        concepts = [concept for _, concept in tokens]
+        durations = [
+            position for position in range(len(tokens) - 1)
+            if _DURATION.match(tokens[position][0]) and tokens[position + 1][1] == "unit"
+            and not _negated(concepts, position)
+        ]
+        rule = next(rule for rule in ACTION_RULES if rule.node_type == "wait_delay")
+        anchors = self._mentions(rule, concepts, trigger_position, explained)
+        delays = []
+        for anchor in anchors:
+            free = [position for position in durations if position not in [d for _, d in delays]]
+            delays.append((anchor, min(free, key=lambda p: abs(p - anchor)) if free else None))
+        claimed = {duration for _, duration in delays}
+        delays += [(position, position) for position in durations if position not in claimed]
+
+        results = []
+        for anchor, duration in delays:
+            data = {"label": rule.label, "description": rule.description, "config": {}}
+            if duration is None:
+                results.append((float(anchor), data, None))
+                continue
+            results.append(self._configure_delay(tokens, anchor, duration, data, explained))
+        return results
+
+    def _configure_delay(
+        self,
+        tokens: List[Tuple[str, str]],
+        anchor: int,
+        position: int,
+        data: Dict[str, Any],
+        explained: set
+    ) -> Tuple[float, Dict[str, Any], Optional[int]]:
+        """
+        Fill wait_delay config from the "<number> <unit>" at position and
+        decide where the step goes: "2 days after X" runs first, "after 2
+        days" runs before the step mentioned just before it, "then wait 2
+        days" runs where it is mentioned.
+        """
+        duration, unit = int(tokens[position][0]), UNIT_CANONICAL[tokens[position + 1][0]]
+        data["config"] = {"duration": duration, "unit": unit}
+        data["label"] = f"Wait {duration} {unit.capitalize()}"
+        explained.update((position, position + 1))
+
+        following = tokens[position + 2][0] if position + 2 < len(tokens) else None
+        if following in ("after", "dopo"):
+            explained.add(position + 2)
+            return -1.0, data, None
+        preceding = tokens[position - 1][0] if position > 0 else None
+        if preceding in ("after", "dopo"):
+            explained.add(position - 1)
+            return float(position), data, position - 1
+        return float(min(anchor, position)), data, None
+
+
+def _negated(concepts: List[str], position: int) -> bool:
+    return "negation" in concepts[max(0, position - NEGATION_SCOPE):position]
+
+
+# Global rule engine instance
+workflow_rule_engine = WorkflowRuleEngine(min_confidence=float(os.getenv('WORKFLOW_RULES_MIN_CONFIDENCE', '0.75')))
@@ -0,0 +1,289 @@
+"""
+Workflow Dry-Run Simulator
+Replays a workflow over sample or synthetic trigger events to estimate call volumes, latency and cost
+"""
+
+import random
+from typing import Dict, Any, List, Optional, Tuple
+
+from trigger_index import compile_filter
+from workflow_engine import delay_seconds
+from workflow_graph import WorkflowGraph, TRIGGER_TYPES, node_type_of, validate_workflow_graph
+
+# Per-node defaults: latency, unit cost and which external service the node hits.
+# Costs are rough list-price estimates; callers can override them per request.
+NODE_COST_MODEL = {
+    "ai_score": {"latency_ms": 2500, "cost_eur": 0.002, "service": "llm"},
+    "send_email": {"latency_ms": 300, "cost_eur": 0.0008, "service": "email"},
+    "send_notification": {"latency_ms": 50, "cost_eur": 0.0, "service": "internal"},
+    "create_deal": {"latency_ms": 80, "cost_eur": 0.0, "service": "crm"},
+    "update_contact": {"latency_ms": 60, "cost_eur": 0.0, "service": "crm"},
+    "wait_delay": {"latency_ms": 0, "cost_eur": 0.0, "service": "timer"},
+}
+TRIGGER_COST = {"latency_ms": 0, "cost_eur": 0.0, "service": "trigger"}
+
+# Thresholds above which a workflow is flagged before activation
+EXPENSIVE_LLM_CALLS_PER_DAY = 1000
+EXPENSIVE_EMAILS_PER_DAY = 5000
+EXPENSIVE_COST_PER_MONTH_EUR = 50.0
+EXPENSIVE_PEAK_LLM_CONCURRENCY = 32
+
+MAX_SIMULATED_EVENTS = 100000
+
+
+def synthetic_events(events_per_hour: float, horizon_hours: float, seed: int = 42) -> List[Dict[str, Any]]:
+    """Poisson arrivals at events_per_hour over horizon_hours, as {"offset_s": ...} events."""
+    rng = random.Random(seed)
+    events = []
+    if events_per_hour <= 0:
+        return events
+    rate_per_s = events_per_hour / 3600.0
+    horizon_s = horizon_hours * 3600.0
+    offset = rng.expovariate(rate_per_s)
+    while offset < horizon_s and len(events) < MAX_SIMULATED_EVENTS:
+        events.append({"offset_s": offset})
+        offset += rng.expovariate(rate_per_s)
+    return events
+
+
+def simulate_workflow(
+    elements: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    events: Optional[List[Dict[str, Any]]] = None,
+    events_per_hour: float = 10.0,
+    horizon_hours: float = 24.0,
+    seed: int = 42,
+    cost_overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+    match_rate: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Estimate what running a workflow would cost before it goes live.
+
+    Uses the engine's semantics: a run starts at the trigger for every
+    event passing the trigger filters, each node runs once per run as soon
+    as its first predecessor finishes, and wait_delay holds the branch for
+    its configured delay. Every run therefore follows the same timeline,
+    so per-node timings are computed once and the runs are overlaid to find
+    peak concurrency.
+
+    Synthetic events have no payload, so the trigger filters are not
+    evaluated on them; match_rate (default 1.0) is the share assumed to
+    pass. When the synthetic stream is capped at MAX_SIMULATED_EVENTS the
+    volumes are measured over the hours it covers and scaled up to the
+    full horizon.
+
+    Args:
+        elements: Workflow nodes
+        edges: Workflow connections
+        events: Sample trigger events (payload dicts, optionally with "offset_s");
+            when omitted a Poisson stream is generated
+        events_per_hour: Synthetic arrival rate (also spreads sample events without offsets)
+        horizon_hours: Period the volumes are measured over
+        seed: Random seed for the synthetic stream
+        cost_overrides: Per-nodeType overrides of NODE_COST_MODEL entries
+        match_rate: Fraction of synthetic events passing the trigger filters (0-1)
+
+    Returns:
+        Per-node volumes, LLM calls, critical path, peak concurrency, cost and flags
+
+    Raises:
+        ValueError: If the workflow graph is invalid, match_rate is out of
+            range or more than MAX_SIMULATED_EVENTS sample events are given
+    """
+    validation = validate_workflow_graph(elements, edges)
+    if not validation["valid"]:
+        raise ValueError("Invalid workflow: " + "; ".join(validation["errors"]))
+
+    cost_model = {node_type: dict(entry) for node_type, entry in NODE_COST_MODEL.items()}
+    for node_type, override in (cost_overrides or {}).items():
+        cost_model.setdefault(node_type, dict(TRIGGER_COST)).update(override)
+
+    graph = WorkflowGraph(elements, edges)
+    trigger = graph.triggers()[0]
+    trigger_config = elements[trigger].get("data", {}).get("config") or {}
+    filters = [compile_filter(spec) for spec in trigger_config.get("filters", [])]
+
+    if match_rate is not None and not 0.0 <= match_rate <= 1.0:
+        raise ValueError("match_rate must be between 0 and 1")
+
+    # Event arrival offsets (seconds from the start of the horizon)
+    sampled_hours = horizon_hours
+    from_samples = events is not None
+    if events is None:
+        events = synthetic_events(events_per_hour, horizon_hours, seed)
+        if len(events) >= MAX_SIMULATED_EVENTS and events[-1]["offset_s"] > 0:
+            sampled_hours = events[-1]["offset_s"] / 3600.0
+        rate = 1.0 if match_rate is None else match_rate
+        rng = random.Random(seed + 1)
+        run_offsets = [event["offset_s"] for event in events if rate >= 1.0 or rng.random() < rate]
+    else:
+        if len(events) > MAX_SIMULATED_EVENTS:
+            raise ValueError(f"At most {MAX_SIMULATED_EVENTS} sample events can be simulated")
+        spacing = 3600.0 / events_per_hour if events_per_hour > 0 else 0.0
+        run_offsets = [
+            float(event.get("offset_s", index * spacing))
+            for index, event in enumerate(events)
+            if all(predicate(event) for predicate in filters)
+        ]
+    horizon_days = max(horizon_hours / 24.0, 1e-9)
+    # Extrapolates a capped synthetic stream to the whole horizon
+    scale = horizon_hours / sampled_hours
+    runs = round(len(run_offsets) * scale)
+
+    # One run's timeline: earliest start/finish of every reachable node
+    timings = _run_timeline(graph, trigger, cost_model)
+    costs = {i: _node_cost(elements[i], cost_model) for i in timings}
+
+    per_node = []
+    service_calls: Dict[str, int] = {}
+    run_cost = 0.0
+    for i in graph.topological_order():
+        if i not in timings:
+            continue
+        cost = costs[i]
+        calls = runs
+        if cost["service"] not in ("trigger", "timer"):
+            service_calls[cost["service"]] = service_calls.get(cost["service"], 0) + calls
+        run_cost += cost["cost_eur"]
+        per_node.append({
+            "id": graph.node_id(i),
+            "nodeType": node_type_of(elements[i]),
+            "service": cost["service"],
+            "calls": calls,
+            "calls_per_day": round(calls / horizon_days, 1),
+            "start_offset_s": round(timings[i][0], 3),
+            "cost_eur": round(calls * cost["cost_eur"], 4)
+        })
+
+    total_cost = run_cost * runs
+    cost_per_day = total_cost / horizon_days
+    llm_calls = service_calls.get("llm", 0)
+
+    critical_path, wall_time_s, processing_ms = _critical_path(graph, timings, costs)
+    peaks = _peak_concurrency(run_offsets, timings, costs, wall_time_s)
+
+    flags = []
+    if llm_calls / horizon_days > EXPENSIVE_LLM_CALLS_PER_DAY:
+        flags.append(f"{llm_calls / horizon_days:.0f} LLM calls/day exceeds {EXPENSIVE_LLM_CALLS_PER_DAY}")
+    if service_calls.get("email", 0) / horizon_days > EXPENSIVE_EMAILS_PER_DAY:
+        flags.append(f"{service_calls['email'] / horizon_days:.0f} emails/day exceeds {EXPENSIVE_EMAILS_PER_DAY}")
+    if cost_per_day * 30 > EXPENSIVE_COST_PER_MONTH_EUR:
+        flags.append(f"Estimated €{cost_per_day * 30:.2f}/month exceeds €{EXPENSIVE_COST_PER_MONTH_EUR:.0f}")
+    if peaks["llm_calls"] > EXPENSIVE_PEAK_LLM_CONCURRENCY:
+        flags.append(f"Peak of {peaks['llm_calls']} concurrent LLM calls exceeds {EXPENSIVE_PEAK_LLM_CONCURRENCY}")
+    unreachable = len(elements) - len(timings)
+    if unreachable:
+        flags.append(f"{unreachable} node(s) never execute")
+
+    return {
+        "events": round(len(events) * scale),
+        "runs": runs,
+        "filtered_out": round((len(events) - len(run_offsets)) * scale),
+        "simulated_events": len(events),
+        "scale": round(scale, 4),
+        "trigger_filters_applied": bool(filters) and from_samples,
+        "horizon_hours": horizon_hours,
+        "per_node": per_node,
+        "llm_calls": llm_calls,
+        "llm_calls_per_day": round(llm_calls / horizon_days, 1),
+        "service_calls": service_calls,
+        "critical_path": {
+            "nodes": [graph.node_id(i) for i in critical_path],
+            "processing_ms": round(processing_ms, 1),
+            "wall_time_s": round(wall_time_s, 3)
+        },
+        "peak_concurrency": peaks,
+        "estimated_cost_eur": {
+            "per_run": round(run_cost, 5),
+            "total": round(total_cost, 4),
+            "per_day": round(cost_per_day, 4),
+            "per_month": round(cost_per_day * 30, 2)
+        },
+        "flags": flags,
+        "expensive": bool(flags)
+    }
+
+
+def _node_cost(element: Dict[str, Any], cost_model: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    node_type = node_type_of(element)
+    if node_type in TRIGGER_TYPES:
+        return dict(cost_model.get(node_type, TRIGGER_COST))
+    cost = dict(cost_model.get(node_type, {"latency_ms": 0, "cost_eur": 0.0, "service": "unknown"}))
+    if node_type == "wait_delay":
+        cost["hold_s"] = delay_seconds(element.get("data", {}).get("config") or {})
+    return cost
+
+
+def _run_timeline(graph: WorkflowGraph, trigger: int, cost_model: Dict[str, Dict[str, Any]]) -> Dict[int, Tuple[float, float]]:
+    """Earliest (start_s, finish_s) of each node reachable from the trigger, relative to the event."""
+    timings: Dict[int, Tuple[float, float]] = {}
+    for node in graph.topological_order():
+        if node == trigger:
+            start = 0.0
+        else:
+            finished = [timings[pred][1] for pred in graph.predecessors[node] if pred in timings]
+            if not finished:
+                continue
+            start = min(finished)
+        cost = _node_cost(graph.elements[node], cost_model)
+        timings[node] = (start, start + cost["latency_ms"] / 1000.0 + cost.get("hold_s", 0.0))
+    return timings
+
+
+def _critical_path(
+    graph: WorkflowGraph,
+    timings: Dict[int, Tuple[float, float]],
+    costs: Dict[int, Dict[str, Any]]
+) -> Tuple[List[int], float, float]:
+    """The chain of nodes that finishes last, its wall time and its processing (non-waiting) time."""
+    last = max(timings, key=lambda node: timings[node][1])
+    path = [last]
+    while True:
+        start = timings[path[-1]][0]
+        previous = next(
+            (pred for pred in graph.predecessors[path[-1]] if pred in timings and timings[pred][1] == start),
+            None
+        )
+        if previous is None:
+            break
+        path.append(previous)
+    path.reverse()
+    processing_ms = sum(costs[node]["latency_ms"] for node in path)
+    return path, timings[last][1], processing_ms
+
+
+def _peak_concurrency(
+    run_offsets: List[float],
+    timings: Dict[int, Tuple[float, float]],
+    costs: Dict[int, Dict[str, Any]],
+    run_duration_s: float
+) -> Dict[str, int]:
+    """Sweep the overlaid run timelines for the maximum simultaneous runs, node executions and LLM calls."""
+    run_points: List[Tuple[float, int]] = []
+    node_points: List[Tuple[float, int]] = []
+    llm_points: List[Tuple[float, int]] = []
+    for offset in run_offsets:
+        run_points += [(offset, 1), (offset + run_duration_s, -1)]
+        for node, (start, finish) in timings.items():
+            cost = costs[node]
+            if cost["latency_ms"] <= 0:
+                continue
+            busy_until = offset + start + cost["latency_ms"] / 1000.0
+            node_points += [(offset + start, 1), (busy_until, -1)]
+            if cost["service"] == "llm":
+                llm_points += [(offset + start, 1), (busy_until, -1)]
+    return {
+        "runs_in_flight": _sweep(run_points),
+        "node_executions": _sweep(node_points),
+        "llm_calls": _sweep(llm_points)
+    }
+
+
+def _sweep(points: List[Tuple[float, int]]) -> int:
+    # Ends sort before starts at the same instant, so back-to-back work does not overlap
+    points.sort()
+    current = peak = 0
+    for _, delta in points:
+        current += delta
+        peak = max(peak, current)
+    return peak
@@ -0,0 +1,97 @@
+"""
+Streaming Workflow Parsing
+Incremental JSON parser that emits workflow nodes and edges while the model is still writing
+"""
+
+import json
+from typing import Dict, Any, List, Tuple
+
+from workflow_layout import ORIGIN_X, ORIGIN_Y, LAYER_SPACING
+
+STREAMED_ARRAYS = {"elements": "node", "edges": "edge"}
+
+
+class IncrementalWorkflowParser:
+    """
+    Scans model output chunk by chunk and emits every object of the
+    top-level "elements" and "edges" arrays as soon as its closing brace
+    arrives.
+
+    Only string/escape state and a bracket stack are tracked, so each
+    character is looked at once no matter how the text is chunked. Prose
+    or ``` fences before the JSON object are skipped.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.text = ""
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escaped = False
+        self.string_start = 0
+        self.last_key = None
+        self.array_kind = None
+        self.item_start = None
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Consume a chunk of model output.
+
+        Returns:
+            ("node" | "edge", object) pairs completed by this chunk, in order
+        """
+        self.text += chunk
+        events = []
+        text = self.text
+        while self.position < len(text) and not self.finished:
+            char = text[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1:
+                        self.last_key = text[self.string_start + 1:self.position]
+            elif not self.stack:
+                if char == "{":
+                    self.stack.append(char)
+            elif char == '"':
+                self.in_string = True
+                self.string_start = self.position
+            elif char in "{[":
+                self.stack.append(char)
+                if char == "[" and len(self.stack) == 2 and self.last_key in STREAMED_ARRAYS:
+                    self.array_kind = STREAMED_ARRAYS[self.last_key]
+                elif char == "{" and len(self.stack) == 3 and self.array_kind:
+                    self.item_start = self.position
+            elif char in "}]":
+                self.stack.pop()
+                if char == "}" and len(self.stack) == 2 and self.item_start is not None:
+                    try:
+                        events.append((self.array_kind, json.loads(text[self.item_start:self.position + 1])))
+                    except json.JSONDecodeError:
+                        pass  # Malformed item - final validation will report what is missing
+                    self.item_start = None
+                elif char == "]" and len(self.stack) == 1:
+                    self.array_kind = None
+                elif not self.stack:
+                    self.finished = True
+            self.position += 1
+        return events
+
+    @property
+    def document(self) -> str:
+        """All text fed so far."""
+        return self.text
+
+
+def provisional_position(index: int) -> Dict[str, int]:
+    """Left-to-right placeholder position for the index-th streamed node, until the final layout event."""
+    return {"x": ORIGIN_X + index * LAYER_SPACING, "y": ORIGIN_Y}
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
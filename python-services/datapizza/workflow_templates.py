@@ -0,0 +1,488 @@
+"""
+Workflow Template Library
+Curated and learned canonical workflows, retrieved by normalized Italian/English intent tokens
+"""
+
+import os
+import re
+import copy
+import json
+import math
+import hashlib
+import time
+import threading
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from model_router import _percentile
+from workflow_layout import layout_workflow
+
+DEFAULT_TEMPLATES_PATH = Path(__file__).parent / '.cache' / 'workflow_templates.json'
+
+# Surface forms (Italian and English, accents stripped) -> intent concept
+CONCEPTS = {
+    "email": ["email", "emails", "mail", "mails", "newsletter"],
+    "welcome": ["welcome", "benvenuto", "benvenuti", "onboarding"],
+    "form": ["form", "forms", "modulo", "moduli", "landing"],
+    "submit": ["submit", "submitted", "submits", "submission", "submissions", "compilato", "compilata", "compilati", "compila", "compilazione"],
+    "score": ["score", "scores", "scored", "scoring", "punteggio", "punteggi", "valuta", "valutare", "valutazione", "qualifica"],
+    "contact": ["contact", "contacts", "contatto", "contatti", "lead", "leads", "cliente", "clienti", "customer", "customers"],
+    "new": ["new", "nuovo", "nuovi", "nuova", "nuove"],
+    "create": ["create", "creates", "crea", "creare", "open", "apri"],
+    "deal": ["deal", "deals", "trattativa", "trattative", "opportunita", "opportunity", "opportunities", "affare"],
+    "won": ["won", "win", "wins", "vinto", "vinta", "vinti", "vinte", "closed", "chiuso", "chiusa", "firmato"],
+    "lost": ["lost", "lose", "perso", "persa", "persi", "perse"],
+    "update": ["update", "updated", "updates", "aggiornato", "aggiornata", "aggiorna", "aggiornare", "modificato", "modificata", "changed"],
+    "notify": ["notify", "notifies", "notification", "notifica", "notifiche", "avvisa", "avvisare", "alert", "inform", "informa"],
+    "send": ["send", "sends", "invia", "inviare", "manda", "mandare", "spedisci"],
+    "team": ["team", "squadra", "staff"],
+    "sales": ["sales", "vendite", "vendita", "commerciale", "commerciali", "sellers"],
+    "delay": ["wait", "after", "dopo", "attendi", "aspetta", "attesa", "pausa", "later", "delay", "ritardo"],
+    "unit": ["minute", "minutes", "minuto", "minuti", "hour", "hours", "ora", "ore", "day", "days", "giorno", "giorni", "week", "weeks", "settimana", "settimane"],
+    "followup": ["follow", "followup", "richiamo", "ricontatta", "ricontattare"],
+    "high": ["high", "alto", "alta", "elevato", "elevata", "hot", "caldo"],
+    "record": ["record", "records", "dati", "data", "informazioni", "details", "scheda", "anagrafica"],
+    "schedule": ["weekly", "daily", "monthly", "settimanale", "giornaliero", "mensile", "every", "ogni", "schedule", "scheduled", "programmato"]
+}
+SYNONYMS = {form: concept for concept, forms in CONCEPTS.items() for form in forms}
+
+STOPWORDS = frozenset("""
+    a an the and or when if is are be been being to of for on in at with from by it its that this then as
+    their them they we our your up into once all any someone somebody
+    il lo la i gli le un uno una e o ed od quando se di da del dello della dei degli delle al allo alla ai agli
+    alle nel nello nella nei negli nelle con per su sul sulla che viene vengono sono poi l un loro suo sua
+    qualcuno calcola fai esegui
+""".split())
+
+# Concepts that pin down which trigger a description is about
+TRIGGER_HINTS = {
+    "form": "form_submit",
+    "submit": "form_submit",
+    "won": "deal_won",
+    "lost": "deal_lost",
+    "update": "contact_update",
+    "schedule": "time_trigger"
+}
+
+# Concepts that name a step: a template only answers a request if it has a node of one of the types
+ACTION_HINTS = {
+    "email": {"send_email"},
+    "score": {"ai_score"},
+    "notify": {"send_notification"},
+    "update": {"update_contact", "contact_update"},
+    "create": {"create_deal"},
+    "deal": {"create_deal", "deal_won", "deal_lost"},
+    "delay": {"wait_delay"}
+}
+
+UNIT_CANONICAL = {
+    "minute": "minutes", "minutes": "minutes", "minuto": "minutes", "minuti": "minutes",
+    "hour": "hours", "hours": "hours", "ora": "hours", "ore": "hours",
+    "day": "days", "days": "days", "giorno": "days", "giorni": "days",
+    "week": "weeks", "weeks": "weeks", "settimana": "weeks", "settimane": "weeks"
+}
+_DELAY_PATTERN = re.compile(r"\b(\d+)\s*(" + "|".join(sorted(UNIT_CANONICAL, key=len, reverse=True)) + r")\b")
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents ("è" -> "e") so Italian text tokenizes predictably."""
+    return unicodedata.normalize('NFKD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+
+
+def intent_tokens(description: str) -> Set[str]:
+    """
+    Reduce a description to its set of intent tokens.
+
+    Accents are folded, stopwords dropped, known Italian/English surface
+    forms mapped to a shared concept and numbers collapsed to "num", so
+    "Invia email di benvenuto quando il modulo è compilato" and "Send
+    welcome email when form is submitted" share the same core tokens.
+    """
+    tokens = set()
+    for word in re.findall(r"[a-z0-9]+", fold_text(description)):
+        if word in STOPWORDS:
+            continue
+        if word.isdigit():
+            tokens.add("num")
+        elif word in SYNONYMS:
+            tokens.add(SYNONYMS[word])
+        elif len(word) > 2:
+            tokens.add(word)
+    return tokens
+
+
+def extract_delay(description: str) -> Optional[Dict[str, Any]]:
+    """
+    Pull a "2 days" / "3 giorni" style delay out of a description.
+
+    Returns:
+        wait_delay config ({"duration": 2, "unit": "days"}) or None
+    """
+    match = _DELAY_PATTERN.search(fold_text(description))
+    if not match:
+        return None
+    return {"duration": int(match.group(1)), "unit": UNIT_CANONICAL[match.group(2)]}
+
+
+def trigger_hints(tokens: Set[str]) -> Set[str]:
+    return {TRIGGER_HINTS[token] for token in tokens if token in TRIGGER_HINTS}
+
+
+def action_hints(tokens: Set[str]) -> List[Set[str]]:
+    """Node types the workflow must contain, one alternative set per step concept in the request."""
+    return [ACTION_HINTS[token] for token in sorted(tokens) if token in ACTION_HINTS]
+
+
+def _node(node_id: str, node_type: str, label: str, description: str, config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    is_trigger = node_id.startswith("trigger")
+    return {
+        "id": node_id,
+        "type": "input" if is_trigger else "default",
+        "data": {"label": label, "nodeType": node_type, "description": description, "config": config or {}},
+        "className": "border-blue-500" if is_trigger else "border-green-500"
+    }
+
+
+def _chain(*nodes: Dict[str, Any]) -> Dict[str, Any]:
+    edges = [
+        {
+            "id": f"e{i + 1}-{i + 2}",
+            "source": source["id"],
+            "target": target["id"],
+            "animated": True,
+            "style": {"stroke": "#3b82f6"}
+        }
+        for i, (source, target) in enumerate(zip(nodes, nodes[1:]))
+    ]
+    return {"elements": list(nodes), "edges": edges}
+
+
+CURATED_TEMPLATES = [
+    {
+        "id": "welcome_email_on_form",
+        "phrases": [
+            "Send welcome email when form is submitted",
+            "Invia email di benvenuto quando viene compilato un modulo"
+        ],
+        "workflow": _chain(
+            _node("trigger-1", "form_submit", "Form Submitted", "When a form is submitted"),
+            _node("action-1", "send_email", "Send Welcome Email", "Send a welcome email to the new contact", {"template": "welcome"})
+        )
+    },
+    {
+        "id": "score_and_create_deal",
+        "phrases": [
+            "Score new contacts and create deal if score is high",
+            "Calcola il punteggio dei nuovi contatti e crea una trattativa se il punteggio è alto"
+        ],
+        "workflow": _chain(
+            _node("trigger-1", "form_submit", "New Contact", "When a new contact submits a form"),
+            _node("action-1", "ai_score", "Score Lead", "Score the contact with DataPizza AI"),
+            _node("action-2", "create_deal", "Create Deal", "Create a deal for high-scoring contacts", {"min_score": 70})
+        )
+    },
+    {
+        "id": "follow_up_after_deal_won",
+        "phrases": [
+            "Send follow-up email 2 days after deal is won",
+            "Invia email di follow-up 2 giorni dopo che la trattativa è vinta"
+        ],
+        "workflow": _chain(
+            _node("trigger-1", "deal_won", "Deal Won", "When a deal is won"),
+            _node("action-1", "wait_delay", "Wait 2 Days", "Wait before following up", {"duration": 2, "unit": "days"}),
+            _node("action-2", "send_email", "Send Follow-up Email", "Send a follow-up email to the customer", {"template": "follow_up"})
+        )
+    },
+    {
+        "id": "notify_sales_on_contact_update",
+        "phrases": [
+            "When contact is updated, notify sales team and update records",
+            "Quando un contatto viene aggiornato, notifica il team vendite e aggiorna i dati"
+        ],
+        "workflow": _chain(
+            _node("trigger-1", "contact_update", "Contact Updated", "When a contact is updated"),
+            _node("action-1", "send_notification", "Notify Sales Team", "Alert the sales team about the change", {"team": "sales"}),
+            _node("action-2", "update_contact", "Update Records", "Sync the contact record")
+        )
+    },
+    {
+        "id": "notify_sales_on_deal_lost",
+        "phrases": [
+            "Notify the sales team when a deal is lost",
+            "Avvisa il team commerciale quando una trattativa è persa"
+        ],
+        "workflow": _chain(
+            _node("trigger-1", "deal_lost", "Deal Lost", "When a deal is lost"),
+            _node("action-1", "send_notification", "Notify Sales Team", "Alert the sales team about the lost deal", {"team": "sales"})
+        )
+    },
+    {
+        "id": "score_form_leads_and_notify",
+        "phrases": [
+            "Score leads from form submissions and notify the sales team",
+            "Valuta i lead che compilano il modulo e avvisa il team vendite"
+        ],
+        "workflow": _chain(
+            _node("trigger-1", "form_submit", "Form Submitted", "When a form is submitted"),
+            _node("action-1", "ai_score", "Score Lead", "Score the lead with DataPizza AI"),
+            _node("action-2", "send_notification", "Notify Sales Team", "Send the scored lead to sales", {"team": "sales"})
+        )
+    },
+    {
+        "id": "weekly_newsletter",
+        "phrases": [
+            "Send a weekly newsletter email to contacts",
+            "Invia una newsletter settimanale ai contatti"
+        ],
+        "workflow": _chain(
+            _node("trigger-1", "time_trigger", "Every Week", "Scheduled weekly", {"schedule": "weekly"}),
+            _node("action-1", "send_email", "Send Newsletter", "Send the weekly newsletter", {"template": "newsletter"})
+        )
+    }
+]
+
+
+class WorkflowTemplateLibrary:
+    """
+    Retrieval over canonical workflows by intent-token similarity.
+
+    Every phrase of every template is a document in an inverted index
+    (token -> phrases). A lookup scores only the phrases sharing a token
+    with the query, using IDF-weighted cosine similarity; tokens the
+    library has never seen count against the match, so novel requests fall
+    below the threshold and go to the agent. A template is never served
+    when the request names a step it lacks (an email, a score, a wait...).
+    Workflows the agent generates successfully are learned and persisted
+    as new templates, visible only to the organization that generated them.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = 0.8,
+        max_learned: int = 500,
+        curated: Optional[List[Dict[str, Any]]] = None
+    ):
+        self.path = Path(path or os.getenv('WORKFLOW_TEMPLATES_PATH', DEFAULT_TEMPLATES_PATH))
+        self.threshold = threshold
+        self.max_learned = max_learned
+
+        self._lock = threading.Lock()
+        self._templates: Dict[str, Dict[str, Any]] = {}
+        self._learned: List[str] = []
+        self._phrases: List[Dict[str, Any]] = []
+        self._index: Dict[str, List[int]] = {}
+        self._idf: Dict[str, float] = {}
+        self._norms: List[float] = []
+        self._latencies_ms: deque = deque(maxlen=1000)
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "learned": 0}
+
+        for template in (CURATED_TEMPLATES if curated is None else curated):
+            self._add(template, learned=False)
+        self._load_learned()
+        self._rebuild()
+
+    def match(self, description: str, organization_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return a ready-to-use workflow when a template is similar enough.
+
+        Args:
+            description: Natural language workflow description
+            organization_id: Organization whose learned templates may be used
+                (curated templates are shared)
+
+        Returns:
+            {"template_id", "similarity", "workflow"} with positions laid out
+            and any "N days" delay applied, or None for a novel request
+        """
+        start = time.perf_counter()
+        tokens = intent_tokens(description)
+
+        with self._lock:
+            best_score, best_template = self._best_match(tokens, organization_id)
+            hit = best_template is not None and best_score >= self.threshold
+            self._stats["lookups"] += 1
+            self._stats["hits" if hit else "misses"] += 1
+            self._latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        if not hit:
+            return None
+
+        workflow = copy.deepcopy(best_template["workflow"])
+        delay = extract_delay(description)
+        if delay:
+            for element in workflow["elements"]:
+                if element.get("data", {}).get("nodeType") == "wait_delay":
+                    element["data"]["config"] = dict(delay)
+                    element["data"]["label"] = f"Wait {delay['duration']} {delay['unit'].capitalize()}"
+        layout_workflow(workflow["elements"], workflow["edges"])
+        return {"template_id": best_template["id"], "similarity": round(best_score, 3), "workflow": workflow}
+
+    def learn(self, description: str, workflow: Dict[str, Any], organization_id: Optional[str] = None) -> Optional[str]:
+        """
+        Add an agent-generated workflow as a learned template of an organization.
+
+        Skipped without an organization, and when a template the
+        organization can see already matches the description. The oldest
+        learned template is dropped once max_learned is reached.
+
+        Returns:
+            The new template id, or None if nothing was learned
+        """
+        tokens = intent_tokens(description)
+        if not organization_id or not tokens or not workflow.get("elements"):
+            return None
+        with self._lock:
+            already_known = self._best_match(tokens, organization_id)[0] >= self.threshold
+        if already_known:
+            return None
+
+        elements = [{k: v for k, v in element.items() if k != "position"} for element in workflow["elements"]]
+        template = {
+            "id": "learned_" + hashlib.sha256(f"{organization_id}\n{description}".encode('utf-8')).hexdigest()[:12],
+            "organization_id": organization_id,
+            "phrases": [description],
+            "workflow": {"elements": copy.deepcopy(elements), "edges": copy.deepcopy(workflow.get("edges", []))},
+            "learned_at": time.time()
+        }
+        with self._lock:
+            self._add(template, learned=True)
+            while len(self._learned) > self.max_learned:
+                self._templates.pop(self._learned.pop(0), None)
+            self._rebuild()
+            self._stats["learned"] += 1
+            # Saved under the lock so concurrent learns cannot persist an older list last
+            self._save_learned([self._templates[template_id]["source"] for template_id in self._learned])
+        return template["id"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / self._stats["lookups"], 3) if self._stats["lookups"] else 0.0,
+                "templates": len(self._templates),
+                "learned_templates": len(self._learned),
+                "threshold": self.threshold,
+                "lookup_p50_ms": round(_percentile(latencies, 0.5), 3) if latencies else None
+            }
+
+    def _add(self, template: Dict[str, Any], learned: bool):
+        trigger = next(
+            (element["data"]["nodeType"] for element in template["workflow"]["elements"]
+             if element.get("type") == "input" and isinstance(element.get("data"), dict)),
+            None
+        )
+        self._templates[template["id"]] = {
+            "id": template["id"],
+            "organization_id": template.get("organization_id"),
+            "trigger": trigger,
+            "node_types": {
+                element["data"].get("nodeType") for element in template["workflow"]["elements"]
+                if isinstance(element.get("data"), dict)
+            },
+            "phrases": template["phrases"],
+            "workflow": template["workflow"],
+            "source": template
+        }
+        if learned:
+            # Relearning an id refreshes its place in the eviction order instead of duplicating it
+            if template["id"] in self._learned:
+                self._learned.remove(template["id"])
+            self._learned.append(template["id"])
+
+    def _rebuild(self):
+        """Recompute the inverted index, IDF weights and phrase norms."""
+        self._phrases = [
+            {"template_id": template["id"], "tokens": intent_tokens(phrase)}
+            for template in self._templates.values()
+            for phrase in template["phrases"]
+        ]
+        self._index = {}
+        for position, phrase in enumerate(self._phrases):
+            for token in phrase["tokens"]:
+                self._index.setdefault(token, []).append(position)
+        total = len(self._phrases)
+        self._idf = {token: math.log(1 + total / len(postings)) for token, postings in self._index.items()}
+        self._norms = [
+            math.sqrt(sum(self._idf[token] ** 2 for token in phrase["tokens"])) or 1.0
+            for phrase in self._phrases
+        ]
+
+    def _best_match(self, tokens: Set[str], organization_id: Optional[str]) -> Tuple[float, Optional[Dict[str, Any]]]:
+        """
+        IDF-weighted cosine over the phrases sharing a token with the query.
+
+        Only templates visible to the organization, starting with a hinted
+        trigger and containing every step the query names are candidates.
+        """
+        if not tokens:
+            return 0.0, None
+        hints = trigger_hints(tokens)
+        required = action_hints(tokens)
+        scores: Dict[int, float] = {}
+        for token in tokens:
+            weight = self._idf.get(token)
+            if weight is None:
+                continue
+            for phrase in self._index[token]:
+                scores[phrase] = scores.get(phrase, 0.0) + weight * weight
+
+        unseen_weight = max(self._idf.values(), default=1.0)
+        query_norm = math.sqrt(sum(self._idf.get(token, unseen_weight) ** 2 for token in tokens))
+        best_score, best_template = 0.0, None
+        for phrase, dot in scores.items():
+            template = self._templates[self._phrases[phrase]["template_id"]]
+            if template["organization_id"] is not None and template["organization_id"] != organization_id:
+                continue
+            if hints and template["trigger"] not in hints:
+                continue
+            if any(not types & template["node_types"] for types in required):
+                continue
+            similarity = dot / (query_norm * self._norms[phrase])
+            if similarity > best_score:
+                best_score, best_template = similarity, template
+        return best_score, best_template
+
+    def _load_learned(self):
+        if not self.path.exists():
+            return
+        try:
+            for template in json.loads(self.path.read_text(encoding='utf-8'))[-self.max_learned:]:
+                # Templates learned before per-organization scoping have no owner and are not served
+                if template.get("organization_id"):
+                    self._add(template, learned=True)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Could not load learned workflow templates: {e}")
+
+    def _save_learned(self, learned: List[Dict[str, Any]]):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_suffix('.tmp')
+            temporary.write_text(json.dumps(learned), encoding='utf-8')
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist learned workflow templates: {e}")
+
+
+_shared_library: Optional[WorkflowTemplateLibrary] = None
+_shared_library_lock = threading.Lock()
+
+
+def get_template_library() -> Optional[WorkflowTemplateLibrary]:
+    """
+    Return the process-wide template library, creating it on first use.
+
+    Returns None when WORKFLOW_TEMPLATES_ENABLED is "false".
+    """
+    global _shared_library
+    if os.getenv('WORKFLOW_TEMPLATES_ENABLED', 'true').lower() == 'false':
+        return None
+    with _shared_library_lock:
+        if _shared_library is None:
+            _shared_library = WorkflowTemplateLibrary(
+                threshold=float(os.getenv('WORKFLOW_TEMPLATE_THRESHOLD', '0.8'))
+            )
+        return _shared_library